@@ -18,6 +18,8 @@ from apps.analytics.models import (
     UserAnalytics, PartyAnalytics, VideoAnalytics, 
     AnalyticsEvent, SystemAnalytics, UserSession, WatchTime
 )
+from apps.analytics import rollups
+from apps.analytics.event_ingest import INGEST_MAX_BATCH, IngestError, build_event, event_ingest
 from apps.parties.models import WatchParty
 from apps.videos.models import Video
 try:  # Billing is optional in the lightweight test settings
@@ -49,13 +51,7 @@ def dashboard_stats(request):
         created_at__gte=start_date
     ).count()
     
-    recent_watch_time = (
-        WatchTime.objects.filter(
-            user=user,
-            created_at__gte=start_date
-        ).aggregate(total=Sum('total_watch_time'))['total']
-        or 0
-    )
+    recent_watch_time = rollups.total(rollups.WATCH_SECONDS, start_date, dimension=f"user:{user.id}")
     
     # Friend activity (optional when the friendships app is disabled)
     friend_parties = 0
@@ -66,9 +62,9 @@ def dashboard_stats(request):
 
     if friends_qs is not None:
         friend_parties = WatchParty.objects.filter(
-            participants__in=friends_qs,
+            participants__user__in=friends_qs,
             created_at__gte=start_date
-        ).count()
+        ).distinct().count()
     
     stats = {
         'user_stats': {
@@ -312,9 +308,7 @@ def system_analytics(request):
     new_parties = WatchParty.objects.filter(created_at__gte=start_date).count()
     
     # Engagement metrics
-    total_watch_time = WatchTime.objects.filter(
-        created_at__gte=start_date
-    ).aggregate(Sum('total_watch_time'))['total_watch_time__sum'] or 0
+    total_watch_time = rollups.total(rollups.WATCH_SECONDS, start_date)
     
     avg_session_duration = UserSession.objects.filter(
         start_time__gte=start_date,
@@ -394,28 +388,34 @@ def system_analytics(request):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def track_event(request):
-    """Track an analytics event"""
+    """Track an analytics event, or a batch of them under ``events``"""
     
-    event_type = request.data.get('event_type')
-    if not event_type:
+    batch = request.data.get('events') if isinstance(request.data, dict) else None
+    payloads = batch if isinstance(batch, list) else [request.data]
+    if not payloads or len(payloads) > INGEST_MAX_BATCH:
         return Response(
-            {'error': 'event_type is required'}, 
+            {'error': f'Send between 1 and {INGEST_MAX_BATCH} events'},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Create analytics event
-    event = AnalyticsEvent.objects.create(
-        user=request.user,
-        event_type=event_type,
-        event_data=request.data.get('data', {}),
-        session_id=request.data.get('session_id', ''),
-        user_agent=request.META.get('HTTP_USER_AGENT', ''),
-        ip_address=request.META.get('REMOTE_ADDR', ''),
-        party_id=request.data.get('party_id'),
-        video_id=request.data.get('video_id')
-    )
-    
-    return Response({'event_id': str(event.id)}, status=status.HTTP_201_CREATED)
+    try:
+        entries = [
+            build_event(
+                request.user, payload,
+                ip_address=request.META.get('REMOTE_ADDR', ''),
+                user_agent=request.META.get('HTTP_USER_AGENT', '')
+            )
+            for payload in payloads
+        ]
+    except IngestError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Stored and counted asynchronously by consume_analytics_events
+    event_ingest.submit(entries)
+    
+    if isinstance(batch, list):
+        return Response({'event_ids': [entry['id'] for entry in entries]}, status=status.HTTP_202_ACCEPTED)
+    return Response({'event_id': entries[0]['id']}, status=status.HTTP_202_ACCEPTED)
 
 
 def _get_recent_activity(user: User, start_date) -> List[Dict[str, Any]]:
@@ -444,19 +444,14 @@ def _get_favorite_genres(user: User) -> List[Dict[str, Any]]:
 
 def _get_watch_time_by_day(user: User, start_date) -> List[Dict[str, Any]]:
     """Get watch time grouped by day"""
-    watch_time_by_day = WatchTime.objects.filter(
-        user=user,
-        created_at__gte=start_date
-    ).annotate(
-        date=TruncDate('created_at')
-    ).values('date').annotate(
-        total_duration=Sum('total_watch_time')
-    ).order_by('date')
+    watch_time_by_day = rollups.series(
+        rollups.WATCH_SECONDS, start_date, granularity=rollups.DAY, dimension=f"user:{user.id}"
+    )
     
     return [
         {
-            'date': item['date'].isoformat(),
-            'duration': item['total_duration']
+            'date': item['bucket'].date().isoformat(),
+            'duration': item['value']
         }
         for item in watch_time_by_day
     ]
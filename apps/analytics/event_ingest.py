@@ -0,0 +1,378 @@
+"""
+Buffered analytics event ingest
+
+``track_event`` validates a single event or a client-side batch, appends it
+to an event log and returns. The log is a Redis stream read through a
+consumer group, or an in-process queue when Redis isn't the cache backend.
+``consume_analytics_events`` (apps.analytics.tasks) reads the log in
+batches. Each batch becomes one bulk insert of AnalyticsEvent rows, and the
+per-user, per-party and per-video counters are folded into one ``F()``
+delta per row with a bulk update. Unacknowledged stream entries from a
+crashed consumer are claimed again by the next one.
+
+Delivery is at least once, so counters are only folded for events that
+weren't stored already. Events from users that no longer exist are
+dropped. A batch that fails on its data is split until the bad entries are
+isolated; those go to a dead-letter stream instead of being retried
+forever.
+
+Party participant and message totals are left to ``event_processor``,
+which folds them from the stored events, so they aren't counted twice.
+"""
+
+import json
+import logging
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from datetime import timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import InterfaceError, OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from shared.observability import observability
+
+from . import personal_stats
+from .models import AnalyticsEvent, PartyAnalytics, UserAnalytics, VideoAnalytics
+
+logger = logging.getLogger(__name__)
+
+INGEST_MAX_BATCH = getattr(settings, 'ANALYTICS_INGEST_MAX_BATCH', 100)
+INGEST_STREAM_MAXLEN = getattr(settings, 'ANALYTICS_INGEST_STREAM_MAXLEN', 1_000_000)
+CONSUME_BATCH_SIZE = getattr(settings, 'ANALYTICS_INGEST_CONSUME_BATCH', 1000)
+LOCAL_FLUSH_INTERVAL = 5
+# Entries a consumer read but never acknowledged are reclaimed after this long
+STALE_CLAIM_MS = 5 * 60 * 1000
+
+STREAM_KEY = 'analytics:events:v1'
+DEAD_LETTER_KEY = 'analytics:events:dead:v1'
+CONSUMER_GROUP = 'analytics-counters'
+
+# Counter fields each event type adds to, per aggregate
+USER_COUNTERS = {
+    'party_join': ('total_parties_joined', 'this_week_parties_joined', 'this_month_parties_joined'),
+    'chat_message': ('total_messages_sent', 'this_week_messages_sent', 'this_month_messages_sent'),
+    'reaction_sent': ('reactions_sent',),
+}
+USER_WATCH_COUNTERS = ('total_watch_time_minutes', 'this_week_watch_time_minutes', 'this_month_watch_time_minutes')
+PARTY_COUNTERS = {
+    'reaction_sent': ('total_reactions',),
+    'buffering': ('buffering_events',),
+    'sync_issue': ('sync_issues',),
+}
+VIDEO_COUNTERS = {
+    'view_start': ('total_views', 'this_week_views', 'this_month_views'),
+    'reaction_sent': ('total_reactions',),
+}
+VIDEO_WATCH_COUNTERS = ('total_watch_time_minutes',)
+
+
+class IngestError(ValueError):
+    """A tracked event failed validation"""
+
+
+def _optional_uuid(value, field):
+    if not value:
+        return None
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        raise IngestError(f"{field} must be a UUID")
+
+
+def build_event(user, payload: Dict, ip_address=None, user_agent='') -> Dict:
+    """Validated log entry for one client event"""
+    if not isinstance(payload, dict) or not payload.get('event_type'):
+        raise IngestError('event_type is required')
+    data = payload.get('data', payload.get('event_data')) or {}
+    if not isinstance(data, dict):
+        raise IngestError('event data must be an object')
+    duration = payload.get('duration_seconds')
+    try:
+        duration = float(duration) if duration else None
+    except (TypeError, ValueError):
+        raise IngestError('duration_seconds must be a number')
+
+    return {
+        'id': str(uuid.uuid4()),
+        'user_id': str(user.pk) if getattr(user, 'is_authenticated', False) else None,
+        'party_id': _optional_uuid(payload.get('party_id'), 'party_id'),
+        'video_id': _optional_uuid(payload.get('video_id'), 'video_id'),
+        'event_type': str(payload['event_type'])[:50],
+        'event_data': data,
+        'session_id': str(payload.get('session_id') or '')[:100],
+        'ip_address': ip_address or None,
+        'user_agent': user_agent or '',
+        'duration_seconds': duration,
+        'timestamp': timezone.now().isoformat(),
+    }
+
+
+class RedisEventLog:
+    """Redis stream with a consumer group"""
+
+    shared = True
+
+    def __init__(self, connection, consumer=None):
+        self.connection = connection
+        self.consumer = consumer or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self._group_ready = False
+
+    def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            self.connection.xgroup_create(STREAM_KEY, CONSUMER_GROUP, id='0', mkstream=True)
+        except Exception as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self._group_ready = True
+
+    def append(self, entries: Iterable[Dict]) -> None:
+        pipe = self.connection.pipeline(transaction=False)
+        for entry in entries:
+            pipe.xadd(STREAM_KEY, {'event': json.dumps(entry)}, maxlen=INGEST_STREAM_MAXLEN, approximate=True)
+        pipe.execute()
+
+    def read(self, count: int) -> List[Tuple[str, Dict]]:
+        self._ensure_group()
+        # Entries left behind by a consumer that died mid-batch come first
+        claimed = self.connection.xautoclaim(
+            STREAM_KEY, CONSUMER_GROUP, self.consumer, min_idle_time=STALE_CLAIM_MS, count=count,
+        )[1]
+        messages = list(claimed)
+        if len(messages) < count:
+            response = self.connection.xreadgroup(
+                CONSUMER_GROUP, self.consumer, {STREAM_KEY: '>'}, count=count - len(messages),
+            )
+            for _stream, stream_messages in response or ():
+                messages.extend(stream_messages)
+        return [
+            (message_id, json.loads(fields[b'event'] if b'event' in fields else fields['event']))
+            for message_id, fields in messages if fields
+        ]
+
+    def ack(self, entry_ids: List) -> None:
+        if entry_ids:
+            pipe = self.connection.pipeline(transaction=True)
+            pipe.xack(STREAM_KEY, CONSUMER_GROUP, *entry_ids)
+            pipe.xdel(STREAM_KEY, *entry_ids)
+            pipe.execute()
+
+    def retry(self, entries: List[Tuple[str, Dict]]) -> None:
+        # Re-append rather than waiting STALE_CLAIM_MS for a reclaim; the event ids stay the same
+        pipe = self.connection.pipeline(transaction=True)
+        for _, entry in entries:
+            pipe.xadd(STREAM_KEY, {'event': json.dumps(entry)}, maxlen=INGEST_STREAM_MAXLEN, approximate=True)
+        pipe.xack(STREAM_KEY, CONSUMER_GROUP, *[entry_id for entry_id, _ in entries])
+        pipe.xdel(STREAM_KEY, *[entry_id for entry_id, _ in entries])
+        pipe.execute()
+
+    def dead_letter(self, entries: List[Tuple[str, Dict]], error: str) -> None:
+        pipe = self.connection.pipeline(transaction=True)
+        for _, entry in entries:
+            pipe.xadd(DEAD_LETTER_KEY, {'event': json.dumps(entry), 'error': error},
+                      maxlen=INGEST_STREAM_MAXLEN, approximate=True)
+        pipe.xack(STREAM_KEY, CONSUMER_GROUP, *[entry_id for entry_id, _ in entries])
+        pipe.xdel(STREAM_KEY, *[entry_id for entry_id, _ in entries])
+        pipe.execute()
+
+
+class MemoryEventLog:
+    """Per-process queue, for non-Redis cache backends"""
+
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self.dead_letters = deque(maxlen=1000)
+
+    def append(self, entries: Iterable[Dict]) -> None:
+        with self._lock:
+            self._queue.extend(entries)
+
+    def read(self, count: int) -> List[Tuple[str, Dict]]:
+        with self._lock:
+            batch = [self._queue.popleft() for _ in range(min(count, len(self._queue)))]
+        return [(entry['id'], entry) for entry in batch]
+
+    def ack(self, entry_ids: List) -> None:
+        pass
+
+    def retry(self, entries: List[Tuple[str, Dict]]) -> None:
+        with self._lock:
+            self._queue.extendleft(entry for _, entry in reversed(entries))
+
+    def dead_letter(self, entries: List[Tuple[str, Dict]], error: str) -> None:
+        with self._lock:
+            self.dead_letters.extend((entry, error) for _, entry in entries)
+
+
+def _default_log():
+    try:
+        from django_redis import get_redis_connection
+
+        return RedisEventLog(get_redis_connection('default'))
+    except (ImportError, NotImplementedError):
+        return MemoryEventLog()
+
+
+def _bulk_add(model, key_field: str, deltas: Dict[str, Dict[str, int]]) -> None:
+    """Add ``deltas[key][field]`` to each counter, creating missing rows first"""
+    if not deltas:
+        return
+    model.objects.bulk_create([model(**{key_field: key}) for key in deltas], ignore_conflicts=True)
+    rows = list(model.objects.filter(**{f"{key_field}__in": list(deltas)}))
+    fields = set()
+    for row in rows:
+        for field, amount in deltas[str(getattr(row, key_field))].items():
+            setattr(row, field, F(field) + amount)
+            fields.add(field)
+    model.objects.bulk_update(rows, sorted(fields))
+
+
+def fold_counters(events: List[Dict]) -> Tuple[Dict, Dict, Dict]:
+    """Per-row counter deltas for a batch of log entries"""
+    user_deltas, party_deltas, video_deltas = (defaultdict(lambda: defaultdict(int)) for _ in range(3))
+    for event in events:
+        event_type = event['event_type']
+        watch_minutes = int((event.get('duration_seconds') or 0) / 60) if event_type == 'view_end' else 0
+        if event['user_id']:
+            for field in USER_COUNTERS.get(event_type, ()):
+                user_deltas[event['user_id']][field] += 1
+            for field in USER_WATCH_COUNTERS if watch_minutes else ():
+                user_deltas[event['user_id']][field] += watch_minutes
+        if event['party_id']:
+            for field in PARTY_COUNTERS.get(event_type, ()):
+                party_deltas[event['party_id']][field] += 1
+        if event['video_id']:
+            for field in VIDEO_COUNTERS.get(event_type, ()):
+                video_deltas[event['video_id']][field] += 1
+            for field in VIDEO_WATCH_COUNTERS if watch_minutes else ():
+                video_deltas[event['video_id']][field] += watch_minutes
+    return user_deltas, party_deltas, video_deltas
+
+
+def _existing_ids(model, ids) -> set:
+    ids = {value for value in ids if value}
+    if not ids:
+        return set()
+    return {str(pk) for pk in model.objects.filter(pk__in=ids).values_list('pk', flat=True)}
+
+
+def store_batch(events: List[Dict]) -> int:
+    """Insert new events and apply their counter deltas in one transaction; returns events inserted"""
+    from apps.parties.models import WatchParty
+    from apps.videos.models import Video
+
+    # The user may have been deleted since the event was tracked
+    users = _existing_ids(get_user_model(), (event['user_id'] for event in events))
+    events = [event for event in events if not event['user_id'] or event['user_id'] in users]
+    # Ids were only format-checked at ingest; drop links to rows that don't exist
+    parties = _existing_ids(WatchParty, (event['party_id'] for event in events))
+    videos = _existing_ids(Video, (event['video_id'] for event in events))
+    for event in events:
+        event['party_id'] = event['party_id'] if event['party_id'] in parties else None
+        event['video_id'] = event['video_id'] if event['video_id'] in videos else None
+
+    with transaction.atomic():
+        # A re-delivered entry is already stored and counted
+        stored = _existing_ids(AnalyticsEvent, (event['id'] for event in events))
+        events = list({event['id']: event for event in events if event['id'] not in stored}.values())
+        if not events:
+            return 0
+        AnalyticsEvent.objects.bulk_create([
+            AnalyticsEvent(
+                id=event['id'], user_id=event['user_id'], party_id=event['party_id'],
+                video_id=event['video_id'], event_type=event['event_type'], event_data=event['event_data'],
+                session_id=event['session_id'], ip_address=event['ip_address'], user_agent=event['user_agent'],
+                duration=timedelta(seconds=event['duration_seconds']) if event['duration_seconds'] else None,
+                timestamp=parse_datetime(event['timestamp']),
+            )
+            for event in events
+        ])
+        user_deltas, party_deltas, video_deltas = fold_counters(events)
+        _bulk_add(UserAnalytics, 'user_id', user_deltas)
+        _bulk_add(PartyAnalytics, 'party_id', party_deltas)
+        _bulk_add(VideoAnalytics, 'video_id', video_deltas)
+    personal_stats.invalidate(event['user_id'] for event in events if event['user_id'])
+    return len(events)
+
+
+class EventIngest:
+    """Accept tracked events quickly and fold them into storage in batches"""
+
+    def __init__(self, log=None):
+        self._log = log
+        self._last_local_flush = None
+
+    @property
+    def log(self):
+        if self._log is None:
+            self._log = _default_log()
+        return self._log
+
+    def submit(self, entries: List[Dict]) -> None:
+        self.log.append(entries)
+        observability.record_metric('analytics.ingest.accepted', len(entries))
+        if not self.log.shared:
+            self._consume_local()
+
+    def _consume_local(self):
+        # A worker can't reach another process's queue, so drain it here
+        now = time.monotonic()
+        if self._last_local_flush is None:
+            self._last_local_flush = now
+        if now - self._last_local_flush < LOCAL_FLUSH_INTERVAL:
+            return
+        self._last_local_flush = now
+        try:
+            self.consume()
+        except Exception as e:
+            logger.error(f"Error consuming analytics events: {str(e)}")
+
+    def consume(self, batch_size: int = CONSUME_BATCH_SIZE, max_batches: int = 50) -> int:
+        """Store buffered events; returns how many were stored"""
+        stored = 0
+        for _ in range(max_batches):
+            entries = self.log.read(batch_size)
+            if not entries:
+                break
+            try:
+                stored += self._store(entries)
+            except Exception:
+                self.log.retry(entries)
+                raise
+            if len(entries) < batch_size:
+                break
+        if stored:
+            observability.record_metric('analytics.ingest.stored', stored)
+        return stored
+
+    def _store(self, entries: List[Tuple[str, Dict]]) -> int:
+        """Store and ack ``entries``, halving on bad data until the failing entries are dead-lettered"""
+        try:
+            stored = store_batch([event for _, event in entries])
+        except (OperationalError, InterfaceError):
+            raise  # the database is unavailable, not the data; retry the whole batch
+        except Exception as e:
+            if len(entries) > 1:
+                middle = len(entries) // 2
+                return self._store(entries[:middle]) + self._store(entries[middle:])
+            logger.error(f"Dead-lettering analytics event {entries[0][1].get('id')}: {str(e)}")
+            observability.record_metric('analytics.ingest.dead_lettered', 1)
+            self.log.dead_letter(entries, str(e))
+            return 0
+        self.log.ack([entry_id for entry_id, _ in entries])
+        return stored
+
+
+event_ingest = EventIngest()
@@ -0,0 +1,288 @@
+"""
+Set-based analytics event processing
+
+Unprocessed events are claimed in chunks ordered by ``(timestamp, id)``
+with ``SELECT ... FOR UPDATE SKIP LOCKED``, so several workers can drain the
+backlog at once without claiming the same rows. A chunk is folded in memory
+into one delta per aggregate row: watch time per (user, video, party),
+counters per party, and one state per session. Each aggregate table then
+gets one bulk read, one bulk insert and one bulk update. The whole chunk is
+marked processed with a single ``UPDATE``, after its time-bucketed rollups
+(``rollups``) are added. If one aggregate group fails, its events are
+retried one at a time. An event that fails on its own because of bad data
+is marked processed and logged, so it can't hold back the rest. Events that
+fail because of a database error stay unprocessed and are retried on the
+next run.
+"""
+
+import json
+import logging
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from shared.observability import observability
+
+from .models import AnalyticsEvent, PartyAnalytics, UserSession, WatchTime
+from .retention import record_activity
+from .rollups import record_events
+
+logger = logging.getLogger(__name__)
+
+EVENT_BATCH_SIZE = getattr(settings, 'ANALYTICS_BATCH_SIZE', 1000)
+EVENT_MAX_BATCHES = getattr(settings, 'ANALYTICS_MAX_BATCHES_PER_RUN', 50)
+
+WATCH_EVENTS = ('video_play', 'video_pause')
+PARTY_EVENTS = ('party_join', 'party_leave', 'chat_message')
+SESSION_EVENTS = ('user_login', 'user_logout')
+# Client-supplied fields the aggregators do arithmetic on, by the type they're stored as
+NUMERIC_FIELDS = {'position': int, 'watch_duration': int, 'session_duration': float}
+
+
+def _number(value, kind):
+    """``value`` as a non-negative ``kind``, or None if it isn't one"""
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return kind(number) if math.isfinite(number) and number >= 0 else None
+
+
+def event_payload(event) -> Dict:
+    """
+    ``event_data`` as a dict; rows written before it was a JSONField may
+    hold a JSON string. Numeric fields are coerced to numbers, and values
+    that aren't non-negative numbers are dropped.
+    """
+    data = event.event_data or {}
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            return {}
+    if not isinstance(data, dict):
+        return {}
+    data = dict(data)
+    for field, kind in NUMERIC_FIELDS.items():
+        if field in data:
+            number = _number(data[field], kind)
+            if number is None:
+                del data[field]
+            else:
+                data[field] = number
+    return data
+
+
+def claim_batch(batch_size: int, after: Optional[Tuple] = None) -> List[AnalyticsEvent]:
+    """Lock the next unprocessed events after the ``(timestamp, id)`` cursor; call inside a transaction"""
+    events = AnalyticsEvent.objects.filter(processed=False)
+    if after is not None:
+        timestamp, event_id = after
+        events = events.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=event_id))
+    return list(
+        events.select_for_update(skip_locked=True)
+        .order_by('timestamp', 'id')
+        .only(
+            'id', 'user_id', 'party_id', 'video_id', 'event_type', 'event_data', 'duration', 'timestamp',
+            'ip_address', 'user_agent',
+        )[:batch_size]
+    )
+
+
+def _apply_watch_times(events: Iterable[AnalyticsEvent]) -> None:
+    # (user, video, party) -> [last position, added watch seconds]
+    folded = {}
+    for event in events:
+        data = event_payload(event)
+        video_id = data.get('video_id') or event.video_id
+        party_id = data.get('party_id') or event.party_id
+        watch_duration = data.get('watch_duration', 0) if event.event_type == 'video_pause' else 0
+        if not video_id or not event.user_id:
+            continue
+        if event.event_type == 'video_pause' and not watch_duration > 0:
+            continue
+        key = (str(event.user_id), str(video_id), str(party_id) if party_id else None)
+        entry = folded.setdefault(key, [0, 0])
+        entry[0] = data.get('position', 0)
+        entry[1] += watch_duration
+    if not folded:
+        return
+
+    existing = {
+        (str(row.user_id), str(row.video_id), str(row.party_id) if row.party_id else None): row
+        for row in WatchTime.objects.select_for_update().filter(
+            user_id__in={key[0] for key in folded}, video_id__in={key[1] for key in folded},
+        )
+    }
+    now = timezone.now()
+    updates, creates = [], []
+    for key, (position, added) in folded.items():
+        row = existing.get(key)
+        if row is None:
+            creates.append(WatchTime(
+                user_id=key[0], video_id=key[1], party_id=key[2],
+                total_watch_time=added, last_position=position,
+            ))
+        else:
+            row.last_position = position
+            row.total_watch_time = F('total_watch_time') + added
+            row.updated_at = now
+            updates.append(row)
+    WatchTime.objects.bulk_create(creates)
+    WatchTime.objects.bulk_update(updates, ['last_position', 'total_watch_time', 'updated_at'])
+
+
+def _apply_party_analytics(events: Iterable[AnalyticsEvent]) -> None:
+    joins, messages = defaultdict(int), defaultdict(int)
+    leaves = defaultdict(list)
+    for event in events:
+        data = event_payload(event)
+        # track_event stores the party in the FK column rather than the payload
+        party_id = data.get('party_id') or event.party_id
+        if not party_id:
+            continue
+        party_id = str(party_id)
+        if event.event_type == 'party_join':
+            joins[party_id] += 1
+        elif event.event_type == 'chat_message':
+            messages[party_id] += 1
+        elif data.get('session_duration', 0) > 0:
+            leaves[party_id].append(data['session_duration'])
+    parties = set(joins) | set(messages) | set(leaves)
+    if not parties:
+        return
+
+    # Joins and messages create the row; a leave alone never did
+    PartyAnalytics.objects.bulk_create(
+        [PartyAnalytics(party_id=party_id) for party_id in set(joins) | set(messages)], ignore_conflicts=True,
+    )
+    rows = list(PartyAnalytics.objects.select_for_update().filter(party_id__in=parties))
+    for row in rows:
+        party_id = str(row.party_id)
+        participants = row.total_participants + joins[party_id]
+        average = row.avg_session_duration
+        for duration in leaves[party_id]:
+            # Running mean over sessions, as participants leave
+            average = (average * participants + duration) / (participants + 1) if average else duration
+        row.avg_session_duration = average
+        row.total_participants = F('total_participants') + joins[party_id]
+        row.total_messages = F('total_messages') + messages[party_id]
+    PartyAnalytics.objects.bulk_update(rows, ['avg_session_duration', 'total_participants', 'total_messages'])
+
+
+def _apply_sessions(events: Iterable[AnalyticsEvent]) -> None:
+    logins, logouts = {}, {}
+    for event in events:
+        session_id = event_payload(event).get('session_id')
+        if session_id:
+            # Events arrive in timestamp order, so the last one per session wins
+            (logins if event.event_type == 'user_login' else logouts)[session_id] = event
+
+    if logins:
+        UserSession.objects.bulk_create(
+            [
+                UserSession(
+                    session_id=session_id, user_id=event.user_id, start_time=event.timestamp,
+                    ip_address=event.ip_address, user_agent=event.user_agent,
+                )
+                for session_id, event in logins.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['session_id'],
+            update_fields=['user', 'start_time', 'ip_address', 'user_agent'],
+        )
+    if logouts:
+        sessions = list(UserSession.objects.filter(session_id__in=list(logouts)))
+        for session in sessions:
+            session.end_time = logouts[session.session_id].timestamp
+            session.duration = int((session.end_time - session.start_time).total_seconds())
+        UserSession.objects.bulk_update(sessions, ['end_time', 'duration'])
+
+
+def _apply_one_by_one(name: str, apply, group: List[AnalyticsEvent]) -> set:
+    """Apply a failed group event by event; returns ids to leave unprocessed"""
+    pending = set()
+    for event in group:
+        try:
+            with transaction.atomic():
+                apply([event])
+        except DatabaseError as exc:
+            # Possibly transient (deadlock, lost connection): try again next run
+            logger.error(f"Error applying {name} analytics event {event.id}: {str(exc)}")
+            pending.add(event.id)
+        except Exception as exc:
+            # Bad data fails the same way every run; count it as processed so it can't block the chunk
+            logger.error(f"Skipping {name} analytics event {event.id}: {str(exc)}")
+            observability.record_event(
+                "analytics.pipeline.event_error",
+                f"Skipped unprocessable {name} analytics event",
+                severity="error",
+                tags={"worker": "analytics.pipeline", "group": name, "event_id": str(event.id)},
+            )
+    if pending:
+        observability.record_event(
+            "analytics.pipeline.group_error",
+            f"Failed to apply {name} analytics events",
+            severity="error",
+            tags={"worker": "analytics.pipeline", "group": name},
+        )
+    return pending
+
+
+AGGREGATORS = (
+    ('watch_time', WATCH_EVENTS, _apply_watch_times),
+    ('party', PARTY_EVENTS, _apply_party_analytics),
+    ('session', SESSION_EVENTS, _apply_sessions),
+)
+
+
+def process_batch(events: List[AnalyticsEvent]) -> int:
+    """Apply a claimed chunk and mark it processed; returns events marked"""
+    by_type = defaultdict(list)
+    for event in events:
+        by_type[event.event_type].append(event)
+
+    failed = set()
+    for name, event_types, apply in AGGREGATORS:
+        group = [event for event_type in event_types for event in by_type.get(event_type, ())]
+        if not group:
+            continue
+        group.sort(key=lambda event: (event.timestamp, str(event.id)))
+        try:
+            with transaction.atomic():
+                apply(group)
+        except Exception as exc:
+            logger.error(f"Error applying {len(group)} {name} analytics events, retrying one by one: {str(exc)}")
+            failed.update(_apply_one_by_one(name, apply, group))
+
+    done = [event for event in events if event.id not in failed]
+    if done:
+        # Rolled back with the whole chunk on failure, so rollups never double count
+        record_events(done)
+        record_activity(done)
+        AnalyticsEvent.objects.filter(id__in=[event.id for event in done]).update(processed=True)
+    return len(done)
+
+
+def process_pending_events(batch_size: int = EVENT_BATCH_SIZE, max_batches: int = EVENT_MAX_BATCHES) -> int:
+    """Drain unprocessed events chunk by chunk; returns events processed"""
+    processed = 0
+    cursor = None
+    for _ in range(max_batches):
+        with transaction.atomic():
+            events = claim_batch(batch_size, after=cursor)
+            if not events:
+                break
+            processed += process_batch(events)
+        # Past anything that failed this run, so it isn't reclaimed in a loop
+        cursor = (events[-1].timestamp, events[-1].id)
+        if len(events) < batch_size:
+            break
+    return processed
@@ -0,0 +1 @@
+# Analytics app management commands
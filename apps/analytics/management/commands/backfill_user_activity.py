@@ -0,0 +1,35 @@
+"""
+Django management command to backfill user activity days.
+Materializes one row per user per active day from stored analytics
+events, so retention cohorts cover the time before the table existed.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.analytics.retention import backfill_activity
+
+
+class Command(BaseCommand):
+    help = 'Backfill user activity days from analytics events'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=120,
+            help='How many days back to backfill',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Activity rows inserted per statement',
+        )
+    
+    def handle(self, *args, **options):
+        start = timezone.now() - timedelta(days=options['days'])
+        offered = backfill_activity(start, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {offered} user activity days since {start:%Y-%m-%d}"))
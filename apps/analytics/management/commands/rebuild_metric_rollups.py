@@ -0,0 +1,35 @@
+"""
+Django management command to rebuild analytics metric rollups.
+Replays processed events into the minute/hour/day buckets, for example
+after the rollup tables are first deployed or a bucket is found wrong.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.analytics.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute metric rollups from processed analytics events'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='How many days back to rebuild',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Events replayed per transaction',
+        )
+    
+    def handle(self, *args, **options):
+        start = timezone.now() - timedelta(days=options['days'])
+        replayed = rebuild(start, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Replayed {replayed} events into rollups since {start:%Y-%m-%d}"))
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.14 on 2026-10-18 21:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0003_analyticsevent_duration_analyticsevent_party_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MetricRollup",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("metric", models.CharField(max_length=64, verbose_name="Metric")),
+                (
+                    "dimension",
+                    models.CharField(
+                        blank=True, default="", max_length=100, verbose_name="Dimension"
+                    ),
+                ),
+                (
+                    "granularity",
+                    models.CharField(
+                        choices=[
+                            ("minute", "Minute"),
+                            ("hour", "Hour"),
+                            ("day", "Day"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField(verbose_name="Bucket Start")),
+                ("value", models.BigIntegerField(default=0, verbose_name="Value")),
+            ],
+            options={
+                "verbose_name": "Metric Rollup",
+                "verbose_name_plural": "Metric Rollups",
+                "db_table": "metric_rollups",
+                "indexes": [
+                    models.Index(
+                        fields=["metric", "granularity", "bucket_start"],
+                        name="metric_roll_metric_864ba1_idx",
+                    )
+                ],
+                "unique_together": {
+                    ("metric", "dimension", "granularity", "bucket_start")
+                },
+            },
+        ),
+    ]
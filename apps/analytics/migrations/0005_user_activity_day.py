@@ -0,0 +1,40 @@
+# Generated by Django 5.0.14 on 2026-10-18 22:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0004_metric_rollup"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserActivityDay",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("day", models.DateField(verbose_name="Day")),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="activity_days",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "User Activity Day",
+                "verbose_name_plural": "User Activity Days",
+                "db_table": "user_activity_days",
+                "indexes": [
+                    models.Index(fields=["day"], name="user_activi_day_8d5e54_idx")
+                ],
+                "unique_together": {("user", "day")},
+            },
+        ),
+    ]
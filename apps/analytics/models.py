@@ -417,3 +417,53 @@ class SystemAnalytics(models.Model):
         
     def __str__(self):
         return f"System Analytics for {self.date}"
+
+
+class MetricRollup(models.Model):
+    """Pre-aggregated metric totals per time bucket"""
+    
+    GRANULARITIES = [
+        ('minute', 'Minute'),
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    
+    id = models.BigAutoField(primary_key=True)
+    metric = models.CharField(max_length=64, verbose_name='Metric')
+    # '' for the global total, otherwise e.g. "video:<id>", "user:<id>", "type:<event_type>"
+    dimension = models.CharField(max_length=100, blank=True, default='', verbose_name='Dimension')
+    granularity = models.CharField(max_length=10, choices=GRANULARITIES)
+    bucket_start = models.DateTimeField(verbose_name='Bucket Start')
+    value = models.BigIntegerField(default=0, verbose_name='Value')
+    
+    class Meta:
+        db_table = 'metric_rollups'
+        verbose_name = 'Metric Rollup'
+        verbose_name_plural = 'Metric Rollups'
+        unique_together = ['metric', 'dimension', 'granularity', 'bucket_start']
+        indexes = [
+            models.Index(fields=['metric', 'granularity', 'bucket_start']),
+        ]
+        
+    def __str__(self):
+        return f"{self.metric}[{self.dimension}] {self.granularity} {self.bucket_start}: {self.value}"
+
+
+class UserActivityDay(models.Model):
+    """One row per user per UTC day with any tracked activity"""
+    
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_days')
+    day = models.DateField(verbose_name='Day')
+    
+    class Meta:
+        db_table = 'user_activity_days'
+        verbose_name = 'User Activity Day'
+        verbose_name_plural = 'User Activity Days'
+        unique_together = ['user', 'day']
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+        
+    def __str__(self):
+        return f"{self.user_id} active on {self.day}"
@@ -4,13 +4,15 @@ Advanced analytics dashboard views
 
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Avg
+from django.core.cache import cache
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import timedelta
 from django.contrib.auth import get_user_model
 
 from shared.responses import StandardResponse
 from shared.api_documentation import api_response_documentation
+from . import personal_stats
+from .personal_stats import DEFAULT_TIME_RANGE, PERSONAL_CACHE_TIMEOUT, TIME_RANGES, WEEKDAYS
 
 User = get_user_model()
 
@@ -29,82 +31,25 @@ class PersonalAnalyticsView(APIView):
     def get(self, request):
         """Get personal analytics for user"""
         user = request.user
-        time_range = request.GET.get('time_range', '30d')  # 7d, 30d, 90d, 1y
-        
-        # Calculate date range
-        end_date = timezone.now()
-        if time_range == '7d':
-            start_date = end_date - timedelta(days=7)
-        elif time_range == '30d':
-            start_date = end_date - timedelta(days=30)
-        elif time_range == '90d':
-            start_date = end_date - timedelta(days=90)
-        elif time_range == '1y':
-            start_date = end_date - timedelta(days=365)
-        else:
-            start_date = end_date - timedelta(days=30)
-        
-        analytics_data = self.calculate_personal_analytics(user, start_date, end_date)
+        time_range = request.GET.get('time_range', DEFAULT_TIME_RANGE)  # 7d, 30d, 90d, 1y
+        if time_range not in TIME_RANGES:
+            time_range = DEFAULT_TIME_RANGE
+        
+        key = personal_stats.cache_key(user.id, time_range)
+        analytics_data = cache.get(key)
+        if analytics_data is None:
+            end_date = timezone.now()
+            start_date = end_date - timedelta(days=TIME_RANGES[time_range])
+            analytics_data = self.calculate_personal_analytics(user, start_date, end_date)
+            cache.set(key, analytics_data, PERSONAL_CACHE_TIMEOUT)
         
         return StandardResponse.success(analytics_data, "Personal analytics retrieved successfully")
     
     def calculate_personal_analytics(self, user, start_date, end_date):
         """Calculate comprehensive personal analytics"""
-        from apps.parties.models import WatchParty, PartyParticipant
-        from apps.videos.models import Video
-        from apps.analytics.models import AnalyticsEvent
-        from apps.chat.models import ChatMessage
-        
-        # Basic user stats
-        hosted_parties = WatchParty.objects.filter(
-            host=user,
-            created_at__range=[start_date, end_date]
-        )
-        
-        joined_parties = PartyParticipant.objects.filter(
-            user=user,
-            is_active=True,
-            joined_at__range=[start_date, end_date]
-        )
-        
-        uploaded_videos = Video.objects.filter(
-            uploader=user,
-            created_at__range=[start_date, end_date]
-        )
-        
-        analytics_events = AnalyticsEvent.objects.filter(
-            user=user,
-            timestamp__range=[start_date, end_date]
-        )
-        
-        chat_messages = ChatMessage.objects.filter(
-            user=user,
-            timestamp__range=[start_date, end_date],
-            is_deleted=False
-        )
-        
-        # Watch time calculation
-        watch_events = analytics_events.filter(event_type='video_watch')
-        total_watch_time = sum([
-            event.event_data.get('duration', 0) 
-            for event in watch_events 
-            if event.event_data and 'duration' in event.event_data
-        ])
-        
-        # Party engagement
-        party_engagement = self.calculate_party_engagement(user, start_date, end_date)
-        
-        # Social metrics
-        social_metrics = self.calculate_social_metrics(user, start_date, end_date)
-        
-        # Achievement progress
-        achievement_progress = self.calculate_achievement_progress(user, start_date, end_date)
-        
-        # Activity trends (daily breakdown)
-        activity_trends = self.calculate_activity_trends(user, start_date, end_date)
-        
-        # Preferences and interests
-        interests = self.calculate_user_interests(user, start_date, end_date)
+        events = personal_stats.event_breakdown(user, start_date, end_date)
+        parties = personal_stats.party_totals(user, start_date, end_date)
+        social = personal_stats.social_totals(user, start_date, end_date)
         
         return {
             'time_range': {
@@ -113,189 +58,85 @@ class PersonalAnalyticsView(APIView):
                 'days': (end_date - start_date).days
             },
             'overview': {
-                'parties_hosted': hosted_parties.count(),
-                'parties_joined': joined_parties.count(),
-                'videos_uploaded': uploaded_videos.count(),
-                'total_watch_time_minutes': total_watch_time // 60,
-                'messages_sent': chat_messages.count(),
-                'events_tracked': analytics_events.count()
+                'parties_hosted': parties['parties_hosted'],
+                'parties_joined': parties['parties_joined'],
+                'videos_uploaded': parties['videos_uploaded'],
+                'total_watch_time_minutes': int(events['watch_seconds'] // 60),
+                'messages_sent': social['chat_messages'],
+                'events_tracked': events['total']
             },
-            'party_engagement': party_engagement,
-            'social_metrics': social_metrics,
-            'achievement_progress': achievement_progress,
-            'activity_trends': activity_trends,
-            'interests': interests,
-            'milestones': self.calculate_milestones(user),
+            'party_engagement': self.calculate_party_engagement(user, parties),
+            'social_metrics': self.calculate_social_metrics(user, social, start_date, end_date),
+            'achievement_progress': self.calculate_achievement_progress(user, social),
+            'activity_trends': self.calculate_activity_trends(events),
+            'interests': self.calculate_user_interests(user, events, start_date, end_date),
+            'milestones': self.calculate_milestones(user, parties),
             'recommendations': self.generate_recommendations(user)
         }
     
-    def calculate_party_engagement(self, user, start_date, end_date):
+    def calculate_party_engagement(self, user, parties):
         """Calculate party engagement metrics"""
-        from apps.parties.models import WatchParty, PartyParticipant
-        from apps.analytics.models import AnalyticsEvent
-        
-        # Parties hosted
-        hosted_parties = WatchParty.objects.filter(
-            host=user,
-            created_at__range=[start_date, end_date]
-        )
-        
-        # Average party duration
-        party_durations = []
-        for party in hosted_parties:
-            duration_events = AnalyticsEvent.objects.filter(
-                party=party,
-                event_type='party_ended'
-            ).first()
-            if duration_events and duration_events.event_data:
-                party_durations.append(duration_events.event_data.get('duration', 0))
-        
-        avg_party_duration = sum(party_durations) / len(party_durations) if party_durations else 0
-        
-        # Participation stats
-        participated_parties = PartyParticipant.objects.filter(
-            user=user,
-            joined_at__range=[start_date, end_date]
-        )
-        
-        # Average participants in hosted parties
-        avg_participants = hosted_parties.aggregate(
-            avg_participants=Avg('participants__user')
-        )['avg_participants'] or 0
+        hosted = parties['parties_hosted']
+        weekday = parties['top_party_weekday']
         
         return {
-            'parties_hosted': hosted_parties.count(),
-            'parties_joined': participated_parties.count(),
-            'avg_party_duration_minutes': avg_party_duration // 60,
-            'avg_participants_in_hosted_parties': round(avg_participants, 1),
-            'most_popular_party_day': self.get_most_popular_day(hosted_parties),
+            'parties_hosted': hosted,
+            'parties_joined': parties['parties_participated'],
+            'avg_party_duration_minutes': parties['avg_party_duration'] // 60,
+            'avg_participants_in_hosted_parties': round(parties['participants_in_hosted'] / hosted, 1) if hosted else 0,
+            'most_popular_party_day': WEEKDAYS[weekday - 1] if weekday else None,
             'hosting_streak': self.calculate_hosting_streak(user)
         }
     
-    def calculate_social_metrics(self, user, start_date, end_date):
+    def calculate_social_metrics(self, user, social, start_date, end_date):
         """Calculate social interaction metrics"""
-        from apps.social.models import GroupMembership, GroupPost
-        from apps.messaging.models import Message
-        
-        # Group activities
-        group_memberships = GroupMembership.objects.filter(
-            user=user,
-            joined_at__range=[start_date, end_date]
-        )
-        
-        group_posts = GroupPost.objects.filter(
-            author=user,
-            created_at__range=[start_date, end_date]
-        )
-        
-        # Messages sent
-        messages_sent = Message.objects.filter(
-            sender=user,
-            sent_at__range=[start_date, end_date]
-        )
-        
-        # Friend interactions
-        friend_interactions = self.calculate_friend_interactions(user, start_date, end_date)
-        
         return {
-            'groups_joined': group_memberships.count(),
-            'group_posts': group_posts.count(),
-            'messages_sent': messages_sent.count(),
-            'friend_interactions': friend_interactions,
+            'groups_joined': social['groups_joined'],
+            'group_posts': social['group_posts'],
+            'messages_sent': social['messages_sent'],
+            'friend_interactions': self.calculate_friend_interactions(user, start_date, end_date),
             'social_score': self.calculate_social_score(user, start_date, end_date)
         }
     
-    def calculate_achievement_progress(self, user, start_date, end_date):
+    def calculate_achievement_progress(self, user, social):
         """Calculate achievement progress"""
-        from apps.store.models import Achievement, UserAchievement
-        
-        unlocked_achievements = UserAchievement.objects.filter(
-            user=user,
-            unlocked_at__range=[start_date, end_date]
-        )
+        from apps.store.models import Achievement
         
         total_achievements = Achievement.objects.count()
-        user_achievements = UserAchievement.objects.filter(user=user).count()
-        
-        # Progress towards next achievements
-        next_achievements = self.get_next_achievements(user)
+        user_achievements = social['achievements_total']
         
         return {
-            'achievements_unlocked': unlocked_achievements.count(),
+            'achievements_unlocked': social['achievements_unlocked'],
             'total_achievements': user_achievements,
-            'completion_percentage': round((user_achievements / total_achievements) * 100, 1),
-            'next_achievements': next_achievements,
-            'achievement_points': sum([
-                ach.achievement.points for ach in UserAchievement.objects.filter(user=user)
-            ])
+            'completion_percentage': round((user_achievements / total_achievements) * 100, 1) if total_achievements else 0,
+            'next_achievements': self.get_next_achievements(user),
+            'achievement_points': social['achievement_points']
         }
     
-    def calculate_activity_trends(self, user, start_date, end_date):
+    def calculate_activity_trends(self, events):
         """Calculate daily activity trends"""
-        from apps.analytics.models import AnalyticsEvent
-        
-        # Daily activity breakdown
-        daily_activity = []
-        current_date = start_date.date()
-        
-        while current_date <= end_date.date():
-            day_start = timezone.make_aware(datetime.combine(current_date, datetime.min.time()))
-            day_end = day_start + timedelta(days=1)
-            
-            events = AnalyticsEvent.objects.filter(
-                user=user,
-                timestamp__range=[day_start, day_end]
-            )
-            
-            daily_activity.append({
-                'date': current_date.isoformat(),
-                'events': events.count(),
-                'event_types': list(events.values_list('event_type', flat=True).distinct()),
-                'peak_hour': self.get_peak_hour(events)
-            })
-            
-            current_date += timedelta(days=1)
+        daily_activity = events['daily']
         
         return {
             'daily_breakdown': daily_activity,
+            'hourly_distribution': events['hourly'],
             'most_active_day': max(daily_activity, key=lambda x: x['events']) if daily_activity else None,
-            'activity_score': self.calculate_activity_score(daily_activity)
+            'activity_score': min(100, events['total'])  # Simplified scoring
         }
     
-    def calculate_user_interests(self, user, start_date, end_date):
+    def calculate_user_interests(self, user, events, start_date, end_date):
         """Calculate user interests based on activity"""
-        from apps.analytics.models import AnalyticsEvent
-        
-        # Video categories watched
-        watched_videos = AnalyticsEvent.objects.filter(
-            user=user,
-            event_type='video_watch',
-            timestamp__range=[start_date, end_date]
-        ).values_list('video__category', flat=True)
-        
-        category_counts = {}
-        for category in watched_videos:
-            if category:
-                category_counts[category] = category_counts.get(category, 0) + 1
-        
-        # Sort by frequency
-        top_categories = sorted(category_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        active_hours = sorted(range(24), key=lambda hour: (-events['hourly'][hour], hour))[:3]
         
         return {
-            'top_video_categories': [{'category': cat, 'count': count} for cat, count in top_categories],
+            'top_videos': personal_stats.top_watched_videos(user, start_date, end_date),
             'preferred_party_size': self.get_preferred_party_size(user),
-            'active_hours': self.get_active_hours(user, start_date, end_date)
+            'active_hours': [(hour, events['hourly'][hour]) for hour in active_hours if events['hourly'][hour]]
         }
     
-    def calculate_milestones(self, user):
+    def calculate_milestones(self, user, parties):
         """Calculate user milestones"""
-        from apps.parties.models import WatchParty
-        from apps.videos.models import Video
-        from apps.store.models import UserAchievement
-        
-        total_parties = WatchParty.objects.filter(host=user).count()
-        total_videos = Video.objects.filter(uploader=user).count()
-        total_achievements = UserAchievement.objects.filter(user=user).count()
+        total_parties = parties['parties_hosted_all_time']
         
         milestones = []
         
@@ -336,18 +177,6 @@ class PersonalAnalyticsView(APIView):
         return recommendations
     
     # Helper methods
-    def get_most_popular_day(self, parties):
-        """Get most popular day for hosting parties"""
-        if not parties:
-            return None
-        
-        day_counts = {}
-        for party in parties:
-            day = party.created_at.strftime('%A')
-            day_counts[day] = day_counts.get(day, 0) + 1
-        
-        return max(day_counts.items(), key=lambda x: x[1])[0] if day_counts else None
-    
     def calculate_hosting_streak(self, user):
         """Calculate current hosting streak"""
         # Simplified implementation
@@ -385,43 +214,7 @@ class PersonalAnalyticsView(APIView):
             for ach in next_achievements
         ]
     
-    def get_peak_hour(self, events):
-        """Get peak activity hour for events"""
-        if not events:
-            return None
-        
-        hour_counts = {}
-        for event in events:
-            hour = event.timestamp.hour
-            hour_counts[hour] = hour_counts.get(hour, 0) + 1
-        
-        return max(hour_counts.items(), key=lambda x: x[1])[0] if hour_counts else None
-    
-    def calculate_activity_score(self, daily_activity):
-        """Calculate overall activity score"""
-        if not daily_activity:
-            return 0
-        
-        total_events = sum([day['events'] for day in daily_activity])
-        return min(100, total_events)  # Simplified scoring
-    
     def get_preferred_party_size(self, user):
         """Get user's preferred party size"""
         # Simplified implementation
         return 'small'  # small, medium, large
-    
-    def get_active_hours(self, user, start_date, end_date):
-        """Get user's most active hours"""
-        from apps.analytics.models import AnalyticsEvent
-        
-        events = AnalyticsEvent.objects.filter(
-            user=user,
-            timestamp__range=[start_date, end_date]
-        )
-        
-        hour_counts = {}
-        for event in events:
-            hour = event.timestamp.hour
-            hour_counts[hour] = hour_counts.get(hour, 0) + 1
-        
-        return sorted(hour_counts.items(), key=lambda x: x[1], reverse=True)[:3]
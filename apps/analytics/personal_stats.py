@@ -0,0 +1,174 @@
+"""
+Personal analytics from grouped aggregates
+
+A user's events in the range are grouped by day, hour and type in one
+query. That single query yields the daily series, the hourly histogram,
+the per-type totals and the watch time. Party and video totals come from
+one row of correlated subqueries; social and achievement totals come from
+another. The dashboard therefore costs a handful of queries, however long
+the range. Built results are cached per user and range, and are dropped
+when that user's events are stored.
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Avg, Count, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, Coalesce, ExtractHour, ExtractWeekDay, TruncDate
+from django.utils import timezone
+
+from .models import AnalyticsEvent
+
+User = get_user_model()
+
+TIME_RANGES = {'7d': 7, '30d': 30, '90d': 90, '1y': 365}
+DEFAULT_TIME_RANGE = '30d'
+PERSONAL_CACHE_TIMEOUT = 60 * 15
+# ExtractWeekDay numbers days from 1 (Sunday) to 7 (Saturday)
+WEEKDAYS = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+_duration = Cast(KT('event_data__duration'), FloatField())
+_has_duration = Q(event_data__duration__gt=0)
+
+
+def cache_key(user_id, time_range: str) -> str:
+    return f"analytics:personal:v1:{user_id}:{time_range}"
+
+
+def invalidate(user_ids: Iterable) -> None:
+    """Drop cached personal analytics for these users, every range"""
+    cache.delete_many([cache_key(user_id, time_range) for user_id in set(user_ids) for time_range in TIME_RANGES])
+
+
+def _count(queryset, group_field: str):
+    """Correlated row count; ``queryset`` filters on an ``OuterRef``"""
+    return Coalesce(Subquery(
+        queryset.order_by().values(group_field).annotate(total=Count('pk')).values('total')
+    ), Value(0))
+
+
+def _peak_hour(hours: Counter):
+    # Earliest hour wins ties
+    return max(sorted(hours), key=lambda hour: hours[hour]) if hours else None
+
+
+def event_breakdown(user, start: datetime, end: datetime) -> Dict:
+    """Daily series, hourly histogram, type totals and watch time from one grouped query"""
+    rows = (
+        AnalyticsEvent.objects.filter(user=user, timestamp__range=[start, end])
+        .annotate(day=TruncDate('timestamp'), hour=ExtractHour('timestamp'))
+        .values('day', 'hour', 'event_type')
+        .annotate(
+            count=Count('id'),
+            watch_seconds=Sum(_duration, filter=Q(event_type='video_watch') & _has_duration),
+        )
+        .order_by()
+    )
+
+    days = defaultdict(lambda: {'events': 0, 'types': set(), 'hours': Counter()})
+    hourly = [0] * 24
+    by_type = Counter()
+    watch_seconds = 0.0
+    for row in rows:
+        day = days[row['day']]
+        day['events'] += row['count']
+        day['types'].add(row['event_type'])
+        day['hours'][row['hour']] += row['count']
+        hourly[row['hour']] += row['count']
+        by_type[row['event_type']] += row['count']
+        watch_seconds += row['watch_seconds'] or 0
+
+    daily = []
+    current, last = timezone.localdate(start), timezone.localdate(end)
+    while current <= last:
+        day = days.get(current)
+        daily.append({
+            'date': current.isoformat(),
+            'events': day['events'] if day else 0,
+            'event_types': sorted(day['types']) if day else [],
+            'peak_hour': _peak_hour(day['hours']) if day else None
+        })
+        current += timedelta(days=1)
+
+    return {
+        'total': sum(hourly),
+        'watch_seconds': watch_seconds,
+        'daily': daily,
+        'hourly': hourly,
+        'by_type': dict(by_type),
+    }
+
+
+def party_totals(user, start: datetime, end: datetime) -> Dict:
+    """Party and video totals as one row of correlated subqueries"""
+    from apps.parties.models import PartyParticipant, WatchParty
+    from apps.videos.models import Video
+
+    in_range = Q(created_at__range=[start, end])
+    hosted = WatchParty.objects.filter(in_range, host=OuterRef('pk'))
+    top_weekday = Subquery(
+        hosted.order_by().annotate(weekday=ExtractWeekDay('created_at')).values('weekday')
+        .annotate(total=Count('pk')).order_by('-total', 'weekday').values('weekday')[:1]
+    )
+    avg_party_duration = Subquery(
+        AnalyticsEvent.objects.filter(
+            _has_duration, party__host=OuterRef('pk'), party__created_at__range=[start, end],
+            event_type='party_ended',
+        ).order_by().values('party__host').annotate(average=Avg(_duration)).values('average')
+    )
+    joined = PartyParticipant.objects.filter(user=OuterRef('pk'), joined_at__range=[start, end])
+
+    return User.objects.filter(pk=user.pk).annotate(
+        parties_hosted=_count(hosted, 'host'),
+        parties_hosted_all_time=_count(WatchParty.objects.filter(host=OuterRef('pk')), 'host'),
+        parties_joined=_count(joined.filter(is_active=True), 'user'),
+        parties_participated=_count(joined, 'user'),
+        participants_in_hosted=_count(
+            PartyParticipant.objects.filter(party__host=OuterRef('pk'), party__created_at__range=[start, end]),
+            'party__host',
+        ),
+        videos_uploaded=_count(Video.objects.filter(in_range, uploader=OuterRef('pk')), 'uploader'),
+        avg_party_duration=Coalesce(avg_party_duration, Value(0.0)),
+        top_party_weekday=top_weekday,
+    ).values(
+        'parties_hosted', 'parties_hosted_all_time', 'parties_joined', 'parties_participated',
+        'participants_in_hosted', 'videos_uploaded', 'avg_party_duration', 'top_party_weekday',
+    ).get()
+
+
+def social_totals(user, start: datetime, end: datetime) -> Dict:
+    """Chat, social and achievement totals as one row of correlated subqueries"""
+    from apps.chat.models import ChatMessage
+    from apps.messaging.models import Message
+    from apps.social.models import GroupMembership, GroupPost
+    from apps.store.models import UserAchievement
+
+    achievements = UserAchievement.objects.filter(user=OuterRef('pk'))
+    return User.objects.filter(pk=user.pk).annotate(
+        chat_messages=_count(
+            ChatMessage.objects.filter(user=OuterRef('pk'), timestamp__range=[start, end], is_deleted=False), 'user',
+        ),
+        groups_joined=_count(GroupMembership.objects.filter(user=OuterRef('pk'), joined_at__range=[start, end]), 'user'),
+        group_posts=_count(GroupPost.objects.filter(author=OuterRef('pk'), created_at__range=[start, end]), 'author'),
+        messages_sent=_count(Message.objects.filter(sender=OuterRef('pk'), sent_at__range=[start, end]), 'sender'),
+        achievements_unlocked=_count(achievements.filter(unlocked_at__range=[start, end]), 'user'),
+        achievements_total=_count(achievements, 'user'),
+        achievement_points=Coalesce(Subquery(
+            achievements.order_by().values('user').annotate(total=Sum('achievement__points')).values('total')
+        ), Value(0)),
+    ).values(
+        'chat_messages', 'groups_joined', 'group_posts', 'messages_sent',
+        'achievements_unlocked', 'achievements_total', 'achievement_points',
+    ).get()
+
+
+def top_watched_videos(user, start: datetime, end: datetime, limit: int = 5) -> List[Dict]:
+    rows = (
+        AnalyticsEvent.objects.filter(user=user, event_type='video_watch', timestamp__range=[start, end], video__isnull=False)
+        .values('video_id', 'video__title').annotate(count=Count('id')).order_by('-count', 'video__title')[:limit]
+    )
+    return [{'video_id': str(row['video_id']), 'title': row['video__title'], 'count': row['count']} for row in rows]
@@ -0,0 +1,170 @@
+"""
+Cohort retention from materialized activity days
+
+``UserActivityDay`` holds one row per user per UTC day with any tracked
+activity. ``event_processor`` adds rows as it processes events. This replaces
+``last_login``, which only records the latest login and so can't tell
+whether a user came back in week 2 once they log in again in week 5.
+
+A retention matrix needs two queries: the cohort's join dates, and its
+activity days. Users are numbered, and each cohort and each activity
+period becomes an integer bitmap over those numbers. Retained users for
+(cohort, period) is the popcount of one AND. Results are cached per range,
+granularity and day.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncDate
+
+from .models import AnalyticsEvent, UserActivityDay
+
+User = get_user_model()
+
+DAY, WEEK = 'day', 'week'
+PERIOD_DAYS = {DAY: 1, WEEK: 7}
+RETENTION_CACHE_TIMEOUT = 3600
+
+
+def _utc_day(moment: datetime) -> date:
+    return moment.astimezone(dt_timezone.utc).date()
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def record_activity(events: Iterable) -> None:
+    """Mark each event's user active on the event's day"""
+    pairs = {(event.user_id, _utc_day(event.timestamp)) for event in events if event.user_id}
+    UserActivityDay.objects.bulk_create(
+        [UserActivityDay(user_id=user_id, day=day) for user_id, day in pairs], ignore_conflicts=True,
+    )
+
+
+def backfill_activity(start: datetime, batch_size: int = 5000) -> int:
+    """Materialize activity days from stored events since ``start``; returns rows offered"""
+    pairs = (
+        AnalyticsEvent.objects.filter(timestamp__gte=start, user__isnull=False)
+        .annotate(day=TruncDate('timestamp', tzinfo=dt_timezone.utc))
+        .values_list('user_id', 'day').distinct().order_by()
+    )
+    offered = 0
+    batch = []
+    for user_id, day in pairs.iterator(chunk_size=batch_size):
+        batch.append(UserActivityDay(user_id=user_id, day=day))
+        if len(batch) >= batch_size:
+            UserActivityDay.objects.bulk_create(batch, ignore_conflicts=True)
+            offered += len(batch)
+            batch = []
+    UserActivityDay.objects.bulk_create(batch, ignore_conflicts=True)
+    return offered + len(batch)
+
+
+def retention_matrix(start: date, cohorts: int, periods: int, granularity: str = WEEK,
+                     today: Optional[date] = None) -> List[Dict]:
+    """
+    Retention for ``cohorts`` consecutive day or week cohorts from ``start``.
+    Period N counts cohort members active N periods after their join
+    period. Periods that haven't finished yet are ``None``.
+    """
+    today = today or _utc_day(datetime.now(dt_timezone.utc))
+    cache_key = f"analytics:retention:v1:{granularity}:{start}:{cohorts}:{periods}:{today}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    length = PERIOD_DAYS[granularity]
+    cohort_end = start + timedelta(days=cohorts * length)
+    horizon = min(cohort_end + timedelta(days=periods * length), today + timedelta(days=1))
+
+    members = User.objects.filter(
+        date_joined__gte=_day_start(start), date_joined__lt=_day_start(cohort_end),
+    ).values_list('id', 'date_joined')
+    index = {}
+    cohort_masks = defaultdict(int)
+    for user_id, joined in members:
+        bit = 1 << index.setdefault(user_id, len(index))
+        cohort_masks[(_utc_day(joined) - start).days // length] |= bit
+
+    active_masks = defaultdict(int)
+    if index:
+        activity = UserActivityDay.objects.filter(
+            user__date_joined__gte=_day_start(start), user__date_joined__lt=_day_start(cohort_end),
+            day__gte=start, day__lt=horizon,
+        ).values_list('user_id', 'day')
+        for user_id, day in activity:
+            if user_id in index:
+                active_masks[(day - start).days // length] |= 1 << index[user_id]
+
+    matrix = []
+    for cohort in range(cohorts):
+        mask = cohort_masks.get(cohort, 0)
+        size = mask.bit_count()
+        retained, rates = [], []
+        for period in range(1, periods + 1):
+            period_end = start + timedelta(days=(cohort + period + 1) * length)
+            if period_end > today:
+                retained.append(None)
+                rates.append(None)
+                continue
+            count = (mask & active_masks.get(cohort + period, 0)).bit_count()
+            retained.append(count)
+            rates.append(round(count / size * 100, 2) if size else 0)
+        matrix.append({
+            'cohort_start': start + timedelta(days=cohort * length),
+            'size': size,
+            'retained': retained,
+            'rates': rates,
+        })
+
+    cache.set(cache_key, matrix, RETENTION_CACHE_TIMEOUT)
+    return matrix
+
+
+def period_retention(matrix: List[Dict], period: int, cohorts: Optional[int] = None) -> Optional[float]:
+    """
+    Retention at ``period`` pooled over the cohorts that have reached it,
+    or only the latest ``cohorts`` of those. ``None`` when no member of
+    any such cohort can be measured yet.
+    """
+    reached = [row for row in matrix if row['retained'][period - 1] is not None]
+    if cohorts is not None:
+        reached = reached[-cohorts:]
+    size = sum(row['size'] for row in reached)
+    return round(sum(row['retained'][period - 1] for row in reached) / size * 100, 2) if size else None
+
+
+def engagement_levels(today: Optional[date] = None) -> Dict[str, int]:
+    """Users by most recent activity: today or yesterday, this week, this month; one aggregate query"""
+    today = today or _utc_day(datetime.now(dt_timezone.utc))
+    latest = (
+        UserActivityDay.objects.filter(day__gt=today - timedelta(days=30))
+        .values('user').annotate(latest=Max('day'))
+    )
+    counts = latest.aggregate(
+        high_engagement=Count('user', filter=Q(latest__gte=today - timedelta(days=1))),
+        week=Count('user', filter=Q(latest__gt=today - timedelta(days=7))),
+        total_active=Count('user'),
+    )
+    return {
+        'high_engagement': counts['high_engagement'],
+        'medium_engagement': counts['week'] - counts['high_engagement'],
+        'low_engagement': counts['total_active'] - counts['week'],
+        'total_active': counts['total_active'],
+    }
+
+
+def signup_counts(now: datetime) -> Dict[str, int]:
+    """Total users and recent signups in one aggregate query"""
+    return User.objects.aggregate(
+        total_users=Count('id'),
+        week_1_users=Count('id', filter=Q(date_joined__gte=now - timedelta(days=7))),
+        month_1_users=Count('id', filter=Q(date_joined__gte=now - timedelta(days=30))),
+        month_3_users=Count('id', filter=Q(date_joined__gte=now - timedelta(days=90))),
+    )
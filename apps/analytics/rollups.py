@@ -0,0 +1,250 @@
+"""
+Time-bucketed metric rollups
+
+Every processed analytics event adds to one minute, one hour and one day
+bucket for each ``(metric, dimension)`` it contributes to. ``event_processor``
+applies these deltas in the same transaction that marks the events
+processed. Late events simply land in their own, older buckets. Minute and
+hour buckets are kept for a limited time; once a late event is older than
+that, only the coarser buckets are updated.
+
+Queries cover ``[start, end)`` with the coarsest buckets that fit: whole
+days, then whole hours at the edges, then minutes. A 30-day range therefore
+reads at most about 30 + 46 + 118 rows, however many events it contains.
+Edges older than a granularity's retention are rounded to the next coarser
+bucket.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import MetricRollup
+
+MINUTE, HOUR, DAY = 'minute', 'hour', 'day'
+GRANULARITY_STEPS = {MINUTE: timedelta(minutes=1), HOUR: timedelta(hours=1), DAY: timedelta(days=1)}
+RETENTION = {
+    MINUTE: timedelta(hours=getattr(settings, 'ANALYTICS_ROLLUP_MINUTE_RETENTION_HOURS', 48)),
+    HOUR: timedelta(days=getattr(settings, 'ANALYTICS_ROLLUP_HOUR_RETENTION_DAYS', 90)),
+}
+
+EVENTS = 'events'
+VIDEO_PLAYS = 'video_plays'
+WATCH_SECONDS = 'watch_seconds'
+PLAY_EVENT_TYPES = ('video_play', 'view_start')
+
+
+def floor_bucket(moment: datetime, granularity: str) -> datetime:
+    moment = moment.replace(second=0, microsecond=0)
+    if granularity in (HOUR, DAY):
+        moment = moment.replace(minute=0)
+    if granularity == DAY:
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def ceil_bucket(moment: datetime, granularity: str) -> datetime:
+    floored = floor_bucket(moment, granularity)
+    return floored if floored == moment else floored + GRANULARITY_STEPS[granularity]
+
+
+def event_contributions(event) -> List[Tuple[str, str, int]]:
+    """``(metric, dimension, amount)`` triples one event adds to"""
+    data = event.event_data if isinstance(event.event_data, dict) else {}
+    contributions = [(EVENTS, '', 1), (EVENTS, f"type:{event.event_type}", 1)]
+
+    if event.event_type in PLAY_EVENT_TYPES:
+        video_id = event.video_id or data.get('video_id')
+        contributions.append((VIDEO_PLAYS, '', 1))
+        if video_id:
+            contributions.append((VIDEO_PLAYS, f"video:{video_id}", 1))
+
+    watched = 0
+    if event.event_type == 'video_pause':
+        watched = data.get('watch_duration', 0) if isinstance(data.get('watch_duration'), (int, float)) else 0
+    elif event.event_type == 'view_end' and event.duration:
+        watched = event.duration.total_seconds()
+    if watched > 0:
+        contributions.append((WATCH_SECONDS, '', int(watched)))
+        if event.user_id:
+            contributions.append((WATCH_SECONDS, f"user:{event.user_id}", int(watched)))
+    return contributions
+
+
+def fold_events(events: Iterable, now: Optional[datetime] = None) -> Dict[Tuple, int]:
+    """Deltas keyed by ``(metric, dimension, granularity, bucket_start)``"""
+    now = now or timezone.now()
+    deltas = defaultdict(int)
+    for event in events:
+        for granularity in (MINUTE, HOUR, DAY):
+            # Don't recreate fine buckets that retention already removed
+            if granularity in RETENTION and event.timestamp < now - RETENTION[granularity]:
+                continue
+            bucket = floor_bucket(event.timestamp, granularity)
+            for metric, dimension, amount in event_contributions(event):
+                deltas[(metric, dimension, granularity, bucket)] += amount
+    return deltas
+
+
+def apply_deltas(deltas: Dict[Tuple, int], batch_size: int = 1000) -> None:
+    """
+    Add ``deltas`` to their buckets; call inside a transaction. Each batch
+    is one ``INSERT ... ON CONFLICT DO UPDATE``, so concurrent workers
+    adding to the same new bucket neither race on the insert nor read-lock
+    rows first. Rows are written in key order to keep lock order stable.
+    """
+    if not deltas:
+        return
+    bucket_field = MetricRollup._meta.get_field('bucket_start')
+    table = connection.ops.quote_name(MetricRollup._meta.db_table)
+    rows = sorted(deltas.items())
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), batch_size):
+            batch = rows[offset:offset + batch_size]
+            params = []
+            for (metric, dimension, granularity, bucket), amount in batch:
+                params.extend([metric, dimension, granularity, bucket_field.get_db_prep_value(bucket, connection), amount])
+            cursor.execute(
+                f"INSERT INTO {table} (metric, dimension, granularity, bucket_start, value) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(batch))} "
+                f"ON CONFLICT (metric, dimension, granularity, bucket_start) "
+                f"DO UPDATE SET value = {table}.value + EXCLUDED.value",
+                params,
+            )
+
+
+def record_events(events: Iterable) -> None:
+    apply_deltas(fold_events(events))
+
+
+def plan_segments(start: datetime, end: datetime, now: Optional[datetime] = None) -> List[Tuple[str, datetime, datetime]]:
+    """Cover ``[start, end)`` with the fewest buckets: ``(granularity, from, to)`` segments"""
+    now = now or timezone.now()
+    # Finer buckets than retention allows are gone; round those edges outward
+    if start < now - RETENTION[HOUR]:
+        start = floor_bucket(start, DAY)
+    elif start < now - RETENTION[MINUTE]:
+        start = floor_bucket(start, HOUR)
+    if end < now - RETENTION[HOUR]:
+        end = ceil_bucket(end, DAY)
+    elif end < now - RETENTION[MINUTE]:
+        end = ceil_bucket(end, HOUR)
+    start, end = floor_bucket(start, MINUTE), ceil_bucket(end, MINUTE)
+    if start >= end:
+        return []
+
+    segments = []
+
+    def cover(lo, hi, granularity, finer):
+        aligned_lo, aligned_hi = ceil_bucket(lo, granularity), floor_bucket(hi, granularity)
+        if aligned_lo >= aligned_hi:
+            finer(lo, hi)
+            return
+        if lo < aligned_lo:
+            finer(lo, aligned_lo)
+        segments.append((granularity, aligned_lo, aligned_hi))
+        if aligned_hi < hi:
+            finer(aligned_hi, hi)
+
+    def minutes(lo, hi):
+        segments.append((MINUTE, lo, hi))
+
+    def hours(lo, hi):
+        cover(lo, hi, HOUR, minutes)
+
+    cover(start, end, DAY, hours)
+    return segments
+
+
+def _segments_filter(segments) -> Q:
+    condition = Q(pk__in=[])
+    for granularity, lo, hi in segments:
+        condition |= Q(granularity=granularity, bucket_start__gte=lo, bucket_start__lt=hi)
+    return condition
+
+
+def total(metric: str, start: datetime, end: Optional[datetime] = None, dimension: str = '') -> int:
+    """Sum of ``metric`` over ``[start, end)`` in one indexed query"""
+    segments = plan_segments(start, end or timezone.now())
+    if not segments:
+        return 0
+    return MetricRollup.objects.filter(
+        _segments_filter(segments), metric=metric, dimension=dimension,
+    ).aggregate(total=Sum('value'))['total'] or 0
+
+
+def all_time_total(metric: str, dimension: str = '') -> int:
+    """Sum over every day bucket, which are never purged"""
+    return MetricRollup.objects.filter(
+        metric=metric, dimension=dimension, granularity=DAY,
+    ).aggregate(total=Sum('value'))['total'] or 0
+
+
+def series(metric: str, start: datetime, end: Optional[datetime] = None, granularity: str = DAY,
+           dimension: str = '') -> List[Dict]:
+    """Per-bucket values at one granularity, for charts"""
+    end = end or timezone.now()
+    rows = MetricRollup.objects.filter(
+        metric=metric, dimension=dimension, granularity=granularity,
+        bucket_start__gte=floor_bucket(start, granularity), bucket_start__lt=end,
+    ).order_by('bucket_start').values_list('bucket_start', 'value')
+    return [{'bucket': bucket, 'value': value} for bucket, value in rows]
+
+
+def top_dimensions(metric: str, start: datetime, end: Optional[datetime] = None, prefix: str = '',
+                   limit: int = 10) -> List[Tuple[str, int]]:
+    """Dimensions under ``prefix`` with the largest totals over ``[start, end)``"""
+    segments = plan_segments(start, end or timezone.now())
+    if not segments:
+        return []
+    rows = (
+        MetricRollup.objects.filter(_segments_filter(segments), metric=metric, dimension__startswith=prefix)
+        .exclude(dimension='')
+        .values('dimension').annotate(total=Sum('value')).order_by('-total')[:limit]
+    )
+    return [(row['dimension'][len(prefix):], row['total']) for row in rows]
+
+
+def purge_expired(now: Optional[datetime] = None) -> int:
+    """Delete minute and hour buckets past their retention; returns rows deleted"""
+    now = now or timezone.now()
+    deleted = 0
+    for granularity, keep in RETENTION.items():
+        deleted += MetricRollup.objects.filter(
+            granularity=granularity, bucket_start__lt=floor_bucket(now - keep, HOUR),
+        ).delete()[0]
+    return deleted
+
+
+def rebuild(start: datetime, batch_size: int = 5000) -> int:
+    """
+    Recompute rollups from processed events since ``start`` (rounded down to
+    a day); returns events replayed. Run it with event processing paused, or
+    events processed meanwhile may be counted twice.
+    """
+    from .models import AnalyticsEvent
+
+    start = floor_bucket(start, DAY)
+    MetricRollup.objects.filter(bucket_start__gte=start).delete()
+
+    replayed = 0
+    events = AnalyticsEvent.objects.filter(processed=True, timestamp__gte=start).only(
+        'id', 'user_id', 'video_id', 'event_type', 'event_data', 'duration', 'timestamp',
+    ).order_by('timestamp', 'id')
+    cursor = None
+    while True:
+        batch = events
+        if cursor is not None:
+            batch = batch.filter(Q(timestamp__gt=cursor[0]) | Q(timestamp=cursor[0], id__gt=cursor[1]))
+        batch = list(batch[:batch_size])
+        if not batch:
+            return replayed
+        with transaction.atomic():
+            record_events(batch)
+        replayed += len(batch)
+        cursor = (batch[-1].timestamp, batch[-1].id)
@@ -5,12 +5,14 @@ Analytics tasks for Watch Party Backend
 from celery import shared_task
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Avg, Sum, F
+from django.db.models import Count, Avg, Sum
 from datetime import datetime, timedelta
-import json
 import logging
 
+from .event_ingest import event_ingest
+from .event_processor import EVENT_BATCH_SIZE, process_pending_events
 from .models import AnalyticsEvent, UserSession, WatchTime, PartyAnalytics
+from .rollups import purge_expired
 from apps.parties.models import WatchParty
 from apps.videos.models import Video
 from shared.observability import observability
@@ -23,33 +25,10 @@ logger = logging.getLogger(__name__)
 def process_analytics_events():
     """Process pending analytics events and update aggregated data"""
     try:
-        # Get unprocessed events from the last hour
-        one_hour_ago = timezone.now() - timedelta(hours=1)
-
-        events = AnalyticsEvent.objects.filter(
-            processed=False,
-            timestamp__gte=one_hour_ago
-        )
-
-        tags = {"worker": "analytics.pipeline", "window": "1h"}
+        tags = {"worker": "analytics.pipeline", "batch_size": str(EVENT_BATCH_SIZE)}
 
         with observability.span("analytics.pipeline.events", tags=tags):
-            processed_count = 0
-
-            for event in events:
-                try:
-                    process_single_event(event)
-                    event.processed = True
-                    event.save()
-                    processed_count += 1
-                except Exception as exc:
-                    logger.error(f"Error processing event {event.id}: {str(exc)}")
-                    observability.record_event(
-                        "analytics.pipeline.event_error",
-                        f"Failed to process event {event.id}",
-                        severity="error",
-                        tags={**tags, "event_type": event.event_type, "event_id": str(event.id)},
-                    )
+            processed_count = process_pending_events()
 
             observability.record_metric(
                 "analytics.pipeline.events_processed", processed_count, tags=tags
@@ -81,157 +60,28 @@ def process_analytics_events():
         return f"Error: {str(e)}"
 
 
-def process_single_event(event):
-    """Process a single analytics event"""
-    event_data = json.loads(event.event_data) if event.event_data else {}
-    
-    if event.event_type == 'video_play':
-        _process_video_play_event(event, event_data)
-    elif event.event_type == 'video_pause':
-        _process_video_pause_event(event, event_data)
-    elif event.event_type == 'party_join':
-        _process_party_join_event(event, event_data)
-    elif event.event_type == 'party_leave':
-        _process_party_leave_event(event, event_data)
-    elif event.event_type == 'chat_message':
-        _process_chat_message_event(event, event_data)
-    elif event.event_type == 'user_login':
-        _process_user_login_event(event, event_data)
-    elif event.event_type == 'user_logout':
-        _process_user_logout_event(event, event_data)
-
-
-def _process_video_play_event(event, data):
-    """Process video play event"""
-    video_id = data.get('video_id')
-    party_id = data.get('party_id')
-    position = data.get('position', 0)
-    
-    if video_id:
-        # Update or create watch time record
-        WatchTime.objects.update_or_create(
-            user_id=event.user_id,
-            video_id=video_id,
-            party_id=party_id,
-            defaults={
-                'last_position': position,
-                'updated_at': timezone.now()
-            }
-        )
-
-
-def _process_video_pause_event(event, data):
-    """Process video pause event"""
-    video_id = data.get('video_id')
-    party_id = data.get('party_id')
-    position = data.get('position', 0)
-    watch_duration = data.get('watch_duration', 0)
-    
-    if video_id and watch_duration > 0:
-        # Update watch time record
-        try:
-            watch_time = WatchTime.objects.get(
-                user_id=event.user_id,
-                video_id=video_id,
-                party_id=party_id
-            )
-            watch_time.total_watch_time += watch_duration
-            watch_time.last_position = position
-            watch_time.updated_at = timezone.now()
-            watch_time.save()
-        except WatchTime.DoesNotExist:
-            WatchTime.objects.create(
-                user_id=event.user_id,
-                video_id=video_id,
-                party_id=party_id,
-                total_watch_time=watch_duration,
-                last_position=position
-            )
-
-
-def _process_party_join_event(event, data):
-    """Process party join event"""
-    party_id = data.get('party_id')
-    
-    if party_id:
-        # Update party analytics
-        analytics, created = PartyAnalytics.objects.get_or_create(
-            party_id=party_id,
-            defaults={'total_participants': 0}
-        )
-        
-        analytics.total_participants = F('total_participants') + 1
-        analytics.save()
-
-
-def _process_party_leave_event(event, data):
-    """Process party leave event"""
-    party_id = data.get('party_id')
-    session_duration = data.get('session_duration', 0)
-    
-    if party_id:
-        # Update party analytics with session duration
-        try:
-            analytics = PartyAnalytics.objects.get(party_id=party_id)
-            if session_duration > 0:
-                if analytics.avg_session_duration:
-                    # Calculate new average
-                    total_duration = analytics.avg_session_duration * analytics.total_participants
-                    analytics.avg_session_duration = (total_duration + session_duration) / (analytics.total_participants + 1)
-                else:
-                    analytics.avg_session_duration = session_duration
-                analytics.save()
-        except PartyAnalytics.DoesNotExist:
-            pass
-
-
-def _process_chat_message_event(event, data):
-    """Process chat message event"""
-    party_id = data.get('party_id')
-    
-    if party_id:
-        # Update party analytics
-        try:
-            analytics = PartyAnalytics.objects.get(party_id=party_id)
-            analytics.total_messages = F('total_messages') + 1
-            analytics.save()
-        except PartyAnalytics.DoesNotExist:
-            PartyAnalytics.objects.create(
-                party_id=party_id,
-                total_messages=1
-            )
+@shared_task
+def consume_analytics_events():
+    """Store events buffered by track_event and fold their counters"""
+    try:
+        stored = event_ingest.consume()
+        return f"Stored {stored} tracked events"
 
+    except Exception as e:
+        logger.error(f"Error in consume_analytics_events: {str(e)}")
+        return f"Error: {str(e)}"
 
-def _process_user_login_event(event, data):
-    """Process user login event"""
-    session_id = data.get('session_id')
-    
-    if session_id:
-        # Create or update user session
-        UserSession.objects.update_or_create(
-            session_id=session_id,
-            defaults={
-                'user_id': event.user_id,
-                'start_time': event.timestamp,
-                'ip_address': event.ip_address,
-                'user_agent': event.user_agent
-            }
-        )
 
+@shared_task
+def purge_metric_rollups():
+    """Drop minute and hour rollup buckets past their retention"""
+    try:
+        deleted = purge_expired()
+        return f"Deleted {deleted} expired rollup buckets"
 
-def _process_user_logout_event(event, data):
-    """Process user logout event"""
-    session_id = data.get('session_id')
-    
-    if session_id:
-        # Update user session with end time
-        try:
-            session = UserSession.objects.get(session_id=session_id)
-            session.end_time = event.timestamp
-            session.duration = int((session.end_time - session.start_time).total_seconds())
-            session.save()
-        except UserSession.DoesNotExist:
-            pass
+    except Exception as e:
+        logger.error(f"Error in purge_metric_rollups: {str(e)}")
+        return f"Error: {str(e)}"
 
 
 @shared_task
@@ -5,7 +5,9 @@ from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from apps.analytics.models import AnalyticsEvent
+from apps.analytics.event_ingest import event_ingest
+from apps.analytics.event_processor import process_pending_events
+from apps.analytics.models import AnalyticsEvent, PartyAnalytics
 from apps.authentication.models import User
 from apps.parties.models import WatchParty
 from apps.videos.models import Video
@@ -65,11 +67,24 @@ class DashboardViewsTests(APITestCase):
         }
 
         response = self.client.post(url, payload, format='json')
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
 
+        # Events are stored by the ingest consumer, not the request
+        event_ingest.consume()
         event = AnalyticsEvent.objects.get(id=response.data['event_id'])
         self.assertEqual(event.user, self.user)
         self.assertEqual(event.party, self.party)
         self.assertEqual(event.video, self.video)
         self.assertEqual(event.event_data, {'note': 'joined party'})
         self.assertEqual(event.session_id, '')
+
+    def test_tracked_party_join_reaches_party_analytics(self):
+        """A join tracked with only the party_id field is counted by the event processor."""
+        url = reverse('analytics:track-event')
+        response = self.client.post(url, {'event_type': 'party_join', 'party_id': str(self.party.id)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        event_ingest.consume()
+        process_pending_events()
+
+        self.assertEqual(PartyAnalytics.objects.get(party=self.party).total_participants, 1)
@@ -12,6 +12,8 @@ from django.utils import timezone
 from django.db.models import Sum, Avg, Count, Q
 from drf_spectacular.utils import extend_schema
 from datetime import timedelta, date
+from . import retention, rollups
+from .event_ingest import IngestError, build_event, event_ingest
 from .models import UserAnalytics, PartyAnalytics, VideoAnalytics, AnalyticsEvent, SystemAnalytics
 from .serializers import (
     UserAnalyticsSerializer, PartyAnalyticsSerializer, VideoAnalyticsSerializer,
@@ -389,12 +391,8 @@ class AdminAnalyticsView(generics.GenericAPIView):
             'parties_created_today': WatchParty.objects.filter(
                 created_at__range=[day_start, day_end]
             ).count(),
-            'total_chat_messages': AnalyticsEvent.objects.filter(
-                event_type='chat_message'
-            ).count(),
-            'total_reactions': AnalyticsEvent.objects.filter(
-                event_type='reaction_sent'
-            ).count(),
+            'total_chat_messages': rollups.all_time_total(rollups.EVENTS, 'type:chat_message'),
+            'total_reactions': rollups.all_time_total(rollups.EVENTS, 'type:reaction_sent'),
         }
 
 
@@ -484,108 +482,26 @@ class ExportAnalyticsView(generics.GenericAPIView):
 @permission_classes([permissions.IsAuthenticated])
 def track_event(request):
     """Track an analytics event"""
-    event_type = request.data.get('event_type')
-    party_id = request.data.get('party_id')
-    video_id = request.data.get('video_id')
-    event_data = request.data.get('event_data', {})
-    session_id = request.data.get('session_id', '')
-    duration_seconds = request.data.get('duration_seconds')
-    
-    if not event_type:
+    try:
+        entry = build_event(
+            request.user,
+            request.data,
+            ip_address=request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT', '')
+        )
+    except IngestError as e:
         return Response(
-            {'error': 'event_type is required'},
+            {'error': str(e)},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Create analytics event
-    event = AnalyticsEvent.objects.create(
-        user=request.user,
-        party_id=party_id if party_id else None,
-        video_id=video_id if video_id else None,
-        event_type=event_type,
-        event_data=event_data,
-        session_id=session_id,
-        ip_address=request.META.get('REMOTE_ADDR'),
-        user_agent=request.META.get('HTTP_USER_AGENT', ''),
-        duration=timedelta(seconds=duration_seconds) if duration_seconds else None
-    )
-    
-    # Update relevant analytics counters
-    _update_analytics_counters(event)
+    # Counters are folded in bulk by consume_analytics_events
+    event_ingest.submit([entry])
     
     return Response({
-        'event_id': event.id,
+        'event_id': entry['id'],
         'message': 'Event tracked successfully'
-    })
-
-
-def _update_analytics_counters(event):
-    """Update analytics counters based on event"""
-    try:
-        if event.user:
-            user_analytics, created = UserAnalytics.objects.get_or_create(user=event.user)
-            
-            if event.event_type == 'view_end' and event.duration:
-                duration_minutes = int(event.duration.total_seconds() / 60)
-                user_analytics.total_watch_time_minutes += duration_minutes
-                user_analytics.this_week_watch_time_minutes += duration_minutes
-                user_analytics.this_month_watch_time_minutes += duration_minutes
-                
-            elif event.event_type == 'party_join':
-                user_analytics.total_parties_joined += 1
-                user_analytics.this_week_parties_joined += 1
-                user_analytics.this_month_parties_joined += 1
-                
-            elif event.event_type == 'chat_message':
-                user_analytics.total_messages_sent += 1
-                user_analytics.this_week_messages_sent += 1
-                user_analytics.this_month_messages_sent += 1
-                
-            elif event.event_type == 'reaction_sent':
-                user_analytics.reactions_sent += 1
-                
-            user_analytics.save()
-        
-        # Update party analytics
-        if event.party:
-            party_analytics, created = PartyAnalytics.objects.get_or_create(party=event.party)
-            
-            if event.event_type == 'party_join':
-                party_analytics.total_joins += 1
-            elif event.event_type == 'party_leave':
-                party_analytics.total_leaves += 1
-            elif event.event_type == 'chat_message':
-                party_analytics.total_chat_messages += 1
-            elif event.event_type == 'reaction_sent':
-                party_analytics.total_reactions += 1
-            elif event.event_type == 'buffering':
-                party_analytics.buffering_events += 1
-            elif event.event_type == 'sync_issue':
-                party_analytics.sync_issues += 1
-                
-            party_analytics.save()
-        
-        # Update video analytics
-        if event.video:
-            video_analytics, created = VideoAnalytics.objects.get_or_create(video=event.video)
-            
-            if event.event_type == 'view_start':
-                video_analytics.total_views += 1
-                video_analytics.this_week_views += 1
-                video_analytics.this_month_views += 1
-            elif event.event_type == 'view_end' and event.duration:
-                duration_minutes = int(event.duration.total_seconds() / 60)
-                video_analytics.total_watch_time_minutes += duration_minutes
-            elif event.event_type == 'reaction_sent':
-                video_analytics.total_reactions += 1
-                
-            video_analytics.save()
-            
-    except Exception as e:
-        # Log error but don't fail the request
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Error updating analytics counters: {str(e)}")
+    }, status=status.HTTP_202_ACCEPTED)
 
 
 # Missing Analytics Endpoints for TODO.md Requirements
@@ -724,73 +640,34 @@ def user_retention_analytics(request):
     try:
         # Get date range
         days = int(request.GET.get('days', 30))
-        start_date = timezone.now() - timedelta(days=days)
-        
-        # Calculate retention cohorts
-        total_users = User.objects.count()
-        
-        # Users registered in different periods
-        week_1_users = User.objects.filter(
-            date_joined__gte=timezone.now() - timedelta(days=7)
-        ).count()
         
-        month_1_users = User.objects.filter(
-            date_joined__gte=timezone.now() - timedelta(days=30)
-        ).count()
-        
-        month_3_users = User.objects.filter(
-            date_joined__gte=timezone.now() - timedelta(days=90)
-        ).count()
-        
-        # Active users in different periods
-        active_week_1 = User.objects.filter(
-            last_login__gte=timezone.now() - timedelta(days=7)
-        ).count()
+        # Weekly signup cohorts, retained if active N weeks after the join week.
+        # Each rate pools the latest ``days`` worth of cohorts that have reached
+        # its period, so the window reaches back past the longest period
+        weeks = max(-(-days // 7), 1)
+        periods = 12
+        history = weeks + periods + 1
+        today = timezone.now().date()
+        matrix = retention.retention_matrix(today - timedelta(weeks=history), cohorts=history, periods=periods)
         
-        active_month_1 = User.objects.filter(
-            last_login__gte=timezone.now() - timedelta(days=30)
-        ).count()
-        
-        active_month_3 = User.objects.filter(
-            last_login__gte=timezone.now() - timedelta(days=90)
-        ).count()
-        
-        # Calculate retention rates
         retention_rates = {
-            'week_1_retention': (active_week_1 / max(week_1_users, 1)) * 100,
-            'month_1_retention': (active_month_1 / max(month_1_users, 1)) * 100,
-            'month_3_retention': (active_month_3 / max(month_3_users, 1)) * 100
+            'week_1_retention': retention.period_retention(matrix, 1, cohorts=weeks),
+            'month_1_retention': retention.period_retention(matrix, 4, cohorts=weeks),
+            'month_3_retention': retention.period_retention(matrix, 12, cohorts=weeks)
         }
         
-        # User engagement levels
-        high_engagement = User.objects.filter(
-            last_login__gte=timezone.now() - timedelta(days=1)
-        ).count()
-        
-        medium_engagement = User.objects.filter(
-            last_login__gte=timezone.now() - timedelta(days=7),
-            last_login__lt=timezone.now() - timedelta(days=1)
-        ).count()
-        
-        low_engagement = User.objects.filter(
-            last_login__gte=timezone.now() - timedelta(days=30),
-            last_login__lt=timezone.now() - timedelta(days=7)
-        ).count()
-        
         return Response({
             'retention_rates': retention_rates,
-            'engagement_levels': {
-                'high_engagement': high_engagement,
-                'medium_engagement': medium_engagement,
-                'low_engagement': low_engagement,
-                'total_active': high_engagement + medium_engagement + low_engagement
-            },
-            'user_counts': {
-                'total_users': total_users,
-                'week_1_users': week_1_users,
-                'month_1_users': month_1_users,
-                'month_3_users': month_3_users
-            }
+            'engagement_levels': retention.engagement_levels(today),
+            'user_counts': retention.signup_counts(timezone.now()),
+            'weekly_cohorts': [
+                {
+                    'cohort_start': row['cohort_start'].isoformat(),
+                    'new_users': row['size'],
+                    'retention_rates': row['rates']
+                }
+                for row in matrix[-weeks:]
+            ]
         })
         
     except Exception as e:
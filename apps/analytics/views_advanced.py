@@ -13,6 +13,7 @@ from datetime import timedelta
 
 from shared.responses import StandardResponse
 from shared.permissions import IsAdminUser
+from apps.analytics import retention, rollups
 from apps.analytics.models import SystemAnalytics, AnalyticsEvent, UserAnalytics
 from apps.parties.models import WatchParty, PartyParticipant, PartyEngagementAnalytics
 from apps.videos.models import Video
@@ -473,45 +474,20 @@ def _calculate_error_rate(start_date):
 def _calculate_user_retention(start_date):
     """Calculate user retention cohorts"""
     try:
-        # Simplified retention calculation
-        cohorts = []
-        
-        # Weekly cohorts for the past month
-        for week in range(4):
-            cohort_start = start_date + timedelta(weeks=week)
-            cohort_end = cohort_start + timedelta(weeks=1)
-            
-            new_users = User.objects.filter(
-                date_joined__gte=cohort_start,
-                date_joined__lt=cohort_end
-            )
-            
-            # Calculate retention for each week after
-            retention_data = []
-            for retention_week in range(1, 5):
-                retention_start = cohort_end + timedelta(weeks=retention_week-1)
-                retention_end = retention_start + timedelta(weeks=1)
-                
-                retained_users = new_users.filter(
-                    last_login__gte=retention_start,
-                    last_login__lt=retention_end
-                ).count()
-                
-                retention_rate = (retained_users / new_users.count() * 100) if new_users.count() > 0 else 0
-                retention_data.append({
-                    'week': retention_week,
-                    'retained_users': retained_users,
-                    'retention_rate': round(retention_rate, 2)
-                })
-            
-            cohorts.append({
-                'cohort_start': cohort_start.isoformat(),
-                'new_users': new_users.count(),
-                'retention': retention_data
-            })
-        
-        return cohorts
-    except:
+        # Weekly cohorts for the past month, from activity days rather than last_login
+        matrix = retention.retention_matrix(start_date.date(), cohorts=4, periods=4, granularity=retention.WEEK)
+        return [
+            {
+                'cohort_start': row['cohort_start'].isoformat(),
+                'new_users': row['size'],
+                'retention': [
+                    {'week': week, 'retained_users': retained, 'retention_rate': rate}
+                    for week, (retained, rate) in enumerate(zip(row['retained'], row['rates']), start=1)
+                ]
+            }
+            for row in matrix
+        ]
+    except Exception:
         return []
 
 
@@ -1090,12 +1066,12 @@ def real_time_dashboard_analytics(request):
             activities.append(activity)
         
         # Trending content
-        trending_videos = AnalyticsEvent.objects.filter(
-            event_type__in=['video_play', 'video_like'],
-            timestamp__gte=timezone.now() - timedelta(hours=1)
-        ).values('video').annotate(
-            engagement_score=Count('id')
-        ).order_by('-engagement_score')[:5]
+        trending_videos = [
+            {'video': video_id, 'engagement_score': plays}
+            for video_id, plays in rollups.top_dimensions(
+                rollups.VIDEO_PLAYS, timezone.now() - timedelta(hours=1), prefix='video:', limit=5
+            )
+        ]
         
         live_metrics = {
             'active_users': active_users,
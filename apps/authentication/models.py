@@ -125,25 +125,10 @@ class User(AbstractUser):
     @property
     def friends(self):
         """Get all friends of this user"""
-        from apps.users.models import Friendship
-        from django.db.models import Q
+        from apps.users.friend_graph import friend_graph
         
-        # Get all accepted friendships where this user is involved
-        friendships = Friendship.objects.filter(
-            Q(from_user=self, status='accepted') |
-            Q(to_user=self, status='accepted')
-        )
-        
-        # Extract friend user IDs
-        friend_ids = []
-        for friendship in friendships:
-            if friendship.from_user == self:
-                friend_ids.append(friendship.to_user.id)
-            else:
-                friend_ids.append(friendship.from_user.id)
-        
-        # Return queryset of friend users
-        return User.objects.filter(id__in=friend_ids)
+        # Friend IDs come from the cached adjacency set, not a Friendship scan
+        return User.objects.filter(id__in=friend_graph.get_friend_ids(self.id))
 
 
 class UserProfile(models.Model):
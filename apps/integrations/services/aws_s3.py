@@ -204,6 +204,78 @@ class AWSS3Service:
             logger.error(f"Error generating presigned URL: {str(e)}")
             raise Exception("Failed to generate upload URL")
     
+    def create_multipart_upload(self, file_key: str, content_type: str = None) -> str:
+        """Start a multipart upload and return its upload id"""
+        if not self.s3_client:
+            raise Exception("S3 client not initialized")
+
+        params = {
+            'Bucket': self.config.bucket_name,
+            'Key': file_key,
+            'ACL': self.config.default_acl,
+        }
+        if content_type:
+            params['ContentType'] = content_type
+        if self.config.enable_encryption:
+            params['ServerSideEncryption'] = 'AES256'
+
+        try:
+            return self.s3_client.create_multipart_upload(**params)['UploadId']
+        except ClientError as e:
+            logger.error(f"Error starting multipart upload: {str(e)}")
+            raise Exception("Failed to start multipart upload")
+
+    def upload_part(self, file_key: str, upload_id: str, part_number: int, body: BinaryIO) -> str:
+        """Upload one part (5MB minimum except the last) and return its ETag"""
+        if not self.s3_client:
+            raise Exception("S3 client not initialized")
+
+        try:
+            response = self.s3_client.upload_part(
+                Bucket=self.config.bucket_name,
+                Key=file_key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=body
+            )
+            return response['ETag']
+        except ClientError as e:
+            logger.error(f"Error uploading part {part_number}: {str(e)}")
+            raise Exception("Failed to upload part")
+
+    def complete_multipart_upload(self, file_key: str, upload_id: str, parts: List[Dict]) -> Dict:
+        """Assemble uploaded ``[{'PartNumber', 'ETag'}]`` parts into the final object"""
+        if not self.s3_client:
+            raise Exception("S3 client not initialized")
+
+        try:
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.config.bucket_name,
+                Key=file_key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+            return {'file_key': file_key, 'file_url': self._generate_file_url(file_key)}
+        except ClientError as e:
+            logger.error(f"Error completing multipart upload: {str(e)}")
+            raise Exception("Failed to complete multipart upload")
+
+    def abort_multipart_upload(self, file_key: str, upload_id: str) -> bool:
+        """Discard a multipart upload and the parts stored so far"""
+        if not self.s3_client:
+            raise Exception("S3 client not initialized")
+
+        try:
+            self.s3_client.abort_multipart_upload(
+                Bucket=self.config.bucket_name,
+                Key=file_key,
+                UploadId=upload_id
+            )
+            return True
+        except ClientError as e:
+            logger.error(f"Error aborting multipart upload: {str(e)}")
+            return False
+
     def get_file_info(self, file_key: str) -> Dict:
         """Get file metadata from S3"""
         if not self.s3_client:
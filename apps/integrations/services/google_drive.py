@@ -383,6 +383,13 @@ class GoogleDriveService:
             return ''
         return f'https://www.googleapis.com/drive/v3/files/{file_id}?alt=media'
 
+    def get_auth_headers(self) -> Dict[str, str]:
+        """Bearer headers for fetching ``get_download_url`` directly over HTTP"""
+        self._refresh_credentials_if_needed()
+        if not self.credentials or not self.credentials.token:
+            raise Exception('Google Drive credentials are not available')
+        return {'Authorization': f'Bearer {self.credentials.token}'}
+
     def upload_file(self, file_path: str, name: Optional[str] = None, folder_id: Optional[str] = None) -> Dict:
         self._ensure_service_initialized()
 
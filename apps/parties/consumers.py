@@ -404,19 +404,7 @@ class PartyConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def update_party_state(self, is_playing=None, current_timestamp=None):
         """Update party playback state"""
-        if is_playing is not None:
-            self.party.is_playing = is_playing
-        if current_timestamp is not None:
-            self.party.current_timestamp = timedelta(seconds=current_timestamp)
-        
-        self.party.last_sync_at = timezone.now()
-        update_fields = ['last_sync_at']
-        
-        if is_playing is not None:
-            update_fields.append('is_playing')
-        if current_timestamp is not None:
-            update_fields.append('current_timestamp')
-        
+        update_fields = self.party.sync_playback(is_playing=is_playing, position=current_timestamp)
         self.party.save(update_fields=update_fields)
     
     @database_sync_to_async
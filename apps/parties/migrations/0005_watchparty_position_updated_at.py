@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("parties", "0004_watchparty_allow_public_search_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="watchparty",
+            name="position_updated_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Position Updated At"
+            ),
+        ),
+    ]
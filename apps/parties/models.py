@@ -74,6 +74,8 @@ class WatchParty(models.Model):
     current_timestamp = models.DurationField(default=timezone.timedelta(0), verbose_name='Current Video Position')
     is_playing = models.BooleanField(default=False, verbose_name='Is Playing')
     last_sync_at = models.DateTimeField(auto_now=True, verbose_name='Last Sync Update')
+    # Only play/pause/seek set this; last_sync_at moves on every save
+    position_updated_at = models.DateTimeField(null=True, blank=True, verbose_name='Position Updated At')
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -130,6 +132,40 @@ class WatchParty(models.Model):
             return True
         return timezone.now() < self.invite_code_expires_at
 
+    def playback_position(self, now=None):
+        """Authoritative playback position in seconds, advanced by wall time while playing"""
+        position = self.current_timestamp.total_seconds() if self.current_timestamp else 0.0
+        if self.is_playing and self.position_updated_at:
+            position += max(((now or timezone.now()) - self.position_updated_at).total_seconds(), 0.0)
+        return position
+
+    def sync_playback(self, is_playing=None, position=None, now=None):
+        """
+        Record a play, pause or seek; returns the fields to save. Without a
+        ``position`` the clock keeps the time played since the last sync.
+        """
+        now = now or timezone.now()
+        if position is None:
+            position = self.playback_position(now)
+        self.current_timestamp = timezone.timedelta(seconds=position)
+        if is_playing is not None:
+            self.is_playing = is_playing
+        self.position_updated_at = now
+        self.last_sync_at = now
+        return ['current_timestamp', 'is_playing', 'position_updated_at', 'last_sync_at']
+
+    def drive_source(self):
+        """``(gdrive_file_id, owner)`` of the Drive movie being watched, or ``(None, None)``"""
+        if self.gdrive_file_id:
+            return self.gdrive_file_id, self.host
+        if self.video_id and self.video.gdrive_file_id:
+            return self.video.gdrive_file_id, self.video.uploader
+        return None, None
+
+    def duration_seconds(self):
+        duration = self.movie_duration or (self.video.duration if self.video_id else None)
+        return duration.total_seconds() if duration else None
+
 
 class PartyParticipant(models.Model):
     """Party participant model"""
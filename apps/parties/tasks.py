@@ -3,9 +3,11 @@ Party management background tasks
 """
 
 from celery import shared_task
+from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
 import logging
+import uuid
 
 from .models import WatchParty
 
@@ -78,3 +80,130 @@ def send_party_reminders_batch():
     except Exception as e:
         logger.error(f"Failed to send party reminders: {str(e)}")
         return f"Error: {str(e)}"
+
+
+PARTY_PREFETCH_INTERVAL = 15  # seconds between follow-ahead passes
+PARTY_PREFETCH_MAX_HOURS = 12
+
+
+def _prefetch_generation_key(party_id):
+    return f"party_prefetch:generation:{party_id}"
+
+
+def _drive_auth_headers(owner):
+    """Lazily build the owner's Drive client; only needed on chunk cache misses"""
+    drive_service = None
+
+    def auth_headers():
+        nonlocal drive_service
+        if drive_service is None:
+            from apps.integrations.services.google_drive import get_drive_service
+            drive_service = get_drive_service(owner)
+        return drive_service.get_auth_headers()
+
+    return auth_headers
+
+
+def schedule_party_prefetch(party, warm_start=True):
+    """
+    (Re)start the follow-ahead chain for ``party``, first warming the start
+    of the video unless ``warm_start`` is false (e.g. after a seek). A fresh
+    generation token retires any chain started earlier for the same party.
+    """
+    generation = uuid.uuid4().hex
+    try:
+        cache.set(_prefetch_generation_key(party.id), generation, PARTY_PREFETCH_MAX_HOURS * 3600)
+        if warm_start:
+            prefetch_party_video.delay(str(party.id), generation)
+        else:
+            follow_party_prefetch.delay(str(party.id), generation)
+    except Exception as e:
+        # Prefetch is an optimization; never fail the party action over it
+        logger.warning(f"Could not schedule prefetch for party {party.id}: {str(e)}")
+        return None
+    return generation
+
+
+@shared_task
+def prefetch_party_video(party_id, generation=None):
+    """Warm the first minutes of the party's video, its poster, manifests and sprites"""
+    from apps.videos.prefetch import (
+        PREFETCH_INITIAL_BYTES, packaged_storage_names, warm_drive_range, warm_storage_names, warm_storage_prefix,
+    )
+
+    try:
+        party = WatchParty.objects.select_related('video', 'host').get(id=party_id)
+        warmed = []
+
+        file_id, owner = party.drive_source()
+        if file_id:
+            warm_drive_range(file_id, _drive_auth_headers(owner), 0, PREFETCH_INITIAL_BYTES)
+            warmed.append('drive')
+
+        video = party.video
+        if video:
+            if warm_storage_names(packaged_storage_names(video)):
+                warmed.append('manifests')
+            if video.file and not (video.streaming_manifest or {}).get('hls'):
+                warm_storage_prefix(video.file.name)
+                warmed.append('file')
+
+        # Scheduled parties are followed once started (``start`` schedules again)
+        if generation and file_id and party.status == 'live':
+            follow_party_prefetch.apply_async((party_id, generation), countdown=PARTY_PREFETCH_INTERVAL)
+
+        return f"Prefetched {', '.join(warmed) or 'nothing'} for party {party_id}"
+
+    except WatchParty.DoesNotExist:
+        return f"Party {party_id} not found"
+    except Exception as e:
+        logger.error(f"Failed to prefetch party {party_id}: {str(e)}")
+        return f"Error: {str(e)}"
+
+
+@shared_task
+def follow_party_prefetch(party_id, generation):
+    """
+    Keep the chunk cache ``PREFETCH_AHEAD_SECONDS`` ahead of the party clock.
+    Reschedules itself while the party is live, skipping ticks while the file
+    size is unknown; stops once superseded or ended.
+    """
+    from apps.videos.prefetch import (
+        PREFETCH_AHEAD_SECONDS, drive_byte_offset, drive_bytes_per_second, ensure_drive_meta, warm_drive_range,
+    )
+
+    if cache.get(_prefetch_generation_key(party_id)) != generation:
+        return f"Prefetch for party {party_id} superseded"
+
+    try:
+        party = WatchParty.objects.select_related('video', 'host').get(id=party_id)
+        if party.status in ('ended', 'cancelled'):
+            cache.delete(_prefetch_generation_key(party_id))
+            return f"Party {party_id} over; prefetch stopped"
+
+        file_id, owner = party.drive_source()
+        duration = party.duration_seconds()
+        if not file_id or not duration:
+            return f"Party {party_id} has no Drive movie to follow"
+
+        chunks = 0
+        if party.status == 'live' and party.is_playing:
+            auth_headers = _drive_auth_headers(owner)
+            ensure_drive_meta(file_id, auth_headers)
+            # Warm from the current position to the end of the look-ahead window
+            offset = drive_byte_offset(file_id, party.playback_position(), duration)
+            rate = drive_bytes_per_second(file_id, duration)
+            if offset is None or rate is None:
+                # Drive didn't report the size yet; try again on the next tick
+                logger.info(f"Size of Drive file {file_id} unknown; skipping follow-ahead for party {party_id}")
+            else:
+                chunks = warm_drive_range(file_id, auth_headers, offset, rate * PREFETCH_AHEAD_SECONDS)
+
+        follow_party_prefetch.apply_async((party_id, generation), countdown=PARTY_PREFETCH_INTERVAL)
+        return f"Warmed {chunks} chunks ahead of party {party_id}"
+
+    except WatchParty.DoesNotExist:
+        return f"Party {party_id} not found"
+    except Exception as e:
+        logger.error(f"Follow-ahead prefetch failed for party {party_id}: {str(e)}")
+        return f"Error: {str(e)}"
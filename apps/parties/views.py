@@ -17,6 +17,7 @@ from drf_spectacular.utils import extend_schema
 from apps.integrations.services.google_drive import get_drive_service
 
 from .models import WatchParty, PartyParticipant, PartyReaction, PartyInvitation, PartyReport
+from .tasks import schedule_party_prefetch
 from apps.chat.models import ChatMessage
 from .serializers import (
     WatchPartySerializer, WatchPartyDetailSerializer, WatchPartyCreateSerializer,
@@ -53,21 +54,9 @@ class WatchPartyViewSet(ModelViewSet):
         queryset = super().get_queryset().select_related('host', 'video').prefetch_related('participants__user')
         user = self.request.user
         
-        # Get user's friends efficiently
-        from apps.users.models import Friendship
-        friend_ids = Friendship.objects.filter(
-            Q(from_user=user, status='accepted') | Q(to_user=user, status='accepted')
-        ).values_list(
-            'to_user', 'from_user'
-        )
-        
-        # Extract friend user IDs
-        friend_user_ids = set()
-        for from_id, to_id in friend_ids:
-            if from_id == user.id:
-                friend_user_ids.add(to_id)
-            else:
-                friend_user_ids.add(from_id)
+        # Get user's friends from the cached friend graph
+        from apps.users.friend_graph import friend_graph
+        friend_user_ids = friend_graph.get_friend_ids(user.id)
         
         # Filter based on visibility and user relationships
         return queryset.filter(
@@ -144,9 +133,11 @@ class WatchPartyViewSet(ModelViewSet):
         
         party.status = 'live'
         party.started_at = timezone.now()
-        party.is_playing = True
+        party.sync_playback(is_playing=True, now=party.started_at)
         party.save()
         
+        schedule_party_prefetch(party)
+        
         # TODO: Send WebSocket notification to all participants
         
         return Response({'message': 'Party started successfully'})
@@ -169,14 +160,16 @@ class WatchPartyViewSet(ModelViewSet):
             timestamp = serializer.validated_data.get('timestamp')
             
             if action == 'play':
-                party.is_playing = True
+                update_fields = party.sync_playback(is_playing=True)
             elif action == 'pause':
-                party.is_playing = False
-            elif action == 'seek':
-                party.current_timestamp = timestamp
+                update_fields = party.sync_playback(is_playing=False)
+            else:
+                update_fields = party.sync_playback(position=timestamp.total_seconds())
+            party.save(update_fields=update_fields)
             
-            party.last_sync_at = timezone.now()
-            party.save()
+            if action == 'seek' and party.status == 'live':
+                # Jump the follow-ahead window to the new position right away
+                schedule_party_prefetch(party, warm_start=False)
             
             # TODO: Send WebSocket notification to all participants
             
@@ -339,6 +332,9 @@ class WatchPartyViewSet(ModelViewSet):
             
             party.save()
             
+            # Warm the start of the movie before the host presses play
+            schedule_party_prefetch(party)
+            
             return Response({
                 'message': 'Movie selected successfully',
                 'movie_title': party.movie_title,
@@ -451,21 +447,9 @@ class PartySearchView(generics.GenericAPIView):
             # Apply visibility filters
             user = request.user
             
-            # Get user's friends
-            from apps.users.models import Friendship
-            friend_ids = Friendship.objects.filter(
-                Q(from_user=user, status='accepted') | Q(to_user=user, status='accepted')
-            ).values_list(
-                'to_user', 'from_user'
-            )
-            
-            # Extract friend user IDs
-            friend_user_ids = set()
-            for from_id, to_id in friend_ids:
-                if from_id == user.id:
-                    friend_user_ids.add(to_id)
-                else:
-                    friend_user_ids.add(from_id)
+            # Get user's friends from the cached friend graph
+            from apps.users.friend_graph import friend_graph
+            friend_user_ids = friend_graph.get_friend_ids(user.id)
             
             queryset = queryset.filter(
                 Q(visibility='public') |
@@ -0,0 +1,267 @@
+"""
+Search result caching with normalized keys and stampede protection
+"""
+
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import time
+import unicodedata
+from datetime import timedelta
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from shared.observability import observability
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_VERSION = 1
+SEARCH_CACHE_TTL = 300  # 5 minutes of logical freshness
+SEARCH_CACHE_STALE_GRACE = 60  # stale copies kept around while one worker refreshes
+SEARCH_CACHE_LOCK_TIMEOUT = 30
+SEARCH_CACHE_WAIT_TIMEOUT = 2.0
+SEARCH_CACHE_WAIT_INTERVAL = 0.05
+SEARCH_CACHE_EARLY_REFRESH_BETA = 1.0
+
+# Fields the user search matches against; used to post-filter the requester
+USER_SEARCH_FIELDS = ('full_name', 'email')
+DATE_FILTER_DAYS = {'week': 7, 'month': 30, 'year': 365}
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_query(query):
+    """Normalize a raw search string so case/whitespace variants share a key"""
+    if not query:
+        return ''
+    normalized = unicodedata.normalize('NFKC', str(query))
+    normalized = _WHITESPACE_RE.sub(' ', normalized).strip()
+    return normalized.casefold()
+
+
+def date_filter_since(date_filter, now=None):
+    """Start of a search ``date_filter`` window, or ``None`` when unfiltered"""
+    now = now or timezone.now()
+    if date_filter == 'today':
+        return timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    days = DATE_FILTER_DAYS.get(date_filter)
+    return now - timedelta(days=days) if days else None
+
+
+def build_search_cache_key(query, **params):
+    """
+    Build a bounded, hashed cache key for a shared (user-agnostic) result set.
+
+    The requesting user is intentionally not part of the key; per-user
+    filtering happens after the shared results are read from the cache.
+    """
+    payload = {
+        'q': normalize_query(query),
+        **{
+            name: normalize_query(value) if isinstance(value, str) else value
+            for name, value in params.items()
+        },
+    }
+    digest = hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+    return f"search:v{SEARCH_CACHE_VERSION}:{digest}"
+
+
+def _record_lookup(result):
+    observability.record_metric('search.cache.lookup', 1, tags={'result': result})
+
+
+class SearchResultCache:
+    """
+    Cache-aside helper for shared search results.
+
+    Entries are stored as envelopes with their logical expiry and the time it
+    took to compute them. Reads refresh probabilistically before expiry
+    (XFetch), and only the worker holding the single-flight lock recomputes;
+    everyone else serves the stale copy or briefly waits for the winner.
+    """
+
+    def __init__(self, backend=None, ttl=SEARCH_CACHE_TTL, stale_grace=SEARCH_CACHE_STALE_GRACE,
+                 lock_timeout=SEARCH_CACHE_LOCK_TIMEOUT, wait_timeout=SEARCH_CACHE_WAIT_TIMEOUT,
+                 beta=SEARCH_CACHE_EARLY_REFRESH_BETA):
+        self.backend = backend or cache
+        self.ttl = ttl
+        self.stale_grace = stale_grace
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.beta = beta
+
+    def get_or_compute(self, key, compute, should_cache=None):
+        """
+        Return ``(value, status)`` for ``key``, computing it at most once
+        per refresh window across workers. ``status`` is one of ``hit``,
+        ``miss``, ``refresh``, ``stale`` or ``wait``. Computed values are
+        only stored when ``should_cache`` (if given) accepts them.
+        """
+        envelope = self.backend.get(key)
+        now = time.time()
+
+        if envelope is not None:
+            if not self._should_refresh(envelope, now):
+                _record_lookup('hit')
+                return envelope['value'], 'hit'
+
+            # Early (or post-expiry) refresh: one worker recomputes, others serve stale
+            lock_token = self._acquire_lock(key)
+            if lock_token is None:
+                _record_lookup('stale')
+                return envelope['value'], 'stale'
+            try:
+                value = self._compute_and_store(key, compute, should_cache)
+            finally:
+                self._release_lock(key, lock_token)
+            _record_lookup('refresh')
+            return value, 'refresh'
+
+        lock_token = self._acquire_lock(key)
+        if lock_token is None:
+            value = self._wait_for_value(key)
+            if value is not None:
+                _record_lookup('wait')
+                return value, 'wait'
+            # The winner is too slow or died; fall through and compute ourselves
+            _record_lookup('miss')
+            return self._compute_and_store(key, compute, should_cache), 'miss'
+
+        try:
+            value = self._compute_and_store(key, compute, should_cache)
+        finally:
+            self._release_lock(key, lock_token)
+        _record_lookup('miss')
+        return value, 'miss'
+
+    def refresh(self, key, compute):
+        """Recompute and store ``key`` unconditionally (e.g. from a scheduled task)"""
+        return self._compute_and_store(key, compute)
+
+    def invalidate(self, key):
+        self.backend.delete(key)
+
+    def _should_refresh(self, envelope, now):
+        expires_at = envelope.get('expires_at', 0)
+        delta = envelope.get('delta', 0)
+        if now >= expires_at:
+            return True
+        # XFetch: refresh earlier the longer the value takes to recompute
+        gap = -delta * self.beta * math.log(max(random.random(), 1e-12))
+        return now + gap >= expires_at
+
+    def _compute_and_store(self, key, compute, should_cache=None):
+        started = time.time()
+        value = compute()
+        finished = time.time()
+        delta = finished - started
+        if should_cache is not None and not should_cache(value):
+            return value
+        envelope = {
+            'value': value,
+            'delta': delta,
+            'expires_at': finished + self.ttl,
+        }
+        self.backend.set(key, envelope, self.ttl + self.stale_grace)
+        observability.record_metric(
+            'search.cache.compute_ms', delta * 1000, tags={'key_version': SEARCH_CACHE_VERSION}
+        )
+        return value
+
+    def _acquire_lock(self, key):
+        token = uuid4().hex
+        if self.backend.add(f"{key}:lock", token, self.lock_timeout):
+            return token
+        return None
+
+    def _release_lock(self, key, token):
+        lock_key = f"{key}:lock"
+        try:
+            if self.backend.get(lock_key) == token:
+                self.backend.delete(lock_key)
+        except Exception:
+            logger.warning("Failed to release search cache lock %s", lock_key, exc_info=True)
+
+    def _wait_for_value(self, key):
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(SEARCH_CACHE_WAIT_INTERVAL)
+            envelope = self.backend.get(key)
+            if envelope is not None:
+                return envelope['value']
+        return None
+
+
+def _user_matches_query(user, query):
+    needle = normalize_query(query)
+    for field in USER_SEARCH_FIELDS:
+        value = getattr(user, field, None)
+        if value and needle in normalize_query(value):
+            return True
+    return False
+
+
+def _user_in_shared_count(user, query, since):
+    """Whether the shared user search counted ``user`` without listing them"""
+    if not getattr(user, 'is_active', False) or not _user_matches_query(user, query):
+        return False
+    date_joined = getattr(user, 'date_joined', None)
+    return since is None or (date_joined is not None and date_joined >= since)
+
+
+def personalize_results(shared_data, user, query, offset, limit):
+    """
+    Apply per-user post-filtering to a shared search payload.
+
+    The shared ``users`` section is fetched with one extra row so the
+    requester can be dropped without leaving the page short. Counts only
+    drop when the requester was actually part of the shared result.
+    """
+    users_section = shared_data['results'].get('users')
+    if not users_section:
+        return shared_data
+
+    user_id = str(getattr(user, 'id', ''))
+    items = users_section['items']
+    filtered = [item for item in items if str(item['id']) != user_id]
+    requester_matched = len(filtered) != len(items) or (
+        'error' not in users_section
+        and users_section['count'] > 0
+        and _user_in_shared_count(
+            user, query, date_filter_since(shared_data['search_meta'].get('date_filter'))
+        )
+    )
+
+    users_count = users_section['count']
+    total_results = shared_data['pagination']['total_results']
+    if requester_matched:
+        users_count = max(users_count - 1, 0)
+        total_results = max(total_results - 1, 0)
+
+    return {
+        **shared_data,
+        'results': {
+            **shared_data['results'],
+            'users': {
+                **users_section,
+                'items': filtered[:limit],
+                'count': users_count,
+                'has_more': users_count > offset + limit,
+            },
+        },
+        'pagination': {
+            **shared_data['pagination'],
+            'total_results': total_results,
+            'has_more': total_results > offset + limit,
+        },
+    }
+
+
+search_result_cache = SearchResultCache()
@@ -0,0 +1,165 @@
+"""
+Materialized discovery feed
+
+Candidate pools for the discover page are built on a schedule and kept in
+the cache in a compact form. Requests only sample from those pools.
+"""
+
+import logging
+import random
+from datetime import timedelta
+
+from django.apps import apps
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .cache import SearchResultCache
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_FEED_CACHE_KEY = 'discovery:feed:v1'
+DISCOVERY_FEED_TTL = 900  # refreshed every 5 minutes by beat; TTL covers missed runs
+TRENDING_WINDOW_DAYS = 7
+
+TRENDING_POOL_SIZE = 50
+FEATURED_POOL_SIZE = 30
+ACTIVE_PARTIES_POOL_SIZE = 30
+SUGGESTED_USERS_POOL_SIZE = 200
+
+TRENDING_SECTION_SIZE = 8
+FEATURED_SECTION_SIZE = 6
+ACTIVE_PARTIES_SECTION_SIZE = 6
+SUGGESTED_USERS_SECTION_SIZE = 8
+
+discovery_feed_cache = SearchResultCache(ttl=DISCOVERY_FEED_TTL)
+
+
+def _truncate(text, length=150):
+    return text[:length] + '...' if len(text) > length else text
+
+
+def _file_url(field):
+    return field.url if field else None
+
+
+def _compact_video(video):
+    return {
+        'id': str(video.id),
+        'title': video.title,
+        'description': _truncate(video.description),
+        'thumbnail': _file_url(video.thumbnail),
+        'duration': video.duration.total_seconds() if video.duration else None,
+        'uploaded_by': {
+            'id': str(video.uploader_id),
+            'name': video.uploader.full_name,
+        },
+        'views': video.view_count,
+        'created_at': video.created_at.isoformat(),
+    }
+
+
+def build_discovery_feed():
+    """Query every candidate pool once and return the compact feed payload"""
+    Video = apps.get_model('videos', 'Video')
+    WatchParty = apps.get_model('parties', 'WatchParty')
+    User = apps.get_model('authentication', 'User')
+
+    now = timezone.now()
+    public_videos = Video.objects.filter(
+        status='ready',
+        visibility='public',
+    ).select_related('uploader')
+
+    trending_videos = public_videos.filter(
+        created_at__gte=now - timedelta(days=TRENDING_WINDOW_DAYS)
+    ).order_by('-view_count', '-created_at')[:TRENDING_POOL_SIZE]
+
+    featured_videos = public_videos.order_by('-created_at')[:FEATURED_POOL_SIZE]
+
+    active_parties = WatchParty.objects.filter(
+        status='live',
+        visibility='public',
+    ).select_related('host').annotate(
+        active_participants=Count('participants', filter=Q(participants__is_active=True))
+    ).order_by('-active_participants', '-created_at')[:ACTIVE_PARTIES_POOL_SIZE]
+
+    # Recently active accounts make up the suggestion pool; sampling happens per request
+    suggested_users = User.objects.filter(is_active=True).only(
+        'id', 'first_name', 'last_name', 'profile_picture', 'is_online'
+    ).order_by('-last_activity')[:SUGGESTED_USERS_POOL_SIZE]
+
+    return {
+        'built_at': now.isoformat(),
+        'trending_videos': [_compact_video(video) for video in trending_videos],
+        'featured_videos': [_compact_video(video) for video in featured_videos],
+        'active_parties': [
+            {
+                'id': str(party.id),
+                'title': party.title,
+                'description': _truncate(party.description),
+                'host': {
+                    'id': str(party.host_id),
+                    'name': party.host.full_name,
+                },
+                'participant_count': party.active_participants,
+                'is_live': True,
+                'created_at': party.created_at.isoformat(),
+            }
+            for party in active_parties
+        ],
+        'suggested_users': [
+            {
+                'id': str(user.id),
+                'name': user.full_name,
+                'profile_picture': _file_url(user.profile_picture),
+                'is_online': user.is_online,
+            }
+            for user in suggested_users
+        ],
+    }
+
+
+def refresh_discovery_feed():
+    """Rebuild the cached feed; called from the scheduled task"""
+    return discovery_feed_cache.refresh(DISCOVERY_FEED_CACHE_KEY, build_discovery_feed)
+
+
+def get_discovery_feed():
+    """Return the cached feed, building it once (single-flight) on a cold cache"""
+    feed, _status = discovery_feed_cache.get_or_compute(DISCOVERY_FEED_CACHE_KEY, build_discovery_feed)
+    return feed
+
+
+def personalize_discovery_feed(feed, user, exclude_user_ids=(), ranked_users=()):
+    """
+    Cheap per-request view of the feed: drop the user's own content and
+    sample suggestions deterministically per (user, feed build).
+    ``ranked_users`` (e.g. friend-of-friend suggestions) go first and the
+    sampled pool only fills the remaining slots.
+    """
+    user_id = str(user.id)
+    excluded = {user_id, *(str(excluded_id) for excluded_id in exclude_user_ids)}
+    rng = random.Random(f"{user_id}:{feed['built_at']}")
+
+    trending = [
+        video for video in feed['trending_videos']
+        if video['uploaded_by']['id'] != user_id
+    ][:TRENDING_SECTION_SIZE]
+    trending_ids = {video['id'] for video in trending}
+    featured = [
+        video for video in feed['featured_videos']
+        if video['id'] not in trending_ids and video['uploaded_by']['id'] != user_id
+    ][:FEATURED_SECTION_SIZE]
+
+    suggested = [candidate for candidate in ranked_users if candidate['id'] not in excluded]
+    suggested = suggested[:SUGGESTED_USERS_SECTION_SIZE]
+    excluded.update(candidate['id'] for candidate in suggested)
+    candidates = [candidate for candidate in feed['suggested_users'] if candidate['id'] not in excluded]
+    suggested += rng.sample(candidates, min(SUGGESTED_USERS_SECTION_SIZE - len(suggested), len(candidates)))
+
+    return {
+        'trending_videos': trending,
+        'active_parties': feed['active_parties'][:ACTIVE_PARTIES_SECTION_SIZE],
+        'suggested_users': suggested,
+        'featured_videos': featured,
+    }
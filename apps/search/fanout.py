@@ -0,0 +1,121 @@
+"""
+Concurrent per-entity search fan-out
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Set
+
+from django.conf import settings
+from django.db import connection, connections
+
+from shared.observability import observability
+
+logger = logging.getLogger(__name__)
+
+SEARCH_ENTITY_TIMEOUT = getattr(settings, 'SEARCH_ENTITY_TIMEOUT', 2.0)
+SEARCH_FANOUT_WORKERS = getattr(settings, 'SEARCH_FANOUT_WORKERS', 8)
+# Grace past the fan-out timeout before the database cancels a worker's query
+SEARCH_STATEMENT_TIMEOUT_GRACE = 0.5
+
+# Shared, bounded pool: a burst of searches queues here instead of
+# opening an unbounded number of threads and database connections
+_executor = ThreadPoolExecutor(max_workers=SEARCH_FANOUT_WORKERS, thread_name_prefix='search-fanout')
+
+
+@dataclass
+class FanoutResult:
+    """Outcome of a fan-out run"""
+
+    results: Dict[str, Any] = field(default_factory=dict)
+    timings_ms: Dict[str, int] = field(default_factory=dict)
+    timed_out: Set[str] = field(default_factory=set)
+    failed: Set[str] = field(default_factory=set)
+
+    @property
+    def partial(self):
+        return bool(self.timed_out or self.failed)
+
+
+def _limit_statement_time(timeout):
+    """
+    Cap this thread's queries just past ``timeout``. Cancelling the future
+    can't stop a running query, so without this a hung one would hold a
+    pool worker indefinitely.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    limit_ms = int((timeout + SEARCH_STATEMENT_TIMEOUT_GRACE) * 1000)
+    with connection.cursor() as cursor:
+        # Session-level; the connection is closed when the entity finishes
+        cursor.execute("SELECT set_config('statement_timeout', %s, false)", [str(limit_ms)])
+
+
+def _run_entity(search, timeout):
+    started = time.perf_counter()
+    try:
+        _limit_statement_time(timeout)
+        return search(), int((time.perf_counter() - started) * 1000)
+    finally:
+        # Worker threads are long-lived; don't let them hold connections open
+        connections.close_all()
+
+
+def _record_timing(name, elapsed_ms, status):
+    observability.record_metric(
+        'search.entity_ms', elapsed_ms, tags={'entity': name, 'status': status}
+    )
+
+
+def run_fanout(searches: Dict[str, Callable[[], Any]], timeout: float = SEARCH_ENTITY_TIMEOUT) -> FanoutResult:
+    """
+    Run independent entity searches concurrently and collect what finishes
+    within ``timeout`` seconds. Entities that time out or raise are reported
+    in ``timed_out`` / ``failed`` rather than failing the whole search.
+    """
+    outcome = FanoutResult()
+    if not searches:
+        return outcome
+
+    if len(searches) == 1:
+        # Nothing to overlap with; stay on the request thread and connection
+        (name, search), = searches.items()
+        started = time.perf_counter()
+        try:
+            outcome.results[name] = search()
+            status = 'ok'
+        except Exception:
+            logger.exception("Search for %s failed", name)
+            outcome.failed.add(name)
+            status = 'failed'
+        outcome.timings_ms[name] = int((time.perf_counter() - started) * 1000)
+        _record_timing(name, outcome.timings_ms[name], status)
+        return outcome
+
+    started = time.perf_counter()
+    futures = {_executor.submit(_run_entity, search, timeout): name for name, search in searches.items()}
+    done, not_done = wait(futures, timeout=timeout)
+
+    for future in done:
+        name = futures[future]
+        try:
+            outcome.results[name], outcome.timings_ms[name] = future.result()
+            status = 'ok'
+        except Exception:
+            logger.exception("Search for %s failed", name)
+            outcome.failed.add(name)
+            outcome.timings_ms[name] = int((time.perf_counter() - started) * 1000)
+            status = 'failed'
+        _record_timing(name, outcome.timings_ms[name], status)
+
+    for future in not_done:
+        name = futures[future]
+        # Queued work is dropped; a running query is cancelled by its statement_timeout
+        future.cancel()
+        outcome.timed_out.add(name)
+        outcome.timings_ms[name] = int(timeout * 1000)
+        _record_timing(name, outcome.timings_ms[name], 'timeout')
+
+    return outcome
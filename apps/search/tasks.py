@@ -0,0 +1,26 @@
+"""
+Search and discovery background tasks
+"""
+
+from celery import shared_task
+import logging
+
+from .discovery import refresh_discovery_feed as rebuild_discovery_feed
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_discovery_feed():
+    """Rebuild the materialized discovery feed candidate pools"""
+    try:
+        feed = rebuild_discovery_feed()
+        logger.info(
+            f"Discovery feed rebuilt: {len(feed['trending_videos'])} trending, "
+            f"{len(feed['featured_videos'])} featured, {len(feed['active_parties'])} parties, "
+            f"{len(feed['suggested_users'])} suggested users"
+        )
+        return "Discovery feed refreshed"
+    except Exception as e:
+        logger.error(f"Failed to refresh discovery feed: {str(e)}")
+        return f"Error: {str(e)}"
@@ -5,16 +5,22 @@ Views for Global Search functionality with enhanced features
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-from django.db.models import Q, Count, F
+from django.db import connection
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+from django.db.models.functions import Concat
 from django.apps import apps
 from django.utils import timezone
 from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
-from django.core.cache import cache
 from drf_spectacular.utils import extend_schema
 from datetime import timedelta
 import time
 
+from apps.users.friend_graph import friend_graph
+from apps.users.suggestions import people_you_may_know
 from shared.responses import StandardResponse
+from .cache import build_search_cache_key, date_filter_since, personalize_results, search_result_cache
+from .discovery import SUGGESTED_USERS_SECTION_SIZE, get_discovery_feed, personalize_discovery_feed
+from .fanout import SEARCH_ENTITY_TIMEOUT, run_fanout
 from .models import SearchQuery as SearchQueryModel, SavedSearch, TrendingQuery, SearchSuggestion, SearchAnalytics
 
 
@@ -50,208 +56,99 @@ class GlobalSearchView(APIView):
         user_agent = request.META.get('HTTP_USER_AGENT', '')
         ip_address = self.get_client_ip(request)
         
-        # Check cache first
-        cache_key = f"search:{query}:{search_type}:{sort_by}:{date_filter}:{category}:{limit}:{page}"
-        cached_result = cache.get(cache_key)
-        if cached_result:
-            return StandardResponse.success(data=cached_result)
-        
-        # Get models
-        User = apps.get_model('authentication', 'User')
-        Video = apps.get_model('videos', 'Video')
-        WatchParty = apps.get_model('parties', 'WatchParty')
+        # Shared results are cached per normalized query; the requester is
+        # filtered out afterwards so one user's view never leaks into the key
+        cache_key = build_search_cache_key(
+            query,
+            type=search_type,
+            sort=sort_by,
+            date_filter=date_filter,
+            category=category,
+            limit=limit,
+            page=page,
+        )
+        shared_data, cache_status = search_result_cache.get_or_compute(
+            cache_key,
+            lambda: self.build_shared_results(
+                query, search_type, sort_by, date_filter, category, page, limit
+            ),
+            # Partial (timed out) fan-outs are served but never cached
+            should_cache=lambda data: not data['search_meta']['partial'],
+        )
+        response_data = personalize_results(shared_data, request.user, query, offset, limit)
+        total_results = response_data['pagination']['total_results']
         
-        # Apply date filters
-        date_filter_q = Q()
-        if date_filter != 'all':
-            now = timezone.now()
-            if date_filter == 'today':
-                date_filter_q = Q(created_at__date=now.date())
-            elif date_filter == 'week':
-                date_filter_q = Q(created_at__gte=now - timedelta(days=7))
-            elif date_filter == 'month':
-                date_filter_q = Q(created_at__gte=now - timedelta(days=30))
-            elif date_filter == 'year':
-                date_filter_q = Q(created_at__gte=now - timedelta(days=365))
+        if cache_status == 'miss':
+            # Calculate search duration
+            search_duration_ms = int((time.time() - start_time) * 1000)
+            
+            # Track search analytics (async)
+            self.track_search_analytics(
+                user=request.user,
+                query=query,
+                search_type=search_type,
+                filters={
+                    'sort_by': sort_by,
+                    'date_filter': date_filter,
+                    'category': category,
+                },
+                results_count=total_results,
+                session_id=session_id,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                search_duration_ms=search_duration_ms
+            )
         
-        results = {}
-        total_results = 0
+        response_data['query'] = query
+        response_data['search_meta'] = {
+            **response_data['search_meta'],
+            'duration_ms': int((time.time() - start_time) * 1000),
+            'cache': cache_status,
+        }
         
-        # Search users (excluding current user)
-        if search_type in ['all', 'users']:
-            users_q = Q(
-                Q(username__icontains=query) | 
-                Q(first_name__icontains=query) |
-                Q(last_name__icontains=query),
-                is_active=True
-            ) & date_filter_q
-            
-            users_queryset = User.objects.filter(users_q).exclude(id=request.user.id)
-            
-            if sort_by == 'alphabetical':
-                users_queryset = users_queryset.order_by('username')
-            elif sort_by == 'date':
-                users_queryset = users_queryset.order_by('-date_joined')
-            else:  # relevance
-                users_queryset = users_queryset.order_by('-is_active', 'username')
-            
-            users = users_queryset[offset:offset + limit]
-            users_count = users_queryset.count()
-            total_results += users_count
-            
-            users_data = []
-            for user in users:
-                users_data.append({
-                    'id': user.id,
-                    'username': user.username,
-                    'name': user.get_full_name(),
-                    'profile_picture': user.profile_picture.url if user.profile_picture else None,
-                    'is_online': getattr(user, 'is_online', False),
-                    'followers_count': getattr(user, 'followers_count', 0),
-                    'date_joined': user.date_joined,
-                })
-            
-            results['users'] = {
-                'items': users_data,
-                'count': users_count,
-                'has_more': users_count > offset + limit
-            }
+        return StandardResponse.success(
+            data=response_data,
+            message=f"Found {total_results} results for '{query}'"
+        )
+    
+    def build_shared_results(self, query, search_type, sort_by, date_filter, category, page, limit):
+        """Run the user-agnostic part of the search so it can be cached and shared"""
+        offset = (page - 1) * limit
         
-        # Search videos with full-text search
-        if search_type in ['all', 'videos']:
-            videos_q = Q(
-                Q(title__icontains=query) | 
-                Q(description__icontains=query) |
-                Q(tags__icontains=query),
-                is_active=True
-            ) & date_filter_q
-            
-            if category:
-                videos_q &= Q(category__icontains=category)
-                
-            videos_queryset = Video.objects.filter(videos_q).select_related('uploaded_by')
-            
-            if sort_by == 'popularity':
-                videos_queryset = videos_queryset.order_by('-view_count', '-created_at')
-            elif sort_by == 'date':
-                videos_queryset = videos_queryset.order_by('-created_at')
-            elif sort_by == 'alphabetical':
-                videos_queryset = videos_queryset.order_by('title')
-            else:  # relevance - use PostgreSQL full-text search if available
-                try:
-                    # Use PostgreSQL full-text search for better relevance
-                    search_vector = SearchVector('title', weight='A') + SearchVector('description', weight='B')
-                    search_query = SearchQuery(query)
-                    videos_queryset = videos_queryset.annotate(
-                        search=search_vector,
-                        rank=SearchRank(search_vector, search_query)
-                    ).filter(search=search_query).order_by('-rank', '-view_count')
-                except:
-                    # Fallback to simple ordering
-                    videos_queryset = videos_queryset.order_by('-view_count', '-created_at')
-            
-            videos = videos_queryset[offset:offset + limit]
-            videos_count = videos_queryset.count()
-            total_results += videos_count
-            
-            videos_data = []
-            for video in videos:
-                videos_data.append({
-                    'id': video.id,
-                    'title': video.title,
-                    'description': video.description[:200] + '...' if len(video.description) > 200 else video.description,
-                    'thumbnail': video.thumbnail.url if video.thumbnail else None,
-                    'duration': video.duration,
-                    'uploaded_by': {
-                        'id': video.uploaded_by.id,
-                        'username': video.uploaded_by.username,
-                        'name': video.uploaded_by.get_full_name(),
-                    },
-                    'created_at': video.created_at,
-                    'views': getattr(video, 'view_count', 0),
-                    'likes': getattr(video, 'likes_count', 0),
-                    'category': getattr(video, 'category', ''),
-                    'tags': getattr(video, 'tags', []),
-                })
-            
-            results['videos'] = {
-                'items': videos_data,
-                'count': videos_count,
-                'has_more': videos_count > offset + limit
-            }
+        # Apply date filters; users have no created_at, so they filter on date_joined
+        since = date_filter_since(date_filter)
+        date_filter_q = Q(created_at__gte=since) if since else Q()
+        joined_filter_q = Q(date_joined__gte=since) if since else Q()
         
-        # Search parties
-        if search_type in ['all', 'parties']:
-            parties_q = Q(
-                Q(title__icontains=query) | 
-                Q(description__icontains=query),
-                is_active=True
-            ) & date_filter_q
-            
-            parties_queryset = WatchParty.objects.filter(parties_q).select_related('host')
-            
-            if sort_by == 'popularity':
-                parties_queryset = parties_queryset.annotate(
-                    participant_count=Count('participants')
-                ).order_by('-participant_count', '-created_at')
-            elif sort_by == 'date':
-                parties_queryset = parties_queryset.order_by('-created_at')
-            elif sort_by == 'alphabetical':
-                parties_queryset = parties_queryset.order_by('title')
-            else:  # relevance
-                parties_queryset = parties_queryset.order_by('-is_active', '-created_at')
-            
-            parties = parties_queryset[offset:offset + limit]
-            parties_count = parties_queryset.count()
-            total_results += parties_count
-            
-            parties_data = []
-            for party in parties:
-                participant_count = party.participants.filter(is_active=True).count()
-                parties_data.append({
-                    'id': party.id,
-                    'title': party.title,
-                    'description': party.description[:200] + '...' if len(party.description) > 200 else party.description,
-                    'host': {
-                        'id': party.host.id,
-                        'username': party.host.username,
-                        'name': party.host.get_full_name(),
-                    },
-                    'is_public': party.is_public,
-                    'is_live': party.is_active,
-                    'participant_count': participant_count,
-                    'max_participants': getattr(party, 'max_participants', None),
-                    'created_at': party.created_at,
-                    'scheduled_start': getattr(party, 'scheduled_start', None),
-                })
-            
-            results['parties'] = {
-                'items': parties_data,
-                'count': parties_count,
-                'has_more': parties_count > offset + limit
+        entity_searches = {
+            'users': lambda: self.search_users(query, sort_by, joined_filter_q, offset, limit),
+            'videos': lambda: self.search_videos(query, sort_by, date_filter_q, category, offset, limit),
+            'parties': lambda: self.search_parties(query, sort_by, date_filter_q, offset, limit),
+        }
+        if search_type != 'all':
+            entity_searches = {
+                name: search for name, search in entity_searches.items() if name == search_type
             }
         
-        # Calculate search duration
-        search_duration_ms = int((time.time() - start_time) * 1000)
+        # Each entity runs on its own pooled thread and DB connection; a slow
+        # entity returns an empty, flagged section instead of stalling the response
+        fanout = run_fanout(entity_searches, timeout=SEARCH_ENTITY_TIMEOUT)
         
-        # Track search analytics (async)
-        self.track_search_analytics(
-            user=request.user,
-            query=query,
-            search_type=search_type,
-            filters={
-                'sort_by': sort_by,
-                'date_filter': date_filter,
-                'category': category,
-            },
-            results_count=total_results,
-            session_id=session_id,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            search_duration_ms=search_duration_ms
-        )
+        results = {}
+        total_results = 0
+        for name in entity_searches:
+            if name in fanout.results:
+                results[name] = fanout.results[name]
+                total_results += results[name]['count']
+            else:
+                results[name] = {
+                    'items': [],
+                    'count': 0,
+                    'has_more': False,
+                    'error': 'timeout' if name in fanout.timed_out else 'failed',
+                }
         
-        response_data = {
+        return {
             'query': query,
             'results': results,
             'pagination': {
@@ -265,17 +162,166 @@ class GlobalSearchView(APIView):
                 'sort_by': sort_by,
                 'date_filter': date_filter,
                 'category': category,
-                'duration_ms': search_duration_ms,
+                'partial': fanout.partial,
+                'entity_timings_ms': fanout.timings_ms,
             }
         }
+    
+    def search_users(self, query, sort_by, date_filter_q, offset, limit):
+        """Search active users; the requester is filtered later per user"""
+        User = apps.get_model('authentication', 'User')
         
-        # Cache results for 5 minutes
-        cache.set(cache_key, response_data, 300)
+        # Same fields personalize_results matches the requester against
+        users_q = Q(
+            Q(search_full_name__icontains=query) |
+            Q(email__icontains=query),
+            is_active=True
+        ) & date_filter_q
         
-        return StandardResponse.success(
-            data=response_data,
-            message=f"Found {total_results} results for '{query}'"
+        # The requester is excluded per user in personalize_results
+        users_queryset = User.objects.annotate(
+            search_full_name=Concat('first_name', Value(' '), 'last_name')
+        ).filter(users_q)
+        
+        if sort_by == 'alphabetical':
+            users_queryset = users_queryset.order_by('first_name', 'last_name', 'id')
+        elif sort_by == 'date':
+            users_queryset = users_queryset.order_by('-date_joined')
+        else:  # relevance
+            users_queryset = users_queryset.order_by('-is_active', 'first_name', 'last_name', 'id')
+        
+        # One extra row so dropping the requester never leaves the page short
+        users = users_queryset[offset:offset + limit + 1]
+        users_count = users_queryset.count()
+        
+        users_data = []
+        for user in users:
+            users_data.append({
+                'id': user.id,
+                'name': user.get_full_name(),
+                'profile_picture': user.profile_picture.url if user.profile_picture else None,
+                'is_online': getattr(user, 'is_online', False),
+                'followers_count': getattr(user, 'followers_count', 0),
+                'date_joined': user.date_joined,
+            })
+        
+        return {
+            'items': users_data,
+            'count': users_count,
+            'has_more': users_count > offset + limit
+        }
+    
+    def search_videos(self, query, sort_by, date_filter_q, category, offset, limit):
+        """Search videos with full-text ranking when available"""
+        Video = apps.get_model('videos', 'Video')
+        
+        # Shared across users, so only public, playable videos
+        videos_q = Q(
+            Q(title__icontains=query) | 
+            Q(description__icontains=query),
+            status='ready',
+            visibility='public'
+        ) & date_filter_q
+        # Videos have no category field, so ``category`` doesn't narrow them
+        
+        videos_queryset = Video.objects.filter(videos_q).select_related('uploader')
+        
+        if sort_by == 'popularity':
+            videos_queryset = videos_queryset.order_by('-view_count', '-created_at')
+        elif sort_by == 'date':
+            videos_queryset = videos_queryset.order_by('-created_at')
+        elif sort_by == 'alphabetical':
+            videos_queryset = videos_queryset.order_by('title')
+        elif connection.vendor == 'postgresql':
+            # Relevance: full-text ranking; the query is lazy, so check the
+            # backend up front rather than catching errors that never come here
+            search_vector = SearchVector('title', weight='A') + SearchVector('description', weight='B')
+            search_query = SearchQuery(query)
+            videos_queryset = videos_queryset.annotate(
+                rank=SearchRank(search_vector, search_query)
+            ).order_by('-rank', '-view_count')
+        else:
+            videos_queryset = videos_queryset.order_by('-view_count', '-created_at')
+        
+        videos = videos_queryset[offset:offset + limit]
+        videos_count = videos_queryset.count()
+        
+        videos_data = []
+        for video in videos:
+            videos_data.append({
+                'id': video.id,
+                'title': video.title,
+                'description': video.description[:200] + '...' if len(video.description) > 200 else video.description,
+                'thumbnail': video.thumbnail.url if video.thumbnail else None,
+                'duration': video.duration,
+                'uploaded_by': {
+                    'id': video.uploader.id,
+                    'name': video.uploader.get_full_name(),
+                },
+                'created_at': video.created_at,
+                'views': video.view_count,
+                'likes': video.like_count,
+            })
+        
+        return {
+            'items': videos_data,
+            'count': videos_count,
+            'has_more': videos_count > offset + limit
+        }
+    
+    def search_parties(self, query, sort_by, date_filter_q, offset, limit):
+        """Search public watch parties that haven't finished"""
+        WatchParty = apps.get_model('parties', 'WatchParty')
+        
+        parties_q = Q(
+            Q(title__icontains=query) | 
+            Q(description__icontains=query),
+            visibility='public',
+            allow_public_search=True,
+            status__in=['scheduled', 'live', 'paused']
+        ) & date_filter_q
+        
+        parties_queryset = WatchParty.objects.filter(parties_q).select_related('host').annotate(
+            active_participants=Count('participants', filter=Q(participants__is_active=True))
         )
+        
+        if sort_by == 'popularity':
+            parties_queryset = parties_queryset.order_by('-active_participants', '-created_at')
+        elif sort_by == 'date':
+            parties_queryset = parties_queryset.order_by('-created_at')
+        elif sort_by == 'alphabetical':
+            parties_queryset = parties_queryset.order_by('title')
+        else:  # relevance: live parties first
+            parties_queryset = parties_queryset.annotate(
+                is_live=Case(When(status='live', then=Value(1)), default=Value(0), output_field=IntegerField())
+            ).order_by('-is_live', '-created_at')
+        
+        parties = parties_queryset[offset:offset + limit]
+        parties_count = parties_queryset.count()
+        
+        parties_data = []
+        for party in parties:
+            parties_data.append({
+                'id': party.id,
+                'title': party.title,
+                'description': party.description[:200] + '...' if len(party.description) > 200 else party.description,
+                'host': {
+                    'id': party.host.id,
+                    'name': party.host.get_full_name(),
+                },
+                'is_public': True,
+                'is_live': party.status == 'live',
+                'participant_count': party.active_participants,
+                'max_participants': party.max_participants,
+                'created_at': party.created_at,
+                'scheduled_start': party.scheduled_start,
+            })
+        
+        return {
+            'items': parties_data,
+            'count': parties_count,
+            'has_more': parties_count > offset + limit
+        }
     
     def get_client_ip(self, request):
         """Get client IP address"""
@@ -699,118 +745,34 @@ class DiscoverContentView(APIView):
     @extend_schema(summary="DiscoverContentView GET")
     def get(self, request):
         """Get personalized content recommendations"""
+        # Candidate pools are materialized by the refresh_discovery_feed task;
+        # per request we only filter and sample from them
         user = request.user
-        
-        # Get models
-        Video = apps.get_model('videos', 'Video')
-        WatchParty = apps.get_model('parties', 'WatchParty')
-        User = apps.get_model('authentication', 'User')
-        
-        # Get trending videos (most viewed recently)
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        one_week_ago = timezone.now() - timedelta(days=7)
-        
-        trending_videos = Video.objects.filter(
-            is_active=True,
-            created_at__gte=one_week_ago
-        ).order_by('-view_count', '-created_at')[:8]
-        
-        # Get active parties
-        active_parties = WatchParty.objects.filter(
-            is_active=True,
-            is_public=True
-        ).order_by('-created_at')[:6]
-        
-        # Get suggested users (random for now, could be based on mutual friends/interests)
-        suggested_users = User.objects.filter(
-            is_active=True
-        ).exclude(id=user.id).order_by('?')[:8]
-        
-        # Get featured content (recent uploads from popular creators)
-        featured_videos = Video.objects.filter(
-            is_active=True
-        ).select_related('uploaded_by').order_by('-created_at')[:6]
-        
-        # Serialize data
-        trending_videos_data = []
-        for video in trending_videos:
-            trending_videos_data.append({
-                'id': video.id,
-                'title': video.title,
-                'description': video.description[:150] + '...' if len(video.description) > 150 else video.description,
-                'thumbnail': video.thumbnail.url if video.thumbnail else None,
-                'duration': video.duration,
-                'uploaded_by': {
-                    'id': video.uploaded_by.id,
-                    'username': video.uploaded_by.username,
-                    'name': video.uploaded_by.get_full_name(),
-                },
-                'views': getattr(video, 'view_count', 0),
-                'created_at': video.created_at,
-            })
-        
-        active_parties_data = []
-        for party in active_parties:
-            active_parties_data.append({
-                'id': party.id,
-                'title': party.title,
-                'description': party.description[:150] + '...' if len(party.description) > 150 else party.description,
-                'host': {
-                    'id': party.host.id,
-                    'username': party.host.username,
-                    'name': party.host.get_full_name(),
-                },
-                'participant_count': party.participants.filter(is_active=True).count(),
-                'is_live': party.is_active,
-                'created_at': party.created_at,
-            })
-        
-        suggested_users_data = []
-        for suggested_user in suggested_users:
-            suggested_users_data.append({
-                'id': suggested_user.id,
-                'username': suggested_user.username,
-                'name': suggested_user.get_full_name(),
-                'profile_picture': suggested_user.profile_picture.url if suggested_user.profile_picture else None,
-                'is_online': getattr(suggested_user, 'is_online', False),
-            })
-        
-        featured_videos_data = []
-        for video in featured_videos:
-            featured_videos_data.append({
-                'id': video.id,
-                'title': video.title,
-                'description': video.description[:150] + '...' if len(video.description) > 150 else video.description,
-                'thumbnail': video.thumbnail.url if video.thumbnail else None,
-                'duration': video.duration,
-                'uploaded_by': {
-                    'id': video.uploaded_by.id,
-                    'username': video.uploaded_by.username,
-                    'name': video.uploaded_by.get_full_name(),
-                },
-                'created_at': video.created_at,
-            })
+        feed = personalize_discovery_feed(
+            get_discovery_feed(),
+            user,
+            exclude_user_ids=friend_graph.get_friend_ids(user.id),
+            ranked_users=people_you_may_know(user, limit=SUGGESTED_USERS_SECTION_SIZE),
+        )
         
         return StandardResponse.success(
             data={
                 'sections': {
                     'trending_videos': {
                         'title': 'Trending This Week',
-                        'items': trending_videos_data,
+                        'items': feed['trending_videos'],
                     },
                     'active_parties': {
                         'title': 'Live Watch Parties',
-                        'items': active_parties_data,
+                        'items': feed['active_parties'],
                     },
                     'suggested_users': {
                         'title': 'People You Might Know',
-                        'items': suggested_users_data,
+                        'items': feed['suggested_users'],
                     },
                     'featured_videos': {
                         'title': 'Recently Added',
-                        'items': featured_videos_data,
+                        'items': feed['featured_videos'],
                     },
                 }
             },
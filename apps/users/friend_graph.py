@@ -0,0 +1,335 @@
+"""
+Friend graph adjacency cache
+
+Keeps each user's accepted-friend ID set in Redis sets (or the Django cache
+when Redis isn't the cache backend) so visibility filters, membership
+checks and mutual-friend lookups never scan Friendship rows per request.
+Sets are loaded lazily from the database once and then kept current by the
+Friendship signal handlers in ``apps.users.signals``.
+
+A load reads the database and then writes the set, so a friendship that
+commits in between could be lost to a stale write. Each load therefore
+takes a lease first; any change to the user's edges revokes it, and the
+loaded set is only stored if the lease survived and nothing else stored
+the set meanwhile.
+"""
+
+import logging
+import uuid
+
+from django.core.cache import cache
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+FRIEND_GRAPH_KEY_PREFIX = 'friend_graph:v1'
+FRIEND_GRAPH_TTL = 24 * 3600
+FRIEND_GRAPH_LEASE_TTL = 60
+
+# Marks a set as loaded so "no friends" is distinguishable from "not cached"
+_LOADED_SENTINEL = '__loaded__'
+
+
+def _key(user_id):
+    return f"{FRIEND_GRAPH_KEY_PREFIX}:{user_id}"
+
+
+def _lease_key(user_id):
+    return f"{FRIEND_GRAPH_KEY_PREFIX}:lease:{user_id}"
+
+
+def _decode(members):
+    members = {member.decode() if isinstance(member, bytes) else member for member in members}
+    members.discard(_LOADED_SENTINEL)
+    return members
+
+
+def load_friend_ids_from_db(user_ids):
+    """Read accepted friends for several users from the Friendship table in one query"""
+    from apps.users.models import Friendship
+
+    user_ids = {str(user_id) for user_id in user_ids}
+    rows = Friendship.objects.filter(
+        Q(from_user_id__in=user_ids) | Q(to_user_id__in=user_ids),
+        status='accepted',
+    ).values_list('from_user_id', 'to_user_id')
+
+    friend_ids = {user_id: set() for user_id in user_ids}
+    for from_id, to_id in rows:
+        from_id, to_id = str(from_id), str(to_id)
+        if from_id in friend_ids:
+            friend_ids[from_id].add(to_id)
+        if to_id in friend_ids:
+            friend_ids[to_id].add(from_id)
+    return friend_ids
+
+
+def load_excluded_ids_from_db(user_ids):
+    """Users with a pending or blocked relationship to each of ``user_ids``"""
+    from apps.users.models import Friendship
+
+    user_ids = {str(user_id) for user_id in user_ids}
+    rows = Friendship.objects.filter(
+        Q(from_user_id__in=user_ids) | Q(to_user_id__in=user_ids),
+    ).exclude(status='accepted').values_list('from_user_id', 'to_user_id')
+
+    excluded = {user_id: set() for user_id in user_ids}
+    for from_id, to_id in rows:
+        from_id, to_id = str(from_id), str(to_id)
+        if from_id in excluded:
+            excluded[from_id].add(to_id)
+        if to_id in excluded:
+            excluded[to_id].add(from_id)
+    return excluded
+
+
+# KEYS: set, lease. ARGV: token, ttl, sentinel, friend ids...
+# Stores the set only while the lease is still ours and no set exists yet
+_PUT_SCRIPT = """
+local holder = redis.call('get', KEYS[2])
+if holder ~= ARGV[1] then
+    return 0
+end
+redis.call('del', KEYS[2])
+if redis.call('exists', KEYS[1]) == 1 then
+    return 0
+end
+for i = 3, #ARGV, 1000 do
+    redis.call('sadd', KEYS[1], unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+redis.call('expire', KEYS[1], ARGV[2])
+return 1
+"""
+
+# KEYS: set, lease. ARGV: friend id
+# Only extends loaded sets (cold ones load in full later) and revokes any in-flight load
+_ADD_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    redis.call('sadd', KEYS[1], ARGV[1])
+end
+redis.call('del', KEYS[2])
+return 1
+"""
+
+
+class RedisFriendGraphStore:
+    """Adjacency sets stored as native Redis sets"""
+
+    def __init__(self, connection, ttl=FRIEND_GRAPH_TTL):
+        self.connection = connection
+        self.ttl = ttl
+        self._put_script = connection.register_script(_PUT_SCRIPT)
+        self._add_script = connection.register_script(_ADD_SCRIPT)
+
+    def get(self, user_id):
+        members = self.connection.smembers(_key(user_id))
+        return _decode(members) if members else None
+
+    def get_many(self, user_ids):
+        pipe = self.connection.pipeline()
+        for user_id in user_ids:
+            pipe.smembers(_key(user_id))
+        return {
+            str(user_id): _decode(members)
+            for user_id, members in zip(user_ids, pipe.execute())
+            if members
+        }
+
+    def lease_many(self, user_ids):
+        """Start loads for ``user_ids``; returns ``{user_id: token}`` for ``put``"""
+        tokens = {str(user_id): uuid.uuid4().hex for user_id in user_ids}
+        pipe = self.connection.pipeline()
+        for user_id, token in tokens.items():
+            pipe.set(_lease_key(user_id), token, ex=FRIEND_GRAPH_LEASE_TTL)
+        pipe.execute()
+        return tokens
+
+    def put(self, user_id, friend_ids, token):
+        """Store a loaded set unless the lease was revoked; returns whether it was stored"""
+        return bool(self._put_script(
+            keys=[_key(user_id), _lease_key(user_id)],
+            args=[token, self.ttl, _LOADED_SENTINEL, *(str(friend_id) for friend_id in friend_ids)],
+        ))
+
+    def add(self, user_id, friend_id):
+        self._add_script(keys=[_key(user_id), _lease_key(user_id)], args=[str(friend_id)])
+
+    def remove(self, user_id, friend_id):
+        pipe = self.connection.pipeline()
+        pipe.srem(_key(user_id), str(friend_id))
+        pipe.delete(_lease_key(user_id))
+        pipe.execute()
+
+    def delete(self, user_id):
+        self.connection.delete(_key(user_id), _lease_key(user_id))
+
+
+class CacheFriendGraphStore:
+    """Adjacency sets stored as compact sorted ID lists in the Django cache"""
+
+    def __init__(self, backend=None, ttl=FRIEND_GRAPH_TTL):
+        self.backend = backend or cache
+        self.ttl = ttl
+
+    def get(self, user_id):
+        friend_ids = self.backend.get(_key(user_id))
+        return None if friend_ids is None else set(friend_ids)
+
+    def get_many(self, user_ids):
+        keys = {_key(user_id): str(user_id) for user_id in user_ids}
+        return {
+            keys[key]: set(friend_ids)
+            for key, friend_ids in self.backend.get_many(list(keys)).items()
+        }
+
+    def lease_many(self, user_ids):
+        tokens = {str(user_id): uuid.uuid4().hex for user_id in user_ids}
+        self.backend.set_many(
+            {_lease_key(user_id): token for user_id, token in tokens.items()}, FRIEND_GRAPH_LEASE_TTL
+        )
+        return tokens
+
+    def put(self, user_id, friend_ids, token):
+        # Best effort: the cache has no compare-and-set, but a revoked lease
+        # or an existing set still wins over this load
+        if self.backend.get(_lease_key(user_id)) != token:
+            return False
+        self.backend.delete(_lease_key(user_id))
+        return self.backend.add(_key(user_id), sorted(friend_ids), self.ttl)
+
+    def _update(self, user_id, change):
+        self.backend.delete(_lease_key(user_id))
+        friend_ids = self.get(user_id)
+        if friend_ids is not None:
+            change(friend_ids)
+            self.backend.set(_key(user_id), sorted(friend_ids), self.ttl)
+
+    def add(self, user_id, friend_id):
+        self._update(user_id, lambda friend_ids: friend_ids.add(str(friend_id)))
+
+    def remove(self, user_id, friend_id):
+        self._update(user_id, lambda friend_ids: friend_ids.discard(str(friend_id)))
+
+    def delete(self, user_id):
+        self.backend.delete_many([_key(user_id), _lease_key(user_id)])
+
+
+def _default_store():
+    try:
+        from django_redis import get_redis_connection
+
+        return RedisFriendGraphStore(get_redis_connection('default'))
+    except (ImportError, NotImplementedError):
+        # Non-redis cache backend (local development, tests)
+        return CacheFriendGraphStore()
+
+
+class FriendGraph:
+    """Read and maintain the accepted-friend adjacency sets"""
+
+    def __init__(self, store=None, loader=load_friend_ids_from_db,
+                 exclusion_loader=load_excluded_ids_from_db):
+        self._store = store
+        self.loader = loader
+        self.exclusion_loader = exclusion_loader
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = _default_store()
+        return self._store
+
+    def _load(self, user_ids):
+        """Read cold sets from the database and store those no change raced with"""
+        tokens = self.store.lease_many(user_ids)
+        loaded = self.loader(user_ids)
+        for user_id, friend_ids in loaded.items():
+            self.store.put(user_id, friend_ids, tokens[user_id])
+        return loaded
+
+    def _ensure_loaded(self, user_id):
+        friend_ids = self.store.get(user_id)
+        if friend_ids is None:
+            friend_ids = self._load([str(user_id)])[str(user_id)]
+        return friend_ids
+
+    def get_friend_ids(self, user_id):
+        """Return the set of accepted-friend IDs (as strings) for ``user_id``"""
+        return set(self._ensure_loaded(user_id))
+
+    def get_friend_ids_many(self, user_ids):
+        """
+        Return ``{user_id: friend_ids}`` for several users with one cache
+        round trip and at most one Friendship query for the cold ones.
+        """
+        user_ids = list({str(user_id) for user_id in user_ids})
+        found = self.store.get_many(user_ids)
+        missing = [user_id for user_id in user_ids if user_id not in found]
+        if missing:
+            found.update(self._load(missing))
+        return found
+
+    def friend_count(self, user_id):
+        return len(self._ensure_loaded(user_id))
+
+    def are_friends(self, user_id, other_id):
+        # Answer from the loaded set: a load that lost its lease isn't stored
+        return str(other_id) in self._ensure_loaded(user_id)
+
+    def mutual_friend_ids(self, user_id, other_id):
+        adjacency = self.get_friend_ids_many([user_id, other_id])
+        return adjacency[str(user_id)] & adjacency[str(other_id)]
+
+    def mutual_friend_counts(self, user_id, other_ids):
+        """Return ``{other_id: shared friend count}`` for many users in one pass"""
+        adjacency = self.get_friend_ids_many([user_id, *other_ids])
+        own = adjacency[str(user_id)]
+        return {str(other_id): len(own & adjacency[str(other_id)]) for other_id in other_ids}
+
+    def suggest_friends(self, user_id, limit=10):
+        """
+        Friend-of-friend suggestions ranked by shared-friend count, as a
+        list of ``(user_id, mutual_count)``.
+        """
+        return self.suggest_friends_many([user_id], limit=limit)[str(user_id)]
+
+    def suggest_friends_many(self, user_ids, limit=10, excluded=None):
+        """
+        Batched friend-of-friend suggestions. Adjacency for every user and
+        all of their friends is fetched in two batched lookups, and pending
+        or blocked relationships come from a single query unless the caller
+        already has them in ``excluded``.
+        """
+        user_ids = [str(user_id) for user_id in user_ids]
+        adjacency = self.get_friend_ids_many(user_ids)
+        second_hop = set().union(*adjacency.values()) - set(adjacency)
+        adjacency.update(self.get_friend_ids_many(second_hop) if second_hop else {})
+        if excluded is None:
+            excluded = self.exclusion_loader(user_ids)
+
+        suggestions = {}
+        for user_id in user_ids:
+            friends = adjacency[user_id]
+            skip = friends | excluded.get(user_id, set()) | {user_id}
+            counts = {}
+            for friend_id in friends:
+                for candidate in adjacency.get(friend_id, ()):
+                    if candidate not in skip:
+                        counts[candidate] = counts.get(candidate, 0) + 1
+            ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            suggestions[user_id] = ranked[:limit]
+        return suggestions
+
+    def add_friendship(self, user_id, other_id):
+        self.store.add(user_id, other_id)
+        self.store.add(other_id, user_id)
+
+    def remove_friendship(self, user_id, other_id):
+        self.store.remove(user_id, other_id)
+        self.store.remove(other_id, user_id)
+
+    def invalidate(self, user_id):
+        self.store.delete(user_id)
+
+
+friend_graph = FriendGraph()
@@ -0,0 +1,28 @@
+"""
+Users signals
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .friend_graph import friend_graph
+from .models import Friendship
+
+
+@receiver(post_save, sender=Friendship)
+def update_friend_graph_on_save(sender, instance, **kwargs):
+    """Keep the friend graph in step with accept/block transitions"""
+    from_user_id, to_user_id = instance.from_user_id, instance.to_user_id
+    if instance.status == 'accepted':
+        transaction.on_commit(lambda: friend_graph.add_friendship(from_user_id, to_user_id))
+    else:
+        # pending/blocked rows are never friends; covers accepted -> blocked
+        transaction.on_commit(lambda: friend_graph.remove_friendship(from_user_id, to_user_id))
+
+
+@receiver(post_delete, sender=Friendship)
+def update_friend_graph_on_delete(sender, instance, **kwargs):
+    """Drop the edge when a friendship is removed or declined"""
+    from_user_id, to_user_id = instance.from_user_id, instance.to_user_id
+    transaction.on_commit(lambda: friend_graph.remove_friendship(from_user_id, to_user_id))
@@ -0,0 +1,72 @@
+"""
+"People you may know" built on friend graph ID sets
+"""
+
+from django.contrib.auth import get_user_model
+
+from .friend_graph import friend_graph
+
+User = get_user_model()
+
+
+def _user_card(user, mutual_friends):
+    return {
+        'id': str(user.id),
+        'name': user.full_name,
+        'profile_picture': user.profile_picture.url if user.profile_picture else None,
+        'is_online': user.is_online,
+        'mutual_friends': mutual_friends,
+    }
+
+
+def _hydrate(ranked):
+    """Turn ``[(user_id, mutual_count)]`` into user cards with one query, keeping rank order"""
+    if not ranked:
+        return []
+    users = User.objects.filter(id__in=[user_id for user_id, _ in ranked], is_active=True).only(
+        'id', 'first_name', 'last_name', 'profile_picture', 'is_online'
+    )
+    users_by_id = {str(user.id): user for user in users}
+    return [
+        _user_card(users_by_id[user_id], mutual_count)
+        for user_id, mutual_count in ranked
+        if user_id in users_by_id
+    ]
+
+
+def people_you_may_know(user, limit=10, fallback_pool=()):
+    """
+    Friend-of-friend suggestions ranked by shared-friend count, topped up
+    from ``fallback_pool`` (compact user dicts, e.g. the discovery feed's
+    suggestion pool) when the user's second-degree network is too small.
+    """
+    return people_you_may_know_many([user], limit=limit, fallback_pool=fallback_pool)[str(user.id)]
+
+
+def people_you_may_know_many(users, limit=10, fallback_pool=()):
+    """Batched variant: one graph pass and one user query for all of ``users``"""
+    user_ids = [str(user.id) for user in users]
+    excluded = friend_graph.exclusion_loader(user_ids)
+    ranked = friend_graph.suggest_friends_many(user_ids, limit=limit, excluded=excluded)
+    friend_ids = friend_graph.get_friend_ids_many(user_ids)
+
+    cards = {card['id']: card for card in _hydrate(
+        [item for suggestions in ranked.values() for item in suggestions]
+    )}
+
+    results = {}
+    for user_id in user_ids:
+        suggested = [
+            {**cards[candidate_id], 'mutual_friends': mutual_count}
+            for candidate_id, mutual_count in ranked[user_id]
+            if candidate_id in cards
+        ]
+        if len(suggested) < limit:
+            skip = {user_id, *friend_ids[user_id], *excluded[user_id], *(card['id'] for card in suggested)}
+            suggested.extend(
+                {**candidate, 'mutual_friends': 0}
+                for candidate in fallback_pool
+                if candidate['id'] not in skip
+            )
+        results[user_id] = suggested[:limit]
+    return results
@@ -28,6 +28,7 @@ urlpatterns = [
     path('password/', views.UpdatePasswordView.as_view(), name='update_password'),
     path('inventory/', views.UserInventoryView.as_view(), name='inventory'),
     path('friends/suggestions/', views.FriendSuggestionsView.as_view(), name='friend_suggestions'),
+    path('friends/mutual-counts/', views.MutualFriendCountsView.as_view(), name='mutual_friend_counts'),
     path('friends/requests/', views.FriendRequestsView.as_view(), name='friend_requests'),
     path('friends/<str:request_id>/accept/', views.AcceptFriendRequestView.as_view(), name='accept_friend_request'),
     path('friends/<str:request_id>/decline/', views.DeclineFriendRequestView.as_view(), name='decline_friend_request'),
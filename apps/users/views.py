@@ -2,6 +2,8 @@
 User views for Watch Party Backend
 """
 
+import uuid
+
 from rest_framework import status, permissions, generics
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -11,12 +13,15 @@ from django.utils import timezone
 from drf_spectacular.utils import extend_schema
 from shared.serializers import DataResponseSerializer, MessageResponseSerializer
 
+from apps.search.discovery import get_discovery_feed
+from .friend_graph import friend_graph
 from .models import Friendship, UserActivity, UserSettings
 from .serializers import (
     UserSerializer, UserProfileSerializer, FriendshipSerializer,
     SendFriendRequestSerializer, UserActivitySerializer, UserSettingsSerializer,
     UserSearchSerializer
 )
+from .suggestions import people_you_may_know
 
 User = get_user_model()
 
@@ -35,9 +40,7 @@ class DashboardStatsView(generics.GenericAPIView):
         user = request.user
         
         # Get basic stats
-        friends_count = Friendship.objects.filter(
-            (Q(from_user=user) | Q(to_user=user)) & Q(status='accepted')
-        ).count()
+        friends_count = friend_graph.friend_count(user.id)
         
         # Import here to avoid circular imports
         from apps.videos.models import Video
@@ -441,10 +444,7 @@ class PublicProfileView(APIView):
                 profile_data.update({
                     'bio': getattr(user, 'bio', ''),
                     'location': getattr(user, 'location', ''),
-                    'friends_count': Friendship.objects.filter(
-                        Q(from_user=user, status='accepted') |
-                        Q(to_user=user, status='accepted')
-                    ).count()
+                    'friends_count': friend_graph.friend_count(user.id)
                 })
             
             return Response({'profile': profile_data})
@@ -846,26 +846,8 @@ class UserMutualFriendsView(APIView):
             other_user = User.objects.get(id=user_id)
             current_user = request.user
             
-            # Get current user's friends
-            current_user_friends = set()
-            current_friendships = Friendship.objects.filter(
-                (Q(from_user=current_user) | Q(to_user=current_user)) & Q(status='accepted')
-            )
-            for friendship in current_friendships:
-                friend = friendship.to_user if friendship.from_user == current_user else friendship.from_user
-                current_user_friends.add(friend.id)
-            
-            # Get other user's friends
-            other_user_friends = set()
-            other_friendships = Friendship.objects.filter(
-                (Q(from_user=other_user) | Q(to_user=other_user)) & Q(status='accepted')
-            )
-            for friendship in other_friendships:
-                friend = friendship.to_user if friendship.from_user == other_user else friendship.from_user
-                other_user_friends.add(friend.id)
-            
-            # Find mutual friends
-            mutual_friend_ids = current_user_friends.intersection(other_user_friends)
+            # Intersect the cached adjacency sets
+            mutual_friend_ids = friend_graph.mutual_friend_ids(current_user.id, other_user.id)
             mutual_friends = User.objects.filter(id__in=mutual_friend_ids)
             
             serializer = UserSerializer(mutual_friends, many=True)
@@ -881,6 +863,34 @@ class UserMutualFriendsView(APIView):
             }, status=status.HTTP_404_NOT_FOUND)
 
 
+class MutualFriendCountsView(APIView):
+    """Mutual friend counts between the current user and many users at once"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @extend_schema(summary="MutualFriendCountsView GET")
+    def get(self, request):
+        user_ids = request.GET.getlist('user_ids')
+        
+        if not user_ids:
+            return Response({
+                'error': 'user_ids parameter is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            user_ids = [str(uuid.UUID(user_id)) for user_id in user_ids[:100]]
+        except ValueError:
+            return Response({
+                'error': 'user_ids must be valid user IDs'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # One batched adjacency read for every listed user
+        counts = friend_graph.mutual_friend_counts(request.user.id, user_ids)
+        
+        return Response({
+            'mutual_friend_counts': counts
+        })
+
+
 class UserOnlineStatusView(APIView):
     """Get online status of users"""
     permission_classes = [permissions.IsAuthenticated]
@@ -999,9 +1009,7 @@ class UserStatsView(APIView):
         parties_joined = WatchParty.objects.filter(participants__user=user).count()
         
         # Friend statistics
-        friends_count = Friendship.objects.filter(
-            (Q(from_user=user) | Q(to_user=user)) & Q(status='accepted')
-        ).count()
+        friends_count = friend_graph.friend_count(user.id)
         
         # Store statistics (if available)
         try:
@@ -1321,33 +1329,13 @@ class FriendSuggestionsView(APIView):
     @extend_schema(summary="FriendSuggestionsView GET")
     def get(self, request):
         """Get friend suggestions"""
-        user = request.user
-        
-        # Get users who are not already friends
-        existing_friends = Friendship.objects.filter(
-            (Q(from_user=user) | Q(to_user=user))
-        ).values_list('from_user_id', 'to_user_id')
-        
-        friend_ids = set()
-        for from_id, to_id in existing_friends:
-            friend_ids.add(from_id)
-            friend_ids.add(to_id)
-        friend_ids.discard(user.id)
-        
-        # Simple suggestion: random users not already friends
-        suggestions = User.objects.filter(
-            is_active=True
-        ).exclude(id__in=friend_ids).exclude(id=user.id)[:10]
-        
-        suggestions_data = []
-        for suggestion in suggestions:
-            suggestions_data.append({
-                'id': suggestion.id,
-                'username': suggestion.username,
-                'name': suggestion.get_full_name(),
-                'profile_picture': suggestion.profile_picture.url if hasattr(suggestion, 'profile_picture') and suggestion.profile_picture else None,
-                'mutual_friends': 0,  # TODO: Calculate mutual friends
-            })
+        # Friends-of-friends ranked by shared friends, topped up from the
+        # materialized discovery pool for users with a small network
+        suggestions_data = people_you_may_know(
+            request.user,
+            limit=10,
+            fallback_pool=get_discovery_feed()['suggested_users'],
+        )
         
         return Response({
             'success': True,
@@ -1494,8 +1482,17 @@ class BlockUserView(APIView):
                 'message': 'Cannot block yourself'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # TODO: Implement actual user blocking logic
-        # This would typically involve creating a UserBlock model
+        # Blocking ends any friendship; the Friendship signals drop the edge
+        # from the friend graph for both users
+        Friendship.objects.filter(
+            Q(from_user=target_user, to_user=request.user) |
+            Q(from_user=request.user, to_user=target_user)
+        ).exclude(status='blocked').delete()
+        Friendship.objects.get_or_create(
+            from_user=request.user,
+            to_user=target_user,
+            defaults={'status': 'blocked'}
+        )
         
         # Log activity
         UserActivity.objects.create(
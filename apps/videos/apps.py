@@ -5,3 +5,6 @@ from django.apps import AppConfig
 class VideosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.videos'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,216 @@
+"""
+Content-addressed deduplication of processed videos
+
+Uploads are keyed by the SHA-256 of their bytes. The first video with a
+given hash owns a ``VideoAsset`` and runs the full pipeline; every later
+upload of the same content is linked to the asset's renditions, thumbnail
+and manifests instead of being transcoded again, and its own copy of the
+source is dropped. ``VideoAsset.reference_count`` tracks the linked videos
+and the shared files are only deleted when the last one goes.
+"""
+
+import logging
+import posixpath
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from shared.observability import observability
+
+from .models import Video, VideoAsset, VideoProcessing
+from .packaging import processed_prefix, stream_prefix
+
+logger = logging.getLogger(__name__)
+
+# claim_asset() outcomes
+LINKED = 'linked'
+WAITING = 'waiting'
+OWNER = 'owner'
+
+
+def claim_asset(video: Video, content_hash: str) -> str:
+    """
+    Attach ``video`` to the asset for ``content_hash``, creating it if needed.
+    Returns ``LINKED`` when processed output already exists (the video is now
+    ready), ``WAITING`` when another video is producing it (the video is
+    linked once that finishes), or ``OWNER`` when this video should run the
+    pipeline itself.
+    """
+    try:
+        VideoAsset.objects.get_or_create(content_hash=content_hash, defaults={'file_size': video.file_size})
+    except IntegrityError:
+        pass  # created concurrently; the locked read below picks it up
+
+    with transaction.atomic():
+        asset = VideoAsset.objects.select_for_update().get(content_hash=content_hash)
+        if video.asset_id != asset.id:
+            VideoAsset.objects.filter(id=asset.id).update(reference_count=F('reference_count') + 1)
+            video.asset = asset
+            video.content_hash = content_hash
+            video.save(update_fields=['asset', 'content_hash', 'updated_at'])
+
+        if asset.status == 'ready':
+            link_video(video, asset)
+            result = LINKED
+        elif asset.status == 'processing' and asset.owner_id and asset.owner_id != video.id:
+            result = WAITING
+        else:
+            asset.owner = video
+            asset.status = 'processing'
+            asset.save(update_fields=['owner', 'status', 'updated_at'])
+            result = OWNER
+
+    observability.record_metric('video.dedup.claim', 1, tags={'result': result})
+    return result
+
+
+def link_video(video: Video, asset: VideoAsset) -> None:
+    """Point ``video`` at the asset's processed files and mark it ready"""
+    duplicate_name = video.file.name if video.file else ''
+    metadata = asset.metadata or {}
+
+    video.file.name = asset.source_name
+    video.thumbnail.name = asset.thumbnail_name or None
+    video.streaming_manifest = asset.streaming_manifest
+    video.file_size = asset.file_size
+    video.resolution = metadata.get('resolution', '')
+    video.codec = metadata.get('codec', '')
+    video.bitrate = metadata.get('bitrate')
+    video.fps = metadata.get('fps')
+    if metadata.get('duration') is not None:
+        video.duration = timedelta(seconds=metadata['duration'])
+    video.status = 'ready'
+    video.save()
+
+    now = timezone.now()
+    VideoProcessing.objects.update_or_create(video=video, defaults={
+        'status': 'completed',
+        'progress_percentage': 100,
+        'metadata_extracted': True,
+        'thumbnail_generated': bool(asset.thumbnail_name),
+        'resolutions_generated': metadata.get('renditions', []),
+        'processing_completed_at': now,
+        'error_message': '',
+    })
+
+    # The duplicate upload is never read again
+    if duplicate_name and duplicate_name != asset.source_name:
+        transaction.on_commit(lambda: _delete_names([duplicate_name]))
+
+
+def publish_asset(video_id, artifact_names=(), renditions=()) -> int:
+    """
+    Record the owner's processed output on its asset and link every video
+    waiting on it. Returns how many waiting videos were linked.
+    """
+    with transaction.atomic():
+        video = Video.objects.select_related('asset').get(id=video_id)
+        if not video.asset_id:
+            return 0
+        asset = VideoAsset.objects.select_for_update().get(id=video.asset_id)
+
+        asset.source_name = video.file.name if video.file else ''
+        asset.thumbnail_name = video.thumbnail.name if video.thumbnail else ''
+        asset.streaming_manifest = video.streaming_manifest or {}
+        asset.stream_prefix = stream_prefix(video.id)
+        asset.artifact_names = _owned_names(video.id, artifact_names)
+        asset.file_size = video.file_size
+        asset.metadata = {
+            'duration': video.duration.total_seconds() if video.duration else None,
+            'resolution': video.resolution,
+            'codec': video.codec,
+            'bitrate': video.bitrate,
+            'fps': video.fps,
+            'renditions': list(renditions),
+        }
+        asset.owner = video
+        asset.status = 'ready'
+        asset.save()
+
+        waiting = Video.objects.filter(asset=asset, status='processing').exclude(id=video.id)
+        linked = 0
+        for other in waiting:
+            link_video(other, asset)
+            linked += 1
+
+    if linked:
+        observability.record_metric('video.dedup.claim', linked, tags={'result': LINKED})
+    return linked
+
+
+def abandon_asset(video_id) -> None:
+    """
+    The owner's pipeline failed for good: release ownership and restart one
+    waiting video so it can produce the asset instead.
+    """
+    from .tasks import start_video_processing
+
+    with transaction.atomic():
+        asset = VideoAsset.objects.select_for_update().filter(owner_id=video_id, status='processing').first()
+        if asset is None:
+            return
+        asset.owner = None
+        asset.status = 'failed'
+        asset.save(update_fields=['owner', 'status', 'updated_at'])
+        successor = Video.objects.filter(asset=asset, status='processing').exclude(id=video_id).first()
+        if successor:
+            successor_id = str(successor.id)
+            transaction.on_commit(lambda: start_video_processing.delay(successor_id))
+
+
+def release_asset(asset_id) -> bool:
+    """
+    Drop one reference to an asset; the last reference deletes the asset and
+    its shared files. Returns True when the asset was deleted.
+    """
+    with transaction.atomic():
+        asset = VideoAsset.objects.select_for_update().filter(id=asset_id).first()
+        if asset is None:
+            return False
+        if asset.reference_count > 1:
+            VideoAsset.objects.filter(id=asset_id).update(reference_count=F('reference_count') - 1)
+            return False
+
+        names = [asset.source_name, asset.thumbnail_name, *asset.artifact_names]
+        names += _list_prefix(asset.stream_prefix)
+        asset.delete()
+        transaction.on_commit(lambda: _delete_names(names))
+
+    observability.record_metric('video.dedup.asset_deleted', 1)
+    return True
+
+
+def _owned_names(video_id, names):
+    """
+    The names under prefixes only ``video_id`` writes to. Releasing the
+    asset deletes its artifacts, so a name another video could share is
+    never recorded.
+    """
+    owned = (f"{processed_prefix(video_id)}/", f"{stream_prefix(video_id)}/")
+    kept = sorted({name for name in names if name.startswith(owned)})
+    if len(kept) != len(set(names)):
+        logger.warning(f"Not recording artifacts outside video {video_id}'s prefixes")
+    return kept
+
+
+def _list_prefix(prefix):
+    if not prefix or not default_storage.exists(prefix):
+        return []
+    directories, files = default_storage.listdir(prefix)
+    names = [posixpath.join(prefix, name) for name in files]
+    for directory in directories:
+        names += _list_prefix(posixpath.join(prefix, directory))
+    return names
+
+
+def _delete_names(names) -> None:
+    for name in names:
+        if not name:
+            continue
+        try:
+            default_storage.delete(name)
+        except Exception as e:
+            logger.error(f"Could not delete shared video file {name}: {str(e)}")
@@ -0,0 +1,316 @@
+"""
+Google Drive streaming proxy
+
+Viewers' byte ranges are mapped onto fixed, aligned chunks. Chunks are
+fetched through one pooled HTTP session, kept in a shared on-disk LRU cache
+keyed by (file_id, chunk), and concurrent requests for the same chunk wait
+on a single upstream fetch, so a party of 50 viewers costs Drive one read
+per chunk instead of 50.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from shared.observability import observability
+
+from .range_streaming import RangeNotSatisfiable, parse_range_header
+
+logger = logging.getLogger(__name__)
+
+DRIVE_PROXY_CHUNK_SIZE = getattr(settings, 'DRIVE_PROXY_CHUNK_SIZE', 1024 * 1024)
+DRIVE_PROXY_POOL_SIZE = getattr(settings, 'DRIVE_PROXY_POOL_SIZE', 32)
+DRIVE_PROXY_TIMEOUT = getattr(settings, 'DRIVE_PROXY_TIMEOUT', (5, 30))  # (connect, read) seconds
+DRIVE_PROXY_CACHE_DIR = (
+    getattr(settings, 'DRIVE_PROXY_CACHE_DIR', '')
+    or os.path.join(tempfile.gettempdir(), 'watchparty-drive-cache')
+)
+DRIVE_PROXY_CACHE_MAX_BYTES = getattr(settings, 'DRIVE_PROXY_CACHE_MAX_BYTES', 2 * 1024 ** 3)
+DRIVE_PROXY_META_TTL = 24 * 3600
+DRIVE_PROXY_LOCK_TIMEOUT = 30
+DRIVE_PROXY_WAIT_TIMEOUT = 10.0
+
+_CONTENT_RANGE_RE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+
+
+class DriveProxyError(Exception):
+    """Upstream fetch failed"""
+
+
+def drive_media_url(file_id):
+    """Same URL as ``GoogleDriveService.get_download_url`` without building a client"""
+    return f'https://www.googleapis.com/drive/v3/files/{file_id}?alt=media'
+
+
+def _build_session():
+    session = requests.Session()
+    retry = Retry(
+        total=2,
+        backoff_factor=0.2,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=DRIVE_PROXY_POOL_SIZE, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# Shared across requests so TLS connections to Drive are reused
+http_session = _build_session()
+
+
+def _read_head(response, size):
+    """The first ``size`` bytes of a streamed body, leaving the rest unread"""
+    data = bytearray()
+    for block in response.iter_content(chunk_size=64 * 1024):
+        data += block
+        if len(data) >= size:
+            break
+    return bytes(data[:size])
+
+
+def http_fetch(url, start, end, headers):
+    """Fetch bytes ``start``-``end`` (inclusive); returns ``(data, total_size, content_type)``"""
+    response = http_session.get(
+        url,
+        headers={**headers, 'Range': f'bytes={start}-{end}'},
+        timeout=DRIVE_PROXY_TIMEOUT,
+        stream=True,
+    )
+    with response:
+        if response.status_code not in (200, 206):
+            raise DriveProxyError(f"Drive returned {response.status_code}")
+
+        content_type = response.headers.get('Content-Type', 'video/mp4')
+        if response.status_code == 206:
+            match = _CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+            total = int(match.group(3)) if match and match.group(3) != '*' else None
+            return response.content, total, content_type
+
+        # Upstream ignored the range. Reading up to a later chunk would pull
+        # the whole prefix again for every chunk, so only the first is served
+        if start > 0:
+            raise DriveProxyError("Drive ignored the Range header")
+        length = response.headers.get('Content-Length')
+        return _read_head(response, end + 1), int(length) if length and length.isdigit() else None, content_type
+
+
+class ChunkCache:
+    """
+    On-disk LRU of fixed-size chunks shared by every worker on the host.
+    Recency is the file mtime (touched on hit); eviction sweeps run after
+    enough new bytes have been written.
+    """
+
+    def __init__(self, directory=DRIVE_PROXY_CACHE_DIR, max_bytes=DRIVE_PROXY_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._written_since_sweep = 0
+        self._lock = threading.Lock()
+
+    def _path(self, file_id, index):
+        digest = hashlib.sha1(file_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest, f"{index}.chunk")
+
+    def get(self, file_id, index):
+        path = self._path(file_id, index)
+        try:
+            with open(path, 'rb') as chunk_file:
+                data = chunk_file.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, file_id, index, data):
+        path = self._path(file_id, index)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so readers never see a partial chunk
+        handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(handle, 'wb') as chunk_file:
+            chunk_file.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._written_since_sweep += len(data)
+            should_sweep = self._written_since_sweep >= self.max_bytes // 20
+            if should_sweep:
+                self._written_since_sweep = 0
+        if should_sweep:
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used chunks until the cache is under 90% of its budget"""
+        entries = []
+        total = 0
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.chunk'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        target = int(self.max_bytes * 0.9)
+        for _mtime, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+class DriveProxy:
+    """Serve byte ranges of Drive files from cached, coalesced chunks"""
+
+    def __init__(self, chunk_cache=None, fetch=http_fetch, chunk_size=DRIVE_PROXY_CHUNK_SIZE, meta_cache=None):
+        self.chunk_cache = chunk_cache or ChunkCache()
+        self.fetch = fetch
+        self.chunk_size = chunk_size
+        self.meta_cache = meta_cache or cache
+        self._inflight: Dict[Tuple[str, int], Future] = {}
+        self._inflight_lock = threading.Lock()
+
+    def _meta_key(self, file_id):
+        return f"drive_proxy:meta:{file_id}"
+
+    def get_meta(self, file_id):
+        return self.meta_cache.get(self._meta_key(file_id))
+
+    def _set_meta(self, file_id, size, content_type):
+        if size is not None:
+            self.meta_cache.set(
+                self._meta_key(file_id), {'size': size, 'content_type': content_type}, DRIVE_PROXY_META_TTL
+            )
+
+    def _fetch_upstream(self, file_id, index, url, auth_headers):
+        start = index * self.chunk_size
+        end = start + self.chunk_size - 1
+        data, total, content_type = self.fetch(url, start, end, auth_headers())
+        self._set_meta(file_id, total, content_type)
+        self.chunk_cache.put(file_id, index, data)
+        return data
+
+    def _wait_for_other_worker(self, file_id, index):
+        deadline = time.monotonic() + DRIVE_PROXY_WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            data = self.chunk_cache.get(file_id, index)
+            if data is not None:
+                return data
+        return None
+
+    def get_chunk(self, file_id, index, url, auth_headers: Callable[[], Dict[str, str]]):
+        """
+        Return chunk ``index`` of ``file_id``. Concurrent callers in this
+        process share one in-flight fetch; other processes are serialized by
+        a cache lock and pick the chunk up from disk.
+        """
+        data = self.chunk_cache.get(file_id, index)
+        if data is not None:
+            observability.record_metric('video.drive_proxy.chunk', 1, tags={'result': 'hit'})
+            return data
+
+        key = (file_id, index)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            observability.record_metric('video.drive_proxy.chunk', 1, tags={'result': 'coalesced'})
+            return future.result(timeout=DRIVE_PROXY_WAIT_TIMEOUT + DRIVE_PROXY_TIMEOUT[1])
+
+        try:
+            lock_key = f"drive_proxy:lock:{file_id}:{index}"
+            data = None
+            locked = self.meta_cache.add(lock_key, 1, DRIVE_PROXY_LOCK_TIMEOUT)
+            if not locked:
+                data = self._wait_for_other_worker(file_id, index)
+                result = 'coalesced'
+            if data is None:
+                if not locked:
+                    # The other worker is slow or gone; take the lock over if it has expired
+                    locked = self.meta_cache.add(lock_key, 1, DRIVE_PROXY_LOCK_TIMEOUT)
+                try:
+                    data = self._fetch_upstream(file_id, index, url, auth_headers)
+                finally:
+                    # Only the holder frees the lock; a waiter that gave up must not
+                    if locked:
+                        self.meta_cache.delete(lock_key)
+                result = 'miss'
+            observability.record_metric('video.drive_proxy.chunk', 1, tags={'result': result})
+            future.set_result(data)
+            return data
+        except Exception as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def open_range(self, file_id, url, auth_headers, range_header: Optional[str]):
+        """
+        Resolve ``range_header`` against the file and return
+        ``(status, headers, body_iterator)``. Multiple ranges are coalesced
+        into the single span that covers them.
+        """
+        meta = self.get_meta(file_id)
+        if meta is None:
+            # The first chunk tells us the total size; players need it next anyway
+            self.get_chunk(file_id, 0, url, auth_headers)
+            meta = self.get_meta(file_id)
+            if meta is None:
+                raise DriveProxyError("Drive did not report the file size")
+
+        size = meta['size']
+        ranges = parse_range_header(range_header, size)  # may raise RangeNotSatisfiable
+        headers = {'Accept-Ranges': 'bytes', 'Content-Type': meta['content_type']}
+        if ranges is None:
+            start, end, status = 0, size - 1, 200
+        else:
+            start, end, status = ranges[0][0], ranges[-1][1], 206
+            headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+        headers['Content-Length'] = str(end - start + 1)
+        return status, headers, self._iter_range(file_id, url, auth_headers, start, end)
+
+    def _iter_range(self, file_id, url, auth_headers, start, end) -> Iterator[bytes]:
+        for index in range(start // self.chunk_size, end // self.chunk_size + 1):
+            data = self.get_chunk(file_id, index, url, auth_headers)
+            chunk_start = index * self.chunk_size
+            yield data[max(start - chunk_start, 0):end - chunk_start + 1]
+
+
+drive_proxy = DriveProxy()
+
+__all__ = ['ChunkCache', 'DriveProxy', 'DriveProxyError', 'RangeNotSatisfiable', 'drive_media_url', 'drive_proxy']
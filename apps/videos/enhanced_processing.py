@@ -3,17 +3,28 @@ Enhanced video processing and streaming features
 """
 
 import os
-import json
-import subprocess
 from django.core.files.storage import default_storage
 from django.conf import settings
 from celery import shared_task
 from datetime import timedelta
 
-from apps.videos.models import Video, VideoProcessing, VideoStreamingUrl
+from apps.videos.models import Video, VideoProcessing
 from apps.analytics.models import AnalyticsEvent
 from shared.error_handling import ErrorTracker
 
+from apps.videos.packaging import package_renditions, prefix_manifest, processed_prefix, stream_prefix
+from apps.videos.probe_cache import probe_field_file
+from apps.videos.sprites import generate_sprites
+from apps.videos.workspace import MediaWorkspace
+from apps.videos.transcoding import (
+    StageTimings, rendition_output_path, renditions_from_presets, run_ffmpeg, select_renditions,
+    transcode_renditions,
+)
+
+# Hard limits for the short ffmpeg calls; transcodes use VIDEO_TRANSCODE_TIMEOUT
+THUMBNAIL_TIMEOUT = getattr(settings, 'VIDEO_THUMBNAIL_TIMEOUT', 120)
+PREVIEW_TIMEOUT = getattr(settings, 'VIDEO_PREVIEW_TIMEOUT', 600)
+
 
 class VideoProcessor:
     """Enhanced video processing with multiple quality levels and formats"""
@@ -30,6 +41,12 @@ class VideoProcessor:
     def __init__(self, video_id):
         self.video = Video.objects.get(id=video_id)
         self.processing_record = None
+        self.timings = StageTimings(pipeline='processing')
+        self.renditions = []
+        self.rendition_outputs = {}
+        # Shared by every stage of this video's job on this host
+        self.workspace = MediaWorkspace.for_video(video_id)
+        self._video_info = None
     
     def start_processing(self):
         """Start video processing pipeline"""
@@ -56,28 +73,31 @@ class VideoProcessor:
         try:
             # Step 1: Validate video file
             self.update_progress(10, "Validating video file")
-            if not self.validate_video():
-                raise Exception("Invalid video file")
+            with self.timings.stage('validate'):
+                if not self.validate_video():
+                    raise Exception("Invalid video file")
             
             # Step 2: Extract metadata
             self.update_progress(20, "Extracting metadata")
-            self.extract_metadata()
+            with self.timings.stage('metadata'):
+                self.extract_metadata()
             
             # Step 3: Generate thumbnail
             self.update_progress(30, "Generating thumbnail")
-            self.generate_thumbnails()
+            with self.timings.stage('thumbnails'):
+                self.generate_thumbnails()
             
-            # Step 4: Process multiple quality levels
-            self.update_progress(40, "Processing video qualities")
+            # Step 4: Process multiple quality levels (timed as 'transcode')
             self.process_multiple_qualities()
             
-            # Step 5: Generate streaming URLs
-            self.update_progress(80, "Generating streaming URLs")
+            # Step 5: Package HLS/DASH manifests (timed as 'package_*')
+            self.update_progress(80, "Packaging adaptive streams")
             self.generate_streaming_urls()
             
             # Step 6: Create preview clips
             self.update_progress(90, "Creating preview clips")
-            self.create_preview_clips()
+            with self.timings.stage('preview_clips'):
+                self.create_preview_clips()
             
             # Step 7: Finalize
             self.update_progress(100, "Processing complete")
@@ -85,6 +105,8 @@ class VideoProcessor:
             
         except Exception as e:
             self.handle_processing_error(e)
+        finally:
+            self.workspace.cleanup()
     
     def validate_video(self):
         """Validate video file format and integrity"""
@@ -135,6 +157,8 @@ class VideoProcessor:
                 self.video.height = video_stream.get('height', 0)
                 self.video.frame_rate = self.parse_frame_rate(video_stream.get('r_frame_rate', ''))
                 self.video.codec = video_stream.get('codec_name', '')
+                # Persisted so later pipeline stages (other workers) know the source size
+                self.video.resolution = f"{self.video.width}x{self.video.height}"
                 
                 # Parse duration
                 duration = video_info.get('format', {}).get('duration')
@@ -168,33 +192,32 @@ class VideoProcessor:
             duration = self.video.duration.total_seconds() if self.video.duration else 10
             timestamp = duration * 0.1
             
-            # Create thumbnail filename
-            filename_base = os.path.splitext(os.path.basename(self.video.file.name))[0]
-            thumbnail_filename = f"thumbnails/{filename_base}_thumb.jpg"
+            # Create thumbnail filename; uploads share basenames, so it is kept per video
+            thumbnail_filename = f"thumbnails/{self.video.id}/{self.filename_base()}_thumb.jpg"
             
             # Generate thumbnail using ffmpeg
-            input_path = self.video.file.path if hasattr(self.video.file, 'path') else self.video.file.url
-            output_path = os.path.join(settings.MEDIA_ROOT, thumbnail_filename)
+            input_path = self.input_path()
+            output_path = self.workspace.path(thumbnail_filename)
             
             # Ensure thumbnail directory exists
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
             
             cmd = [
                 'ffmpeg',
+                '-ss', str(timestamp),  # seek before decoding
                 '-i', input_path,
-                '-ss', str(timestamp),
                 '-vframes', '1',
                 '-vf', 'scale=640:360',
                 '-y',
                 output_path
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            result = run_ffmpeg(cmd, THUMBNAIL_TIMEOUT, operation='thumbnail')
             
             if result.returncode == 0 and os.path.exists(output_path):
                 # Save thumbnail to video model
-                self.video.thumbnail = thumbnail_filename
-                self.video.save()
+                self.video.thumbnail = self.workspace.store(output_path, thumbnail_filename)
+                self.video.save(update_fields=['thumbnail', 'updated_at'])
                 
                 # Generate additional preview thumbnails
                 self.generate_preview_thumbnails()
@@ -213,123 +236,104 @@ class VideoProcessor:
             return False
     
     def generate_preview_thumbnails(self):
-        """Generate preview thumbnails at various timestamps"""
+        """Generate seek-preview sprite sheets and their WebVTT track in one ffmpeg pass"""
         try:
             if not self.video.duration:
                 return
             
-            duration = self.video.duration.total_seconds()
-            preview_count = min(10, int(duration // 10))  # One preview every 10 seconds, max 10
+            input_path = self.input_path()
+            sprites_prefix = f"{stream_prefix(self.video.id)}/sprites"
+            sprites_dir = self.workspace.scratch_dir(sprites_prefix)
+            sprites = generate_sprites(
+                input_path,
+                sprites_dir,
+                self.video.duration.total_seconds(),
+                timings=self.timings,
+            )
+            self.workspace.store_tree(sprites_dir, sprites_prefix)
             
-            previews = []
-            for i in range(preview_count):
-                timestamp = (duration / preview_count) * i
-                preview_filename = f"previews/{os.path.splitext(os.path.basename(self.video.file.name))[0]}_preview_{i}.jpg"
-                
-                # Generate preview thumbnail
-                if self.generate_single_thumbnail(timestamp, preview_filename):
-                    previews.append({
-                        'timestamp': timestamp,
-                        'filename': preview_filename
-                    })
-            
-            # Save preview data
-            self.video.preview_thumbnails = previews
-            self.video.save()
+            # Only this column: other stages may be writing the video row concurrently
+            self.video.streaming_manifest = {
+                **(self.video.streaming_manifest or {}),
+                'thumbnails': f"{sprites_prefix}/{sprites['vtt']}",
+            }
+            self.video.save(update_fields=['streaming_manifest', 'updated_at'])
             
         except Exception as e:
             ErrorTracker.log_error('preview_thumbnails_error', e, extra_data={'video_id': self.video.id})
     
     def process_multiple_qualities(self):
-        """Process video in multiple quality levels"""
+        """Process every quality level from a single decode of the source"""
         try:
-            self.video.width or 1920
-            original_height = self.video.height or 1080
+            renditions = self.select_renditions()
+            self.update_progress(40, f"Processing {len(renditions)} qualities in one pass")
             
-            processed_qualities = []
-            
-            for quality, preset in self.QUALITY_PRESETS.items():
-                # Skip if quality is higher than original
-                if preset['height'] > original_height:
-                    continue
-                
-                self.update_progress(
-                    40 + (len(processed_qualities) * 8),  # Progress from 40-80%
-                    f"Processing {quality} quality"
-                )
-                
-                if self.process_quality_level(quality, preset):
-                    processed_qualities.append(quality)
+            self.renditions = renditions
+            self.rendition_outputs = self.processed_outputs(self.transcode(renditions))
             
             # Update video with available qualities
-            self.video.available_qualities = processed_qualities
+            self.video.available_qualities = list(self.rendition_outputs)
             self.video.save()
             
         except Exception as e:
             ErrorTracker.log_error('quality_processing_error', e, extra_data={'video_id': self.video.id})
     
-    def process_quality_level(self, quality, preset):
-        """Process video for specific quality level"""
-        try:
-            filename_base = os.path.splitext(os.path.basename(self.video.file.name))[0]
-            output_filename = f"processed/{filename_base}_{quality}.mp4"
-            
-            input_path = self.video.file.path if hasattr(self.video.file, 'path') else self.video.file.url
-            output_path = os.path.join(settings.MEDIA_ROOT, output_filename)
-            
-            # Ensure output directory exists
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            cmd = [
-                'ffmpeg',
-                '-i', input_path,
-                '-vf', f"scale={preset['width']}:{preset['height']}",
-                '-b:v', preset['bitrate'],
-                '-c:v', 'libx264',
-                '-preset', 'medium',
-                '-c:a', 'aac',
-                '-b:a', '128k',
-                '-movflags', '+faststart',
-                '-y',
-                output_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0 and os.path.exists(output_path):
-                # Save processed file info
-                self.save_processed_quality(quality, output_filename, preset)
-                return True
-            else:
-                ErrorTracker.log_error(
-                    'quality_processing_error',
-                    Exception(f"FFmpeg error for {quality}: {result.stderr}"),
-                    extra_data={'video_id': self.video.id, 'quality': quality}
-                )
-                return False
-                
-        except Exception as e:
-            ErrorTracker.log_error('quality_processing_error', e, extra_data={'video_id': self.video.id, 'quality': quality})
-            return False
+    def select_renditions(self):
+        """Quality presets that don't upscale the source"""
+        return select_renditions(renditions_from_presets(self.QUALITY_PRESETS), self.source_height())
+    
+    def transcode(self, renditions):
+        """
+        Encode ``renditions`` in one ffmpeg pass and save them to storage,
+        where the packaging stage picks them up; raises TranscodingError
+        """
+        input_path = self.input_path()
+        outputs = transcode_renditions(
+            input_path,
+            self.workspace.scratch_dir(self.processed_prefix()),
+            renditions,
+            filename_base=self.filename_base(),
+            timings=self.timings,
+        )
+        for quality, output_path in outputs.items():
+            output_filename = self.workspace.store(output_path, self.processed_name(output_path))
+            self.save_processed_quality(quality, output_filename, self.QUALITY_PRESETS[quality])
+        return outputs
     
     def generate_streaming_urls(self):
-        """Generate streaming URLs for different qualities"""
+        """Package the renditions as HLS/DASH and record the manifest paths"""
         try:
-            # Clear existing streaming URLs
-            VideoStreamingUrl.objects.filter(video=self.video).delete()
-            
-            # Create streaming URLs for each quality
-            for quality in self.video.available_qualities or []:
-                VideoStreamingUrl.objects.create(
-                    video=self.video,
-                    quality=quality,
-                    url=self.get_streaming_url(quality),
-                    format='mp4'
-                )
+            if not self.rendition_outputs:
+                return
+            self.package(self.rendition_outputs, self.renditions)
             
         except Exception as e:
             ErrorTracker.log_error('streaming_url_error', e, extra_data={'video_id': self.video.id})
     
+    def package(self, outputs, renditions):
+        """
+        Package transcoded outputs (``{rendition name: storage name}``), save
+        the packaged files to storage and record the manifest; raises
+        TranscodingError
+        """
+        prefix = stream_prefix(self.video.id)
+        output_dir = self.workspace.scratch_dir(prefix)
+        manifest = package_renditions(
+            {name: self.workspace.fetch_stored(stored) for name, stored in outputs.items()},
+            renditions,
+            output_dir,
+            timings=self.timings,
+        )
+        self.workspace.store_tree(output_dir, prefix)
+        
+        # Signed per-viewer URLs (VideoStreamingUrl) are issued at request
+        # time; the pipeline only records where the manifests live
+        existing = Video.objects.filter(id=self.video.id).values_list('streaming_manifest', flat=True).first()
+        self.video.streaming_manifest = {**(existing or {}), **prefix_manifest(manifest, prefix)}
+        # Only this column: other stages may be writing the video row concurrently
+        self.video.save(update_fields=['streaming_manifest', 'updated_at'])
+        return self.video.streaming_manifest
+    
     def create_preview_clips(self):
         """Create short preview clips for the video"""
         try:
@@ -344,7 +348,7 @@ class VideoProcessor:
             start_time = max(0, (duration / 2) - 15)
             preview_filename = f"previews/{os.path.splitext(os.path.basename(self.video.file.name))[0]}_preview.mp4"
             
-            input_path = self.video.file.path if hasattr(self.video.file, 'path') else self.video.file.url
+            input_path = self.input_path()
             output_path = os.path.join(settings.MEDIA_ROOT, preview_filename)
             
             # Ensure preview directory exists
@@ -362,7 +366,7 @@ class VideoProcessor:
                 output_path
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            result = run_ffmpeg(cmd, PREVIEW_TIMEOUT, operation='preview clip')
             
             if result.returncode == 0 and os.path.exists(output_path):
                 self.video.preview_url = preview_filename
@@ -392,7 +396,8 @@ class VideoProcessor:
                 video=self.video,
                 event_data={
                     'processing_time': (timezone.now() - self.processing_record.started_at).total_seconds(),
-                    'qualities_processed': len(self.video.available_qualities or [])
+                    'qualities_processed': len(self.video.available_qualities or []),
+                    'stage_timings_ms': self.timings.stages,
                 }
             )
             
@@ -430,26 +435,52 @@ class VideoProcessor:
             ErrorTracker.log_error('progress_update_error', e, extra_data={'video_id': self.video.id})
     
     # Helper methods
+    def input_path(self):
+        """Local path of the source, fetched into the job workspace once if storage is remote"""
+        return self.workspace.source_for_file(self.video.file)
+    
+    def source_height(self):
+        """Source height from the persisted ``WxH`` resolution, if known"""
+        resolution = self.video.resolution or ''
+        if 'x' in resolution:
+            try:
+                return int(resolution.split('x', 1)[1]) or None
+            except ValueError:
+                return None
+        return getattr(self.video, 'height', None)
+    
+    def filename_base(self):
+        return os.path.splitext(os.path.basename(self.video.file.name))[0]
+    
+    def processed_prefix(self):
+        """
+        Storage prefix of this video's transcoded renditions. Upload names
+        repeat across videos and ``store`` replaces what it finds, so the
+        video id keeps one video from overwriting another's renditions
+        """
+        return processed_prefix(self.video.id)
+    
+    def processed_name(self, output_path):
+        """Storage name of a transcoded rendition"""
+        return f"{self.processed_prefix()}/{os.path.basename(output_path)}"
+    
+    def processed_outputs(self, rendition_names):
+        """Storage names of renditions already transcoded (possibly by other workers)"""
+        return {
+            rendition.name: self.processed_name(rendition_output_path('', self.filename_base(), rendition))
+            for rendition in self.select_renditions()
+            if rendition.name in rendition_names
+        }
+    
     def get_video_info(self):
-        """Get video information using ffprobe"""
+        """
+        ffprobe output for the source, from the probe cache when this file
+        version was already probed; the source is only fetched on a miss
+        """
         try:
-            input_path = self.video.file.path if hasattr(self.video.file, 'path') else self.video.file.url
-            
-            cmd = [
-                'ffprobe',
-                '-v', 'quiet',
-                '-print_format', 'json',
-                '-show_format',
-                '-show_streams',
-                input_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                return json.loads(result.stdout)
-            else:
-                return None
+            if self._video_info is None and self.video.file:
+                self._video_info = probe_field_file(self.video.file, self.input_path)
+            return self._video_info
                 
         except Exception:
             return None
@@ -465,32 +496,6 @@ class VideoProcessor:
         except (ValueError, ZeroDivisionError):
             return 0.0
     
-    def generate_single_thumbnail(self, timestamp, filename):
-        """Generate a single thumbnail at specific timestamp"""
-        try:
-            input_path = self.video.file.path if hasattr(self.video.file, 'path') else self.video.file.url
-            output_path = os.path.join(settings.MEDIA_ROOT, filename)
-            
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            cmd = [
-                'ffmpeg',
-                '-i', input_path,
-                '-ss', str(timestamp),
-                '-vframes', '1',
-                '-vf', 'scale=320:180',
-                '-y',
-                output_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            return result.returncode == 0 and os.path.exists(output_path)
-            
-        except Exception:
-            return False
-    
     def save_processed_quality(self, quality, filename, preset):
         """Save processed quality information"""
         try:
@@ -503,8 +508,9 @@ class VideoProcessor:
                 'height': preset['height'],
                 'bitrate': preset['bitrate']
             }
+            # In-memory only: transcode stages run in parallel, and a full
+            # Video.save() here would overwrite columns other stages just wrote
             self.video.processed_files = processed_files
-            self.video.save()
             
         except Exception as e:
             ErrorTracker.log_error('save_quality_error', e, extra_data={'video_id': self.video.id, 'quality': quality})
@@ -525,13 +531,9 @@ class VideoProcessor:
 
 
 # Celery task for async video processing
-@shared_task(bind=True, max_retries=3)
-def process_video_async(self, video_id):
-    """Asynchronous video processing task"""
-    try:
-        processor = VideoProcessor(video_id)
-        processor.start_processing()
-        
-    except Exception as e:
-        # Retry the task
-        raise self.retry(exc=e, countdown=60)  # Retry after 1 minute
+@shared_task
+def process_video_async(video_id):
+    """Asynchronous video processing; runs the staged, resumable pipeline"""
+    from apps.videos.tasks import start_video_processing
+    
+    return start_video_processing(video_id)
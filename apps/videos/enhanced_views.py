@@ -108,7 +108,8 @@ class VideoStreamingUrlView(APIView):
         
         if video.visibility == 'friends':
             # Check if user is friend with uploader
-            return user in video.uploader.friends.all()
+            from apps.users.friend_graph import friend_graph
+            return friend_graph.are_friends(video.uploader_id, user.id)
         
         return False
 
@@ -0,0 +1,99 @@
+"""
+Like/dislike toggling with incremental counts
+
+A click is one locked read of the viewer's like row, one insert, update or
+delete of that row, and a relative ``F()`` change to ``Video.like_count``, all
+in one transaction. The count in the response is read back inside that
+transaction, after the update, so concurrent clicks can't skew it and
+popular videos never pay for a ``COUNT(*)``. ``reconcile_like_counts`` repairs
+any drift from writes that bypassed this path (admin, bulk deletes) and runs
+on a schedule.
+"""
+
+import logging
+from typing import NamedTuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from shared.observability import observability
+
+from .models import Video, VideoLike
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+class LikeResult(NamedTuple):
+    is_liked: bool
+    like_count: int
+
+
+def _apply(video, user, is_like: bool):
+    """Write the toggle; returns the viewer's resulting like state and the video's ``like_count``"""
+    rows = VideoLike.objects.filter(user=user, video=video)
+    current = rows.select_for_update().values_list('is_like', flat=True).first()
+
+    if current is None:
+        VideoLike.objects.create(user=user, video=video, is_like=is_like)
+        is_liked, delta = is_like, (1 if is_like else 0)
+    elif current == is_like:
+        # Clicking the same action again removes it
+        rows.delete()
+        is_liked, delta = False, (-1 if is_like else 0)
+    else:
+        rows.update(is_like=is_like)
+        is_liked, delta = is_like, (1 if is_like else -1)
+
+    videos = Video.objects.filter(id=video.id)
+    if delta:
+        videos.update(like_count=Greatest(F('like_count') + delta, Value(0)))
+    # Our update holds the row lock, so this sees it and no uncommitted click
+    return is_liked, videos.values_list('like_count', flat=True).get()
+
+
+def toggle_like(video, user, is_like: bool = True) -> LikeResult:
+    """Like, dislike or clear ``user``'s reaction to ``video``, as the like button does"""
+    try:
+        with transaction.atomic():
+            is_liked, like_count = _apply(video, user, is_like)
+    except IntegrityError:
+        # A concurrent first click inserted the row; toggle against it instead
+        with transaction.atomic():
+            is_liked, like_count = _apply(video, user, is_like)
+
+    return LikeResult(is_liked=is_liked, like_count=like_count)
+
+
+def reconcile_like_counts(batch_size: int = RECONCILE_BATCH_SIZE) -> int:
+    """Reset ``like_count`` wherever it disagrees with the like rows; returns videos fixed"""
+    actual_likes = Coalesce(Subquery(
+        VideoLike.objects.filter(video=OuterRef('pk'), is_like=True)
+        .order_by().values('video').annotate(total=Count('pk')).values('total')
+    ), Value(0))
+
+    fixed = 0
+    last_id = None
+    while True:
+        batch = Video.objects.order_by('pk')
+        if last_id is not None:
+            batch = batch.filter(pk__gt=last_id)
+        rows = list(
+            batch.annotate(actual=Count('likes', filter=Q(likes__is_like=True)))
+            .values_list('pk', 'like_count', 'actual')[:batch_size]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        drifted = [pk for pk, like_count, actual in rows if like_count != actual]
+        if drifted:
+            # Recounted at write time, so toggles since the read aren't lost
+            fixed += Video.objects.filter(pk__in=drifted).update(like_count=actual_likes)
+        if len(rows) < batch_size:
+            break
+
+    observability.record_metric('video.likes.drift', fixed)
+    return fixed
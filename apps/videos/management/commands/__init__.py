@@ -0,0 +1 @@
+# Videos app management commands
@@ -0,0 +1,46 @@
+"""
+Django management command to run a video processing worker.
+Starts a Celery worker on one media lane, sized for this host.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.videos.media_queue import LANES, cpu_count, worker_argv
+
+
+class Command(BaseCommand):
+    help = 'Run a Celery worker for the fast (probe/thumbnail) or transcode video lane'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lane',
+            choices=sorted(LANES),
+            default='transcode',
+            help='Which video lane to consume',
+        )
+        parser.add_argument(
+            '--cores',
+            type=int,
+            help='Cores to size the transcode lane for (defaults to the cores available here)',
+        )
+        parser.add_argument(
+            '--loglevel',
+            default='info',
+            help='Celery log level',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the worker arguments instead of starting it',
+        )
+    
+    def handle(self, *args, **options):
+        argv = worker_argv(options['lane'], cores=options['cores'], loglevel=options['loglevel'])
+        self.stdout.write(
+            f"Video {options['lane']} lane on {options['cores'] or cpu_count()} cores: celery {' '.join(argv)}"
+        )
+        if options['dry_run']:
+            return
+        
+        from config.celery import app
+        app.worker_main(argv)
@@ -0,0 +1,118 @@
+"""
+Dedicated Celery lanes for ffmpeg work
+
+Video processing runs on its own queues instead of the default one, so it
+never competes with notification or analytics tasks. Short jobs (probe,
+thumbnails, packaging) get a lane of their own and are never stuck behind
+another video's long rendition encode. Transcode workers are sized from the
+host's cores and the per-process ffmpeg thread cap, so parallel encodes
+don't oversubscribe the CPU.
+"""
+
+import logging
+import math
+import os
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+from shared.observability import observability
+
+from .transcoding import FFMPEG_THREADS, TRANSCODE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+FAST_QUEUE = 'video_fast'
+TRANSCODE_QUEUE = 'video_transcode'
+LANES = {'fast': FAST_QUEUE, 'transcode': TRANSCODE_QUEUE}
+
+FAST_LANE_CONCURRENCY = getattr(settings, 'VIDEO_FAST_LANE_CONCURRENCY', 2)
+
+# Per-task limits: the soft limit raises inside the task (killing any running
+# ffmpeg child), the hard limit replaces a worker process that ignores it
+FAST_TASK_SOFT_TIME_LIMIT = getattr(settings, 'VIDEO_FAST_TASK_TIME_LIMIT', 900)
+TRANSCODE_TASK_SOFT_TIME_LIMIT = TRANSCODE_TIMEOUT + 300
+HARD_TIME_LIMIT_GRACE = 60
+
+
+CGROUP_V2_CPU_MAX = '/sys/fs/cgroup/cpu.max'
+CGROUP_V1_QUOTA = '/sys/fs/cgroup/cpu/cpu.cfs_quota_us'
+CGROUP_V1_PERIOD = '/sys/fs/cgroup/cpu/cpu.cfs_period_us'
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as handle:
+            return handle.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_quota() -> Optional[float]:
+    """CPUs allowed by the container's CFS quota (``docker --cpus``), or ``None`` when unlimited"""
+    cpu_max = _read(CGROUP_V2_CPU_MAX)
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(' ')
+    else:
+        quota, period = _read(CGROUP_V1_QUOTA), _read(CGROUP_V1_PERIOD)
+    try:
+        quota, period = int(quota), int(period)
+    except (TypeError, ValueError):
+        return None  # "max", -1 or no cgroup files: no quota
+    return quota / period if quota > 0 and period > 0 else None
+
+
+def cpu_count() -> int:
+    """Cores this process may use: CPU affinity, capped by any cgroup CPU quota"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    quota = cgroup_cpu_quota()
+    if quota is not None:
+        cores = min(cores, max(1, math.ceil(quota)))
+    return cores
+
+
+def transcode_concurrency(cores: Optional[int] = None, threads: int = FFMPEG_THREADS) -> int:
+    """Parallel encodes that fit on ``cores`` when each ffmpeg uses ``threads``"""
+    return max(1, (cores or cpu_count()) // max(1, threads))
+
+
+def worker_argv(lane: str, cores: Optional[int] = None, loglevel: str = 'info') -> List[str]:
+    """``celery worker`` arguments for one lane"""
+    concurrency = FAST_LANE_CONCURRENCY if lane == 'fast' else transcode_concurrency(cores)
+    return [
+        'worker',
+        '-Q', LANES[lane],
+        '--concurrency', str(concurrency),
+        # Reserve one job per slot so queued work isn't held behind a long encode
+        '--prefetch-multiplier', '1',
+        '-O', 'fair',
+        '-n', f'video-{lane}@%h',
+        '-l', loglevel,
+    ]
+
+
+def queue_depths(connection, queues: Iterable[str] = LANES.values()) -> Dict[str, int]:
+    """Messages waiting in each queue, read with passive declares on ``connection``"""
+    depths = {}
+    for queue in queues:
+        channel = connection.channel()
+        try:
+            depths[queue] = channel.queue_declare(queue=queue, passive=True).message_count
+        except Exception:
+            depths[queue] = 0  # not declared yet: nothing has been routed there
+        finally:
+            try:
+                channel.close()
+            except Exception:
+                pass
+    return depths
+
+
+def record_queue_depths(connection) -> Dict[str, int]:
+    depths = queue_depths(connection)
+    for queue, depth in depths.items():
+        observability.record_metric('video.queue.depth', depth, tags={'queue': queue})
+    return depths
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.14 on 2026-10-18 21:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("videos", "0003_videoprocessing_videostreamingurl_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="streaming_manifest",
+            field=models.JSONField(
+                blank=True, default=dict, verbose_name="Streaming Manifest"
+            ),
+        ),
+    ]
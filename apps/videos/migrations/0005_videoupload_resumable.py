@@ -0,0 +1,47 @@
+# Generated by Django 5.0.14 on 2026-10-18 21:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("videos", "0004_video_streaming_manifest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="videoupload",
+            name="bytes_received",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="videoupload",
+            name="content_type",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name="videoupload",
+            name="multipart_upload_id",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="videoupload",
+            name="storage_backend",
+            field=models.CharField(
+                choices=[("local", "Local"), ("s3", "S3")],
+                default="local",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="videoupload",
+            name="storage_key",
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name="videoupload",
+            name="upload_parts",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
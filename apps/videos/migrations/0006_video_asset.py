@@ -0,0 +1,106 @@
+# Generated by Django 5.0.14 on 2026-10-18 21:39
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("videos", "0005_videoupload_resumable"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, db_index=True, max_length=64, verbose_name="Content SHA-256"
+            ),
+        ),
+        migrations.CreateModel(
+            name="VideoAsset",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "content_hash",
+                    models.CharField(
+                        max_length=64, unique=True, verbose_name="Content SHA-256"
+                    ),
+                ),
+                (
+                    "file_size",
+                    models.BigIntegerField(
+                        blank=True, null=True, verbose_name="File Size (bytes)"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("processing", "Processing"),
+                            ("ready", "Ready"),
+                            ("failed", "Failed"),
+                        ],
+                        default="processing",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "reference_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Reference Count"
+                    ),
+                ),
+                ("source_name", models.CharField(blank=True, max_length=500)),
+                ("thumbnail_name", models.CharField(blank=True, max_length=500)),
+                ("stream_prefix", models.CharField(blank=True, max_length=500)),
+                ("artifact_names", models.JSONField(blank=True, default=list)),
+                ("streaming_manifest", models.JSONField(blank=True, default=dict)),
+                ("metadata", models.JSONField(blank=True, default=dict)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="owned_assets",
+                        to="videos.video",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Video Asset",
+                "verbose_name_plural": "Video Assets",
+                "db_table": "video_assets",
+            },
+        ),
+        migrations.AddField(
+            model_name="video",
+            name="asset",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="videos",
+                to="videos.videoasset",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="videoasset",
+            index=models.Index(
+                fields=["status", "updated_at"], name="video_asset_status_027162_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.14 on 2026-10-18 21:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("videos", "0006_video_asset"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VideoProbe",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source", models.CharField(max_length=500, verbose_name="Source")),
+                (
+                    "version",
+                    models.CharField(max_length=255, verbose_name="Source Version"),
+                ),
+                ("probe", models.JSONField(default=dict, verbose_name="Probe Result")),
+                (
+                    "origin",
+                    models.CharField(
+                        choices=[
+                            ("ffprobe", "ffprobe"),
+                            ("gdrive", "Google Drive metadata"),
+                        ],
+                        default="ffprobe",
+                        max_length=20,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Video Probe",
+                "verbose_name_plural": "Video Probes",
+                "db_table": "video_probes",
+                "unique_together": {("source", "version")},
+            },
+        ),
+    ]
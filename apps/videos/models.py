@@ -67,6 +67,13 @@ class Video(models.Model):
     codec = models.CharField(max_length=50, blank=True, verbose_name='Video Codec')
     bitrate = models.IntegerField(null=True, blank=True, verbose_name='Bitrate (kbps)')
     fps = models.FloatField(null=True, blank=True, verbose_name='Frame Rate')
+    streaming_manifest = models.JSONField(default=dict, blank=True, verbose_name='Streaming Manifest')  # HLS/DASH storage paths
+    
+    # Content-addressed processing output shared by identical uploads
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, verbose_name='Content SHA-256')
+    asset = models.ForeignKey(
+        'VideoAsset', null=True, blank=True, on_delete=models.SET_NULL, related_name='videos'
+    )
     
     # Settings
     visibility = models.CharField(max_length=20, choices=VISIBILITY_CHOICES, default='private')
@@ -98,6 +105,72 @@ class Video(models.Model):
         return self.title
 
 
+class VideoAsset(models.Model):
+    """Processed output for one source file, shared by every video uploaded with the same content"""
+    
+    STATUS_CHOICES = [
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    content_hash = models.CharField(max_length=64, unique=True, verbose_name='Content SHA-256')
+    file_size = models.BigIntegerField(null=True, blank=True, verbose_name='File Size (bytes)')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing')
+    # The video whose pipeline produces the shared files
+    owner = models.ForeignKey(
+        Video, null=True, blank=True, on_delete=models.SET_NULL, related_name='owned_assets'
+    )
+    reference_count = models.PositiveIntegerField(default=0, verbose_name='Reference Count')
+    
+    # Shared storage: the source, the packaged stream prefix and every other file to delete with the asset
+    source_name = models.CharField(max_length=500, blank=True)
+    thumbnail_name = models.CharField(max_length=500, blank=True)
+    stream_prefix = models.CharField(max_length=500, blank=True)
+    artifact_names = models.JSONField(default=list, blank=True)
+    streaming_manifest = models.JSONField(default=dict, blank=True)
+    metadata = models.JSONField(default=dict, blank=True)  # duration, resolution, codec, renditions...
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'video_assets'
+        verbose_name = 'Video Asset'
+        verbose_name_plural = 'Video Assets'
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+        
+    def __str__(self):
+        return f"Asset {self.content_hash[:12]} ({self.reference_count} refs)"
+
+
+class VideoProbe(models.Model):
+    """Persisted ffprobe output for one version of a source file"""
+    
+    ORIGIN_CHOICES = [
+        ('ffprobe', 'ffprobe'),
+        ('gdrive', 'Google Drive metadata'),
+    ]
+    
+    source = models.CharField(max_length=500, verbose_name='Source')  # "storage:<name>", "gdrive:<id>", ...
+    version = models.CharField(max_length=255, verbose_name='Source Version')  # size/mtime/etag of the probed bytes
+    probe = models.JSONField(default=dict, verbose_name='Probe Result')  # ffprobe -show_format -show_streams
+    origin = models.CharField(max_length=20, choices=ORIGIN_CHOICES, default='ffprobe')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'video_probes'
+        unique_together = [['source', 'version']]
+        verbose_name = 'Video Probe'
+        verbose_name_plural = 'Video Probes'
+        
+    def __str__(self):
+        return f"Probe: {self.source} @ {self.version}"
+
+
 class VideoLike(models.Model):
     """Video likes/dislikes"""
     
@@ -182,12 +255,20 @@ class VideoUpload(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     progress_percentage = models.FloatField(default=0.0)
     error_message = models.TextField(blank=True)
-    
+
+    # Resumable upload state
+    content_type = models.CharField(max_length=100, blank=True)
+    bytes_received = models.BigIntegerField(default=0)
+    storage_backend = models.CharField(max_length=10, choices=[('local', 'Local'), ('s3', 'S3')], default='local')
+    storage_key = models.CharField(max_length=500, blank=True)
+    multipart_upload_id = models.CharField(max_length=255, blank=True)
+    upload_parts = models.JSONField(default=list, blank=True)  # [{'PartNumber', 'ETag', 'size'}]
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(null=True, blank=True)
-    
+
     class Meta:
         db_table = 'video_uploads'
         ordering = ['-created_at']
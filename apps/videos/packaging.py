@@ -0,0 +1,247 @@
+"""
+HLS/DASH packaging of transcoded renditions
+
+Each rendition produced by ``apps.videos.transcoding`` is remuxed (no
+re-encode) into fragmented MP4 segments with an HLS variant playlist, and a
+master playlist ties the ladder together so players can switch bitrate
+mid-stream. DASH output is optional and reuses the same renditions.
+
+The master playlist advertises what each rendition actually contains: its
+codecs and dimensions come from probing the encoded file, since the
+encoder keeps the aspect ratio (``scale=-2:h``) rather than the preset's
+width.
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .probe_cache import run_ffprobe
+from .transcoding import KEYFRAME_INTERVAL_SECONDS, Rendition, StageTimings, TranscodingError, run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# A multiple of the transcoder's forced keyframe interval so every
+# rendition cuts on the same boundaries
+HLS_SEGMENT_SECONDS = getattr(settings, 'VIDEO_HLS_SEGMENT_SECONDS', 2 * KEYFRAME_INTERVAL_SECONDS)
+PACKAGE_DASH = getattr(settings, 'VIDEO_PACKAGE_DASH', False)
+PACKAGE_TIMEOUT = getattr(settings, 'VIDEO_PACKAGE_TIMEOUT', 900)
+
+MASTER_PLAYLIST_NAME = 'master.m3u8'
+VARIANT_PLAYLIST_NAME = 'index.m3u8'
+DASH_MANIFEST_NAME = 'manifest.mpd'
+
+# H.264 High@4.0 + AAC-LC, the transcoder's usual libx264/aac output; used when a probe can't say
+DEFAULT_CODECS = 'avc1.640028,mp4a.40.2'
+# ffprobe profile names as RFC 6381 profile_idc + constraint flag bytes
+AVC_PROFILES = {
+    'Constrained Baseline': '42e0',
+    'Baseline': '4200',
+    'Main': '4d00',
+    'Extended': '5800',
+    'High': '6400',
+    'High 10': '6e00',
+    'High 4:2:2': '7a00',
+}
+# ffprobe AAC profile names as MPEG-4 audio object types
+AAC_OBJECT_TYPES = {'LC': 2, 'HE-AAC': 5, 'HE-AACv2': 29}
+
+CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.mpd': 'application/dash+xml',
+    '.m4s': 'video/iso.segment',
+    '.mp4': 'video/mp4',
+}
+
+
+def stream_prefix(video_id) -> str:
+    """Storage prefix holding every packaged file for a video"""
+    return f"streams/{video_id}"
+
+
+def processed_prefix(video_id) -> str:
+    """Storage prefix the transcode stages hand a video's renditions to packaging under"""
+    return f"processed/{video_id}"
+
+
+def _bits_per_second(bitrate: str) -> int:
+    multipliers = {'k': 1000, 'K': 1000, 'm': 1000000, 'M': 1000000}
+    if bitrate[-1] in multipliers:
+        return int(float(bitrate[:-1]) * multipliers[bitrate[-1]])
+    return int(bitrate)
+
+
+def rendition_bandwidth(rendition: Rendition) -> int:
+    """Peak bandwidth advertised for a rendition, in bits per second"""
+    return _bits_per_second(rendition.video_bitrate) + _bits_per_second(rendition.audio_bitrate)
+
+
+def _stream(probe: Dict, codec_type: str) -> Optional[Dict]:
+    return next((stream for stream in probe.get('streams', []) if stream.get('codec_type') == codec_type), None)
+
+
+def codecs_from_probe(probe: Optional[Dict]) -> Optional[str]:
+    """RFC 6381 ``CODECS`` value for a probed H.264/AAC file, or ``None`` if it can't be derived"""
+    if not probe:
+        return None
+    codecs = []
+    video = _stream(probe, 'video')
+    if video:
+        profile, level = AVC_PROFILES.get(video.get('profile')), video.get('level')
+        if video.get('codec_name') != 'h264' or not profile or not isinstance(level, int) or level <= 0:
+            return None
+        codecs.append(f"avc1.{profile}{level:02x}")
+    audio = _stream(probe, 'audio')
+    if audio:
+        if audio.get('codec_name') != 'aac':
+            return None
+        codecs.append(f"mp4a.40.{AAC_OBJECT_TYPES.get(audio.get('profile'), 2)}")
+    return ','.join(codecs) or None
+
+
+def dimensions_from_probe(probe: Optional[Dict]) -> Optional[Tuple[int, int]]:
+    video = _stream(probe or {}, 'video')
+    if video and video.get('width') and video.get('height'):
+        return int(video['width']), int(video['height'])
+    return None
+
+
+def build_hls_variant_command(input_path: str, output_dir: str,
+                              segment_seconds: int = HLS_SEGMENT_SECONDS) -> List[str]:
+    """Remux one rendition into fMP4 segments plus a VOD variant playlist"""
+    return [
+        'ffmpeg', '-hide_banner', '-nostdin', '-y',
+        '-i', input_path,
+        '-map', '0',
+        '-c', 'copy',
+        '-f', 'hls',
+        '-hls_time', str(segment_seconds),
+        '-hls_playlist_type', 'vod',
+        '-hls_segment_type', 'fmp4',
+        '-hls_fmp4_init_filename', 'init.mp4',
+        '-hls_flags', 'independent_segments',
+        '-hls_segment_filename', os.path.join(output_dir, 'seg_%05d.m4s'),
+        os.path.join(output_dir, VARIANT_PLAYLIST_NAME),
+    ]
+
+
+def build_dash_command(inputs: List[str], output_path: str,
+                       segment_seconds: int = HLS_SEGMENT_SECONDS) -> List[str]:
+    """Remux all renditions into a single DASH manifest with one adaptation set per type"""
+    cmd = ['ffmpeg', '-hide_banner', '-nostdin', '-y']
+    for input_path in inputs:
+        cmd += ['-i', input_path]
+    for index in range(len(inputs)):
+        cmd += ['-map', f'{index}:v:0']
+    # The audio track is identical across renditions; package it once
+    cmd += ['-map', '0:a:0?']
+    cmd += [
+        '-c', 'copy',
+        '-f', 'dash',
+        '-seg_duration', str(segment_seconds),
+        '-use_template', '1',
+        '-use_timeline', '1',
+        '-adaptation_sets', 'id=0,streams=v id=1,streams=a',
+        output_path,
+    ]
+    return cmd
+
+
+def build_master_playlist(variants: List[Dict], codecs: str = DEFAULT_CODECS) -> str:
+    """
+    Render the HLS master playlist. ``variants`` are dicts with ``name``,
+    ``width``, ``height``, ``bandwidth``, ``playlist`` (relative URI) and
+    optionally ``codecs`` (``codecs`` otherwise), listed highest bandwidth
+    first.
+    """
+    lines = ['#EXTM3U', '#EXT-X-VERSION:7', '#EXT-X-INDEPENDENT-SEGMENTS']
+    for variant in sorted(variants, key=lambda item: item['bandwidth'], reverse=True):
+        lines.append(
+            f"#EXT-X-STREAM-INF:BANDWIDTH={variant['bandwidth']},"
+            f"RESOLUTION={variant['width']}x{variant['height']},"
+            f"CODECS=\"{variant.get('codecs') or codecs}\",NAME=\"{variant['name']}\""
+        )
+        lines.append(variant['playlist'])
+    return '\n'.join(lines) + '\n'
+
+
+def _run(cmd, timeout):
+    result = run_ffmpeg(cmd, timeout, operation='ffmpeg packaging')
+    if result.returncode != 0:
+        raise TranscodingError(f"ffmpeg packaging exited with {result.returncode}: {result.stderr[-2000:]}")
+
+
+def package_renditions(outputs: Dict[str, str], renditions: List[Rendition], output_dir: str,
+                       dash: bool = PACKAGE_DASH, timeout: int = PACKAGE_TIMEOUT,
+                       timings: Optional[StageTimings] = None) -> Dict:
+    """
+    Package transcoded ``outputs`` (``{rendition name: mp4 path}``) into
+    ``output_dir`` and return a manifest description with paths relative to
+    ``output_dir``::
+
+        {'hls': 'master.m3u8', 'dash': 'manifest.mpd' | None,
+         'renditions': [{'name', 'width', 'height', 'bandwidth', 'playlist'}]}
+    """
+    timings = timings or StageTimings()
+    packaged = [rendition for rendition in renditions if rendition.name in outputs]
+    if not packaged:
+        raise TranscodingError("No renditions to package")
+
+    os.makedirs(output_dir, exist_ok=True)
+    variants = []
+    with timings.stage('package_hls'):
+        for rendition in packaged:
+            variant_dir = os.path.join(output_dir, rendition.name)
+            os.makedirs(variant_dir, exist_ok=True)
+            _run(build_hls_variant_command(outputs[rendition.name], variant_dir), timeout)
+            probed = run_ffprobe(outputs[rendition.name])
+            width, height = dimensions_from_probe(probed) or (rendition.width, rendition.height)
+            variants.append({
+                'name': rendition.name,
+                'width': width,
+                'height': height,
+                'bandwidth': rendition_bandwidth(rendition),
+                'codecs': codecs_from_probe(probed) or DEFAULT_CODECS,
+                'playlist': f"{rendition.name}/{VARIANT_PLAYLIST_NAME}",
+            })
+
+        with open(os.path.join(output_dir, MASTER_PLAYLIST_NAME), 'w') as master:
+            master.write(build_master_playlist(variants))
+
+    dash_manifest = None
+    if dash:
+        with timings.stage('package_dash'):
+            dash_dir = os.path.join(output_dir, 'dash')
+            os.makedirs(dash_dir, exist_ok=True)
+            _run(
+                build_dash_command(
+                    [outputs[rendition.name] for rendition in packaged],
+                    os.path.join(dash_dir, DASH_MANIFEST_NAME),
+                ),
+                timeout,
+            )
+            dash_manifest = f"dash/{DASH_MANIFEST_NAME}"
+
+    return {
+        'hls': MASTER_PLAYLIST_NAME,
+        'dash': dash_manifest,
+        'renditions': variants,
+    }
+
+
+def content_type_for(path: str) -> str:
+    return CONTENT_TYPES.get(os.path.splitext(path)[1], 'application/octet-stream')
+
+
+def prefix_manifest(manifest: Dict, prefix: str) -> Dict:
+    """Rewrite the manifest's relative paths as storage names under ``prefix``"""
+    return {
+        'hls': f"{prefix}/{manifest['hls']}",
+        'dash': f"{prefix}/{manifest['dash']}" if manifest.get('dash') else None,
+        'renditions': [
+            {**variant, 'playlist': f"{prefix}/{variant['playlist']}"}
+            for variant in manifest['renditions']
+        ],
+    }
@@ -0,0 +1,157 @@
+"""
+Cache warming for videos about to be watched
+
+Drive sources are pulled into the drive proxy's chunk cache; packaged videos
+have their manifests, poster and seek-preview sprites warmed where viewers
+read them from, so the first requests of a party don't all miss at once.
+That is the host's page cache for local storage, or the CDN in front of
+remote storage (``AWS_S3_CUSTOM_DOMAIN``). Remote storage without a CDN
+has nothing in between to warm, so it is skipped rather than downloaded
+into the worker for nothing.
+"""
+
+import logging
+import posixpath
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from shared.observability import observability
+
+from .drive_proxy import drive_media_url, drive_proxy
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_INITIAL_BYTES = getattr(settings, 'VIDEO_PREFETCH_INITIAL_BYTES', 16 * 1024 * 1024)
+PREFETCH_AHEAD_SECONDS = getattr(settings, 'VIDEO_PREFETCH_AHEAD_SECONDS', 60)
+STORAGE_READ_BLOCK = 256 * 1024
+CDN_WARM_TIMEOUT = (5, 30)  # (connect, read) seconds
+
+
+def ensure_drive_meta(file_id: str, auth_headers: Callable[[], Dict[str, str]]) -> Optional[Dict]:
+    """Size and content type of a Drive file, learned from its first chunk if not cached"""
+    meta = drive_proxy.get_meta(file_id)
+    if meta is None:
+        drive_proxy.get_chunk(file_id, 0, drive_media_url(file_id), auth_headers)
+        meta = drive_proxy.get_meta(file_id)
+    return meta
+
+
+def warm_drive_range(file_id: str, auth_headers: Callable[[], Dict[str, str]], start: int, length: int) -> int:
+    """Pull ``length`` bytes from ``start`` into the chunk cache; returns chunks touched"""
+    url = drive_media_url(file_id)
+    meta = ensure_drive_meta(file_id, auth_headers)
+    end = start + length - 1
+    if meta:
+        end = min(end, meta['size'] - 1)
+    if end < start:
+        return 0
+
+    chunk_size = drive_proxy.chunk_size
+    indexes = range(start // chunk_size, end // chunk_size + 1)
+    for index in indexes:
+        drive_proxy.get_chunk(file_id, index, url, auth_headers)
+    observability.record_metric('video.prefetch.chunks', len(indexes), tags={'source': 'gdrive'})
+    return len(indexes)
+
+
+def drive_byte_offset(file_id: str, position_seconds: float, duration_seconds: Optional[float]) -> Optional[int]:
+    """
+    Approximate byte offset of a playback position, assuming a constant
+    bitrate. ``None`` until the file size is known.
+    """
+    meta = drive_proxy.get_meta(file_id)
+    if not meta or not duration_seconds:
+        return None
+    fraction = min(max(position_seconds / duration_seconds, 0.0), 1.0)
+    return int(meta['size'] * fraction)
+
+
+def drive_bytes_per_second(file_id: str, duration_seconds: Optional[float]) -> Optional[int]:
+    meta = drive_proxy.get_meta(file_id)
+    if not meta or not duration_seconds:
+        return None
+    return int(meta['size'] / duration_seconds)
+
+
+def packaged_storage_names(video) -> List[str]:
+    """Poster, manifests, variant playlists and sprite sheets for a packaged video"""
+    names = []
+    if video.thumbnail:
+        names.append(video.thumbnail.name)
+
+    manifest = video.streaming_manifest or {}
+    for key in ('hls', 'dash'):
+        if manifest.get(key):
+            names.append(manifest[key])
+    names.extend(variant['playlist'] for variant in manifest.get('renditions', []))
+
+    vtt = manifest.get('thumbnails')
+    if vtt:
+        names.append(vtt)
+        sprites_dir = posixpath.dirname(vtt)
+        try:
+            _dirs, files = default_storage.listdir(sprites_dir)
+        except (OSError, NotImplementedError):
+            files = []
+        names.extend(posixpath.join(sprites_dir, name) for name in sorted(files) if name.endswith('.jpg'))
+    return names
+
+
+def _is_local(storage) -> bool:
+    try:
+        storage.path('')
+    except NotImplementedError:
+        return False
+    return True
+
+
+def _warm(name: str, length: Optional[int] = None) -> int:
+    """
+    Read ``name`` (or its first ``length`` bytes) the way viewers will;
+    returns bytes read, 0 when there is no cache to warm
+    """
+    read = 0
+    if _is_local(default_storage):
+        with default_storage.open(name, 'rb') as file:
+            while length is None or read < length:
+                size = STORAGE_READ_BLOCK if length is None else min(STORAGE_READ_BLOCK, length - read)
+                block = file.read(size)
+                if not block:
+                    break
+                read += len(block)
+        return read
+
+    if not getattr(settings, 'AWS_S3_CUSTOM_DOMAIN', ''):
+        return 0
+    # Pull it through the CDN so the edge has it; the body is discarded as it streams
+    headers = {'Range': f'bytes=0-{length - 1}'} if length else {}
+    with requests.get(default_storage.url(name), headers=headers, stream=True, timeout=CDN_WARM_TIMEOUT) as response:
+        response.raise_for_status()
+        for block in response.iter_content(chunk_size=STORAGE_READ_BLOCK):
+            read += len(block)
+    return read
+
+
+def warm_storage_names(names: Iterable[str]) -> int:
+    """Warm each file once so the next reader hits a warm cache; returns files warmed"""
+    warmed = 0
+    for name in names:
+        try:
+            if _warm(name):
+                warmed += 1
+        except Exception as e:
+            logger.warning(f"Prefetch skipped {name}: {str(e)}")
+    observability.record_metric('video.prefetch.files', warmed, tags={'source': 'storage'})
+    return warmed
+
+
+def warm_storage_prefix(name: str, length: int = PREFETCH_INITIAL_BYTES) -> int:
+    """Warm the first ``length`` bytes of a stored file; returns bytes read"""
+    try:
+        return _warm(name, length)
+    except Exception as e:
+        logger.warning(f"Prefetch skipped {name}: {str(e)}")
+        return 0
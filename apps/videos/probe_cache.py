@@ -0,0 +1,142 @@
+"""
+ffprobe result cache keyed by source identity
+
+A probe result is stored once per ``(source, version)`` pair. The source
+names where the bytes live: a storage name or a local path.
+The version is whatever changes when those bytes do: size plus mtime.
+Every stage and view that needs stream information asks the cache first.
+A hit never downloads the source and never runs ffprobe. A miss probes
+once, persists the result in ``VideoProbe``, and fronts it with the
+default cache.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+
+from shared.observability import observability
+
+from .models import VideoProbe
+from .transcoding import TranscodingError, run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+PROBE_TIMEOUT = getattr(settings, 'VIDEO_PROBE_TIMEOUT', 60)
+PROBE_CACHE_TIMEOUT = 24 * 3600
+PROBE_LOCK_TIMEOUT = PROBE_TIMEOUT + 30
+PROBE_WAIT_INTERVAL = 0.2
+
+
+class SourceIdentity(NamedTuple):
+    source: str
+    version: str
+
+
+def identity_for_path(path: str) -> SourceIdentity:
+    stat = os.stat(path)
+    return SourceIdentity(f"file:{os.path.realpath(path)}", f"{stat.st_size}:{stat.st_mtime_ns}")
+
+
+def identity_for_field_file(field_file) -> SourceIdentity:
+    """Identity from storage metadata alone, so a hit needs no download"""
+    storage, name = field_file.storage, field_file.name
+    version = str(storage.size(name))
+    try:
+        version += f":{storage.get_modified_time(name).timestamp()}"
+    except (NotImplementedError, AttributeError):
+        pass
+    return SourceIdentity(f"storage:{name}", version)
+
+
+def _cache_key(identity: SourceIdentity) -> str:
+    digest = hashlib.sha1(f"{identity.source}|{identity.version}".encode()).hexdigest()
+    return f"video_probe:{digest}"
+
+
+def get_probe(identity: SourceIdentity) -> Optional[Dict]:
+    """Cached probe result for ``identity``, or ``None``"""
+    probe = cache.get(_cache_key(identity))
+    if probe is None:
+        probe = (
+            VideoProbe.objects.filter(source=identity.source, version=identity.version)
+            .values_list('probe', flat=True).first()
+        )
+        if probe is not None:
+            cache.set(_cache_key(identity), probe, PROBE_CACHE_TIMEOUT)
+    return probe
+
+
+def store_probe(identity: SourceIdentity, probe: Dict, origin: str = 'ffprobe') -> Dict:
+    try:
+        VideoProbe.objects.update_or_create(
+            source=identity.source, version=identity.version,
+            defaults={'probe': probe, 'origin': origin},
+        )
+    except IntegrityError:
+        pass  # stored concurrently with the same result
+    cache.set(_cache_key(identity), probe, PROBE_CACHE_TIMEOUT)
+    return probe
+
+
+def run_ffprobe(path: str) -> Optional[Dict]:
+    cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', path]
+    try:
+        result = run_ffmpeg(cmd, PROBE_TIMEOUT, operation='ffprobe')
+    except TranscodingError as e:
+        logger.error(f"ffprobe failed for {path}: {str(e)}")
+        return None
+    if result.returncode != 0:
+        logger.error(f"ffprobe failed for {path}: {result.stderr}")
+        return None
+    return json.loads(result.stdout)
+
+
+def probe(identity: SourceIdentity, local_path: Callable[[], str]) -> Optional[Dict]:
+    """
+    Probe result for ``identity``. On a miss, ``local_path()`` is called for
+    a file to run ffprobe on. Concurrent misses for the same identity wait
+    for the first probe rather than running their own.
+    """
+    cached = get_probe(identity)
+    if cached is not None:
+        observability.record_metric('video.probe.cache', 1, tags={'result': 'hit'})
+        return cached
+
+    lock_key = f"{_cache_key(identity)}:lock"
+    locked = cache.add(lock_key, 1, PROBE_LOCK_TIMEOUT)
+    if not locked:
+        deadline = time.monotonic() + PROBE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(PROBE_WAIT_INTERVAL)
+            cached = get_probe(identity)
+            if cached is not None:
+                observability.record_metric('video.probe.cache', 1, tags={'result': 'coalesced'})
+                return cached
+            locked = cache.add(lock_key, 1, PROBE_LOCK_TIMEOUT)
+            if locked:
+                break  # the other prober gave up
+
+    try:
+        observability.record_metric('video.probe.cache', 1, tags={'result': 'miss'})
+        result = run_ffprobe(local_path())
+        # Failures aren't cached: a missing or half-written file may be fine later
+        return store_probe(identity, result) if result is not None else None
+    finally:
+        # A waiter that timed out probes anyway but must not free the holder's lock
+        if locked:
+            cache.delete(lock_key)
+
+
+def probe_path(path: str) -> Optional[Dict]:
+    return probe(identity_for_path(path), lambda: path)
+
+
+def probe_field_file(field_file, local_path: Callable[[], str]) -> Optional[Dict]:
+    return probe(identity_for_field_file(field_file), local_path)
@@ -0,0 +1,209 @@
+"""
+HTTP Range support for serving local video files
+
+Single ranges are returned as a ``FileResponse`` over a length-limited view
+of the open file, so WSGI servers with ``wsgi.file_wrapper`` (gunicorn) send
+the bytes with ``os.sendfile`` from the right offset. Multiple ranges are
+returned as ``multipart/byteranges``. When ``VIDEO_X_ACCEL_REDIRECT_PREFIX``
+is set, nginx serves the file itself after Django has authorized the request.
+"""
+
+import os
+import re
+from typing import List, Optional, Tuple
+from uuid import uuid4
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+X_ACCEL_REDIRECT_PREFIX = getattr(settings, 'VIDEO_X_ACCEL_REDIRECT_PREFIX', '')
+MAX_RANGES = 16  # more than this and the whole file is cheaper (and not a player)
+BLOCK_SIZE = 256 * 1024
+
+_RANGE_RE = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+
+class RangeNotSatisfiable(Exception):
+    """None of the requested ranges overlap the file"""
+
+
+def parse_range_header(header: Optional[str], size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a ``Range: bytes=...`` header into sorted, coalesced inclusive
+    ``(start, end)`` pairs. Returns ``None`` when the header is absent,
+    malformed, or asks for too many ranges (the full file is served then),
+    and raises ``RangeNotSatisfiable`` when nothing overlaps the file.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec:
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        match = _RANGE_RE.match(part)
+        if not match:
+            return None
+        first, last = match.groups()
+        if not first and not last:
+            return None
+        if not first:
+            # Suffix range: the final N bytes
+            length = int(last)
+            if length == 0:
+                continue
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+        if start < size:
+            ranges.append((start, end))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class RangeFile:
+    """
+    Read-only view of ``length`` bytes of an open file starting at ``start``.
+
+    The underlying descriptor is positioned at ``start`` and exposed through
+    ``fileno()`` so sendfile-capable servers can hand the copy to the kernel;
+    everyone else reads through the length-limited ``read``.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        self.file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _if_range_matches(request, etag, mtime):
+    """``If-Range`` lets clients resume only if the file hasn't changed"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    parsed = parse_http_date_safe(if_range)
+    return parsed is not None and int(mtime) <= parsed
+
+
+def _base_headers(response, etag, mtime):
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    return response
+
+
+def _multipart_body(path, ranges, boundary, content_type, size):
+    with open(path, 'rb') as file:
+        for start, end in ranges:
+            yield (
+                f"\r\n--{boundary}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+            ).encode('ascii')
+            file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = file.read(min(BLOCK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        yield f"\r\n--{boundary}--\r\n".encode('ascii')
+
+
+def _multipart_length(ranges, boundary, content_type, size):
+    length = len(f"\r\n--{boundary}--\r\n")
+    for start, end in ranges:
+        length += len(
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        )
+        length += end - start + 1
+    return length
+
+
+def serve_file(request, path, content_type='video/mp4', accel_name=None):
+    """
+    Serve ``path`` honouring ``Range``/``If-Range``: 200 for the full file,
+    206 for one or more ranges, 416 when no range is satisfiable.
+
+    ``accel_name`` is the path relative to the media root; when given and
+    ``VIDEO_X_ACCEL_REDIRECT_PREFIX`` is configured, the bytes are left to nginx.
+    """
+    if accel_name and X_ACCEL_REDIRECT_PREFIX:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = f"{X_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{accel_name.lstrip('/')}"
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = _etag(stat)
+
+    try:
+        ranges = parse_range_header(request.META.get('HTTP_RANGE'), size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{size}"
+        return _base_headers(response, etag, stat.st_mtime)
+
+    if ranges is None or not _if_range_matches(request, etag, stat.st_mtime):
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        return _base_headers(response, etag, stat.st_mtime)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        length = end - start + 1
+        response = FileResponse(RangeFile(open(path, 'rb'), start, length), content_type=content_type, status=206)
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        return _base_headers(response, etag, stat.st_mtime)
+
+    boundary = uuid4().hex
+    response = StreamingHttpResponse(
+        _multipart_body(path, ranges, boundary, content_type, size),
+        status=206,
+        content_type=f"multipart/byteranges; boundary={boundary}",
+    )
+    response['Content-Length'] = str(_multipart_length(ranges, boundary, content_type, size))
+    return _base_headers(response, etag, stat.st_mtime)
@@ -0,0 +1,220 @@
+"""
+Resumable, chunked video uploads
+
+A tus-style protocol on top of ``VideoUpload``: the client declares the
+total length up front, then ``PATCH``es raw bytes at ``Upload-Offset``. Each
+chunk is copied from the request stream to a staging file in small blocks,
+so memory stays bounded whatever the file size. With S3 configured the
+staged bytes are shipped as multipart parts as soon as a part is full and
+the staging file only ever holds the unsent tail.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from typing import BinaryIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from shared.observability import observability
+
+logger = logging.getLogger(__name__)
+
+MAX_VIDEO_FILE_SIZE = getattr(settings, 'MAX_VIDEO_FILE_SIZE', 500 * 1024 * 1024)
+UPLOAD_CHUNK_MAX_BYTES = getattr(settings, 'VIDEO_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+# S3 requires every part but the last to be at least 5MB
+S3_PART_SIZE = max(getattr(settings, 'VIDEO_UPLOAD_S3_PART_SIZE', 8 * 1024 * 1024), 5 * 1024 * 1024)
+UPLOAD_STAGING_DIR = (
+    getattr(settings, 'VIDEO_UPLOAD_STAGING_DIR', '')
+    or os.path.join(tempfile.gettempdir(), 'watchparty-uploads')
+)
+UPLOAD_LOCK_TIMEOUT = 300
+COPY_BLOCK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """Rejected upload request; ``status_code`` is the HTTP status to answer with"""
+
+    status_code = 400
+
+
+class UploadOffsetConflict(UploadError):
+    status_code = 409
+
+
+class UploadTooLarge(UploadError):
+    status_code = 413
+
+
+def check_declared_size(file_size: int) -> None:
+    """Reject uploads on their declared length, before any bytes are read"""
+    if file_size > MAX_VIDEO_FILE_SIZE:
+        raise UploadTooLarge(f"File exceeds the {MAX_VIDEO_FILE_SIZE} byte limit")
+
+
+def use_s3() -> bool:
+    return bool(getattr(settings, 'AWS_STORAGE_BUCKET_NAME', ''))
+
+
+def _s3_service():
+    from apps.integrations.services.aws_s3 import AWSS3Service
+    return AWSS3Service()
+
+
+def staging_path(upload) -> str:
+    return os.path.join(UPLOAD_STAGING_DIR, f"{upload.id}.part")
+
+
+def begin_upload(upload) -> None:
+    """Pick the destination for ``upload`` and open an S3 multipart upload if needed"""
+    filename = get_valid_filename(os.path.basename(upload.filename)) or 'video'
+    upload.storage_key = f"videos/{timezone.now().strftime('%Y/%m/%d')}/{upload.id}_{filename}"
+    upload.storage_backend = 's3' if use_s3() else 'local'
+    if upload.storage_backend == 's3':
+        upload.multipart_upload_id = _s3_service().create_multipart_upload(
+            upload.storage_key, upload.content_type or None
+        )
+    upload.save(update_fields=['storage_key', 'storage_backend', 'multipart_upload_id', 'updated_at'])
+
+
+def _copy_stream(stream: BinaryIO, target: BinaryIO, length: int) -> int:
+    written = 0
+    while written < length:
+        block = stream.read(min(COPY_BLOCK_SIZE, length - written))
+        if not block:
+            break  # client went away; keep what arrived so it can resume
+        target.write(block)
+        written += len(block)
+    return written
+
+
+def _sent_bytes(upload) -> int:
+    return sum(part['size'] for part in upload.upload_parts)
+
+
+def _ship_part(upload, spool: BinaryIO, size: int) -> None:
+    spool.seek(0)
+    part_number = len(upload.upload_parts) + 1
+    etag = _s3_service().upload_part(upload.storage_key, upload.multipart_upload_id, part_number, spool)
+    upload.upload_parts = upload.upload_parts + [{'PartNumber': part_number, 'ETag': etag, 'size': size}]
+    spool.seek(0)
+    spool.truncate()
+
+
+def append_chunk(upload, offset: int, stream: BinaryIO, length: int):
+    """
+    Write ``length`` bytes from ``stream`` at ``offset``. The offset must match
+    what the server already holds; the upload completes once the declared
+    length has arrived. Returns the updated upload.
+    """
+    if upload.status not in ('pending', 'uploading'):
+        raise UploadError(f"Upload is {upload.status}")
+    if length > UPLOAD_CHUNK_MAX_BYTES:
+        raise UploadTooLarge(f"Chunks are limited to {UPLOAD_CHUNK_MAX_BYTES} bytes")
+    if offset + length > upload.file_size:
+        raise UploadError("Chunk runs past the declared upload length")
+
+    lock_key = f"video_upload:lock:{upload.id}"
+    if not cache.add(lock_key, 1, UPLOAD_LOCK_TIMEOUT):
+        raise UploadOffsetConflict("Another chunk for this upload is in progress")
+
+    try:
+        upload.refresh_from_db()
+        if offset != upload.bytes_received:
+            raise UploadOffsetConflict(f"Expected offset {upload.bytes_received}")
+
+        os.makedirs(UPLOAD_STAGING_DIR, exist_ok=True)
+        path = staging_path(upload)
+        # The staging file holds everything not yet shipped as a part
+        spool_offset = offset - _sent_bytes(upload)
+        with open(path, 'r+b' if os.path.exists(path) else 'w+b') as spool:
+            spool.truncate(spool_offset)
+            spool.seek(spool_offset)
+            written = _copy_stream(stream, spool, length)
+            spool.flush()
+
+            received = offset + written
+            if upload.storage_backend == 's3':
+                spooled = spool.tell()
+                if spooled >= S3_PART_SIZE or (received == upload.file_size and spooled):
+                    _ship_part(upload, spool, spooled)
+
+        upload.bytes_received = received
+        upload.progress_percentage = round(received * 100.0 / upload.file_size, 2)
+        upload.status = 'uploading'
+        upload.save(update_fields=[
+            'bytes_received', 'progress_percentage', 'status', 'upload_parts', 'updated_at'
+        ])
+        observability.record_metric('video.upload.chunk_bytes', written, tags={'backend': upload.storage_backend})
+
+        if received == upload.file_size:
+            finalize_upload(upload)
+        return upload
+    finally:
+        cache.delete(lock_key)
+
+
+class _HashingFile(File):
+    """Feeds every chunk storage reads into ``digest``, so saving and hashing are one pass"""
+
+    def __init__(self, file, digest):
+        super().__init__(file)
+        self.digest = digest
+
+    def chunks(self, chunk_size=None):
+        for chunk in super().chunks(chunk_size):
+            self.digest.update(chunk)
+            yield chunk
+
+
+def finalize_upload(upload) -> None:
+    """Move the assembled file into storage, attach it to the video and queue processing"""
+    path = staging_path(upload)
+    content_hash = ''
+    if upload.storage_backend == 's3':
+        # Parts already left for S3; the processing workspace hashes the source instead
+        parts = [{'PartNumber': part['PartNumber'], 'ETag': part['ETag']} for part in upload.upload_parts]
+        _s3_service().complete_multipart_upload(upload.storage_key, upload.multipart_upload_id, parts)
+        name = upload.storage_key
+    else:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as staged:
+            # Streams the copy in chunks rather than reading it whole
+            name = default_storage.save(upload.storage_key, _HashingFile(staged, digest))
+        content_hash = digest.hexdigest()
+    if os.path.exists(path):
+        os.unlink(path)
+
+    with transaction.atomic():
+        upload.status = 'completed'
+        upload.progress_percentage = 100.0
+        upload.completed_at = timezone.now()
+        upload.save(update_fields=['status', 'progress_percentage', 'completed_at', 'updated_at'])
+
+        video = upload.video
+        if video:
+            video.file.name = name
+            video.content_hash = content_hash
+            video.status = 'processing'
+            video.save(update_fields=['file', 'content_hash', 'status', 'updated_at'])
+
+            from .tasks import start_video_processing
+            transaction.on_commit(lambda: start_video_processing.delay(str(video.id)))
+
+
+def abort_upload(upload) -> None:
+    """Cancel ``upload`` and release everything it staged"""
+    if upload.storage_backend == 's3' and upload.multipart_upload_id:
+        _s3_service().abort_multipart_upload(upload.storage_key, upload.multipart_upload_id)
+    path = staging_path(upload)
+    if os.path.exists(path):
+        os.unlink(path)
+    upload.status = 'cancelled'
+    upload.save(update_fields=['status', 'updated_at'])
@@ -213,10 +213,10 @@ class VideoUploadSerializer(serializers.ModelSerializer):
     class Meta:
         model = VideoUpload
         fields = [
-            'id', 'filename', 'file_size', 'status', 'progress_percentage',
+            'id', 'filename', 'file_size', 'bytes_received', 'upload_url', 'status', 'progress_percentage',
             'error_message', 'created_at', 'updated_at', 'completed_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'completed_at']
+        read_only_fields = ['id', 'bytes_received', 'upload_url', 'created_at', 'updated_at', 'completed_at']
 
 
 class VideoUploadCreateSerializer(serializers.Serializer):
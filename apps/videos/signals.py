@@ -0,0 +1,18 @@
+"""
+Videos signals
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Video
+
+
+@receiver(post_delete, sender=Video)
+def release_asset_on_delete(sender, instance, **kwargs):
+    """Drop the deleted video's reference to its shared processed asset"""
+    asset_id = instance.asset_id
+    if asset_id:
+        from .dedup import release_asset
+        transaction.on_commit(lambda: release_asset(asset_id))
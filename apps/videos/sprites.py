@@ -0,0 +1,123 @@
+"""
+Seek-preview sprite sheets and WebVTT thumbnail tracks
+
+One ffmpeg pass samples the source with ``fps``, scales each frame and packs
+them into grid images with ``tile``. A WebVTT track maps every time range to
+its cell (``sprite_001.jpg#xywh=x,y,w,h``) so players can show scrubbing
+previews with one request per sheet.
+"""
+
+import glob
+import logging
+import math
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from .transcoding import StageTimings, TranscodingError, run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+SPRITE_TIMEOUT = getattr(settings, 'VIDEO_SPRITE_TIMEOUT', 600)
+SPRITE_FILENAME_PATTERN = 'sprite_%03d.jpg'
+THUMBNAILS_VTT_NAME = 'thumbnails.vtt'
+
+
+@dataclass(frozen=True)
+class SpriteSpec:
+    """Sprite sheet layout"""
+
+    interval: float = 10.0  # seconds between thumbnails
+    columns: int = 5
+    rows: int = 5
+    width: int = 160
+    height: int = 90
+    max_thumbnails: int = 500  # long videos widen the interval instead
+
+    @property
+    def per_sheet(self):
+        return self.columns * self.rows
+
+
+def effective_interval(duration: float, spec: SpriteSpec) -> float:
+    """Sampling interval, widened so long videos stay under ``max_thumbnails``"""
+    return max(spec.interval, duration / spec.max_thumbnails)
+
+
+def build_sprite_command(input_path: str, output_dir: str, interval: float, spec: SpriteSpec) -> List[str]:
+    return [
+        'ffmpeg', '-hide_banner', '-nostdin', '-y',
+        # Decode keyframes only when sampling sparsely; much cheaper than a full decode
+        *(['-skip_frame', 'nokey'] if interval >= 2 else []),
+        '-i', input_path,
+        '-an', '-sn',
+        '-vf', f"fps=1/{interval:g},scale={spec.width}:{spec.height},tile={spec.columns}x{spec.rows}",
+        '-vsync', 'vfr',
+        '-q:v', '4',
+        os.path.join(output_dir, SPRITE_FILENAME_PATTERN),
+    ]
+
+
+def _timestamp(seconds: float) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
+
+
+def build_thumbnails_vtt(duration: float, interval: float, spec: SpriteSpec, sprite_names: List[str]) -> str:
+    """WebVTT cues pointing each time range at its cell in the sprite sheets"""
+    count = min(math.ceil(duration / interval), len(sprite_names) * spec.per_sheet)
+    lines = ['WEBVTT', '']
+    for index in range(count):
+        start = index * interval
+        end = min(start + interval, duration)
+        sheet, cell = divmod(index, spec.per_sheet)
+        x = (cell % spec.columns) * spec.width
+        y = (cell // spec.columns) * spec.height
+        lines.append(f"{_timestamp(start)} --> {_timestamp(end)}")
+        lines.append(f"{sprite_names[sheet]}#xywh={x},{y},{spec.width},{spec.height}")
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def generate_sprites(input_path: str, output_dir: str, duration: float,
+                     spec: Optional[SpriteSpec] = None, timeout: int = SPRITE_TIMEOUT,
+                     timings: Optional[StageTimings] = None) -> Dict:
+    """
+    Write sprite sheets and ``thumbnails.vtt`` into ``output_dir``.
+
+    Returns ``{'vtt': name, 'sprites': [names], 'interval': seconds}`` with
+    names relative to ``output_dir``. Raises ``TranscodingError`` on failure.
+    """
+    spec = spec or SpriteSpec()
+    if not duration or duration <= 0:
+        raise TranscodingError("Cannot build sprites without a duration")
+
+    os.makedirs(output_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(output_dir, 'sprite_*.jpg')):
+        os.unlink(stale)
+
+    interval = effective_interval(duration, spec)
+    timings = timings or StageTimings()
+    with timings.stage('sprites'):
+        result = run_ffmpeg(
+            build_sprite_command(input_path, output_dir, interval, spec), timeout,
+            operation='ffmpeg sprite generation',
+        )
+    if result.returncode != 0:
+        raise TranscodingError(f"ffmpeg sprite generation exited with {result.returncode}: {result.stderr[-2000:]}")
+
+    sprite_names = sorted(
+        os.path.basename(path) for path in glob.glob(os.path.join(output_dir, 'sprite_*.jpg'))
+    )
+    if not sprite_names:
+        raise TranscodingError("ffmpeg produced no sprite sheets")
+
+    with open(os.path.join(output_dir, THUMBNAILS_VTT_NAME), 'w') as vtt:
+        vtt.write(build_thumbnails_vtt(duration, interval, spec, sprite_names))
+
+    return {'vtt': THUMBNAILS_VTT_NAME, 'sprites': sprite_names, 'interval': interval}
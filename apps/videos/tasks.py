@@ -2,26 +2,47 @@
 Video processing tasks for Watch Party Backend
 """
 
-from celery import shared_task
+from celery import chord, current_app, group, shared_task
+from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
-from django.core.files.base import ContentFile
+from django.core.files import File
 from django.core.files.storage import default_storage
 import os
 import subprocess
 import tempfile
 import logging
-import json
 from typing import Optional, Dict, Any
 from botocore.exceptions import ClientError
 
 from shared.aws import get_boto3_session
 
-from .models import Video
+from .dedup import OWNER, abandon_asset, claim_asset, publish_asset
+from .enhanced_processing import VideoProcessor
+from .likes import reconcile_like_counts
+from .media_queue import (
+    FAST_TASK_SOFT_TIME_LIMIT, HARD_TIME_LIMIT_GRACE, TRANSCODE_TASK_SOFT_TIME_LIMIT, record_queue_depths,
+)
+from .models import Video, VideoProcessing
+from .probe_cache import probe_path
+from .packaging import content_type_for, package_renditions, prefix_manifest, stream_prefix
+from .transcoding import Rendition, StageTimings, TranscodingError, select_renditions, transcode_renditions
+from .view_counter import view_counter
+from .workspace import MediaWorkspace, WorkspaceError, sweep_stale_workspaces
 from apps.analytics.models import AnalyticsEvent
 
 logger = logging.getLogger(__name__)
 
+# Renditions encoded by one transcode task. 1 spreads the ladder across
+# workers; larger values share a single decode between renditions.
+VIDEO_RENDITIONS_PER_TASK = getattr(settings, 'VIDEO_RENDITIONS_PER_TASK', 1)
+
+VARIANT_RENDITIONS = [
+    Rendition('720p', 1280, 720, '2000k'),
+    Rendition('480p', 854, 480, '1000k'),
+    Rendition('360p', 640, 360, '500k'),
+]
+
 
 @shared_task
 def process_video_upload(video_id):
@@ -29,12 +50,16 @@ def process_video_upload(video_id):
     try:
         video = Video.objects.get(id=video_id)
         
-        if not video.video_url:
-            logger.error(f"Video {video_id} has no video URL")
-            return f"Error: No video URL for video {video_id}"
+        with MediaWorkspace(f"upload-{video_id}") as workspace:
+            # Fetched once; metadata and thumbnail both read the local copy
+            source_path = fetch_video_source(video, workspace)
+            if not source_path:
+                logger.error(f"Video {video_id} has no source to process")
+                return f"Error: No source for video {video_id}"
+            
+            metadata = extract_video_metadata(source_path)
+            thumbnail_url = generate_video_thumbnail(source_path)
         
-        # Extract metadata
-        metadata = extract_video_metadata(video.video_url)
         if metadata:
             video.duration = metadata.get('duration', 0)
             video.file_size = metadata.get('file_size', 0)
@@ -49,8 +74,6 @@ def process_video_upload(video_id):
                     'fps': metadata.get('fps', 0)
                 }
         
-        # Generate thumbnail
-        thumbnail_url = generate_video_thumbnail(video.video_url)
         if thumbnail_url:
             video.thumbnail = thumbnail_url
         
@@ -88,37 +111,13 @@ def process_video_upload(video_id):
         return f"Error: {str(e)}"
 
 
-def extract_video_metadata(video_url: str) -> Optional[Dict[str, Any]]:
-    """Extract metadata from video file using ffprobe"""
+def extract_video_metadata(video_path: str) -> Optional[Dict[str, Any]]:
+    """Extract metadata from a local video file using ffprobe (cached per file version)"""
     try:
-        # Download video to temporary file if it's a URL
-        temp_file = None
-        if video_url.startswith('http'):
-            temp_file = download_video_temp(video_url)
-            if not temp_file:
-                return None
-            video_path = temp_file
-        else:
-            video_path = video_url
-        
-        # Use ffprobe to extract metadata
-        cmd = [
-            'ffprobe',
-            '-v', 'quiet',
-            '-print_format', 'json',
-            '-show_format',
-            '-show_streams',
-            video_path
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        
-        if result.returncode != 0:
-            logger.error(f"ffprobe failed for {video_url}: {result.stderr}")
+        metadata = probe_path(video_path)
+        if metadata is None:
             return None
         
-        metadata = json.loads(result.stdout)
-        
         # Extract relevant information
         format_info = metadata.get('format', {})
         video_stream = None
@@ -129,7 +128,7 @@ def extract_video_metadata(video_url: str) -> Optional[Dict[str, Any]]:
                 break
         
         if not video_stream:
-            logger.error(f"No video stream found in {video_url}")
+            logger.error(f"No video stream found in {video_path}")
             return None
         
         extracted_metadata = {
@@ -142,33 +141,16 @@ def extract_video_metadata(video_url: str) -> Optional[Dict[str, Any]]:
             'fps': eval(video_stream.get('r_frame_rate', '0/1'))
         }
         
-        # Clean up temporary file
-        if temp_file and os.path.exists(temp_file):
-            os.unlink(temp_file)
-        
         return extracted_metadata
         
-    except subprocess.TimeoutExpired:
-        logger.error(f"ffprobe timeout for {video_url}")
-        return None
     except Exception as e:
-        logger.error(f"Error extracting metadata from {video_url}: {str(e)}")
+        logger.error(f"Error extracting metadata from {video_path}: {str(e)}")
         return None
 
 
-def generate_video_thumbnail(video_url: str) -> Optional[str]:
-    """Generate thumbnail from video file"""
+def generate_video_thumbnail(video_path: str) -> Optional[str]:
+    """Generate thumbnail from a local video file"""
     try:
-        # Download video to temporary file if it's a URL
-        temp_file = None
-        if video_url.startswith('http'):
-            temp_file = download_video_temp(video_url)
-            if not temp_file:
-                return None
-            video_path = temp_file
-        else:
-            video_path = video_url
-        
         # Create temporary thumbnail file
         with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as thumb_file:
             thumbnail_path = thumb_file.name
@@ -187,7 +169,7 @@ def generate_video_thumbnail(video_url: str) -> Optional[str]:
         result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
         
         if result.returncode != 0:
-            logger.error(f"ffmpeg thumbnail generation failed for {video_url}: {result.stderr}")
+            logger.error(f"ffmpeg thumbnail generation failed for {video_path}: {result.stderr}")
             return None
         
         # Upload thumbnail to storage
@@ -196,34 +178,27 @@ def generate_video_thumbnail(video_url: str) -> Optional[str]:
         # Clean up temporary files
         if os.path.exists(thumbnail_path):
             os.unlink(thumbnail_path)
-        if temp_file and os.path.exists(temp_file):
-            os.unlink(temp_file)
         
         return thumbnail_url
         
     except subprocess.TimeoutExpired:
-        logger.error(f"ffmpeg timeout for {video_url}")
+        logger.error(f"ffmpeg timeout for {video_path}")
         return None
     except Exception as e:
-        logger.error(f"Error generating thumbnail for {video_url}: {str(e)}")
+        logger.error(f"Error generating thumbnail for {video_path}: {str(e)}")
         return None
 
 
-def download_video_temp(video_url: str) -> Optional[str]:
-    """Download video to temporary file for processing"""
+def fetch_video_source(video: Video, workspace: MediaWorkspace) -> Optional[str]:
+    """Local path of the video's source inside ``workspace``, downloading it at most once"""
     try:
-        import requests
-        
-        response = requests.get(video_url, stream=True, timeout=60)
-        response.raise_for_status()
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_file:
-            for chunk in response.iter_content(chunk_size=8192):
-                temp_file.write(chunk)
-            return temp_file.name
-            
-    except Exception as e:
-        logger.error(f"Error downloading video {video_url}: {str(e)}")
+        if video.file:
+            return workspace.source_for_file(video.file)
+        if video.source_url and video.source_url.startswith('http'):
+            return workspace.fetch_source(url=video.source_url)
+        return None
+    except WorkspaceError as e:
+        logger.error(f"Error fetching source for video {video.id}: {str(e)}")
         return None
 
 
@@ -244,7 +219,7 @@ def upload_thumbnail_to_storage(thumbnail_path: str) -> Optional[str]:
         return None
 
 
-def upload_to_s3(file_path: str, s3_key: str) -> Optional[str]:
+def upload_to_s3(file_path: str, s3_key: str, content_type: str = 'image/jpeg') -> Optional[str]:
     """Upload file to AWS S3"""
     try:
         s3_client = get_boto3_session().client(
@@ -260,7 +235,7 @@ def upload_to_s3(file_path: str, s3_key: str) -> Optional[str]:
                 file_obj,
                 bucket_name,
                 s3_key,
-                ExtraArgs={'ContentType': 'image/jpeg'}
+                ExtraArgs={'ContentType': content_type}
             )
         
         # Return public URL
@@ -278,7 +253,8 @@ def upload_to_local_storage(file_path: str, filename: str) -> Optional[str]:
     """Upload file to local storage"""
     try:
         with open(file_path, 'rb') as file_obj:
-            uploaded_file = default_storage.save(filename, ContentFile(file_obj.read()))
+            # File() lets storage copy in chunks instead of reading the whole file into memory
+            uploaded_file = default_storage.save(filename, File(file_obj))
             return default_storage.url(uploaded_file)
             
     except Exception as e:
@@ -339,103 +315,71 @@ def optimize_video_quality():
 
 def create_video_variants(video: Video) -> bool:
     """Create multiple resolution variants of a video"""
+    workspace = MediaWorkspace.for_video(video.id)
+    timings = StageTimings(pipeline='variants')
     try:
-        if not video.video_url:
+        # Fetch the original once into the video's workspace
+        with timings.stage('download'):
+            source_path = fetch_video_source(video, workspace)
+        if not source_path:
             return False
         
-        # Download original video
-        temp_file = download_video_temp(video.video_url)
-        if not temp_file:
+        with timings.stage('probe'):
+            metadata = extract_video_metadata(source_path) or {}
+        
+        # Only renditions at or below the source resolution
+        renditions = select_renditions(VARIANT_RENDITIONS, metadata.get('height'))
+        if not renditions:
             return False
         
-        # Create different quality variants
-        variants = {
-            '720p': {'width': 1280, 'height': 720, 'bitrate': '2000k'},
-            '480p': {'width': 854, 'height': 480, 'bitrate': '1000k'},
-            '360p': {'width': 640, 'height': 360, 'bitrate': '500k'}
-        }
+        # One decode, every variant encoded from it
+        output_dir = workspace.scratch_dir('variants')
+        outputs = transcode_renditions(source_path, output_dir, renditions, timings=timings)
         
-        variant_urls = {}
+        # Segment every rendition for adaptive streaming (remux only)
+        package_dir = os.path.join(output_dir, 'stream')
+        manifest = package_renditions(outputs, renditions, package_dir, timings=timings)
         
-        for quality, settings in variants.items():
-            variant_url = create_video_variant(
-                temp_file, 
-                quality, 
-                settings['width'], 
-                settings['height'], 
-                settings['bitrate']
-            )
-            if variant_url:
-                variant_urls[quality] = variant_url
+        variant_urls = {}
+        date_path = timezone.now().strftime('%Y/%m/%d')
+        prefix = stream_prefix(video.id)
+        with timings.stage('upload'):
+            for quality, output_path in outputs.items():
+                filename = f"videos/variants/{date_path}/{video.id}_{quality}.mp4"
+                variant_url = upload_to_storage_backend(output_path, filename, content_type='video/mp4')
+                if variant_url:
+                    variant_urls[quality] = variant_url
+            
+            packaged_files = upload_directory_to_storage(package_dir, prefix)
         
         # Update video with variants
         if variant_urls:
             if not video.metadata:
                 video.metadata = {}
             video.metadata['variants'] = variant_urls
-            video.save()
-        
-        # Clean up
-        if os.path.exists(temp_file):
-            os.unlink(temp_file)
+            video.metadata['variant_timings_ms'] = timings.stages
+        if packaged_files:
+            video.streaming_manifest = prefix_manifest(manifest, prefix)
+        video.save()
         
+        logger.info(f"Created variants {list(variant_urls)} for video {video.id} (timings: {timings.stages})")
         return len(variant_urls) > 0
         
+    except TranscodingError as e:
+        logger.error(f"ffmpeg variant creation failed for {video.id}: {str(e)}")
+        return False
     except Exception as e:
         logger.error(f"Error creating video variants for {video.id}: {str(e)}")
         return False
+    finally:
+        workspace.cleanup()
 
 
-def create_video_variant(input_path: str, quality: str, width: int, height: int, bitrate: str) -> Optional[str]:
-    """Create a single video variant"""
-    try:
-        with tempfile.NamedTemporaryFile(suffix=f'_{quality}.mp4', delete=False) as output_file:
-            output_path = output_file.name
-        
-        # Use ffmpeg to create variant
-        cmd = [
-            'ffmpeg',
-            '-i', input_path,
-            '-vf', f'scale={width}:{height}',
-            '-b:v', bitrate,
-            '-c:v', 'libx264',
-            '-preset', 'medium',
-            '-crf', '23',
-            '-c:a', 'aac',
-            '-b:a', '128k',
-            '-y',
-            output_path
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)  # 5 minute timeout
-        
-        if result.returncode != 0:
-            logger.error(f"ffmpeg variant creation failed for {quality}: {result.stderr}")
-            return None
-        
-        # Upload variant to storage
-        filename = f"videos/variants/{timezone.now().strftime('%Y/%m/%d')}/{quality}_{os.path.basename(output_path)}"
-        variant_url = upload_to_storage_backend(output_path, filename)
-        
-        # Clean up
-        if os.path.exists(output_path):
-            os.unlink(output_path)
-        
-        return variant_url
-        
-    except subprocess.TimeoutExpired:
-        logger.error(f"ffmpeg timeout for variant {quality}")
-        return None
-    except Exception as e:
-        logger.error(f"Error creating variant {quality}: {str(e)}")
-        return None
-
-
-def upload_to_storage_backend(file_path: str, filename: str) -> Optional[str]:
+def upload_to_storage_backend(file_path: str, filename: str, content_type: str = 'image/jpeg') -> Optional[str]:
     """Upload file to configured storage backend"""
     try:
         if hasattr(settings, 'AWS_STORAGE_BUCKET_NAME') and settings.AWS_STORAGE_BUCKET_NAME:
-            return upload_to_s3(file_path, filename)
+            return upload_to_s3(file_path, filename, content_type=content_type)
         else:
             return upload_to_local_storage(file_path, filename)
     except Exception as e:
@@ -443,6 +387,26 @@ def upload_to_storage_backend(file_path: str, filename: str) -> Optional[str]:
         return None
 
 
+def upload_directory_to_storage(directory: str, prefix: str) -> int:
+    """Upload a packaged stream directory, keeping its relative layout under ``prefix``"""
+    uses_s3 = bool(getattr(settings, 'AWS_STORAGE_BUCKET_NAME', None))
+    uploaded = 0
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            file_path = os.path.join(root, name)
+            relative = os.path.relpath(file_path, directory).replace(os.sep, '/')
+            storage_name = f"{prefix}/{relative}"
+            # Playlists reference segments by exact name; don't let local storage rename on re-runs
+            if not uses_s3 and default_storage.exists(storage_name):
+                default_storage.delete(storage_name)
+            if upload_to_storage_backend(file_path, storage_name, content_type=content_type_for(name)):
+                uploaded += 1
+            else:
+                logger.error(f"Failed to upload packaged file {relative} to {prefix}")
+                return 0
+    return uploaded
+
+
 @shared_task
 def generate_video_preview():
     """Generate video preview clips"""
@@ -455,7 +419,9 @@ def generate_video_preview():
         
         generated_count = 0
         for video in videos:
-            preview_url = create_video_preview(video.video_url)
+            with MediaWorkspace(f"preview-{video.id}") as workspace:
+                source_path = fetch_video_source(video, workspace)
+                preview_url = create_video_preview(source_path) if source_path else None
             if preview_url:
                 video.preview_url = preview_url
                 video.save()
@@ -469,21 +435,16 @@ def generate_video_preview():
         return f"Error: {str(e)}"
 
 
-def create_video_preview(video_url: str) -> Optional[str]:
-    """Create a short preview clip from video"""
+def create_video_preview(video_path: str) -> Optional[str]:
+    """Create a short preview clip from a local video file"""
     try:
-        # Download original video
-        temp_file = download_video_temp(video_url)
-        if not temp_file:
-            return None
-        
         with tempfile.NamedTemporaryFile(suffix='_preview.mp4', delete=False) as preview_file:
             preview_path = preview_file.name
         
         # Create 30-second preview starting from 10% of video duration
         cmd = [
             'ffmpeg',
-            '-i', temp_file,
+            '-i', video_path,
             '-ss', '10%',
             '-t', '30',
             '-vf', 'scale=640:360',
@@ -509,8 +470,6 @@ def create_video_preview(video_url: str) -> Optional[str]:
         # Clean up
         if os.path.exists(preview_path):
             os.unlink(preview_path)
-        if os.path.exists(temp_file):
-            os.unlink(temp_file)
         
         return preview_url
         
@@ -523,27 +482,226 @@ def create_video_preview(video_url: str) -> Optional[str]:
 
 
 @shared_task
-def cleanup_temporary_files():
-    """Clean up temporary video processing files"""
+def cleanup_media_workspaces(max_age_hours=24):
+    """Remove processing workspaces abandoned by crashed or killed workers"""
     try:
-        # Clean up any leftover temporary files
-        temp_dir = tempfile.gettempdir()
-        count = 0
+        count = sweep_stale_workspaces(max_age_seconds=max_age_hours * 3600)
+        logger.info(f"Cleaned up {count} stale media workspaces")
+        return f"Cleaned up {count} stale media workspaces"
         
-        for filename in os.listdir(temp_dir):
-            if filename.endswith(('.mp4', '.avi', '.mov', '.mkv', '.jpg', '.png')) and filename.startswith('tmp'):
-                file_path = os.path.join(temp_dir, filename)
-                try:
-                    # Delete files older than 1 hour
-                    if os.path.getmtime(file_path) < (timezone.now().timestamp() - 3600):
-                        os.unlink(file_path)
-                        count += 1
-                except Exception:
-                    pass
+    except Exception as e:
+        logger.error(f"Error cleaning up media workspaces: {str(e)}")
+        return f"Error: {str(e)}"
+
+
+@shared_task
+def record_video_queue_depths():
+    """Report how many jobs wait in each video lane"""
+    try:
+        with current_app.connection_for_read() as connection:
+            depths = record_queue_depths(connection)
+        return f"Video queue depths: {depths}"
         
-        logger.info(f"Cleaned up {count} temporary files")
-        return f"Cleaned up {count} temporary files"
+    except Exception as e:
+        logger.error(f"Error reading video queue depths: {str(e)}")
+        return f"Error: {str(e)}"
+
+
+@shared_task
+def flush_video_views():
+    """Write buffered views to VideoView and ``view_count`` in bulk"""
+    try:
+        count = view_counter.flush()
+        return f"Flushed {count} video views"
         
     except Exception as e:
-        logger.error(f"Error cleaning up temporary files: {str(e)}")
+        logger.error(f"Error flushing video views: {str(e)}")
         return f"Error: {str(e)}"
+
+
+@shared_task
+def reconcile_video_like_counts():
+    """Repair ``like_count`` drift against the stored like rows"""
+    try:
+        count = reconcile_like_counts()
+        if count:
+            logger.warning(f"Corrected like_count on {count} videos")
+        return f"Corrected like_count on {count} videos"
+        
+    except Exception as e:
+        logger.error(f"Error reconciling like counts: {str(e)}")
+        return f"Error: {str(e)}"
+
+
+# Processing DAG
+#
+#   prepare (validate + metadata)
+#     -> chord(group(thumbnails, transcode[rendition group] ...), package + finalize)
+#
+# Every stage checks its checkpoint on VideoProcessing first, so re-running
+# the pipeline (or a retried stage) resumes from the first unfinished stage.
+
+def _checkpoint(video_id, **changes):
+    VideoProcessing.objects.filter(video_id=video_id).update(updated_at=timezone.now(), **changes)
+
+
+def _record_renditions(video_id, rendition_names):
+    """Append finished renditions; concurrent transcode tasks serialize on the row lock"""
+    with transaction.atomic():
+        record = VideoProcessing.objects.select_for_update().get(video_id=video_id)
+        generated = list(record.resolutions_generated)
+        generated += [name for name in rendition_names if name not in generated]
+        record.resolutions_generated = generated
+        record.save(update_fields=['resolutions_generated', 'updated_at'])
+
+
+def _fail_stage(task, video_id, stage, exc):
+    """Retry the stage with backoff; once retries run out mark the run failed but keep checkpoints"""
+    if task.request.retries < task.max_retries:
+        raise task.retry(exc=exc, countdown=60 * 2 ** task.request.retries)
+    logger.error(f"Video {video_id} failed at stage {stage}: {str(exc)}")
+    _checkpoint(video_id, status='failed', error_message=f"{stage}: {exc}")
+    Video.objects.filter(id=video_id).update(status='failed')
+    abandon_asset(video_id)
+    MediaWorkspace.for_video(video_id).cleanup()
+    raise exc
+
+
+@shared_task
+def start_video_processing(video_id):
+    """Start (or resume) the processing DAG for a video"""
+    record, _ = VideoProcessing.objects.get_or_create(video_id=video_id)
+    if record.status == 'completed':
+        return f"Video {video_id} already processed"
+    
+    _checkpoint(
+        video_id,
+        status='processing',
+        error_message='',
+        processing_started_at=record.processing_started_at or timezone.now(),
+    )
+    Video.objects.filter(id=video_id).update(status='processing')
+    prepare_video_stage.delay(video_id)
+    return f"Started processing for video {video_id}"
+
+
+@shared_task(
+    bind=True, max_retries=3, acks_late=True,
+    soft_time_limit=FAST_TASK_SOFT_TIME_LIMIT, time_limit=FAST_TASK_SOFT_TIME_LIMIT + HARD_TIME_LIMIT_GRACE,
+)
+def prepare_video_stage(self, video_id):
+    """Validate and probe the source, then fan out the parallel stages"""
+    try:
+        processor = VideoProcessor(video_id)
+        record = VideoProcessing.objects.get(video_id=video_id)
+        
+        # Identical content already processed (or being processed) for another video
+        if processor.video.file:
+            content_hash = processor.video.content_hash or processor.workspace.content_hash(processor.video.file)
+            claim = claim_asset(processor.video, content_hash)
+            if claim != OWNER:
+                processor.workspace.cleanup()
+                return f"Video {video_id} {claim} to asset {content_hash[:12]}"
+        
+        if not record.metadata_extracted:
+            with processor.timings.stage('validate'):
+                if not processor.validate_video():
+                    raise ValueError("Invalid video file")
+            with processor.timings.stage('metadata'):
+                if processor.extract_metadata() is None:
+                    raise ValueError("Could not read video metadata")
+            _checkpoint(video_id, metadata_extracted=True, progress_percentage=20)
+        
+        pending = [
+            rendition.name for rendition in processor.select_renditions()
+            if rendition.name not in record.resolutions_generated
+        ]
+    except Exception as e:
+        _fail_stage(self, video_id, 'prepare', e)
+    
+    branches = []
+    if not record.thumbnail_generated:
+        branches.append(generate_thumbnails_stage.si(video_id))
+    for start in range(0, len(pending), VIDEO_RENDITIONS_PER_TASK):
+        branches.append(transcode_renditions_stage.si(video_id, pending[start:start + VIDEO_RENDITIONS_PER_TASK]))
+    
+    finalize = package_and_finalize_stage.si(video_id)
+    if branches:
+        chord(group(branches))(finalize)
+    else:
+        finalize.delay()
+    return f"Scheduled {len(branches)} parallel stages for video {video_id}"
+
+
+@shared_task(
+    bind=True, max_retries=3, acks_late=True,
+    soft_time_limit=FAST_TASK_SOFT_TIME_LIMIT, time_limit=FAST_TASK_SOFT_TIME_LIMIT + HARD_TIME_LIMIT_GRACE,
+)
+def generate_thumbnails_stage(self, video_id):
+    """Poster thumbnail and preview images"""
+    try:
+        processor = VideoProcessor(video_id)
+        with processor.timings.stage('thumbnails'):
+            if not processor.generate_thumbnails():
+                raise ValueError("Thumbnail generation failed")
+        _checkpoint(video_id, thumbnail_generated=True)
+    except Exception as e:
+        _fail_stage(self, video_id, 'thumbnails', e)
+    return 'thumbnails'
+
+
+@shared_task(
+    bind=True, max_retries=3, acks_late=True,
+    soft_time_limit=TRANSCODE_TASK_SOFT_TIME_LIMIT,
+    time_limit=TRANSCODE_TASK_SOFT_TIME_LIMIT + HARD_TIME_LIMIT_GRACE,
+)
+def transcode_renditions_stage(self, video_id, rendition_names):
+    """Encode one group of renditions (single decode for the whole group)"""
+    try:
+        processor = VideoProcessor(video_id)
+        renditions = [
+            rendition for rendition in processor.select_renditions()
+            if rendition.name in rendition_names
+        ]
+        processor.transcode(renditions)
+        _record_renditions(video_id, rendition_names)
+    except Exception as e:
+        _fail_stage(self, video_id, f"transcode:{','.join(rendition_names)}", e)
+    return rendition_names
+
+
+@shared_task(
+    bind=True, max_retries=3, acks_late=True,
+    soft_time_limit=FAST_TASK_SOFT_TIME_LIMIT, time_limit=FAST_TASK_SOFT_TIME_LIMIT + HARD_TIME_LIMIT_GRACE,
+)
+def package_and_finalize_stage(self, video_id):
+    """Package every finished rendition and mark the video ready"""
+    try:
+        processor = VideoProcessor(video_id)
+        record = VideoProcessing.objects.get(video_id=video_id)
+        
+        if not (processor.video.streaming_manifest or {}).get('hls'):
+            outputs = processor.processed_outputs(record.resolutions_generated)
+            renditions = [
+                rendition for rendition in processor.select_renditions()
+                if rendition.name in outputs
+            ]
+            processor.package(outputs, renditions)
+        
+        now = timezone.now()
+        _checkpoint(video_id, status='completed', progress_percentage=100, processing_completed_at=now)
+        Video.objects.filter(id=video_id).update(status='ready', updated_at=now)
+        
+        # Share the output with every upload of the same content
+        if processor.video.asset_id:
+            outputs = processor.processed_outputs(record.resolutions_generated)
+            publish_asset(
+                video_id,
+                artifact_names=list(outputs.values()),
+                renditions=record.resolutions_generated,
+            )
+    except Exception as e:
+        _fail_stage(self, video_id, 'package', e)
+    # Every stage has run; the job's source copy is no longer needed
+    processor.workspace.cleanup()
+    return f"Video {video_id} processed"
@@ -0,0 +1,191 @@
+"""
+Single-pass multi-rendition transcoding
+
+The source is decoded once and fanned out through an ffmpeg ``split`` filter
+into one scaled branch per rendition, so adding a rendition costs an extra
+encode but never an extra decode.
+"""
+
+import logging
+import os
+import subprocess
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+from shared.observability import observability
+
+logger = logging.getLogger(__name__)
+
+TRANSCODE_TIMEOUT = getattr(settings, 'VIDEO_TRANSCODE_TIMEOUT', 3600)
+TRANSCODE_PRESET = getattr(settings, 'VIDEO_TRANSCODE_PRESET', 'medium')
+# Threads per ffmpeg process; transcode workers are sized as cores // threads
+FFMPEG_THREADS = getattr(settings, 'VIDEO_FFMPEG_THREADS', 2)
+# Keyframe interval shared by every rendition so they can be segmented on the same boundaries
+KEYFRAME_INTERVAL_SECONDS = 2
+
+
+class TranscodingError(Exception):
+    """Raised when ffmpeg fails or times out"""
+
+
+def run_ffmpeg(cmd: List[str], timeout: int, operation: str = 'ffmpeg') -> subprocess.CompletedProcess:
+    """
+    Run an ffmpeg/ffprobe command with a hard timeout. The child is killed
+    when it expires and ``TranscodingError`` is raised.
+    """
+    try:
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired as e:
+        observability.record_metric('video.ffmpeg.timeout', 1, tags={'operation': operation})
+        raise TranscodingError(f"{operation} timed out after {timeout}s") from e
+
+
+@dataclass(frozen=True)
+class Rendition:
+    """One output quality of the transcoding ladder"""
+
+    name: str
+    width: int
+    height: int
+    video_bitrate: str
+    audio_bitrate: str = '128k'
+
+
+def renditions_from_presets(presets: Dict[str, Dict]) -> List[Rendition]:
+    """Build renditions from ``{'720p': {'width', 'height', 'bitrate'}}`` style presets"""
+    return [
+        Rendition(name, preset['width'], preset['height'], preset['bitrate'])
+        for name, preset in presets.items()
+    ]
+
+
+def select_renditions(renditions: Iterable[Rendition], source_height: Optional[int]) -> List[Rendition]:
+    """Drop renditions that would upscale the source, highest quality first"""
+    selected = [
+        rendition for rendition in renditions
+        if not source_height or rendition.height <= source_height
+    ]
+    return sorted(selected, key=lambda rendition: rendition.height, reverse=True)
+
+
+def _bufsize(bitrate):
+    """Twice the target bitrate, keeping the ``k``/``M`` suffix ffmpeg expects"""
+    number, suffix = bitrate[:-1], bitrate[-1]
+    if suffix.isdigit():
+        return str(int(bitrate) * 2)
+    return f"{int(float(number) * 2)}{suffix}"
+
+
+def build_filter_graph(renditions: List[Rendition]) -> str:
+    """``split`` the decoded video once, then scale each branch to its rendition"""
+    branches = ''.join(f"[s{index}]" for index in range(len(renditions)))
+    graph = [f"[0:v]split={len(renditions)}{branches}"]
+    for index, rendition in enumerate(renditions):
+        # -2 keeps the aspect ratio with an even width, which libx264 requires
+        graph.append(f"[s{index}]scale=-2:{rendition.height}[v{index}]")
+    return ';'.join(graph)
+
+
+def build_transcode_command(input_path: str, outputs: List[tuple], preset: str = TRANSCODE_PRESET,
+                            threads: int = FFMPEG_THREADS) -> List[str]:
+    """
+    Build one ffmpeg invocation for every ``(rendition, output_path)`` pair.
+    Audio is optional (``0:a:0?``) so silent sources don't fail the run.
+    Decoder, filters and each encoder are capped at ``threads`` so a worker
+    slot never uses more cores than it was sized for.
+    """
+    renditions = [rendition for rendition, _ in outputs]
+    cmd = [
+        'ffmpeg', '-hide_banner', '-nostdin', '-y',
+        '-threads', str(threads),
+        '-i', input_path,
+        '-filter_complex_threads', str(threads),
+        '-filter_complex', build_filter_graph(renditions),
+    ]
+    for index, (rendition, output_path) in enumerate(outputs):
+        cmd += [
+            '-map', f'[v{index}]',
+            '-map', '0:a:0?',
+            '-c:v', 'libx264',
+            '-threads', str(threads),
+            '-preset', preset,
+            '-b:v', rendition.video_bitrate,
+            '-maxrate', rendition.video_bitrate,
+            '-bufsize', _bufsize(rendition.video_bitrate),
+            '-force_key_frames', f'expr:gte(t,n_forced*{KEYFRAME_INTERVAL_SECONDS})',
+            '-c:a', 'aac',
+            '-b:a', rendition.audio_bitrate,
+            '-movflags', '+faststart',
+            output_path,
+        ]
+    return cmd
+
+
+class StageTimings:
+    """Wall-clock timings for the stages of one processing run"""
+
+    def __init__(self, pipeline='video'):
+        self.pipeline = pipeline
+        self.stages: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        status = 'ok'
+        try:
+            yield
+        except Exception:
+            status = 'failed'
+            raise
+        finally:
+            elapsed_ms = int((time.perf_counter() - started) * 1000)
+            self.stages[name] = elapsed_ms
+            observability.record_metric(
+                'video.pipeline.stage_ms', elapsed_ms,
+                tags={'pipeline': self.pipeline, 'stage': name, 'status': status},
+            )
+
+
+def rendition_output_path(output_dir: str, filename_base: str, rendition: Rendition) -> str:
+    return os.path.join(output_dir, f"{filename_base}_{rendition.name}.mp4")
+
+
+def transcode_renditions(input_path: str, output_dir: str, renditions: List[Rendition],
+                         filename_base: str = 'output', timeout: int = TRANSCODE_TIMEOUT,
+                         timings: Optional[StageTimings] = None) -> Dict[str, str]:
+    """
+    Encode every rendition from a single decode of ``input_path``.
+
+    Returns ``{rendition name: output path}``. Raises ``TranscodingError``
+    if ffmpeg fails, times out, or leaves an output missing.
+    """
+    if not renditions:
+        return {}
+
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = [
+        (rendition, rendition_output_path(output_dir, filename_base, rendition))
+        for rendition in renditions
+    ]
+    cmd = build_transcode_command(input_path, outputs)
+
+    timings = timings or StageTimings()
+    with timings.stage('transcode'):
+        result = run_ffmpeg(cmd, timeout, operation='transcode')
+
+    if result.returncode != 0:
+        raise TranscodingError(f"ffmpeg exited with {result.returncode}: {result.stderr[-2000:]}")
+
+    missing = [rendition.name for rendition, path in outputs if not os.path.exists(path)]
+    if missing:
+        raise TranscodingError(f"ffmpeg did not produce renditions: {', '.join(missing)}")
+
+    logger.info(
+        "Transcoded %s into %d renditions in %sms",
+        input_path, len(outputs), timings.stages.get('transcode'),
+    )
+    return {rendition.name: path for rendition, path in outputs}
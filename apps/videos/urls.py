@@ -8,6 +8,7 @@ from .views import (
     VideoViewSet, 
     VideoCommentViewSet,
     VideoUploadView, 
+    VideoUploadChunkView,
     VideoUploadCompleteView, 
     VideoUploadStatusView, 
     VideoSearchView,
@@ -52,6 +53,7 @@ urlpatterns = [
     # Upload endpoints
     path('upload/', VideoUploadView.as_view(), name='upload'),
     path('upload/s3/', S3VideoUploadView.as_view(), name='s3_upload'),
+    path('upload/<uuid:upload_id>/chunks/', VideoUploadChunkView.as_view(), name='upload_chunks'),
     path('upload/<uuid:upload_id>/complete/', VideoUploadCompleteView.as_view(), name='upload_complete'),
     path('upload/<uuid:upload_id>/status/', VideoUploadStatusView.as_view(), name='upload_status'),
     
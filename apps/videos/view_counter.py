@@ -0,0 +1,240 @@
+"""
+Buffered video view counting
+
+Detail and stream requests record a view with one round trip to Redis
+instead of a VideoView insert plus a contended ``view_count`` update. Repeat
+views by the same viewer within a dedup window are dropped by a Bloom
+filter: one bitmap per window, k bits per (video, viewer). Counted views
+are buffered as per-video counters plus pending VideoView rows.
+``flush_video_views`` (apps.videos.tasks) drains the buffer periodically
+into one bulk insert and one ``view_count`` UPDATE per batch. Without a
+Redis cache backend (local development, tests) an in-process buffer with the
+same interface is used; it is flushed by the process that buffered it.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from shared.observability import observability
+
+logger = logging.getLogger(__name__)
+
+VIEW_DEDUP_WINDOW = getattr(settings, 'VIDEO_VIEW_DEDUP_WINDOW', 30 * 60)
+VIEW_FLUSH_BATCH = getattr(settings, 'VIDEO_VIEW_FLUSH_BATCH', 5000)
+VIEW_FLUSH_INTERVAL = getattr(settings, 'VIDEO_VIEW_FLUSH_INTERVAL', 30)
+# False-positive rate ~1% up to ~1M views per window at 10M bits / 7 hashes
+BLOOM_BITS = getattr(settings, 'VIDEO_VIEW_BLOOM_BITS', 10 * 1024 * 1024)
+BLOOM_HASHES = 7
+
+VIEW_KEY_PREFIX = 'video_views:v1'
+COUNTS_KEY = f"{VIEW_KEY_PREFIX}:counts"
+ROWS_KEY = f"{VIEW_KEY_PREFIX}:rows"
+
+
+def current_window(now=None) -> int:
+    return int((now or time.time()) // VIEW_DEDUP_WINDOW)
+
+
+def bloom_positions(member: str, bits: int = BLOOM_BITS, hashes: int = BLOOM_HASHES) -> List[int]:
+    """Bit offsets for ``member``, from two 64-bit halves of one digest (Kirsch-Mitzenmacher)"""
+    digest = hashlib.blake2b(member.encode(), digest_size=16).digest()
+    h1, h2 = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big')
+    return [(h1 + index * h2) % bits for index in range(hashes)]
+
+
+class RedisViewCounterStore:
+    """Bloom filter bitmaps, a counter hash and a row list in Redis"""
+
+    shared = True
+
+    def __init__(self, connection, bits=BLOOM_BITS, hashes=BLOOM_HASHES):
+        self.connection = connection
+        self.bits = bits
+        self.hashes = hashes
+
+    def record(self, window, member, video_id, row) -> bool:
+        key = f"{VIEW_KEY_PREFIX}:seen:{window}"
+        pipe = self.connection.pipeline(transaction=False)
+        for position in bloom_positions(member, self.bits, self.hashes):
+            pipe.setbit(key, position, 1)
+        pipe.expire(key, VIEW_DEDUP_WINDOW * 2)
+        previous = pipe.execute()[:-1]
+        if all(previous):
+            return False  # every bit was already set: seen in this window
+
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.hincrby(COUNTS_KEY, str(video_id), 1)
+        pipe.rpush(ROWS_KEY, json.dumps(row))
+        pipe.execute()
+        return True
+
+    def pending(self, video_id) -> int:
+        return max(0, int(self.connection.hget(COUNTS_KEY, str(video_id)) or 0))
+
+    def drain(self, limit) -> Tuple[Dict[str, int], List[Dict]]:
+        # MULTI/EXEC: views recorded meanwhile land wholly before or after
+        pipe = self.connection.pipeline(transaction=True)
+        pipe.lrange(ROWS_KEY, 0, limit - 1)
+        pipe.ltrim(ROWS_KEY, limit, -1)
+        raw_rows = pipe.execute()[0]
+        rows = [json.loads(row) for row in raw_rows]
+        counts = Counter(row['video_id'] for row in rows)
+        if counts:
+            pipe = self.connection.pipeline(transaction=True)
+            for video_id, count in counts.items():
+                pipe.hincrby(COUNTS_KEY, video_id, -count)
+            pipe.execute()
+        return dict(counts), rows
+
+    def restore(self, rows) -> None:
+        pipe = self.connection.pipeline(transaction=True)
+        for row in rows:
+            pipe.hincrby(COUNTS_KEY, row['video_id'], 1)
+        pipe.lpush(ROWS_KEY, *[json.dumps(row) for row in reversed(rows)])
+        pipe.execute()
+
+
+class MemoryViewCounterStore:
+    """Per-process buffer with exact dedup, for non-Redis cache backends"""
+
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = {}
+        self._rows = []
+
+    def record(self, window, member, video_id, row) -> bool:
+        with self._lock:
+            # Older windows can't be hit again
+            for stale in [key for key in self._seen if key < window]:
+                del self._seen[stale]
+            seen = self._seen.setdefault(window, set())
+            if member in seen:
+                return False
+            seen.add(member)
+            self._rows.append(row)
+            return True
+
+    def pending(self, video_id) -> int:
+        with self._lock:
+            return sum(1 for row in self._rows if row['video_id'] == str(video_id))
+
+    def drain(self, limit) -> Tuple[Dict[str, int], List[Dict]]:
+        with self._lock:
+            rows, self._rows = self._rows[:limit], self._rows[limit:]
+        return dict(Counter(row['video_id'] for row in rows)), rows
+
+    def restore(self, rows) -> None:
+        with self._lock:
+            self._rows[:0] = rows
+
+
+def _default_store():
+    try:
+        from django_redis import get_redis_connection
+
+        return RedisViewCounterStore(get_redis_connection('default'))
+    except (ImportError, NotImplementedError):
+        return MemoryViewCounterStore()
+
+
+def _viewer(user, ip_address) -> str:
+    return f"u:{user.pk}" if getattr(user, 'is_authenticated', False) else f"ip:{ip_address}"
+
+
+class ViewCounter:
+    """Record views cheaply and flush them to the database in batches"""
+
+    def __init__(self, store=None):
+        self._store = store
+        self._last_local_flush = time.monotonic()
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = _default_store()
+        return self._store
+
+    def record_view(self, video, user, ip_address, user_agent='') -> bool:
+        """Count a view unless this viewer already viewed ``video`` in the current window"""
+        video_id = str(getattr(video, 'pk', video))
+        row = {
+            'video_id': video_id,
+            'user_id': str(user.pk) if getattr(user, 'is_authenticated', False) else None,
+            'ip_address': ip_address,
+            'user_agent': (user_agent or '')[:1000],
+        }
+        try:
+            counted = self.store.record(current_window(), f"{video_id}:{_viewer(user, ip_address)}", video_id, row)
+        except Exception as e:
+            # Views are best-effort; never fail the request over them
+            logger.error(f"Error recording view for video {video_id}: {str(e)}")
+            return False
+        observability.record_metric('video.views.recorded', 1, tags={'counted': str(counted).lower()})
+        if counted and not self.store.shared:
+            self._flush_local()
+        return counted
+
+    def _flush_local(self):
+        # A worker can't reach another process's buffer, so flush it here
+        if time.monotonic() - self._last_local_flush < VIEW_FLUSH_INTERVAL:
+            return
+        self._last_local_flush = time.monotonic()
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing buffered views: {str(e)}")
+
+    def pending_views(self, video_id) -> int:
+        """Counted views not flushed yet, so responses can show an up-to-date total"""
+        try:
+            return self.store.pending(video_id)
+        except Exception:
+            return 0
+
+    def flush(self, batch_size: int = VIEW_FLUSH_BATCH) -> int:
+        """Write buffered views to the database; returns how many were written"""
+        from .models import Video, VideoView
+
+        flushed = 0
+        while True:
+            counts, rows = self.store.drain(batch_size)
+            if not rows:
+                return flushed
+            try:
+                with transaction.atomic():
+                    existing = {
+                        str(video_id) for video_id in
+                        Video.objects.filter(id__in=list(counts)).order_by().values_list('id', flat=True)
+                    }
+                    VideoView.objects.bulk_create([
+                        VideoView(
+                            video_id=row['video_id'], user_id=row['user_id'],
+                            ip_address=row['ip_address'], user_agent=row['user_agent'],
+                        )
+                        for row in rows if row['video_id'] in existing
+                    ], batch_size=1000)
+                    Video.objects.filter(id__in=existing).update(view_count=F('view_count') + Case(
+                        *[When(id=video_id, then=Value(counts[video_id])) for video_id in existing],
+                        default=Value(0), output_field=IntegerField(),
+                    ))
+            except Exception:
+                self.store.restore(rows)
+                raise
+            flushed += len(rows)
+            observability.record_metric('video.views.flushed', len(rows), tags={'videos': str(len(existing))})
+            if len(rows) < batch_size:
+                return flushed
+
+
+view_counter = ViewCounter()
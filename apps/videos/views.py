@@ -2,29 +2,40 @@
 Video views for Watch Party Backend
 """
 
+import mimetypes
 from datetime import timedelta
 from django.utils import timezone
-from django.db.models import Q, F
-from django.http import FileResponse
+from django.db.models import Q
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from rest_framework import status, generics, permissions, filters
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework.exceptions import ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema
 
 from apps.integrations.services.google_drive import get_drive_service
+from apps.users.friend_graph import friend_graph
 
-from .models import Video, VideoLike, VideoComment, VideoView, VideoUpload
+from .models import Video, VideoComment, VideoView, VideoUpload
 from .serializers import (
     VideoSerializer, VideoDetailSerializer, VideoCreateSerializer,
     VideoUpdateSerializer, VideoCommentSerializer, VideoUploadSerializer,
     VideoUploadCreateSerializer, VideoSearchSerializer
 )
+from .drive_proxy import drive_media_url, drive_proxy
+from .likes import toggle_like
+from .range_streaming import RangeNotSatisfiable, serve_file
+from .resumable_upload import (
+    UPLOAD_CHUNK_MAX_BYTES, UploadError, abort_upload, append_chunk, begin_upload, check_declared_size,
+)
+from .view_counter import view_counter
 from shared.permissions import IsOwnerOrReadOnly, IsAdminUser
 
 
@@ -61,7 +72,7 @@ class VideoViewSet(ModelViewSet):
         return queryset.filter(
             Q(visibility='public') |
             Q(uploader=user) |
-            Q(visibility='friends', uploader__in=user.friends.all())
+            Q(visibility='friends', uploader_id__in=friend_graph.get_friend_ids(user.id))
         ).distinct()
     
     def retrieve(self, request, *args, **kwargs):
@@ -75,16 +86,15 @@ class VideoViewSet(ModelViewSet):
                 status=status.HTTP_402_PAYMENT_REQUIRED
             )
         
-        # Record view
+        # Record view; counts are buffered and flushed in bulk
         if request.user.is_authenticated:
-            VideoView.objects.create(
-                video=instance,
-                user=request.user,
-                ip_address=self.get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
+            view_counter.record_view(
+                instance,
+                request.user,
+                self.get_client_ip(request),
+                request.META.get('HTTP_USER_AGENT', '')
             )
-            # Update view count
-            Video.objects.filter(id=instance.id).update(view_count=F('view_count') + 1)
+        instance.view_count += view_counter.pending_views(instance.id)
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -95,35 +105,13 @@ class VideoViewSet(ModelViewSet):
         video = self.get_object()
         is_like = request.data.get('is_like', True)
         
-        like_obj, created = VideoLike.objects.get_or_create(
-            user=request.user, 
-            video=video,
-            defaults={'is_like': is_like}
-        )
-        
-        if not created:
-            if like_obj.is_like == is_like:
-                # Remove like/dislike if clicking same action
-                like_obj.delete()
-            else:
-                # Update like/dislike
-                like_obj.is_like = is_like
-                like_obj.save()
-        else:
-            pass
-        
-        # Update like count
-        like_count = video.likes.filter(is_like=True).count()
-        Video.objects.filter(id=video.id).update(like_count=like_count)
-        
-        # Check if user still has like record
-        current_like = VideoLike.objects.filter(user=request.user, video=video).first()
+        result = toggle_like(video, request.user, is_like)
         
         # Return response in expected format
         return Response({
             'success': True,
-            'is_liked': current_like.is_like if current_like else False,
-            'like_count': like_count
+            'is_liked': result.is_liked,
+            'like_count': result.like_count
         })
     
     @action(detail=True, methods=['get', 'post'], permission_classes=[permissions.IsAuthenticated])
@@ -158,14 +146,16 @@ class VideoViewSet(ModelViewSet):
         if not video.file:
             return Response({'error': 'Video file not available'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Return file response for streaming
-        response = FileResponse(
-            video.file.open(), 
-            content_type='video/mp4',
-            as_attachment=False
-        )
-        response['Accept-Ranges'] = 'bytes'
-        return response
+        try:
+            path = video.file.path
+        except NotImplementedError:
+            # Remote storage (S3) serves ranges itself
+            return HttpResponseRedirect(video.file.url)
+        
+        # Honour Range requests so seeking doesn't restart from byte 0;
+        # nginx serves the bytes when X-Accel-Redirect is configured
+        content_type = mimetypes.guess_type(video.file.name)[0] or 'video/mp4'
+        return serve_file(request, path, content_type=content_type, accel_name=video.file.name)
     
     @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def download(self, request, pk=None):
@@ -243,23 +233,29 @@ class VideoUploadView(generics.GenericAPIView):
     """Handle video upload initiation"""
     
     permission_classes = [permissions.IsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
     serializer_class = VideoUploadCreateSerializer
     
     @extend_schema(
         summary="Video Upload",
-        description="Initiate video upload",
+        description="Initiate a resumable video upload; bytes are then PATCHed to upload_url",
         responses={200: VideoUploadCreateSerializer}
     )
     def post(self, request):
         """Initiate video upload"""
         serializer = VideoUploadCreateSerializer(data=request.data)
         if serializer.is_valid():
+            try:
+                check_declared_size(serializer.validated_data['file_size'])
+            except UploadError as e:
+                return Response({'success': False, 'error': str(e)}, status=e.status_code)
+            
             # Create upload record
             upload = VideoUpload.objects.create(
                 user=request.user,
                 filename=serializer.validated_data['filename'],
                 file_size=serializer.validated_data['file_size'],
+                content_type=serializer.validated_data['content_type'],
                 status='pending'
             )
             
@@ -274,12 +270,16 @@ class VideoUploadView(generics.GenericAPIView):
             )
             
             upload.video = video
+            upload.upload_url = request.build_absolute_uri(reverse('videos:upload_chunks', args=[upload.id]))
             upload.save()
+            begin_upload(upload)
             
             return Response({
                 'success': True,
                 'upload_id': upload.id,
                 'video_id': video.id,
+                'upload_url': upload.upload_url,
+                'chunk_size': UPLOAD_CHUNK_MAX_BYTES,
                 'message': 'Video upload initiated successfully',
                 'status': 'ready_for_upload'
             }, status=status.HTTP_201_CREATED)
@@ -290,6 +290,60 @@ class VideoUploadView(generics.GenericAPIView):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+class VideoUploadChunkView(APIView):
+    """Resumable upload endpoint: HEAD for the offset, PATCH to append, DELETE to abort"""
+    
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def _offset_response(self, upload, status_code=status.HTTP_204_NO_CONTENT):
+        response = HttpResponse(status=status_code)
+        response['Upload-Offset'] = str(upload.bytes_received)
+        response['Upload-Length'] = str(upload.file_size)
+        response['Cache-Control'] = 'no-store'
+        return response
+    
+    @extend_schema(summary="VideoUploadChunkView HEAD")
+    def head(self, request, upload_id):
+        """Report how many bytes the server holds so the client can resume"""
+        upload = get_object_or_404(VideoUpload, id=upload_id, user=request.user)
+        return self._offset_response(upload, status.HTTP_200_OK)
+    
+    @extend_schema(summary="VideoUploadChunkView PATCH")
+    def patch(self, request, upload_id):
+        """Append the raw request body at Upload-Offset"""
+        upload = get_object_or_404(VideoUpload, id=upload_id, user=request.user)
+        
+        if request.content_type != 'application/offset+octet-stream':
+            return Response(
+                {'error': 'Content-Type must be application/offset+octet-stream'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            return Response({'error': 'Upload-Offset and Content-Length are required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            # Read straight from the request stream; request.data would buffer the body
+            append_chunk(upload, offset, request.stream, length)
+        except UploadError as e:
+            response = self._offset_response(upload, e.status_code)
+            response.content = str(e)
+            return response
+        
+        return self._offset_response(upload)
+    
+    @extend_schema(summary="VideoUploadChunkView DELETE")
+    def delete(self, request, upload_id):
+        """Abort the upload and discard staged bytes"""
+        upload = get_object_or_404(VideoUpload, id=upload_id, user=request.user)
+        if upload.status == 'completed':
+            return Response({'error': 'Upload already completed'}, status=status.HTTP_400_BAD_REQUEST)
+        abort_upload(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class VideoUploadCompleteView(APIView):
     """Mark video upload as complete"""
     
@@ -300,9 +354,19 @@ class VideoUploadCompleteView(APIView):
         """Complete video upload"""
         upload = get_object_or_404(VideoUpload, id=upload_id, user=request.user)
         
+        # Chunked uploads complete themselves with their last chunk
+        if upload.status == 'completed':
+            return Response({'status': 'completed'})
+        
         if upload.status != 'uploading':
             return Response({'error': 'Upload not in progress'}, status=status.HTTP_400_BAD_REQUEST)
         
+        if upload.storage_key and upload.bytes_received < upload.file_size:
+            return Response({
+                'error': 'Upload incomplete',
+                'bytes_received': upload.bytes_received
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
         # Mark as completed
         upload.status = 'completed'
         upload.progress_percentage = 100.0
@@ -381,7 +445,7 @@ class VideoSearchView(generics.GenericAPIView):
                 queryset = queryset.filter(
                     Q(visibility='public') |
                     Q(uploader=user) |
-                    Q(visibility='friends', uploader__in=user.friends.all())
+                    Q(visibility='friends', uploader_id__in=friend_graph.get_friend_ids(user.id))
                 ).distinct()
             
             # Paginate results
@@ -672,7 +736,7 @@ class GoogleDriveMovieStreamView(APIView):
                     'message': 'Access denied'
                 }, status=status.HTTP_403_FORBIDDEN)
             elif video.visibility == 'friends':
-                if video.uploader != request.user and not video.uploader.friends.filter(id=request.user.id).exists():
+                if video.uploader_id != request.user.id and not friend_graph.are_friends(video.uploader_id, request.user.id):
                     return Response({
                         'success': False,
                         'message': 'Access denied'
@@ -691,20 +755,19 @@ class GoogleDriveMovieStreamView(APIView):
             # Get streaming URL
             streaming_url = drive_service.generate_streaming_url(video.gdrive_file_id)
             
-            # Record view
-            VideoView.objects.create(
-                video=video,
-                user=request.user,
-                ip_address=self.get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')
+            # Record view; counts are buffered and flushed in bulk
+            view_counter.record_view(
+                video,
+                request.user,
+                self.get_client_ip(request),
+                request.META.get('HTTP_USER_AGENT', '')
             )
             
-            # Update view count
-            Video.objects.filter(id=video.id).update(view_count=F('view_count') + 1)
-            
             return Response({
                 'success': True,
                 'streaming_url': streaming_url,
+                # Served from the shared chunk cache that party prefetch warms
+                'proxy_url': request.build_absolute_uri(reverse('videos:video_proxy', args=[video.id])),
                 'video': VideoDetailSerializer(video, context={'request': request}).data
             }, status=status.HTTP_200_OK)
             
@@ -730,9 +793,6 @@ class VideoProxyView(APIView):
     def get(self, request, video_id):
         """Proxy video stream from Google Drive"""
         try:
-            import requests
-            from django.http import StreamingHttpResponse
-            
             # Get video
             video = get_object_or_404(Video, id=video_id, source_type='gdrive')
             
@@ -740,43 +800,36 @@ class VideoProxyView(APIView):
             if video.visibility == 'private' and video.uploader != request.user:
                 return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
             elif video.visibility == 'friends':
-                if video.uploader != request.user and not video.uploader.friends.filter(id=request.user.id).exists():
+                if video.uploader_id != request.user.id and not friend_graph.are_friends(video.uploader_id, request.user.id):
                     return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
             
             # Check premium requirement
             if video.require_premium and not request.user.is_subscription_active:
                 return Response({'error': 'Premium subscription required'}, status=status.HTTP_402_PAYMENT_REQUIRED)
             
-            # Get Drive service
-            drive_service = get_drive_service(video.uploader)
-            
-            # Get download URL
-            download_url = drive_service.get_download_url(video.gdrive_file_id)
+            # The Drive client is only built when a chunk misses the cache
+            drive_service = None
             
-            # Set up headers for range requests
-            headers = {}
-            if 'Range' in request.headers:
-                headers['Range'] = request.headers['Range']
+            def auth_headers():
+                nonlocal drive_service
+                if drive_service is None:
+                    drive_service = get_drive_service(video.uploader)
+                return drive_service.get_auth_headers()
             
-            # Make request to Google Drive
-            response = requests.get(download_url, headers=headers, stream=True)
-            
-            # Create streaming response
-            def generate():
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        yield chunk
-            
-            streaming_response = StreamingHttpResponse(
-                generate(),
-                content_type=response.headers.get('Content-Type', 'video/mp4'),
-                status=response.status_code
-            )
+            download_url = drive_media_url(video.gdrive_file_id)
+            try:
+                status_code, headers, body = drive_proxy.open_range(
+                    video.gdrive_file_id, download_url, auth_headers, request.headers.get('Range')
+                )
+            except RangeNotSatisfiable:
+                meta = drive_proxy.get_meta(video.gdrive_file_id) or {}
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f"bytes */{meta.get('size', '*')}"
+                return response
             
-            # Copy relevant headers
-            for header in ['Content-Length', 'Content-Range', 'Accept-Ranges']:
-                if header in response.headers:
-                    streaming_response[header] = response.headers[header]
+            streaming_response = StreamingHttpResponse(body, status=status_code)
+            for header, value in headers.items():
+                streaming_response[header] = value
             
             return streaming_response
             
@@ -1078,7 +1131,33 @@ class VideoQualityVariantsView(APIView):
                     'error': 'Permission denied'
                 }, status=status.HTTP_403_FORBIDDEN)
             
-            # Return available quality variants
+            manifest = video.streaming_manifest or {}
+            if manifest.get('hls'):
+                # Adaptive streams: players load the master playlist and
+                # switch renditions themselves
+                quality_variants = [
+                    {
+                        'quality': variant['name'],
+                        'url': default_storage.url(variant['playlist']),
+                        'width': variant['width'],
+                        'height': variant['height'],
+                        'bandwidth': variant['bandwidth'],
+                        'available': True
+                    }
+                    for variant in manifest.get('renditions', [])
+                ]
+                return Response({
+                    'video_id': str(video.id),
+                    'original_quality': getattr(video, 'resolution', 'Unknown'),
+                    'manifests': {
+                        'hls': default_storage.url(manifest['hls']),
+                        'dash': default_storage.url(manifest['dash']) if manifest.get('dash') else None,
+                        'thumbnails': default_storage.url(manifest['thumbnails']) if manifest.get('thumbnails') else None,
+                    },
+                    'quality_variants': quality_variants
+                })
+            
+            # Not packaged yet: progressive variants only
             quality_variants = [
                 {
                     'quality': '360p',
@@ -1105,6 +1184,7 @@ class VideoQualityVariantsView(APIView):
             return Response({
                 'video_id': str(video.id),
                 'original_quality': getattr(video, 'resolution', 'Unknown'),
+                'manifests': None,
                 'quality_variants': quality_variants
             })
             
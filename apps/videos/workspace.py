@@ -0,0 +1,322 @@
+"""
+Per-job media workspace
+
+Every processing job gets one scratch directory holding a single local copy
+of its source. The copy is fetched once (remote sources in parallel ranged
+chunks), verified against its size and any known checksum, and then shared
+by every stage that runs on the host. The directory is removed when the job
+finishes, so nothing is left for a tmp-dir sweep to guess at.
+
+Stages may run on different hosts, so whatever one stage hands to the next
+goes through storage: ``store``/``store_tree`` publish local outputs, and
+``fetch_stored`` brings them back into the workspace (a no-op on the host
+that wrote them).
+"""
+
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from shared.observability import observability
+
+logger = logging.getLogger(__name__)
+
+WORKSPACE_ROOT = (
+    getattr(settings, 'VIDEO_WORKSPACE_ROOT', '')
+    or os.path.join(tempfile.gettempdir(), 'watchparty-media')
+)
+DOWNLOAD_CHUNK_SIZE = getattr(settings, 'VIDEO_DOWNLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+DOWNLOAD_WORKERS = getattr(settings, 'VIDEO_DOWNLOAD_WORKERS', 4)
+DOWNLOAD_TIMEOUT = (10, 60)  # (connect, read) seconds
+STREAM_BLOCK_SIZE = 1024 * 1024
+SOURCE_NAME = 'source'
+MANIFEST_NAME = 'source.sha256'
+
+
+class WorkspaceError(Exception):
+    """The source could not be fetched or failed verification"""
+
+
+def _file_digest(path, algorithm='sha256'):
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(STREAM_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _http_session():
+    # The drive proxy's pooled session; same retry and pool settings suit source downloads
+    from .drive_proxy import http_session
+    return http_session
+
+
+def _probe_remote(url, headers):
+    """``(size, accepts_ranges)`` from a HEAD request; size is ``None`` when unknown"""
+    response = _http_session().head(url, headers=headers, timeout=DOWNLOAD_TIMEOUT, allow_redirects=True)
+    if response.status_code >= 400:
+        return None, False
+    size = response.headers.get('Content-Length')
+    accepts_ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+    return (int(size) if size and size.isdigit() else None), accepts_ranges
+
+
+def _download_range(url, headers, path, start, end):
+    response = _http_session().get(
+        url, headers={**headers, 'Range': f'bytes={start}-{end}'}, stream=True, timeout=DOWNLOAD_TIMEOUT,
+    )
+    if response.status_code != 206:
+        raise WorkspaceError(f"Range request {start}-{end} returned {response.status_code}")
+    written = 0
+    with open(path, 'r+b') as target:
+        target.seek(start)
+        for block in response.iter_content(STREAM_BLOCK_SIZE):
+            target.write(block)
+            written += len(block)
+    if written != end - start + 1:
+        raise WorkspaceError(f"Range {start}-{end} was truncated at {written} bytes")
+
+
+def _download_stream(url, headers, path):
+    response = _http_session().get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT)
+    if response.status_code != 200:
+        raise WorkspaceError(f"Download returned {response.status_code}")
+    with open(path, 'wb') as target:
+        for block in response.iter_content(STREAM_BLOCK_SIZE):
+            target.write(block)
+
+
+def download_url(url, path, headers=None, chunk_size=DOWNLOAD_CHUNK_SIZE, workers=DOWNLOAD_WORKERS):
+    """
+    Download ``url`` to ``path``. When the server supports byte ranges the
+    file is preallocated and fetched as ``chunk_size`` ranges on ``workers``
+    threads, each streaming straight to its offset; otherwise it is streamed
+    sequentially. Returns the expected size, if the server declared one.
+    """
+    headers = headers or {}
+    size, accepts_ranges = _probe_remote(url, headers)
+
+    if not size or not accepts_ranges or size <= chunk_size:
+        _download_stream(url, headers, path)
+        return size
+
+    with open(path, 'wb') as target:
+        target.truncate(size)
+    ranges = [(start, min(start + chunk_size, size) - 1) for start in range(0, size, chunk_size)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # list() re-raises the first failed range
+        list(pool.map(lambda byte_range: _download_range(url, headers, path, *byte_range), ranges))
+    return size
+
+
+class MediaWorkspace:
+    """Scratch directory for one processing job"""
+
+    def __init__(self, job_id, root=WORKSPACE_ROOT):
+        self.job_id = str(job_id)
+        self.directory = os.path.join(root, self.job_id)
+
+    @classmethod
+    def for_video(cls, video_id, root=WORKSPACE_ROOT):
+        return cls(f"video-{video_id}", root=root)
+
+    def __enter__(self):
+        os.makedirs(self.directory, exist_ok=True)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cleanup()
+
+    def path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def scratch_dir(self, name):
+        """A subdirectory for a stage's intermediate outputs"""
+        directory = self.path(name)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    @contextmanager
+    def _lock(self):
+        """Serialize fetches between stages sharing this host"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path('.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _verified_source(self):
+        source_path = self.path(SOURCE_NAME)
+        manifest_path = self.path(MANIFEST_NAME)
+        if not (os.path.exists(source_path) and os.path.exists(manifest_path)):
+            return None
+        with open(manifest_path) as manifest:
+            size = int(manifest.read().split()[1])
+        # Size is enough to catch truncation; the digest was checked at fetch time
+        return source_path if os.path.getsize(source_path) == size else None
+
+    def fetch_source(self, url=None, storage_name=None, headers=None,
+                     expected_checksum: Optional[Tuple[str, str]] = None) -> str:
+        """
+        Return the local path of the job's source, fetching it on first use
+        from ``url`` (parallel ranges) or ``storage_name`` (streamed through
+        storage). ``expected_checksum`` is an ``(algorithm, hexdigest)`` pair,
+        e.g. Drive's ``md5Checksum``. Raises ``WorkspaceError``.
+        """
+        with self._lock():
+            cached = self._verified_source()
+            if cached:
+                observability.record_metric('video.workspace.source', 1, tags={'result': 'reused'})
+                return cached
+
+            source_path = self.path(SOURCE_NAME)
+            partial_path = f"{source_path}.partial"
+            started = time.perf_counter()
+            try:
+                if url:
+                    expected_size = download_url(url, partial_path, headers=headers)
+                elif storage_name:
+                    with default_storage.open(storage_name, 'rb') as stored, open(partial_path, 'wb') as target:
+                        shutil.copyfileobj(stored, target, STREAM_BLOCK_SIZE)
+                    expected_size = default_storage.size(storage_name)
+                else:
+                    raise WorkspaceError("No source to fetch")
+
+                size = os.path.getsize(partial_path)
+                if expected_size is not None and size != expected_size:
+                    raise WorkspaceError(f"Source is {size} bytes, expected {expected_size}")
+
+                sha256 = _file_digest(partial_path)
+                if expected_checksum:
+                    algorithm, expected = expected_checksum
+                    actual = sha256 if algorithm == 'sha256' else _file_digest(partial_path, algorithm)
+                    if actual != expected.lower():
+                        raise WorkspaceError(f"Source {algorithm} mismatch: {actual} != {expected}")
+            except WorkspaceError:
+                if os.path.exists(partial_path):
+                    os.unlink(partial_path)
+                raise
+            except Exception as e:
+                if os.path.exists(partial_path):
+                    os.unlink(partial_path)
+                raise WorkspaceError(f"Could not fetch source: {str(e)}") from e
+
+            os.replace(partial_path, source_path)
+            with open(self.path(MANIFEST_NAME), 'w') as manifest:
+                manifest.write(f"{sha256} {size}\n")
+
+            elapsed_ms = int((time.perf_counter() - started) * 1000)
+            observability.record_metric('video.workspace.source', 1, tags={'result': 'fetched'})
+            observability.record_metric('video.workspace.fetch_ms', elapsed_ms, tags={'job': 'video'})
+            logger.info(f"Fetched source for {self.job_id} ({size} bytes) in {elapsed_ms}ms")
+            return source_path
+
+    def source_for_file(self, field_file, expected_checksum=None) -> str:
+        """
+        Local path for a ``FieldFile``: the file itself when storage is on
+        this filesystem, otherwise a verified workspace copy.
+        """
+        try:
+            local_path = field_file.path
+        except NotImplementedError:
+            local_path = None
+        if local_path and os.path.exists(local_path):
+            return local_path
+
+        url = field_file.url
+        if url.startswith('http'):
+            return self.fetch_source(url=url, expected_checksum=expected_checksum)
+        return self.fetch_source(storage_name=field_file.name, expected_checksum=expected_checksum)
+
+    def store(self, local_path, name) -> str:
+        """Save a local output to storage as ``name``, replacing any previous copy"""
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        with open(local_path, 'rb') as output:
+            stored = default_storage.save(name, File(output))
+        # Later stages on this host read it from here instead of downloading it again
+        cached = self.path(stored)
+        if os.path.abspath(local_path) != os.path.abspath(cached):
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            shutil.copyfile(local_path, cached)
+        return stored
+
+    def store_tree(self, directory, prefix) -> List[str]:
+        """Save every file under ``directory`` to storage under ``prefix``"""
+        stored = []
+        for root, _dirs, files in os.walk(directory):
+            for filename in sorted(files):
+                local_path = os.path.join(root, filename)
+                relative = os.path.relpath(local_path, directory).replace(os.sep, '/')
+                stored.append(self.store(local_path, f"{prefix}/{relative}"))
+        return stored
+
+    def fetch_stored(self, name) -> str:
+        """Local path of storage file ``name``, downloaded into the workspace unless already here"""
+        local_path = self.path(name)
+        if os.path.exists(local_path):
+            return local_path
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        partial_path = f"{local_path}.partial"
+        try:
+            with default_storage.open(name, 'rb') as stored, open(partial_path, 'wb') as target:
+                shutil.copyfileobj(stored, target, STREAM_BLOCK_SIZE)
+        except Exception as e:
+            if os.path.exists(partial_path):
+                os.unlink(partial_path)
+            raise WorkspaceError(f"Could not fetch {name}: {str(e)}") from e
+        os.replace(partial_path, local_path)
+        return local_path
+
+    def checksum(self) -> Optional[Dict]:
+        """``{'sha256', 'size'}`` of the fetched source, if any"""
+        try:
+            with open(self.path(MANIFEST_NAME)) as manifest:
+                sha256, size = manifest.read().split()
+        except FileNotFoundError:
+            return None
+        return {'sha256': sha256, 'size': int(size)}
+
+    def content_hash(self, field_file) -> str:
+        """
+        SHA-256 of a ``FieldFile``'s content: taken from the manifest when
+        the source was fetched here, otherwise read from the local file.
+        """
+        path = self.source_for_file(field_file)
+        checksum = self.checksum()
+        if checksum and path == self.path(SOURCE_NAME):
+            return checksum['sha256']
+        return _file_digest(path)
+
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def sweep_stale_workspaces(max_age_seconds=24 * 3600, root=WORKSPACE_ROOT) -> int:
+    """Remove workspaces left behind by crashed workers; returns how many were removed"""
+    if not os.path.isdir(root):
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for name in os.listdir(root):
+        directory = os.path.join(root, name)
+        try:
+            if os.path.isdir(directory) and os.path.getmtime(directory) < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
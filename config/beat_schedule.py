@@ -20,6 +20,24 @@ app.conf.beat_schedule = {
         'schedule': crontab(minute=0),  # Every hour
     },
     
+    # Store tracked events buffered by the ingest endpoint
+    'consume-analytics-events': {
+        'task': 'apps.analytics.tasks.consume_analytics_events',
+        'schedule': 10.0,  # Every 10 seconds
+    },
+    
+    # Fold new analytics events into the aggregate tables
+    'process-analytics-events': {
+        'task': 'apps.analytics.tasks.process_analytics_events',
+        'schedule': crontab(minute='*'),  # Every minute
+    },
+    
+    # Drop expired minute and hour rollup buckets
+    'purge-metric-rollups': {
+        'task': 'apps.analytics.tasks.purge_metric_rollups',
+        'schedule': crontab(minute=15),  # Every hour
+    },
+    
     # Generate daily analytics reports
     'daily-analytics': {
         'task': 'apps.analytics.tasks.generate_daily_report',
@@ -44,6 +62,36 @@ app.conf.beat_schedule = {
         'schedule': crontab(minute='*/2'),  # Every 2 minutes
     },
     
+    # Remove processing workspaces left by crashed workers
+    'cleanup-media-workspaces': {
+        'task': 'apps.videos.tasks.cleanup_media_workspaces',
+        'schedule': crontab(minute=30),  # Every hour
+    },
+    
+    # Report backlog in the video processing lanes
+    'record-video-queue-depths': {
+        'task': 'apps.videos.tasks.record_video_queue_depths',
+        'schedule': crontab(minute='*'),  # Every minute
+    },
+    
+    # Write buffered video views to the database
+    'flush-video-views': {
+        'task': 'apps.videos.tasks.flush_video_views',
+        'schedule': 30.0,  # Every 30 seconds
+    },
+    
+    # Correct like counts that drifted from the like rows
+    'reconcile-video-like-counts': {
+        'task': 'apps.videos.tasks.reconcile_video_like_counts',
+        'schedule': crontab(hour=3, minute=30),  # 3:30 AM daily
+    },
+    
+    # Rebuild the materialized discovery feed
+    'refresh-discovery-feed': {
+        'task': 'apps.search.tasks.refresh_discovery_feed',
+        'schedule': crontab(minute='*/5'),  # Every 5 minutes
+    },
+    
     # Update user analytics
     'update-user-analytics': {
         'task': 'apps.analytics.tasks.update_user_analytics',
@@ -283,6 +283,17 @@ CELERY_TASK_ROUTES = {
     'shared.background_tasks.process_notification_analytics': {'queue': 'analytics'},
     'shared.background_tasks.cleanup_expired_data': {'queue': 'maintenance'},
     'shared.background_tasks.optimize_database_indexes': {'queue': 'maintenance'},
+    # ffmpeg work runs on dedicated lanes (apps.videos.media_queue); long encodes
+    # go to video_transcode so probes and thumbnails are never queued behind them
+    'apps.videos.tasks.transcode_renditions_stage': {'queue': 'video_transcode'},
+    'apps.videos.tasks.optimize_video_quality': {'queue': 'video_transcode'},
+    'apps.videos.tasks.generate_video_preview': {'queue': 'video_transcode'},
+    'apps.videos.tasks.start_video_processing': {'queue': 'video_fast'},
+    'apps.videos.tasks.prepare_video_stage': {'queue': 'video_fast'},
+    'apps.videos.tasks.generate_thumbnails_stage': {'queue': 'video_fast'},
+    'apps.videos.tasks.package_and_finalize_stage': {'queue': 'video_fast'},
+    'apps.videos.tasks.process_video_upload': {'queue': 'video_fast'},
+    'apps.videos.enhanced_processing.process_video_async': {'queue': 'video_fast'},
 }
 
 # Channels Configuration with support for AWS ElastiCache Valkey
@@ -586,7 +597,28 @@ CSP_FORM_ACTION = "'self'"
 VIDEO_UPLOAD_PATH = 'videos/'
 VIDEO_THUMBNAIL_PATH = 'thumbnails/'
 MAX_VIDEO_FILE_SIZE = 500 * 1024 * 1024  # 500MB
+# Resumable uploads: largest PATCH body (must stay under MAX_UPLOAD_SIZE) and where partial files are staged
+VIDEO_UPLOAD_CHUNK_SIZE = config('VIDEO_UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024, cast=int)
+VIDEO_UPLOAD_STAGING_DIR = config('VIDEO_UPLOAD_STAGING_DIR', default='')  # empty uses the system temp dir
+# Per-job processing workspaces: one verified source copy shared by every stage
+VIDEO_WORKSPACE_ROOT = config('VIDEO_WORKSPACE_ROOT', default='')  # empty uses the system temp dir
+VIDEO_DOWNLOAD_WORKERS = config('VIDEO_DOWNLOAD_WORKERS', default=4, cast=int)
+# Transcode workers run cores // VIDEO_FFMPEG_THREADS encodes at once
+VIDEO_FFMPEG_THREADS = config('VIDEO_FFMPEG_THREADS', default=2, cast=int)
+VIDEO_FAST_LANE_CONCURRENCY = config('VIDEO_FAST_LANE_CONCURRENCY', default=2, cast=int)
+VIDEO_TRANSCODE_TIMEOUT = config('VIDEO_TRANSCODE_TIMEOUT', default=3600, cast=int)
+# Repeat views by one viewer within this many seconds count once
+VIDEO_VIEW_DEDUP_WINDOW = config('VIDEO_VIEW_DEDUP_WINDOW', default=1800, cast=int)
+VIDEO_VIEW_FLUSH_BATCH = config('VIDEO_VIEW_FLUSH_BATCH', default=5000, cast=int)
+# Pause events newer than this many seconds wait for the next engagement profile refresh
+VIDEO_ANALYTICS_SETTLE_SECONDS = config('VIDEO_ANALYTICS_SETTLE_SECONDS', default=120, cast=int)
 SUPPORTED_VIDEO_FORMATS = ['mp4', 'avi', 'mov', 'wmv', 'flv', 'webm']
+# Internal nginx location for X-Accel-Redirect video streaming (e.g. /protected-media/); empty serves from Django
+VIDEO_X_ACCEL_REDIRECT_PREFIX = config('VIDEO_X_ACCEL_REDIRECT_PREFIX', default='')
+# Google Drive proxy: aligned chunk size and the shared on-disk chunk cache
+DRIVE_PROXY_CHUNK_SIZE = config('DRIVE_PROXY_CHUNK_SIZE', default=1024 * 1024, cast=int)
+DRIVE_PROXY_CACHE_DIR = config('DRIVE_PROXY_CACHE_DIR', default='')  # empty uses the system temp dir
+DRIVE_PROXY_CACHE_MAX_BYTES = config('DRIVE_PROXY_CACHE_MAX_BYTES', default=2 * 1024 ** 3, cast=int)
 
 # Two-Factor Authentication
 OTP_TOTP_ISSUER = 'WatchParty'
@@ -598,4 +630,9 @@ NOTIFICATION_RETRY_DELAY = 300  # 5 minutes
 
 # Analytics Configuration
 ANALYTICS_BATCH_SIZE = 1000
+ANALYTICS_MAX_BATCHES_PER_RUN = 50  # bounds one process_analytics_events run
+ANALYTICS_INGEST_MAX_BATCH = 100  # events per track_event request
+# Day rollup buckets are kept forever; finer ones only this long
+ANALYTICS_ROLLUP_MINUTE_RETENTION_HOURS = 48
+ANALYTICS_ROLLUP_HOUR_RETENTION_DAYS = 90
 ANALYTICS_RETENTION_DAYS = 365
@@ -74,7 +74,15 @@ CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 CELERY_TASK_ROUTES = {
     'utils.email_service.*': {'queue': 'email'},
     'apps.analytics.tasks.*': {'queue': 'analytics'},
-    'apps.videos.tasks.*': {'queue': 'video_processing'},
+    # Exact names win over the pattern below: long encodes on their own lane
+    'apps.videos.tasks.transcode_renditions_stage': {'queue': 'video_transcode'},
+    'apps.videos.tasks.optimize_video_quality': {'queue': 'video_transcode'},
+    'apps.videos.tasks.generate_video_preview': {'queue': 'video_transcode'},
+    'apps.videos.tasks.record_video_queue_depths': {'queue': 'celery'},
+    'apps.videos.tasks.flush_video_views': {'queue': 'celery'},
+    'apps.videos.tasks.reconcile_video_like_counts': {'queue': 'celery'},
+    'apps.videos.tasks.*': {'queue': 'video_fast'},
+    'apps.videos.enhanced_processing.*': {'queue': 'video_fast'},
     'watchparty.tasks.*': {'queue': 'maintenance'},
 }
 
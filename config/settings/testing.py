@@ -146,6 +146,8 @@ INSTALLED_APPS = [
     'apps.analytics',
     'apps.parties',
     'apps.videos',
+    'apps.users',
+    'apps.search',
 ]
 
 # Password hashers for faster tests
@@ -42,6 +42,36 @@ module.exports = {
       error_file: '/var/log/watchparty/pm2_celery_worker_error.log',
       log_date_format: 'YYYY-MM-DD HH:mm:ss Z'
     },
+    {
+      name: 'watchparty-media-fast',
+      script: './start-celery-media-worker.sh',
+      args: 'fast',
+      cwd: '/opt/watch-party-backend',
+      instances: 1,
+      exec_mode: 'fork',
+      autorestart: true,
+      watch: false,
+      max_memory_restart: '512M',
+      log_file: '/var/log/watchparty/pm2_media_fast.log',
+      out_file: '/var/log/watchparty/pm2_media_fast_out.log',
+      error_file: '/var/log/watchparty/pm2_media_fast_error.log',
+      log_date_format: 'YYYY-MM-DD HH:mm:ss Z'
+    },
+    {
+      name: 'watchparty-media-transcode',
+      script: './start-celery-media-worker.sh',
+      args: 'transcode',
+      cwd: '/opt/watch-party-backend',
+      instances: 1,
+      exec_mode: 'fork',
+      autorestart: true,
+      watch: false,
+      max_memory_restart: '2G',
+      log_file: '/var/log/watchparty/pm2_media_transcode.log',
+      out_file: '/var/log/watchparty/pm2_media_transcode_out.log',
+      error_file: '/var/log/watchparty/pm2_media_transcode_error.log',
+      log_date_format: 'YYYY-MM-DD HH:mm:ss Z'
+    },
     {
       name: 'watchparty-celery-beat',
       script: './start-celery-beat.sh',
@@ -0,0 +1,91 @@
+"""
+Benchmark seek latency and Python CPU per GB for the video stream endpoint.
+
+Compares the old behaviour (every seek re-reads the file from byte 0) with
+Range-aware serving through apps.videos.range_streaming.serve_file. The
+response is consumed in-process, i.e. this measures the Python read path;
+with gunicorn + sendfile or nginx X-Accel-Redirect the copy leaves Python
+entirely.
+
+Usage: python scripts/benchmark_range_streaming.py [--size-mb 512] [--seeks 50]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.testing')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.http import FileResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+
+from apps.videos.range_streaming import serve_file  # noqa: E402
+
+SEEK_WINDOW = 2 * 1024 * 1024  # bytes a player needs after a seek before it can render
+
+
+def consume(response, limit=None):
+    read = 0
+    for chunk in response.streaming_content:
+        read += len(chunk)
+        if limit is not None and read >= limit:
+            break
+    if getattr(response, 'file_to_stream', None) is not None:
+        response.file_to_stream.close()
+    return read
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=int, default=512)
+    parser.add_argument('--seeks', type=int, default=50)
+    args = parser.parse_args()
+
+    factory = RequestFactory()
+    size = args.size_mb * 1024 * 1024
+    with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as file:
+        block = os.urandom(1024 * 1024)
+        for _ in range(args.size_mb):
+            file.write(block)
+        path = file.name
+
+    try:
+        offsets = [random.randrange(0, size - SEEK_WINDOW) for _ in range(args.seeks)]
+
+        legacy, ranged = [], []
+        for offset in offsets:
+            started = time.perf_counter()
+            consume(FileResponse(open(path, 'rb'), content_type='video/mp4'), limit=offset + SEEK_WINDOW)
+            legacy.append(time.perf_counter() - started)
+
+            request = factory.get('/', HTTP_RANGE=f'bytes={offset}-{offset + SEEK_WINDOW - 1}')
+            started = time.perf_counter()
+            consume(serve_file(request, path))
+            ranged.append(time.perf_counter() - started)
+
+        cpu_started = time.process_time()
+        served = consume(serve_file(factory.get('/'), path))
+        cpu_per_gb = (time.process_time() - cpu_started) / (served / 1024 ** 3)
+
+        def ms(values, pct):
+            return statistics.quantiles(values, n=100)[pct - 1] * 1000
+
+        print(f"file: {args.size_mb} MB, seeks: {args.seeks}, seek window: {SEEK_WINDOW // 1024} KB")
+        print(f"seek latency  legacy p50 {ms(legacy, 50):8.1f} ms  p95 {ms(legacy, 95):8.1f} ms")
+        print(f"seek latency  range  p50 {ms(ranged, 50):8.1f} ms  p95 {ms(ranged, 95):8.1f} ms")
+        print(f"python CPU per GB (in-process read path): {cpu_per_gb:.2f} s")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
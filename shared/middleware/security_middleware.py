@@ -43,16 +43,22 @@ class AdvancedRateLimitMiddleware:
 class FileUploadSecurityMiddleware:
     """Block uploads that exceed the configured maximum size."""
 
+    UPLOAD_CONTENT_TYPES = ('multipart/form-data', 'application/octet-stream', 'application/offset+octet-stream')
+
     def __init__(self, get_response: Callable):
         self.get_response = get_response
         self.max_upload_size = getattr(settings, 'MAX_UPLOAD_SIZE', 10 * 1024 * 1024)  # 10MB default
 
     def __call__(self, request: HttpRequest):
-        if request.method in {'POST', 'PUT', 'PATCH'} and request.FILES:
-            for upload in request.FILES.values():
-                if upload.size > self.max_upload_size:
-                    logger.warning('Blocked oversized upload', extra={'name': upload.name, 'size': upload.size})
-                    raise SuspiciousOperation('Uploaded file too large')
+        # Check the declared length; reading request.FILES here would spool the whole body first
+        if request.method in {'POST', 'PUT', 'PATCH'} and request.content_type in self.UPLOAD_CONTENT_TYPES:
+            try:
+                declared = int(request.META.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                raise SuspiciousOperation('Invalid Content-Length')
+            if declared > self.max_upload_size:
+                logger.warning('Blocked oversized upload', extra={'path': request.path, 'size': declared})
+                raise SuspiciousOperation('Uploaded file too large')
         return self.get_response(request)
 
 
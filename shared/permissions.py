@@ -192,8 +192,8 @@ class CanAccessPrivateContent(permissions.BasePermission):
         if obj.visibility == 'friends':
             if obj.uploader == request.user:
                 return True
-            # Check if user is friend (assuming friends relationship exists)
-            if hasattr(request.user, 'friends'):
-                return obj.uploader in request.user.friends.all()
+            # Check if user is friend via the cached friend graph
+            from apps.users.friend_graph import friend_graph
+            return friend_graph.are_friends(request.user.id, obj.uploader_id)
         
         return False
@@ -1,43 +1,330 @@
 """
 Video Analytics Service
-Handles video analytics, tracking, and metrics
+Per-second engagement, retention and trend analytics for videos
+
+Watch segments come from the player's ``video_pause`` events. Each one
+reports the playhead ``position`` and the ``watch_duration`` played since
+the last play, i.e. the segment ``[position - watch_duration, position)``.
+Segments are loaded into ``array`` columns and folded into a per-second
+difference array: +1 where a segment starts, -1 where it ends. One running
+sum turns that into the heatmap, so a video with a million segments costs
+O(segments + seconds) rather than a query or loop per second.
+
+Each video's folded profile is cached with a watermark. A request folds in
+only the events between the old watermark and ``now - settle``, so profiles
+stay current without replaying history. Events that arrive later than the
+settle delay are only picked up when the profile is rebuilt.
 """
 
-class VideoAnalyticsService:
-    """Service for video analytics and tracking"""
-    
+import math
+from array import array
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.analytics.models import AnalyticsEvent
+from apps.videos.models import Video, VideoView
+
+SEGMENT_EVENT_TYPE = 'video_pause'
+SEGMENT_BATCH = 5000
+SETTLE_DELAY = timedelta(seconds=getattr(settings, 'VIDEO_ANALYTICS_SETTLE_SECONDS', 120))
+PROFILE_CACHE_TIMEOUT = 60 * 60 * 24
+TRENDING_CACHE_TIMEOUT = 60 * 10
+# Longer timelines (or unknown durations past this) are clipped
+MAX_TIMELINE_SECONDS = 6 * 60 * 60
+
+
+class SegmentColumns:
+    """Watch segments as parallel start/end columns, in seconds"""
+
     def __init__(self):
-        self.metrics = {}
-    
-    def track_video_view(self, video_id, user_id, duration=None):
-        """Track video view event"""
-        # Placeholder implementation
-        return {"success": True, "tracked": True}
-    
-    def track_video_interaction(self, video_id, user_id, interaction_type):
-        """Track video interaction (like, comment, share)"""
-        # Placeholder implementation
-        return {"success": True, "interaction": interaction_type}
-    
-    def get_video_analytics(self, video_id):
-        """Get analytics data for a video"""
-        # Placeholder implementation
+        self.starts = array('d')
+        self.ends = array('d')
+
+    def __len__(self):
+        return len(self.starts)
+
+    def append(self, start, end):
+        self.starts.append(start)
+        self.ends.append(end)
+
+    @property
+    def furthest(self):
+        return max(self.ends, default=0.0)
+
+
+class EngagementProfile:
+    """Folded segments for one video, cached between requests"""
+
+    def __init__(self, length):
+        self.length = length
+        self.watermark = None
+        # Net segment starts minus ends per second; index ``length`` absorbs clipped ends
+        self.deltas = array('q', bytes(8 * (length + 1)))
+        self.segments = 0
+        self.watch_seconds = 0.0
+
+    def fold(self, columns):
+        length, deltas = self.length, self.deltas
+        for start, end in zip(columns.starts, columns.ends):
+            lo, hi = min(int(start), length), min(math.ceil(end), length)
+            if hi > lo:
+                deltas[lo] += 1
+                deltas[hi] -= 1
+        self.segments += len(columns)
+        self.watch_seconds += sum(columns.ends) - sum(columns.starts)
+
+    def heat(self):
+        """Segments covering each second"""
+        return list(accumulate(self.deltas[:self.length]))
+
+    def starters(self, heat=None):
+        heat = heat if heat is not None else self.heat()
+        return heat[0] if heat else 0
+
+    def top_changes(self, count, losses=True):
+        """Seconds with the largest net drop (or rise) in viewers"""
+        sign = -1 if losses else 1
+        changes = [
+            (sign * self.deltas[second], second)
+            for second in range(1, self.length) if sign * self.deltas[second] > 0
+        ]
+        changes.sort(key=lambda change: (-change[0], change[1]))
+        return [(second, amount) for amount, second in changes[:count]]
+
+
+def _timeline_length(video, furthest=0.0):
+    if video.duration:
+        seconds = video.duration.total_seconds()
+    else:
+        seconds = furthest
+    return max(1, min(math.ceil(seconds), MAX_TIMELINE_SECONDS))
+
+
+def _downsample(values, points, reduce):
+    """At most ``points`` buckets of ``values``, each summarized by ``reduce``"""
+    if not values:
+        return []
+    size = max(1, math.ceil(len(values) / points))
+    return [
+        (start, min(start + size, len(values)), reduce(values[start:start + size]))
+        for start in range(0, len(values), size)
+    ]
+
+
+def _percentage(part, whole):
+    return round(part / whole * 100, 2) if whole else 0
+
+
+def load_segments(video_id, since=None, until=None):
+    """Watch segments for a video from pause events in ``[since, until)``"""
+    events = AnalyticsEvent.objects.filter(video_id=video_id, event_type=SEGMENT_EVENT_TYPE)
+    if since is not None:
+        events = events.filter(timestamp__gte=since)
+    if until is not None:
+        events = events.filter(timestamp__lt=until)
+
+    columns = SegmentColumns()
+    for data in events.values_list('event_data', flat=True).iterator(chunk_size=SEGMENT_BATCH):
+        if not isinstance(data, dict):
+            continue
+        position, watched = data.get('position'), data.get('watch_duration')
+        if not isinstance(position, (int, float)) or not isinstance(watched, (int, float)) or watched <= 0:
+            continue
+        columns.append(max(position - watched, 0.0), float(position))
+    return columns
+
+
+class VideoAnalyticsService:
+    """Service for video engagement analytics"""
+
+    def _profile_key(self, video_id):
+        return f"video_analytics:profile:v1:{video_id}"
+
+    def get_profile(self, video):
+        """Cached engagement profile, brought up to the current watermark"""
+        watermark = timezone.now() - SETTLE_DELAY
+        profile = cache.get(self._profile_key(video.id))
+
+        if profile is not None and profile.watermark >= watermark:
+            return profile
+        since = profile.watermark if profile is not None else None
+        columns = load_segments(video.id, since, watermark)
+        if profile is not None and profile.length != _timeline_length(video, max(columns.furthest, profile.length)):
+            # The duration changed or an unknown-length timeline grew; fold everything again
+            profile = None
+            columns = load_segments(video.id, None, watermark)
+        if profile is None:
+            profile = EngagementProfile(_timeline_length(video, columns.furthest))
+
+        profile.fold(columns)
+        profile.watermark = watermark
+        cache.set(self._profile_key(video.id), profile, PROFILE_CACHE_TIMEOUT)
+        return profile
+
+    def get_engagement_heatmap(self, video, points=100):
+        """Average viewers per timeline bucket, with intensity relative to the peak"""
+        heat = self.get_profile(video).heat()
+        buckets = _downsample(heat, points, lambda values: sum(values) / len(values))
+        peak = max((viewers for _, _, viewers in buckets), default=0)
+        return [
+            {
+                'start_second': start,
+                'end_second': end,
+                'viewers': round(viewers, 2),
+                'intensity': round(viewers / peak, 4) if peak else 0
+            }
+            for start, end, viewers in buckets
+        ]
+
+    def get_retention_curve(self, video, points=100):
+        """Share of starting viewers still watching at each point, plus drop-off points"""
+        profile = self.get_profile(video)
+        heat = profile.heat()
+        starters = profile.starters(heat)
+        curve = [
+            {'second': start, 'viewers': viewers, 'percentage': _percentage(viewers, starters)}
+            for start, _, viewers in _downsample(heat, points, lambda values: values[0])
+        ]
         return {
-            "views": 0,
-            "likes": 0,
-            "comments": 0,
-            "shares": 0,
-            "watch_time": 0
+            'starting_viewers': starters,
+            'curve': curve,
+            'drop_off_points': [
+                {'second': second, 'viewers_lost': lost, 'percentage': _percentage(lost, starters)}
+                for second, lost in profile.top_changes(5)
+            ]
         }
-    
-    def get_user_analytics(self, user_id):
-        """Get analytics data for a user"""
-        # Placeholder implementation
+
+    def get_viewer_journey_analysis(self, video):
+        """How far viewers get, where they leave and where they jump in"""
+        profile = self.get_profile(video)
+        heat = profile.heat()
+        starters = profile.starters(heat)
+        milestones = []
+        for percent in (25, 50, 75, 100):
+            second = min(profile.length - 1, profile.length * percent // 100)
+            milestones.append({
+                'percent': percent,
+                'second': second,
+                'viewers': heat[second],
+                'percentage': _percentage(heat[second], starters)
+            })
         return {
-            "videos_watched": 0,
-            "total_watch_time": 0,
-            "favorite_genres": []
+            'starting_viewers': starters,
+            'segments_watched': profile.segments,
+            'average_view_percentage': _percentage(profile.watch_seconds, starters * profile.length),
+            'milestones': milestones,
+            'drop_off_points': [
+                {'second': second, 'viewers_lost': lost} for second, lost in profile.top_changes(5)
+            ],
+            'jump_in_points': [
+                {'second': second, 'viewers_gained': gained}
+                for second, gained in profile.top_changes(5, losses=False)
+            ]
         }
 
+    def get_video_analytics(self, video, days=30):
+        """View metrics for the last ``days`` with all-time engagement"""
+        start = timezone.now() - timedelta(days=days)
+        views = VideoView.objects.filter(video=video, created_at__gte=start)
+        totals = views.aggregate(
+            total_views=Count('id'),
+            unique_viewers=Count('user', distinct=True),
+            anonymous_views=Count('id', filter=Q(user__isnull=True))
+        )
+        daily = (
+            views.annotate(day=TruncDate('created_at')).values('day')
+            .annotate(views=Count('id')).order_by('day')
+        )
+
+        profile = self.get_profile(video)
+        heat = profile.heat()
+        starters = profile.starters(heat)
+        return {
+            'video_id': str(video.id),
+            'period_days': days,
+            'metrics': {
+                **totals,
+                'like_count': video.like_count,
+                'watch_time_seconds': round(profile.watch_seconds),
+                'average_view_percentage': _percentage(profile.watch_seconds, starters * profile.length),
+                'completion_rate': _percentage(heat[-1] if heat else 0, starters)
+            },
+            'daily_views': [{'date': row['day'].isoformat(), 'views': row['views']} for row in daily]
+        }
+
+    def get_comparative_analytics(self, video):
+        """Video metrics against its channel's and the platform's averages"""
+        ready = Video.objects.filter(status='ready')
+        channel = Q(uploader_id=video.uploader_id)
+        averages = ready.aggregate(
+            channel_views=Avg('view_count', filter=channel),
+            channel_likes=Avg('like_count', filter=channel),
+            platform_views=Avg('view_count'),
+            platform_likes=Avg('like_count'),
+            channel_rank=Count('id', filter=channel & Q(view_count__gt=video.view_count)),
+            channel_videos=Count('id', filter=channel)
+        )
+
+        def compare(value, average):
+            average = average or 0
+            return {
+                'average': round(average, 2),
+                'ratio': round(value / average, 2) if average else None
+            }
+
+        return {
+            'views': video.view_count,
+            'likes': video.like_count,
+            'channel': {
+                'videos': averages['channel_videos'],
+                'views_rank': averages['channel_rank'] + 1,
+                'views': compare(video.view_count, averages['channel_views']),
+                'likes': compare(video.like_count, averages['channel_likes'])
+            },
+            'platform': {
+                'views': compare(video.view_count, averages['platform_views']),
+                'likes': compare(video.like_count, averages['platform_likes'])
+            }
+        }
+
+    def get_trending_analysis(self, days=7, limit=20):
+        """Most viewed videos over ``days`` with growth against the previous period"""
+        cache_key = f"video_analytics:trending:v1:{days}:{limit}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        now = timezone.now()
+        split = now - timedelta(days=days)
+        rows = (
+            VideoView.objects.filter(created_at__gte=now - timedelta(days=2 * days))
+            .values('video_id', 'video__title')
+            .annotate(
+                current=Count('id', filter=Q(created_at__gte=split)),
+                previous=Count('id', filter=Q(created_at__lt=split))
+            )
+            .filter(current__gt=0)
+            .order_by('-current')[:limit]
+        )
+        trending = [
+            {
+                'video_id': str(row['video_id']),
+                'title': row['video__title'],
+                'views': row['current'],
+                'previous_views': row['previous'],
+                'growth_rate': _percentage(row['current'] - row['previous'], row['previous']) if row['previous'] else None
+            }
+            for row in rows
+        ]
+        cache.set(cache_key, trending, TRENDING_CACHE_TIMEOUT)
+        return trending
+
+
 # Singleton instance
-video_analytics_service = VideoAnalyticsService()
\ No newline at end of file
+video_analytics_service = VideoAnalyticsService()
@@ -0,0 +1,4 @@
+cd /opt/watch-party-backend
+source venv/bin/activate
+set -a && source .env && set +a
+exec python manage.py run_media_worker --lane "${1:-transcode}"
@@ -0,0 +1,122 @@
+"""Tests for the buffered track_event ingest path."""
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.analytics.event_ingest import (
+    EventIngest, IngestError, MemoryEventLog, build_event, event_ingest, store_batch,
+)
+from apps.analytics.models import AnalyticsEvent, PartyAnalytics, UserAnalytics, VideoAnalytics
+
+
+class EventIngestTests(TestCase):
+    """Tracked events are stored and counted in bulk by the consumer."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import WatchPartyFactory
+
+        self.party = WatchPartyFactory()
+        self.user = self.party.host
+        self.video = self.party.video
+        self.ingest = EventIngest(log=MemoryEventLog())
+
+    def _submit(self, *payloads):
+        self.ingest.submit([build_event(self.user, payload) for payload in payloads])
+
+    def test_nothing_is_written_until_consumed(self):
+        with CaptureQueriesContext(connection) as queries:
+            self._submit({'event_type': 'view_start', 'video_id': str(self.video.id)})
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(self.ingest.consume(), 1)
+        self.assertEqual(AnalyticsEvent.objects.get().video, self.video)
+
+    def test_counters_are_folded_per_row(self):
+        video_id, party_id = str(self.video.id), str(self.party.id)
+        self._submit(
+            *[{'event_type': 'view_start', 'video_id': video_id}] * 3,
+            {'event_type': 'view_end', 'video_id': video_id, 'duration_seconds': 600},
+            {'event_type': 'reaction_sent', 'video_id': video_id, 'party_id': party_id},
+            {'event_type': 'chat_message', 'party_id': party_id},
+        )
+        self.ingest.consume()
+
+        video = VideoAnalytics.objects.get(video=self.video)
+        self.assertEqual((video.total_views, video.this_week_views), (3, 3))
+        self.assertEqual(video.total_watch_time_minutes, 10)
+        self.assertEqual(video.total_reactions, 1)
+        user = UserAnalytics.objects.get(user=self.user)
+        self.assertEqual((user.total_watch_time_minutes, user.total_messages_sent, user.reactions_sent), (10, 1, 1))
+        # Message totals belong to the event processor
+        self.assertEqual(PartyAnalytics.objects.get(party=self.party).total_messages, 0)
+
+    def test_increments_add_to_existing_counts(self):
+        VideoAnalytics.objects.create(video=self.video, total_views=5)
+        self._submit({'event_type': 'view_start', 'video_id': str(self.video.id)})
+        self.ingest.consume()
+        self.assertEqual(VideoAnalytics.objects.get().total_views, 6)
+
+    def test_unknown_links_are_dropped(self):
+        self._submit({'event_type': 'view_start', 'video_id': '00000000-0000-0000-0000-000000000000'})
+        self.ingest.consume()
+        self.assertIsNone(AnalyticsEvent.objects.get().video_id)
+        self.assertFalse(VideoAnalytics.objects.exists())
+
+    def test_redelivered_entries_are_counted_once(self):
+        entries = [build_event(self.user, {'event_type': 'view_start', 'video_id': str(self.video.id)})]
+        self.assertEqual(store_batch([dict(entry) for entry in entries]), 1)
+        self.assertEqual(store_batch([dict(entry) for entry in entries]), 0)
+
+        self.assertEqual(AnalyticsEvent.objects.count(), 1)
+        self.assertEqual(VideoAnalytics.objects.get().total_views, 1)
+
+    def test_events_from_deleted_users_are_dropped(self):
+        from tests.factories import UserFactory
+
+        gone = UserFactory()
+        entries = [build_event(gone, {'event_type': 'chat_message'}), build_event(self.user, {'event_type': 'chat_message'})]
+        gone.delete()
+        self.ingest.submit(entries)
+
+        self.assertEqual(self.ingest.consume(), 1)
+        self.assertEqual(AnalyticsEvent.objects.get().user, self.user)
+
+    def test_bad_entry_is_dead_lettered_and_the_rest_stored(self):
+        entries = [build_event(self.user, {'event_type': 'chat_message'}) for _ in range(3)]
+        entries[1]['duration_seconds'] = 'forever'
+        self.ingest.submit(entries)
+
+        self.assertEqual(self.ingest.consume(), 2)
+        self.assertEqual(AnalyticsEvent.objects.count(), 2)
+        self.assertEqual([entry['id'] for entry, _ in self.ingest.log.dead_letters], [entries[1]['id']])
+        self.assertEqual(self.ingest.consume(), 0)
+
+    def test_invalid_payloads_are_rejected(self):
+        with self.assertRaises(IngestError):
+            build_event(self.user, {'event_type': 'view_start', 'video_id': 'not-a-uuid'})
+        with self.assertRaises(IngestError):
+            build_event(self.user, {'data': {}})
+
+
+class TrackEventBatchTests(TestCase):
+    """The endpoint accepts client-side batches."""
+
+    def test_batch_returns_one_id_per_event(self):
+        from tests.factories import UserFactory
+
+        # Don't leave this test's entries in the shared log
+        self.addCleanup(event_ingest.log.read, 10_000)
+        client = APIClient()
+        client.force_authenticate(UserFactory())
+        events = [{'event_type': 'reaction_sent'}, {'event_type': 'buffering'}]
+        response = client.post(reverse('analytics:track-event'), {'events': events}, format='json')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(response.data['event_ids']), 2)
+
+        response = client.post(reverse('analytics:track-event'), {'events': events * 60}, format='json')
+        self.assertEqual(response.status_code, 400)
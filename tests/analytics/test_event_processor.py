@@ -0,0 +1,119 @@
+"""Tests for the set-based analytics event processor."""
+
+from datetime import timedelta
+from unittest import mock
+
+from django.db import DatabaseError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.analytics import event_processor
+from apps.analytics.event_processor import process_pending_events
+from apps.analytics.models import AnalyticsEvent, PartyAnalytics, UserSession, WatchTime
+
+
+class EventProcessorTests(TestCase):
+    """Chunks are folded into aggregate rows and marked processed in bulk."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import WatchPartyFactory
+
+        self.party = WatchPartyFactory()
+        self.user = self.party.host
+        self.video = self.party.video
+        # Hour-aligned, so a test's events share rollup buckets whatever the clock says
+        self.start = (timezone.now() - timedelta(days=3)).replace(minute=0, second=0, microsecond=0)
+
+    def _event(self, event_type, minutes, **data):
+        return AnalyticsEvent.objects.create(
+            user=self.user, event_type=event_type, event_data=data,
+            timestamp=self.start + timedelta(minutes=minutes),
+        )
+
+    def test_watch_time_deltas_are_summed(self):
+        video_id, party_id = str(self.video.id), str(self.party.id)
+        self._event('video_play', 0, video_id=video_id, party_id=party_id, position=0)
+        self._event('video_pause', 1, video_id=video_id, party_id=party_id, position=60, watch_duration=60)
+        self._event('video_pause', 2, video_id=video_id, party_id=party_id, position=90, watch_duration=30)
+
+        self.assertEqual(process_pending_events(batch_size=2), 3)
+
+        watch_time = WatchTime.objects.get()
+        self.assertEqual(watch_time.total_watch_time, 90)
+        self.assertEqual(watch_time.last_position, 90)
+        self.assertFalse(AnalyticsEvent.objects.filter(processed=False).exists())
+
+    def test_party_counters_and_backlog_older_than_an_hour(self):
+        party_id = str(self.party.id)
+        for minute in range(3):
+            self._event('party_join', minute, party_id=party_id)
+        self._event('chat_message', 4, party_id=party_id)
+        self._event('party_leave', 5, party_id=party_id, session_duration=300)
+
+        process_pending_events()
+
+        analytics = PartyAnalytics.objects.get(party=self.party)
+        self.assertEqual(analytics.total_participants, 3)
+        self.assertEqual(analytics.total_messages, 1)
+        self.assertEqual(analytics.avg_session_duration, 300)
+
+    def test_sessions_upserted_and_closed(self):
+        self._event('user_login', 0, session_id='s-1')
+        self._event('user_logout', 30, session_id='s-1')
+
+        process_pending_events()
+
+        session = UserSession.objects.get(session_id='s-1')
+        self.assertEqual(session.duration, 30 * 60)
+
+    def test_queries_do_not_grow_with_chunk_size(self):
+        party_id = str(self.party.id)
+        counts = []
+        for events in (5, 50):
+            for minute in range(events):
+                self._event('chat_message', minute, party_id=party_id)
+            with CaptureQueriesContext(connection) as queries:
+                process_pending_events(batch_size=100)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(PartyAnalytics.objects.get().total_messages, 55)
+
+    def test_failed_group_leaves_only_its_events_pending(self):
+        party_id = str(self.party.id)
+        self._event('chat_message', 0, party_id=party_id)
+        login = self._event('user_login', 1, session_id='s-2')
+
+        failing = ('session', event_processor.SESSION_EVENTS, mock.Mock(side_effect=DatabaseError('boom')))
+        with mock.patch.object(event_processor, 'AGGREGATORS', event_processor.AGGREGATORS[:2] + (failing,)):
+            self.assertEqual(process_pending_events(), 1)
+
+        self.assertEqual(list(AnalyticsEvent.objects.filter(processed=False)), [login])
+        self.assertEqual(PartyAnalytics.objects.get().total_messages, 1)
+
+    def test_bad_payload_does_not_block_its_group(self):
+        party_id = str(self.party.id)
+        self._event('party_leave', 0, party_id=party_id, session_duration='300')
+        self._event('party_leave', 1, party_id=party_id, session_duration='soon')
+        self._event('party_join', 2, party_id=party_id)
+
+        self.assertEqual(process_pending_events(), 3)
+
+        analytics = PartyAnalytics.objects.get()
+        self.assertEqual((analytics.total_participants, analytics.avg_session_duration), (1, 300))
+
+    def test_event_failing_alone_is_marked_processed(self):
+        login = self._event('user_login', 0, session_id='s-1')
+        self._event('user_login', 1, session_id='s-2')
+
+        def apply(events):
+            if login in events:
+                raise ValueError('bad event')
+
+        failing = ('session', event_processor.SESSION_EVENTS, apply)
+        with mock.patch.object(event_processor, 'AGGREGATORS', (failing,)):
+            self.assertEqual(process_pending_events(), 2)
+
+        self.assertFalse(AnalyticsEvent.objects.filter(processed=False).exists())
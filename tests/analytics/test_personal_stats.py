@@ -0,0 +1,73 @@
+"""Tests for aggregate-backed personal analytics."""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from apps.analytics import personal_stats
+from apps.analytics.event_ingest import EventIngest, MemoryEventLog, build_event
+from apps.analytics.models import AnalyticsEvent
+
+START = datetime(2026, 3, 2, tzinfo=dt_timezone.utc)  # a Monday
+
+
+class PersonalStatsTests(TestCase):
+    """Series and totals come from a fixed number of grouped queries."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import UserFactory
+
+        self.user = UserFactory()
+
+    def _event(self, event_type, at, **data):
+        AnalyticsEvent.objects.create(user=self.user, event_type=event_type, event_data=data, timestamp=at)
+
+    def test_event_breakdown_is_one_query(self):
+        self._event('video_watch', START + timedelta(hours=9), duration=300)
+        self._event('video_watch', START + timedelta(hours=9, minutes=5), duration='unknown')
+        self._event('chat_message', START + timedelta(hours=21))
+        self._event('chat_message', START + timedelta(days=2, hours=21))
+
+        with self.assertNumQueries(1):
+            breakdown = personal_stats.event_breakdown(self.user, START, START + timedelta(days=3))
+
+        self.assertEqual(breakdown['total'], 4)
+        self.assertEqual(breakdown['watch_seconds'], 300)
+        self.assertEqual(breakdown['by_type'], {'video_watch': 2, 'chat_message': 2})
+        self.assertEqual((breakdown['hourly'][9], breakdown['hourly'][21]), (2, 2))
+        self.assertEqual(
+            [(day['events'], day['peak_hour']) for day in breakdown['daily']],
+            [(3, 9), (0, None), (1, 21), (0, None)],
+        )
+        self.assertEqual(breakdown['daily'][0]['event_types'], ['chat_message', 'video_watch'])
+
+    def test_party_totals_are_one_query(self):
+        from apps.parties.models import PartyParticipant, WatchParty
+        from tests.factories import UserFactory, VideoFactory, WatchPartyFactory
+
+        parties = [WatchPartyFactory(host=self.user) for _ in range(2)]
+        WatchParty.objects.filter(id=parties[0].id).update(created_at=START + timedelta(days=2))  # Wednesday
+        WatchParty.objects.filter(id=parties[1].id).update(created_at=START + timedelta(days=9))
+        for party in parties:
+            PartyParticipant.objects.create(party=party, user=UserFactory())
+        VideoFactory(uploader=self.user)
+
+        with self.assertNumQueries(1):
+            totals = personal_stats.party_totals(self.user, START, START + timedelta(days=30))
+
+        self.assertEqual(totals['parties_hosted'], 2)
+        self.assertEqual(totals['participants_in_hosted'], 2)
+        self.assertEqual(personal_stats.WEEKDAYS[totals['top_party_weekday'] - 1], 'Wednesday')
+        self.assertEqual(totals['parties_joined'], 0)
+
+    def test_stored_events_invalidate_the_users_cache(self):
+        key = personal_stats.cache_key(self.user.id, '30d')
+        cache.set(key, {'cached': True})
+
+        ingest = EventIngest(log=MemoryEventLog())
+        ingest.submit([build_event(self.user, {'event_type': 'chat_message'})])
+        ingest.consume()
+
+        self.assertIsNone(cache.get(key))
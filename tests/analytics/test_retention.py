@@ -0,0 +1,125 @@
+"""Tests for cohort retention from activity days."""
+
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.analytics import retention
+from apps.analytics.event_processor import process_pending_events
+from apps.analytics.models import AnalyticsEvent, UserActivityDay
+
+START = date(2026, 3, 2)
+TODAY = date(2026, 4, 20)
+
+
+class RetentionTests(TestCase):
+    """Retention counts users active in each later period."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def _user(self, joined, *active_days):
+        from tests.factories import UserFactory
+
+        user = UserFactory(date_joined=datetime.combine(joined, datetime.min.time(), tzinfo=dt_timezone.utc))
+        UserActivityDay.objects.bulk_create([UserActivityDay(user=user, day=day) for day in active_days])
+        return user
+
+    def test_weekly_matrix_uses_every_active_week(self):
+        week = timedelta(weeks=1)
+        # Came back in weeks 1 and 3; last_login alone would only show week 3
+        self._user(START, START + week, START + 3 * week)
+        self._user(START + timedelta(days=2), START + week + timedelta(days=1))
+        self._user(START + timedelta(days=4))
+        self._user(START + week, START + 2 * week)
+
+        matrix = retention.retention_matrix(START, cohorts=2, periods=3, today=TODAY)
+
+        self.assertEqual(matrix[0]['size'], 3)
+        self.assertEqual(matrix[0]['retained'], [2, 0, 1])
+        self.assertEqual(matrix[0]['rates'], [66.67, 0, 33.33])
+        self.assertEqual((matrix[1]['size'], matrix[1]['retained']), (1, [1, 0, 0]))
+        self.assertEqual(retention.period_retention(matrix, 1), 75.0)
+
+    def test_unfinished_periods_are_none(self):
+        self._user(START, START + timedelta(days=1))
+        matrix = retention.retention_matrix(START, cohorts=1, periods=3, granularity=retention.DAY,
+                                            today=START + timedelta(days=3))
+        self.assertEqual(matrix[0]['retained'], [1, 0, None])
+
+    def test_periods_no_cohort_has_reached_are_none(self):
+        self._user(START, START + timedelta(weeks=1))
+        matrix = retention.retention_matrix(START, cohorts=2, periods=4, today=START + timedelta(weeks=3))
+
+        self.assertEqual(retention.period_retention(matrix, 1), 100.0)
+        self.assertIsNone(retention.period_retention(matrix, 4))
+
+    def test_pooling_can_be_limited_to_the_latest_cohorts(self):
+        self._user(START, START + timedelta(weeks=1))
+        self._user(START + timedelta(weeks=1))
+        matrix = retention.retention_matrix(START, cohorts=2, periods=1, today=TODAY)
+
+        self.assertEqual(retention.period_retention(matrix, 1), 50.0)
+        self.assertEqual(retention.period_retention(matrix, 1, cohorts=1), 0.0)
+
+    def test_view_reports_month_3_for_a_30_day_range(self):
+        from apps.analytics.views import user_retention_analytics
+        from tests.factories import UserFactory
+
+        today = timezone.now().date()
+        joined = today - timedelta(weeks=15)
+        self._user(joined, joined + timedelta(weeks=1), joined + timedelta(weeks=12))
+        request = APIRequestFactory().get('/api/analytics/retention/', {'days': 30})
+        force_authenticate(request, user=UserFactory(is_staff=True))
+
+        response = user_retention_analytics(request)
+
+        self.assertEqual(response.status_code, 200)
+        # Only the one cohort old enough for month 3 has members
+        self.assertEqual(response.data['retention_rates'], {
+            'week_1_retention': None, 'month_1_retention': None, 'month_3_retention': 100.0,
+        })
+        self.assertEqual(len(response.data['weekly_cohorts']), 5)
+
+    def test_matrix_is_two_queries_and_cached(self):
+        self._user(START, START + timedelta(weeks=1))
+        with self.assertNumQueries(2):
+            retention.retention_matrix(START, cohorts=4, periods=4, today=TODAY)
+        with self.assertNumQueries(0):
+            retention.retention_matrix(START, cohorts=4, periods=4, today=TODAY)
+
+    def test_engagement_levels_by_latest_activity(self):
+        self._user(START, TODAY, TODAY - timedelta(days=20))
+        self._user(START, TODAY - timedelta(days=3))
+        self._user(START, TODAY - timedelta(days=10))
+        self._user(START, TODAY - timedelta(days=45))
+
+        with self.assertNumQueries(1):
+            levels = retention.engagement_levels(TODAY)
+        self.assertEqual(levels, {
+            'high_engagement': 1, 'medium_engagement': 1, 'low_engagement': 1, 'total_active': 3,
+        })
+
+
+class ActivityRecordingTests(TestCase):
+    """Processed events mark their users active once per day."""
+
+    def test_processing_and_backfill_record_each_user_day_once(self):
+        from tests.factories import UserFactory
+
+        user = UserFactory()
+        at = datetime(2026, 3, 5, 23, 30, tzinfo=dt_timezone.utc)
+        for offset in (0, 5, 60):
+            AnalyticsEvent.objects.create(user=user, event_type='chat_message', timestamp=at + timedelta(minutes=offset))
+        process_pending_events()
+
+        days = list(UserActivityDay.objects.order_by('day').values_list('day', flat=True))
+        self.assertEqual(days, [date(2026, 3, 5), date(2026, 3, 6)])
+
+        UserActivityDay.objects.all().delete()
+        retention.backfill_activity(at - timedelta(days=1))
+        self.assertEqual(UserActivityDay.objects.count(), 2)
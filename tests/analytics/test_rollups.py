@@ -0,0 +1,99 @@
+"""Tests for time-bucketed metric rollups."""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from apps.analytics import rollups
+from apps.analytics.event_processor import process_pending_events
+from apps.analytics.models import AnalyticsEvent, MetricRollup
+
+NOW = datetime(2026, 3, 10, 12, 30, tzinfo=dt_timezone.utc)
+
+
+class PlanSegmentsTests(SimpleTestCase):
+    """Ranges are covered by the coarsest buckets that fit."""
+
+    def test_days_inside_hours_and_minutes_at_edges(self):
+        start = datetime(2026, 3, 8, 22, 15, tzinfo=dt_timezone.utc)
+        end = datetime(2026, 3, 10, 1, 45, tzinfo=dt_timezone.utc)
+        segments = rollups.plan_segments(start, end, now=NOW)
+
+        self.assertEqual(segments, [
+            ('minute', start, start.replace(hour=23, minute=0)),
+            ('hour', start.replace(hour=23, minute=0), datetime(2026, 3, 9, tzinfo=dt_timezone.utc)),
+            ('day', datetime(2026, 3, 9, tzinfo=dt_timezone.utc), datetime(2026, 3, 10, tzinfo=dt_timezone.utc)),
+            ('hour', datetime(2026, 3, 10, tzinfo=dt_timezone.utc), end.replace(minute=0)),
+            ('minute', end.replace(minute=0), end),
+        ])
+
+    def test_old_edges_round_to_retained_buckets(self):
+        start = NOW - timedelta(days=200, minutes=7)
+        segments = rollups.plan_segments(start, NOW, now=NOW)
+        self.assertEqual(segments[0], ('day', rollups.floor_bucket(start, 'day'), segments[0][2]))
+        self.assertNotIn('minute', [granularity for granularity, lo, hi in segments if lo < NOW - timedelta(days=2)])
+
+
+class RollupMaintenanceTests(TestCase):
+    """Processed events update every granularity incrementally."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import UserFactory, VideoFactory
+
+        self.user = UserFactory()
+        self.video = VideoFactory()
+
+    def _event(self, event_type, at, **data):
+        return AnalyticsEvent.objects.create(user=self.user, event_type=event_type, event_data=data, timestamp=at)
+
+    def test_totals_match_raw_events_across_granularities(self):
+        now = timezone.now()
+        for days_ago in (0, 1, 3):
+            self._event('video_play', now - timedelta(days=days_ago, minutes=5), video_id=str(self.video.id))
+        self._event('video_pause', now - timedelta(hours=2), video_id=str(self.video.id), watch_duration=120)
+        process_pending_events()
+
+        self.assertEqual(rollups.total(rollups.VIDEO_PLAYS, now - timedelta(days=7)), 3)
+        self.assertEqual(rollups.total(rollups.VIDEO_PLAYS, now - timedelta(hours=1)), 1)
+        self.assertEqual(
+            rollups.total(rollups.WATCH_SECONDS, now - timedelta(days=1), dimension=f"user:{self.user.id}"), 120,
+        )
+        self.assertEqual(
+            rollups.top_dimensions(rollups.VIDEO_PLAYS, now - timedelta(days=7), prefix='video:'),
+            [(str(self.video.id), 3)],
+        )
+
+    def test_late_events_add_to_existing_buckets(self):
+        at = timezone.now() - timedelta(minutes=30)
+        self._event('chat_message', at)
+        process_pending_events()
+        self._event('chat_message', at)
+        process_pending_events()
+
+        buckets = MetricRollup.objects.filter(metric=rollups.EVENTS, dimension='type:chat_message')
+        self.assertEqual(sorted(buckets.values_list('granularity', 'value')), [('day', 2), ('hour', 2), ('minute', 2)])
+
+    def test_events_past_minute_retention_skip_minute_buckets(self):
+        self._event('chat_message', timezone.now() - timedelta(days=10))
+        process_pending_events()
+
+        granularities = set(MetricRollup.objects.values_list('granularity', flat=True))
+        self.assertEqual(granularities, {'hour', 'day'})
+        self.assertEqual(rollups.all_time_total(rollups.EVENTS, 'type:chat_message'), 1)
+
+    def test_rebuild_replays_processed_events(self):
+        self._event('reaction_sent', timezone.now() - timedelta(hours=3))
+        process_pending_events()
+        MetricRollup.objects.update(value=99)
+
+        self.assertEqual(rollups.rebuild(timezone.now() - timedelta(days=1)), 1)
+        self.assertEqual(rollups.all_time_total(rollups.EVENTS, 'type:reaction_sent'), 1)
+
+    def test_purge_keeps_day_buckets(self):
+        self._event('chat_message', timezone.now() - timedelta(hours=1))
+        process_pending_events()
+
+        rollups.purge_expired(now=timezone.now() + timedelta(days=365))
+        self.assertEqual(list(MetricRollup.objects.values_list('granularity', flat=True).distinct()), ['day'])
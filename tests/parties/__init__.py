@@ -0,0 +1 @@
+"""Parties app tests."""
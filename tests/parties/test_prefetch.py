@@ -0,0 +1,149 @@
+"""Tests for party-aware video prefetch."""
+
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.parties import tasks
+from apps.parties.models import WatchParty
+from apps.videos import prefetch
+from apps.videos.drive_proxy import ChunkCache, DriveProxy
+
+CHUNK = 1024
+FILE_SIZE = 600 * CHUNK  # 600 chunks over a 600 second movie: one chunk per second
+
+
+class PrefetchTests(TestCase):
+    """Prefetch warms the start of the movie, then follows the party clock."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import WatchPartyFactory
+
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        self.fetched = []
+        self.proxy = DriveProxy(
+            chunk_cache=ChunkCache(cache_dir), fetch=self._fetch, chunk_size=CHUNK,
+            meta_cache=LocMemCache('party-prefetch-tests', {}),
+        )
+        patches = [
+            mock.patch('apps.videos.prefetch.drive_proxy', self.proxy),
+            mock.patch('apps.videos.prefetch.PREFETCH_AHEAD_SECONDS', 10),
+            mock.patch.object(tasks.follow_party_prefetch, 'apply_async'),
+            mock.patch.object(tasks, '_drive_auth_headers', return_value=dict),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(cache.clear)
+
+        self.party = WatchPartyFactory(
+            gdrive_file_id='drive-file', movie_duration=timedelta(seconds=600), is_playing=True,
+        )
+
+    def _fetch(self, url, start, end, headers):
+        self.fetched.append(start // CHUNK)
+        return b'x' * (end - start + 1), FILE_SIZE, 'video/mp4'
+
+    def _set_clock(self, position, seconds_ago):
+        WatchParty.objects.filter(id=self.party.id).update(
+            current_timestamp=timedelta(seconds=position),
+            position_updated_at=timezone.now() - timedelta(seconds=seconds_ago),
+        )
+
+    def test_playback_position_advances_while_playing(self):
+        self._set_clock(100, 30)
+        party = WatchParty.objects.get(id=self.party.id)
+        self.assertAlmostEqual(party.playback_position(), 130, delta=1)
+
+        party.is_playing = False
+        self.assertEqual(party.playback_position(), 100)
+
+    def test_unrelated_saves_do_not_move_the_clock(self):
+        self._set_clock(100, 30)
+        party = WatchParty.objects.get(id=self.party.id)
+        party.title = 'Renamed'
+        party.save()
+
+        self.assertAlmostEqual(WatchParty.objects.get(id=self.party.id).playback_position(), 130, delta=1)
+
+    def test_pause_keeps_the_time_played(self):
+        self._set_clock(100, 30)
+        party = WatchParty.objects.get(id=self.party.id)
+        party.save(update_fields=party.sync_playback(is_playing=False))
+
+        self.assertAlmostEqual(WatchParty.objects.get(id=self.party.id).playback_position(), 130, delta=1)
+
+    def test_start_warms_initial_bytes_and_starts_follow_ahead(self):
+        with mock.patch('apps.videos.prefetch.PREFETCH_INITIAL_BYTES', 4 * CHUNK):
+            tasks.prefetch_party_video(str(self.party.id), 'gen-1')
+
+        self.assertEqual(sorted(set(self.fetched)), [0, 1, 2, 3])
+        tasks.follow_party_prefetch.apply_async.assert_called_once_with(
+            (str(self.party.id), 'gen-1'), countdown=tasks.PARTY_PREFETCH_INTERVAL
+        )
+
+    def test_follow_ahead_tracks_party_clock(self):
+        cache.set(tasks._prefetch_generation_key(self.party.id), 'gen-1')
+        self._set_clock(300, 0)
+
+        tasks.follow_party_prefetch(str(self.party.id), 'gen-1')
+
+        # 10 seconds ahead of second 300 at one chunk per second
+        warmed = sorted(set(self.fetched) - {0})
+        self.assertEqual(warmed[0], 300)
+        self.assertIn(warmed[-1], (309, 310))
+        self.assertTrue(tasks.follow_party_prefetch.apply_async.called)
+
+    def test_follow_ahead_keeps_going_while_the_size_is_unknown(self):
+        cache.set(tasks._prefetch_generation_key(self.party.id), 'gen-1')
+
+        with mock.patch('apps.videos.prefetch.ensure_drive_meta', return_value=None):
+            result = tasks.follow_party_prefetch(str(self.party.id), 'gen-1')
+
+        self.assertIn('Warmed 0 chunks', result)
+        self.assertTrue(tasks.follow_party_prefetch.apply_async.called)
+
+    def test_superseded_chain_stops(self):
+        cache.set(tasks._prefetch_generation_key(self.party.id), 'gen-2')
+
+        result = tasks.follow_party_prefetch(str(self.party.id), 'gen-1')
+
+        self.assertIn('superseded', result)
+        self.assertEqual(self.fetched, [])
+        tasks.follow_party_prefetch.apply_async.assert_not_called()
+
+
+class StorageWarmingTests(TestCase):
+    """Stored files are warmed where viewers read them, never just downloaded."""
+
+    def _remote_storage(self):
+        storage = mock.Mock()
+        storage.path.side_effect = NotImplementedError
+        storage.url.side_effect = lambda name: f"https://cdn.example.com/{name}"
+        return mock.patch('apps.videos.prefetch.default_storage', storage)
+
+    def test_remote_storage_without_cdn_is_skipped(self):
+        with self._remote_storage() as storage, self.settings(AWS_S3_CUSTOM_DOMAIN=''):
+            self.assertEqual(prefetch.warm_storage_names(['videos/1/master.m3u8']), 0)
+        storage.open.assert_not_called()
+
+    def test_remote_storage_is_warmed_through_the_cdn(self):
+        response = mock.MagicMock()
+        response.__enter__.return_value = response
+        response.iter_content.return_value = [b'#EXTM3U\n']
+        with self._remote_storage() as storage, self.settings(AWS_S3_CUSTOM_DOMAIN='cdn.example.com'), \
+                mock.patch('apps.videos.prefetch.requests.get', return_value=response) as get:
+            self.assertEqual(prefetch.warm_storage_names(['videos/1/master.m3u8']), 1)
+
+        get.assert_called_once_with(
+            'https://cdn.example.com/videos/1/master.m3u8', headers={}, stream=True, timeout=prefetch.CDN_WARM_TIMEOUT,
+        )
+        storage.open.assert_not_called()
@@ -0,0 +1,61 @@
+"""Tests for the materialized discovery feed."""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.search.discovery import (
+    build_discovery_feed,
+    get_discovery_feed,
+    personalize_discovery_feed,
+)
+from apps.videos.models import Video
+
+
+class DiscoveryFeedTests(TestCase):
+    """Pools are built in a fixed number of queries and sampled per user."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_feed_is_built_with_constant_queries(self):
+        from tests.factories import UserFactory, VideoFactory, WatchPartyFactory
+
+        for _ in range(3):
+            WatchPartyFactory()
+            VideoFactory()
+        UserFactory()
+
+        # trending, featured, parties, users - regardless of pool sizes
+        with self.assertNumQueries(4):
+            feed = build_discovery_feed()
+
+        self.assertEqual(len(feed["trending_videos"]), 6)
+        self.assertEqual(len(feed["active_parties"]), 3)
+        self.assertEqual(feed["active_parties"][0]["participant_count"], 0)
+
+    def test_personalized_view_excludes_own_content_and_is_stable(self):
+        from tests.factories import UserFactory, VideoFactory
+
+        viewer = UserFactory()
+        VideoFactory(uploader=viewer)
+        # Too old to trend, so it only reaches the featured pool
+        own_featured = VideoFactory(uploader=viewer)
+        Video.objects.filter(id=own_featured.id).update(created_at=timezone.now() - timedelta(days=30))
+        VideoFactory()
+        UserFactory.create_batch(12)
+
+        feed = get_discovery_feed()
+        with self.assertNumQueries(0):
+            first = personalize_discovery_feed(get_discovery_feed(), viewer)
+        second = personalize_discovery_feed(feed, viewer)
+
+        self.assertTrue(all(item["uploaded_by"]["id"] != str(viewer.id) for item in first["trending_videos"]))
+        self.assertTrue(all(item["uploaded_by"]["id"] != str(viewer.id) for item in first["featured_videos"]))
+        suggested_ids = [item["id"] for item in first["suggested_users"]]
+        self.assertNotIn(str(viewer.id), suggested_ids)
+        self.assertEqual(len(suggested_ids), 8)
+        self.assertEqual(suggested_ids, [item["id"] for item in second["suggested_users"]])
@@ -0,0 +1,48 @@
+"""Tests for the cached global search endpoint."""
+
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.search.views import GlobalSearchView
+
+
+class GlobalSearchTests(TransactionTestCase):
+    """Every entity search runs on real fields, so full fan-outs are cached."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import UserFactory, VideoFactory, WatchPartyFactory
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.requester = UserFactory()
+        self.host = UserFactory(first_name='Comet', last_name='Fan')
+        VideoFactory(title='Comet landing', uploader=self.host)
+        VideoFactory(title='Comet draft', uploader=self.host, status='processing')
+        WatchPartyFactory(title='Comet night', host=self.host)
+        WatchPartyFactory(title='Comet rerun', host=self.host, status='ended')
+
+    def _search(self, **params):
+        request = APIRequestFactory().get('/api/search/', {'q': 'comet', **params})
+        force_authenticate(request, user=self.requester)
+        response = GlobalSearchView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data['data']
+
+    def test_full_search_is_complete_and_cached(self):
+        first = self._search()
+
+        self.assertFalse(first['search_meta']['partial'])
+        self.assertEqual(first['search_meta']['cache'], 'miss')
+        results = first['results']
+        self.assertEqual([item['title'] for item in results['videos']['items']], ['Comet landing'])
+        self.assertEqual([item['title'] for item in results['parties']['items']], ['Comet night'])
+        self.assertEqual([item['id'] for item in results['users']['items']], [self.host.id])
+
+        self.assertEqual(self._search()['search_meta']['cache'], 'hit')
+
+    def test_every_sort_order_runs(self):
+        for sort in ('relevance', 'date', 'popularity', 'alphabetical'):
+            with self.subTest(sort):
+                self.assertFalse(self._search(sort=sort, date_filter='week')['search_meta']['partial'])
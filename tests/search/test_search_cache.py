@@ -0,0 +1,145 @@
+"""Tests for the search result cache layer."""
+
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from apps.search.cache import (
+    SearchResultCache,
+    build_search_cache_key,
+    normalize_query,
+    personalize_results,
+)
+from shared.observability import observability
+
+
+class SearchCacheKeyTests(SimpleTestCase):
+    """Key normalization keeps equivalent queries on one entry."""
+
+    def test_case_and_whitespace_variants_share_a_key(self):
+        self.assertEqual(normalize_query("  Star   WARS "), "star wars")
+        self.assertEqual(
+            build_search_cache_key("Star Wars", type="all", page=1),
+            build_search_cache_key("  star   wars", type="ALL", page=1),
+        )
+
+    def test_keys_are_hashed_and_parameter_sensitive(self):
+        key = build_search_cache_key("x" * 400, type="all", page=1)
+        self.assertLess(len(key), 100)
+        self.assertNotEqual(key, build_search_cache_key("x" * 400, type="all", page=2))
+
+
+class SearchResultCacheTests(SimpleTestCase):
+    """Single-flight and early-refresh behaviour of the shared cache."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        observability.reset()
+        self.search_cache = SearchResultCache(wait_timeout=0.2)
+
+    def test_second_lookup_is_a_hit(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {"answer": 42}
+
+        self.assertEqual(self.search_cache.get_or_compute("k", compute), ({"answer": 42}, "miss"))
+        self.assertEqual(self.search_cache.get_or_compute("k", compute), ({"answer": 42}, "hit"))
+        self.assertEqual(len(calls), 1)
+        results = [metric.tags["result"] for metric in observability.get_metrics("search.cache.lookup")]
+        self.assertEqual(results, ["miss", "hit"])
+
+    def test_expired_entry_is_served_stale_while_another_worker_refreshes(self):
+        self.search_cache.get_or_compute("k", lambda: "old")
+        envelope = cache.get("k")
+        envelope["expires_at"] = 0
+        cache.set("k", envelope)
+        cache.add("k:lock", "other-worker")
+
+        value, status = self.search_cache.get_or_compute("k", lambda: "new")
+        self.assertEqual((value, status), ("old", "stale"))
+
+        cache.delete("k:lock")
+        value, status = self.search_cache.get_or_compute("k", lambda: "new")
+        self.assertEqual((value, status), ("new", "refresh"))
+
+    def test_concurrent_miss_waits_for_lock_holder(self):
+        cache.add("k:lock", "other-worker")
+
+        def winner_finishes(_seconds):
+            cache.set("k", {"value": "shared", "delta": 0.0, "expires_at": float("inf")})
+
+        with patch("apps.search.cache.time.sleep", side_effect=winner_finishes):
+            value, status = self.search_cache.get_or_compute("k", lambda: "duplicate")
+
+        self.assertEqual((value, status), ("shared", "wait"))
+
+
+class PersonalizeResultsTests(SimpleTestCase):
+    """Per-user post-filtering of shared payloads."""
+
+    def _payload(self, user_ids, count, date_filter="all", **section):
+        return {
+            "results": {
+                "users": {
+                    "items": [{"id": user_id} for user_id in user_ids],
+                    "count": count,
+                    "has_more": count > 2,
+                    **section,
+                },
+            },
+            "pagination": {"page": 1, "limit": 2, "total_results": count, "has_more": count > 2},
+            "search_meta": {"date_filter": date_filter},
+        }
+
+    def _user(self, user_id, full_name, joined_days_ago=400):
+        return SimpleNamespace(
+            id=user_id, is_active=True, full_name=full_name, email=f"{user_id}@example.com",
+            date_joined=timezone.now() - timedelta(days=joined_days_ago),
+        )
+
+    def test_requester_is_removed_and_page_is_refilled(self):
+        requester = self._user("u2", "Ann Lee")
+        data = personalize_results(self._payload(["u1", "u2", "u3"], 3), requester, "ann", 0, 2)
+
+        self.assertEqual([item["id"] for item in data["results"]["users"]["items"]], ["u1", "u3"])
+        self.assertEqual(data["results"]["users"]["count"], 2)
+        self.assertFalse(data["pagination"]["has_more"])
+
+    def test_other_users_see_the_full_window(self):
+        other = self._user("u9", "Zed Q")
+        data = personalize_results(self._payload(["u1", "u2", "u3"], 3), other, "ann", 0, 2)
+
+        self.assertEqual([item["id"] for item in data["results"]["users"]["items"]], ["u1", "u2"])
+        self.assertEqual(data["results"]["users"]["count"], 3)
+        self.assertTrue(data["pagination"]["has_more"])
+
+    def test_matching_requester_on_a_later_page_is_uncounted(self):
+        requester = self._user("u7", "Ann Lee")
+        data = personalize_results(self._payload(["u1", "u2", "u3"], 5), requester, "ann", 0, 2)
+
+        self.assertEqual(data["results"]["users"]["count"], 4)
+        self.assertEqual(data["pagination"]["total_results"], 4)
+
+    def test_requester_outside_the_shared_result_keeps_the_counts(self):
+        requester = self._user("u7", "Ann Lee")
+        cases = {
+            "joined before the date filter": self._payload(["u1", "u2", "u3"], 5, date_filter="month"),
+            "failed section": self._payload([], 0, error="failed"),
+        }
+        for name, payload in cases.items():
+            with self.subTest(name):
+                data = personalize_results(payload, requester, "ann", 0, 2)
+                self.assertEqual(data["results"]["users"]["count"], payload["results"]["users"]["count"])
+                self.assertEqual(data["pagination"]["total_results"], payload["pagination"]["total_results"])
+
+    def test_section_keys_are_kept(self):
+        data = personalize_results(self._payload([], 0, error="timeout"), self._user("u2", "Ann Lee"), "ann", 0, 2)
+
+        self.assertEqual(data["results"]["users"]["error"], "timeout")
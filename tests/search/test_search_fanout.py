@@ -0,0 +1,64 @@
+"""Tests for the concurrent per-entity search fan-out."""
+
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.search.fanout import run_fanout
+
+
+class SearchFanoutTests(SimpleTestCase):
+    """Entity searches overlap and slow entities degrade to partial results."""
+
+    def test_entities_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=1)
+
+        def search(name):
+            def _run():
+                # Only passes if all three entities are in flight at once
+                barrier.wait()
+                return {"items": [name], "count": 1}
+            return _run
+
+        outcome = run_fanout({name: search(name) for name in ("users", "videos", "parties")}, timeout=2)
+
+        self.assertFalse(outcome.partial)
+        self.assertEqual(set(outcome.results), {"users", "videos", "parties"})
+        self.assertEqual(set(outcome.timings_ms), {"users", "videos", "parties"})
+
+    def test_slow_and_failing_entities_are_reported(self):
+        release = threading.Event()
+
+        def slow():
+            release.wait(2)
+            return {"items": [], "count": 0}
+
+        def broken():
+            raise RuntimeError("boom")
+
+        started = time.perf_counter()
+        outcome = run_fanout(
+            {"users": lambda: {"items": [], "count": 0}, "videos": slow, "parties": broken},
+            timeout=0.1,
+        )
+        release.set()
+
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertTrue(outcome.partial)
+        self.assertEqual(set(outcome.results), {"users"})
+        self.assertEqual(outcome.timed_out, {"videos"})
+        self.assertEqual(outcome.failed, {"parties"})
+
+    def test_worker_queries_are_capped_on_postgresql(self):
+        cursor = mock.MagicMock()
+        db = mock.MagicMock(vendor="postgresql")
+        db.cursor.return_value.__enter__.return_value = cursor
+
+        with mock.patch("apps.search.fanout.connection", db):
+            outcome = run_fanout({"users": lambda: 1, "videos": lambda: 2}, timeout=2)
+
+        self.assertEqual(outcome.results, {"users": 1, "videos": 2})
+        cursor.execute.assert_called_with("SELECT set_config('statement_timeout', %s, false)", ["2500"])
+        self.assertEqual(cursor.execute.call_count, 2)
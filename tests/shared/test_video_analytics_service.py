@@ -0,0 +1,93 @@
+"""Tests for the per-second video analytics service."""
+
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.analytics.models import AnalyticsEvent
+from apps.videos.models import VideoView
+from shared.services.video_analytics_service import video_analytics_service
+
+
+class VideoAnalyticsServiceTests(TestCase):
+    """Heatmaps and retention are folded from pause-event segments."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import VideoFactory
+
+        cache.clear()
+        self.video = VideoFactory(duration=timedelta(seconds=10))
+        self.now = timezone.now()
+
+    def _segment(self, start, end, at=None):
+        AnalyticsEvent.objects.create(
+            video=self.video, event_type='video_pause',
+            event_data={'position': end, 'watch_duration': end - start},
+            timestamp=at or self.now - timedelta(minutes=10),
+        )
+
+    def _at(self, moment):
+        return mock.patch('shared.services.video_analytics_service.timezone.now', return_value=moment)
+
+    def test_heatmap_retention_and_journey(self):
+        for start, end in ((0, 10), (0, 5), (0, 5), (0, 2), (6, 10)):
+            self._segment(start, end)
+
+        heatmap = video_analytics_service.get_engagement_heatmap(self.video, points=10)
+        self.assertEqual([bucket['viewers'] for bucket in heatmap], [4, 4, 3, 3, 3, 1, 2, 2, 2, 2])
+        self.assertEqual(heatmap[0]['intensity'], 1.0)
+
+        retention = video_analytics_service.get_retention_curve(self.video, points=5)
+        self.assertEqual(retention['starting_viewers'], 4)
+        self.assertEqual([point['percentage'] for point in retention['curve']], [100, 75, 75, 50, 50])
+        self.assertEqual(retention['drop_off_points'][0], {'second': 5, 'viewers_lost': 2, 'percentage': 50})
+
+        journey = video_analytics_service.get_viewer_journey_analysis(self.video)
+        self.assertEqual(journey['jump_in_points'], [{'second': 6, 'viewers_gained': 1}])
+        self.assertEqual(journey['milestones'][-1]['percentage'], 50)
+
+    def test_profile_folds_only_new_events(self):
+        self._segment(0, 4)
+        with self._at(self.now):
+            video_analytics_service.get_profile(self.video)
+        with self._at(self.now), self.assertNumQueries(0):
+            video_analytics_service.get_profile(self.video)
+
+        self._segment(0, 10, at=self.now - timedelta(seconds=30))
+        with self._at(self.now + timedelta(minutes=5)), self.assertNumQueries(1):
+            profile = video_analytics_service.get_profile(self.video)
+        self.assertEqual(profile.segments, 2)
+        self.assertEqual(profile.heat(), [2, 2, 2, 2, 1, 1, 1, 1, 1, 1])
+
+    def test_trending_compares_against_previous_period(self):
+        from tests.factories import VideoFactory
+
+        quiet = VideoFactory()
+        for video, age_days in ((self.video, 1), (self.video, 1), (self.video, 9), (quiet, 2)):
+            view = VideoView.objects.create(video=video, ip_address='127.0.0.1')
+            VideoView.objects.filter(id=view.id).update(created_at=self.now - timedelta(days=age_days))
+
+        trending = video_analytics_service.get_trending_analysis(days=7)
+        self.assertEqual(
+            [(row['video_id'], row['views'], row['growth_rate']) for row in trending],
+            [(str(self.video.id), 2, 100), (str(quiet.id), 1, None)],
+        )
+
+    def test_video_and_comparative_analytics(self):
+        from tests.factories import VideoFactory
+
+        self._segment(0, 10)
+        VideoView.objects.create(video=self.video, user=self.video.uploader, ip_address='127.0.0.1')
+        VideoFactory(uploader=self.video.uploader, view_count=4)
+
+        metrics = video_analytics_service.get_video_analytics(self.video, 30)['metrics']
+        self.assertEqual((metrics['total_views'], metrics['unique_viewers']), (1, 1))
+        self.assertEqual((metrics['completion_rate'], metrics['watch_time_seconds']), (100, 10))
+
+        comparative = video_analytics_service.get_comparative_analytics(self.video)
+        self.assertEqual(comparative['channel']['views_rank'], 2)
+        self.assertEqual(comparative['channel']['views']['average'], 2)
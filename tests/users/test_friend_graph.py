@@ -0,0 +1,146 @@
+"""Tests for the friend graph adjacency cache."""
+
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from apps.users.friend_graph import CacheFriendGraphStore, FriendGraph, friend_graph
+from apps.users.models import Friendship
+
+
+class FriendGraphTests(SimpleTestCase):
+    """Adjacency sets load once and are then maintained incrementally."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.edges = {("a", "b"), ("a", "c"), ("b", "c"), ("c", "d")}
+        self.loads = []
+        self.blocked = {("a", "e")}
+        self.graph = FriendGraph(
+            store=CacheFriendGraphStore(),
+            loader=self._load,
+            exclusion_loader=self._load_excluded,
+        )
+
+    @staticmethod
+    def _neighbours(edges, user_id):
+        return {other for pair in edges if user_id in pair for other in pair if other != user_id}
+
+    def _load(self, user_ids):
+        self.loads.extend(sorted(user_ids))
+        loaded = {user_id: self._neighbours(self.edges, user_id) for user_id in user_ids}
+        self.during_load()
+        return loaded
+
+    def during_load(self):
+        pass
+
+    def _load_excluded(self, user_ids):
+        return {user_id: self._neighbours(self.blocked, user_id) for user_id in user_ids}
+
+    def test_sets_are_loaded_once(self):
+        self.assertEqual(self.graph.get_friend_ids("a"), {"b", "c"})
+        self.assertEqual(self.graph.friend_count("a"), 2)
+        self.assertTrue(self.graph.are_friends("a", "b"))
+        self.assertFalse(self.graph.are_friends("a", "d"))
+        self.assertEqual(self.loads, ["a"])
+
+    def test_mutual_friends_intersect_both_sets(self):
+        self.assertEqual(self.graph.mutual_friend_ids("a", "d"), {"c"})
+        self.assertEqual(self.graph.mutual_friend_ids("a", "b"), {"c"})
+
+    def test_incremental_updates_only_touch_loaded_sets(self):
+        self.graph.get_friend_ids("a")
+        self.graph.add_friendship("a", "d")
+
+        self.assertEqual(self.graph.get_friend_ids("a"), {"b", "c", "d"})
+        self.assertNotIn("d", self.loads)  # d's set stays cold until first read
+
+        self.graph.remove_friendship("a", "b")
+        self.assertEqual(self.graph.get_friend_ids("a"), {"c", "d"})
+        self.assertEqual(self.loads, ["a"])
+
+    def test_batched_reads_load_cold_sets_together(self):
+        self.graph.get_friend_ids("a")
+        friend_ids = self.graph.get_friend_ids_many(["a", "b", "d"])
+
+        self.assertEqual(friend_ids, {"a": {"b", "c"}, "b": {"a", "c"}, "d": {"c"}})
+        self.assertEqual(self.loads, ["a", "b", "d"])
+
+    def test_mutual_friend_counts_for_many_users(self):
+        self.assertEqual(self.graph.mutual_friend_counts("a", ["b", "d"]), {"b": 1, "d": 1})
+
+    def test_suggestions_rank_by_shared_friends(self):
+        self.edges |= {("b", "d"), ("c", "e"), ("b", "f")}
+
+        self.assertEqual(self.graph.suggest_friends("a"), [("d", 2), ("f", 1)])
+        suggestions = self.graph.suggest_friends_many(["a", "d"], limit=1)
+        self.assertEqual(suggestions["a"], [("d", 2)])
+        self.assertEqual(suggestions["d"], [("a", 2)])
+
+    def test_change_during_load_is_not_overwritten(self):
+        def accept_while_loading():
+            # Commits after the load read the database but before it stores the set
+            self.during_load = lambda: None
+            self.edges.add(("a", "d"))
+            self.graph.add_friendship("a", "d")
+
+        self.during_load = accept_while_loading
+
+        self.assertEqual(self.graph.get_friend_ids("a"), {"b", "c"})
+        self.assertEqual(self.graph.get_friend_ids("a"), {"b", "c", "d"})
+        self.assertEqual(self.loads, ["a", "a"])
+
+    def test_late_load_does_not_replace_a_stored_set(self):
+        store = self.graph.store
+        store.put("a", {"b", "c", "d"}, store.lease_many(["a"])["a"])
+
+        # A reader that missed before that store finishes its own load later
+        self.assertFalse(store.put("a", {"b", "c"}, store.lease_many(["a"])["a"]))
+        self.assertEqual(store.get("a"), {"b", "c", "d"})
+
+class FriendGraphSignalTests(TestCase):
+    """Friendship changes reach loaded adjacency sets once they commit."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import UserFactory
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.alice = UserFactory()
+        self.bob = UserFactory()
+
+    def _befriend(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Friendship.objects.create(from_user=self.alice, to_user=self.bob, status='accepted')
+
+    def test_accepting_adds_the_edge(self):
+        self.assertEqual(friend_graph.get_friend_ids(self.alice.id), set())
+
+        self._befriend()
+
+        self.assertEqual(friend_graph.get_friend_ids(self.alice.id), {str(self.bob.id)})
+        self.assertTrue(friend_graph.are_friends(self.bob.id, self.alice.id))
+
+    def test_blocking_drops_the_edge(self):
+        friendship = self._befriend()
+        self.assertTrue(friend_graph.are_friends(self.alice.id, self.bob.id))
+
+        friendship.status = 'blocked'
+        with self.captureOnCommitCallbacks(execute=True):
+            friendship.save()
+
+        self.assertFalse(friend_graph.are_friends(self.alice.id, self.bob.id))
+        self.assertEqual(friend_graph.get_friend_ids(self.bob.id), set())
+
+    def test_removing_drops_the_edge(self):
+        friendship = self._befriend()
+        self.assertTrue(friend_graph.are_friends(self.bob.id, self.alice.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            friendship.delete()
+
+        self.assertEqual(friend_graph.get_friend_ids(self.alice.id), set())
+        self.assertEqual(friend_graph.get_friend_ids(self.bob.id), set())
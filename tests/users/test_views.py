@@ -0,0 +1,86 @@
+"""Tests for the users API views."""
+
+import uuid
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.users.friend_graph import friend_graph
+from apps.users.models import Friendship
+from apps.users.views import BlockUserView, MutualFriendCountsView
+
+
+class MutualFriendCountsViewTests(TestCase):
+    """Mutual counts are only looked up for well-formed user IDs."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import UserFactory
+
+        self.user = UserFactory()
+        self.factory = APIRequestFactory()
+
+    def _get(self, user_ids):
+        request = self.factory.get('/api/users/friends/mutual-counts/', {'user_ids': user_ids})
+        force_authenticate(request, user=self.user)
+        return MutualFriendCountsView.as_view()(request)
+
+    def test_counts_are_returned_for_valid_ids(self):
+        other = str(uuid.uuid4())
+        with mock.patch('apps.users.views.friend_graph') as graph:
+            graph.mutual_friend_counts.return_value = {other: 2}
+            response = self._get([other])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['mutual_friend_counts'], {other: 2})
+        graph.mutual_friend_counts.assert_called_once_with(self.user.id, [other])
+
+    def test_malformed_id_is_rejected(self):
+        with mock.patch('apps.users.views.friend_graph') as graph:
+            response = self._get([str(uuid.uuid4()), 'not-a-uuid'])
+
+        self.assertEqual(response.status_code, 400)
+        graph.mutual_friend_counts.assert_not_called()
+
+
+class BlockUserViewTests(TestCase):
+    """Blocking ends the friendship in the database and the friend graph."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import UserFactory
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = UserFactory()
+        self.other = UserFactory()
+        self.factory = APIRequestFactory()
+
+    def _block(self, user_id):
+        request = self.factory.post(f'/api/users/{user_id}/block/')
+        force_authenticate(request, user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return BlockUserView.as_view()(request, user_id=str(user_id))
+
+    def test_block_replaces_the_friendship(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Friendship.objects.create(from_user=self.other, to_user=self.user, status='accepted')
+        self.assertTrue(friend_graph.are_friends(self.user.id, self.other.id))
+
+        response = self._block(self.other.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(Friendship.objects.values_list('from_user_id', 'to_user_id', 'status')),
+            [(self.user.id, self.other.id, 'blocked')],
+        )
+        self.assertFalse(friend_graph.are_friends(self.user.id, self.other.id))
+        self.assertEqual(friend_graph.get_friend_ids(self.other.id), set())
+
+    def test_cannot_block_yourself(self):
+        response = self._block(self.user.id)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Friendship.objects.exists())
@@ -0,0 +1,126 @@
+"""Tests for content-hash deduplication of processed videos."""
+
+import hashlib
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from apps.videos.dedup import LINKED, OWNER, WAITING, claim_asset, publish_asset
+from apps.videos.enhanced_processing import VideoProcessor
+from apps.videos.models import Video, VideoAsset, VideoProcessing
+from apps.videos.tasks import prepare_video_stage
+
+
+class VideoDedupTests(TestCase):
+    """Identical uploads share one processed asset, deleted with its last reference."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import VideoFactory
+
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=f'{self.tmp}/media')
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.data = b'same movie bytes' * 64
+        self.content_hash = hashlib.sha256(self.data).hexdigest()
+        self.original = self._upload(VideoFactory)
+        self.duplicate = self._upload(VideoFactory)
+
+    def _upload(self, factory):
+        video = factory(status='processing', duration=None)
+        video.file.name = default_storage.save('videos/movie.mp4', ContentFile(self.data))
+        video.save()
+        return video
+
+    def _process_original(self):
+        """What the owner's pipeline leaves behind"""
+        self.assertEqual(claim_asset(self.original, self.content_hash), OWNER)
+        thumbnail = default_storage.save('thumbnails/movie_thumb.jpg', ContentFile(b'jpg'))
+        default_storage.save(f'streams/{self.original.id}/master.m3u8', ContentFile(b'#EXTM3U'))
+        default_storage.save(f'streams/{self.original.id}/480p/seg_00000.m4s', ContentFile(b'seg'))
+        Video.objects.filter(id=self.original.id).update(
+            status='ready', thumbnail=thumbnail, resolution='854x480', codec='h264',
+            duration=timedelta(seconds=90),
+            streaming_manifest={'hls': f'streams/{self.original.id}/master.m3u8'},
+        )
+        publish_asset(self.original.id, renditions=['480p'])
+
+    def test_duplicate_links_to_processed_asset(self):
+        self._process_original()
+        duplicate_name = self.duplicate.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(claim_asset(self.duplicate, self.content_hash), LINKED)
+
+        self.duplicate.refresh_from_db()
+        self.original.refresh_from_db()
+        self.assertEqual(self.duplicate.status, 'ready')
+        self.assertEqual(self.duplicate.file.name, self.original.file.name)
+        self.assertEqual(self.duplicate.streaming_manifest, self.original.streaming_manifest)
+        self.assertEqual(self.duplicate.duration, timedelta(seconds=90))
+        self.assertEqual(VideoProcessing.objects.get(video=self.duplicate).resolutions_generated, ['480p'])
+        self.assertEqual(VideoAsset.objects.get().reference_count, 2)
+        # Only one copy of the source is kept
+        self.assertFalse(default_storage.exists(duplicate_name))
+
+    def test_waiting_video_linked_when_owner_finishes(self):
+        self.assertEqual(claim_asset(self.original, self.content_hash), OWNER)
+        self.assertEqual(claim_asset(self.duplicate, self.content_hash), WAITING)
+
+        publish_asset(self.original.id)
+
+        self.duplicate.refresh_from_db()
+        self.assertEqual(self.duplicate.status, 'ready')
+        self.assertEqual(self.duplicate.file.name, self.original.file.name)
+
+    def test_last_reference_deletes_shared_files(self):
+        self._process_original()
+        claim_asset(self.duplicate, self.content_hash)
+        asset = VideoAsset.objects.get()
+        shared = [asset.source_name, asset.thumbnail_name, f'streams/{self.original.id}/480p/seg_00000.m4s']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.original.delete()
+        asset.refresh_from_db()
+        self.assertEqual(asset.reference_count, 1)
+        self.assertTrue(all(default_storage.exists(name) for name in shared))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.duplicate.delete()
+        self.assertFalse(VideoAsset.objects.exists())
+        self.assertFalse(any(default_storage.exists(name) for name in shared))
+
+    def test_release_only_deletes_renditions_the_owner_wrote(self):
+        self.assertEqual(claim_asset(self.original, self.content_hash), OWNER)
+        owned = default_storage.save(f'processed/{self.original.id}/movie_480p.mp4', ContentFile(b'mine'))
+        # Another upload named movie.mp4, from the flat layout
+        foreign = default_storage.save('processed/movie_480p.mp4', ContentFile(b'theirs'))
+
+        publish_asset(self.original.id, artifact_names=[owned, foreign])
+        self.assertEqual(VideoAsset.objects.get().artifact_names, [owned])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.original.delete()
+        self.assertFalse(default_storage.exists(owned))
+        self.assertTrue(default_storage.exists(foreign))
+
+    def test_prepare_stage_skips_pipeline_for_known_content(self):
+        self._process_original()
+        VideoProcessing.objects.create(video=self.duplicate, status='processing')
+
+        with mock.patch.object(VideoProcessor, 'validate_video') as validate:
+            result = prepare_video_stage(self.duplicate.id)
+
+        validate.assert_not_called()
+        self.assertIn(LINKED, result)
+        self.duplicate.refresh_from_db()
+        self.assertEqual(self.duplicate.content_hash, self.content_hash)
+        self.assertEqual(self.duplicate.status, 'ready')
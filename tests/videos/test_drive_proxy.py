@@ -0,0 +1,171 @@
+"""Tests for the chunked, cached Google Drive proxy."""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+
+from apps.videos import drive_proxy
+from apps.videos.drive_proxy import ChunkCache, DriveProxy, DriveProxyError, http_fetch
+from apps.videos.range_streaming import RangeNotSatisfiable
+
+
+class FakeDrive:
+    """Serves ranges of an in-memory file and counts upstream requests."""
+
+    def __init__(self, data, delay=0.0):
+        self.data = data
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, url, start, end, headers):
+        with self._lock:
+            self.calls.append((start, end))
+        if self.delay:
+            time.sleep(self.delay)
+        return self.data[start:end + 1], len(self.data), 'video/mp4'
+
+
+class DriveProxyTests(SimpleTestCase):
+    """Ranges are served from aligned chunks fetched once."""
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        self.data = bytes(range(256)) * 40  # 10240 bytes
+        self.drive = FakeDrive(self.data)
+        self.proxy = self._proxy(self.drive)
+
+    def _proxy(self, fetch):
+        return DriveProxy(
+            chunk_cache=ChunkCache(self.cache_dir, max_bytes=10 ** 9),
+            fetch=fetch,
+            chunk_size=1024,
+            meta_cache=LocMemCache('drive-proxy-tests', {}),
+        )
+
+    def _read(self, proxy, range_header):
+        status, headers, body = proxy.open_range('file-1', 'https://drive/file-1', dict, range_header)
+        return status, headers, b''.join(body)
+
+    def test_range_spanning_chunks(self):
+        status, headers, body = self._read(self.proxy, 'bytes=1000-3100')
+
+        self.assertEqual(status, 206)
+        self.assertEqual(body, self.data[1000:3101])
+        self.assertEqual(headers['Content-Range'], 'bytes 1000-3100/10240')
+        self.assertEqual(headers['Content-Length'], '2101')
+        # Chunks 0..3, each requested on its aligned boundary
+        self.assertEqual(self.drive.calls, [(0, 1023), (1024, 2047), (2048, 3071), (3072, 4095)])
+
+    def test_full_file_without_range(self):
+        status, headers, body = self._read(self.proxy, None)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body, self.data)
+        self.assertNotIn('Content-Range', headers)
+
+    def test_second_viewer_is_served_from_disk(self):
+        self._read(self.proxy, 'bytes=0-2047')
+        calls = len(self.drive.calls)
+
+        # A different worker shares the disk cache but not the in-process state
+        other = DriveProxy(
+            chunk_cache=ChunkCache(self.cache_dir), fetch=self.drive, chunk_size=1024,
+            meta_cache=self.proxy.meta_cache,
+        )
+        status, _headers, body = self._read(other, 'bytes=100-2000')
+
+        self.assertEqual(status, 206)
+        self.assertEqual(body, self.data[100:2001])
+        self.assertEqual(len(self.drive.calls), calls)
+
+    def test_concurrent_viewers_share_one_fetch(self):
+        drive = FakeDrive(self.data, delay=0.1)
+        proxy = self._proxy(drive)
+        proxy.meta_cache.set(proxy._meta_key('file-1'), {'size': len(self.data), 'content_type': 'video/mp4'})
+        results = []
+
+        def viewer():
+            results.append(proxy.get_chunk('file-1', 3, 'https://drive/file-1', dict))
+
+        threads = [threading.Thread(target=viewer) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(drive.calls, [(3072, 4095)])
+        self.assertEqual(results, [self.data[3072:4096]] * 8)
+
+    def test_unsatisfiable_range(self):
+        with self.assertRaises(RangeNotSatisfiable):
+            self._read(self.proxy, 'bytes=20000-')
+
+    def test_waiter_that_gives_up_leaves_the_holders_lock(self):
+        lock_key = 'drive_proxy:lock:file-1:2'
+        self.proxy.meta_cache.add(lock_key, 'other-worker', 30)
+
+        with mock.patch.object(drive_proxy, 'DRIVE_PROXY_WAIT_TIMEOUT', 0):
+            data = self.proxy.get_chunk('file-1', 2, 'https://drive/file-1', dict)
+
+        self.assertEqual(data, self.data[2048:3072])
+        self.assertEqual(self.proxy.meta_cache.get(lock_key), 'other-worker')
+
+
+class HttpFetchTests(SimpleTestCase):
+    """Responses that ignore the Range header are never read whole."""
+
+    def _response(self, status, headers, body):
+        response = mock.MagicMock(status_code=status, headers=headers)
+        response.__enter__.return_value = response
+        response.iter_content.return_value = iter([body[i:i + 100] for i in range(0, len(body), 100)])
+        return response
+
+    def test_full_response_reads_only_the_first_chunk(self):
+        body = b'x' * 1000
+        response = self._response(200, {'Content-Length': '1000', 'Content-Type': 'video/webm'}, body)
+        with mock.patch.object(drive_proxy.http_session, 'get', return_value=response):
+            data, total, content_type = http_fetch('https://drive/file-1', 0, 249, {})
+
+        self.assertEqual((len(data), total, content_type), (250, 1000, 'video/webm'))
+        # Three of the ten blocks were enough
+        self.assertEqual(len(list(response.iter_content.return_value)), 7)
+
+    def test_full_response_for_a_later_chunk_is_rejected(self):
+        response = self._response(200, {'Content-Length': '1000'}, b'x' * 1000)
+        with mock.patch.object(drive_proxy.http_session, 'get', return_value=response):
+            with self.assertRaises(DriveProxyError):
+                http_fetch('https://drive/file-1', 500, 749, {})
+
+
+class ChunkCacheTests(SimpleTestCase):
+    """The disk cache evicts least recently used chunks."""
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+
+    def test_evicts_oldest_chunks(self):
+        chunk_cache = ChunkCache(self.cache_dir, max_bytes=3000)
+        for index in range(3):
+            chunk_cache.put('file-1', index, b'x' * 1000)
+            path = chunk_cache._path('file-1', index)
+            os.utime(path, (1000 + index, 1000 + index))
+        # Reading chunk 0 makes it the most recently used
+        chunk_cache.get('file-1', 0)
+
+        chunk_cache.put('file-1', 3, b'x' * 1000)
+        chunk_cache.evict()
+
+        self.assertIsNotNone(chunk_cache.get('file-1', 0))
+        self.assertIsNone(chunk_cache.get('file-1', 1))
+        self.assertIsNotNone(chunk_cache.get('file-1', 3))
@@ -0,0 +1,85 @@
+"""Tests for incremental like toggling and count reconciliation."""
+
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.videos.likes import reconcile_like_counts, toggle_like
+from apps.videos.models import Video, VideoLike
+from apps.videos.views import VideoViewSet
+
+
+class ToggleLikeTests(TestCase):
+    """Each click adjusts like_count by the change it made."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import UserFactory, VideoFactory
+
+        self.user = UserFactory()
+        self.video = VideoFactory()
+
+    def _toggle(self, is_like=True):
+        video = Video.objects.get(id=self.video.id)
+        return toggle_like(video, self.user, is_like)
+
+    def test_like_then_unlike(self):
+        self.assertEqual(self._toggle(), (True, 1))
+        self.assertEqual(self._toggle(), (False, 0))
+        self.assertFalse(VideoLike.objects.exists())
+
+    def test_switching_to_dislike_drops_the_like(self):
+        self._toggle(True)
+        self.assertEqual(self._toggle(False), (False, 0))
+        self.assertFalse(VideoLike.objects.get().is_like)
+        self.assertEqual(self._toggle(True), (True, 1))
+
+    def test_toggle_never_counts_rows(self):
+        video = Video.objects.get(id=self.video.id)
+        # Savepoint, locked read, insert, count update, count read, release
+        with self.assertNumQueries(6):
+            toggle_like(video, self.user, True)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.like_count, 1)
+
+    def test_count_never_goes_negative(self):
+        self._toggle(True)
+        Video.objects.filter(id=self.video.id).update(like_count=0)
+        self.assertEqual(self._toggle(True).like_count, 0)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.like_count, 0)
+
+    def test_response_count_includes_other_clicks(self):
+        # get_object() ran before another viewer's like committed
+        stale = Video.objects.get(id=self.video.id)
+        Video.objects.filter(id=self.video.id).update(like_count=5)
+        self.assertEqual(toggle_like(stale, self.user, True), (True, 6))
+
+    def test_like_endpoint(self):
+        request = APIRequestFactory().post(f'/api/videos/{self.video.id}/like/', {'is_like': True}, format='json')
+        force_authenticate(request, user=self.user)
+        with mock.patch('apps.videos.views.friend_graph.get_friend_ids', return_value=set()):
+            response = VideoViewSet.as_view({'post': 'like'}, **VideoViewSet.like.kwargs)(request, pk=str(self.video.id))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'success': True, 'is_liked': True, 'like_count': 1})
+
+
+class ReconcileLikeCountsTests(TestCase):
+    """Drifted counts are reset from the like rows."""
+
+    def test_fixes_only_drifted_videos(self):
+        from tests.factories import UserFactory, VideoFactory
+
+        drifted, accurate = VideoFactory(), VideoFactory()
+        for _ in range(2):
+            VideoLike.objects.create(user=UserFactory(), video=drifted, is_like=True)
+        VideoLike.objects.create(user=UserFactory(), video=drifted, is_like=False)
+        Video.objects.filter(id=drifted.id).update(like_count=7)
+
+        self.assertEqual(reconcile_like_counts(batch_size=1), 1)
+        drifted.refresh_from_db()
+        accurate.refresh_from_db()
+        self.assertEqual(drifted.like_count, 2)
+        self.assertEqual(accurate.like_count, 0)
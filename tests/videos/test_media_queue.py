@@ -0,0 +1,71 @@
+"""Tests for the dedicated video processing lanes."""
+
+import sys
+from unittest import mock
+
+from django.test import SimpleTestCase
+from kombu import Connection
+
+from apps.videos import media_queue
+from apps.videos.media_queue import (
+    FAST_LANE_CONCURRENCY, FAST_QUEUE, TRANSCODE_QUEUE, queue_depths, transcode_concurrency, worker_argv,
+)
+from apps.videos.transcoding import Rendition, TranscodingError, build_transcode_command, run_ffmpeg
+
+
+class WorkerSizingTests(SimpleTestCase):
+    """Transcode slots are sized from cores and ffmpeg threads."""
+
+    def test_concurrency_divides_cores_by_threads(self):
+        self.assertEqual(transcode_concurrency(cores=16, threads=4), 4)
+        self.assertEqual(transcode_concurrency(cores=2, threads=4), 1)
+
+    def test_cgroup_quota_caps_cores(self):
+        files = {media_queue.CGROUP_V2_CPU_MAX: '150000 100000'}
+        with mock.patch.object(media_queue, '_read', side_effect=files.get), \
+                mock.patch.object(media_queue.os, 'sched_getaffinity', return_value=set(range(16)), create=True):
+            self.assertEqual(media_queue.cpu_count(), 2)
+
+        files[media_queue.CGROUP_V2_CPU_MAX] = 'max 100000'
+        with mock.patch.object(media_queue, '_read', side_effect=files.get), \
+                mock.patch.object(media_queue.os, 'sched_getaffinity', return_value=set(range(16)), create=True):
+            self.assertEqual(media_queue.cpu_count(), 16)
+
+    def test_worker_argv_per_lane(self):
+        fast = worker_argv('fast')
+        self.assertEqual(fast[fast.index('-Q') + 1], FAST_QUEUE)
+        self.assertEqual(fast[fast.index('--concurrency') + 1], str(FAST_LANE_CONCURRENCY))
+
+        transcode = worker_argv('transcode', cores=8)
+        self.assertEqual(transcode[transcode.index('-Q') + 1], TRANSCODE_QUEUE)
+        self.assertEqual(transcode[transcode.index('--prefetch-multiplier') + 1], '1')
+
+    def test_transcode_command_caps_threads(self):
+        cmd = build_transcode_command('source.mp4', [(Rendition('360p', 640, 360, '1000k'), '/tmp/360p.mp4')], threads=3)
+        self.assertEqual(cmd[cmd.index('-threads') + 1], '3')
+        self.assertLess(cmd.index('-threads'), cmd.index('-i'))
+        self.assertEqual(cmd.count('-threads'), 2)
+
+
+class QueueDepthTests(SimpleTestCase):
+    """Depths come from passive declares on the broker."""
+
+    def test_counts_waiting_messages(self):
+        with Connection('memory://') as connection:
+            queue = connection.SimpleQueue(TRANSCODE_QUEUE)
+            for index in range(3):
+                queue.put({'job': index})
+
+            depths = queue_depths(connection)
+            queue.close()
+
+        self.assertEqual(depths[TRANSCODE_QUEUE], 3)
+        self.assertEqual(depths[FAST_QUEUE], 0)
+
+
+class RunFfmpegTests(SimpleTestCase):
+    """Media subprocesses are killed at their hard timeout."""
+
+    def test_timeout_raises_transcoding_error(self):
+        with self.assertRaises(TranscodingError):
+            run_ffmpeg([sys.executable, '-c', 'import time; time.sleep(5)'], timeout=0.2, operation='probe')
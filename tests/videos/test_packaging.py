@@ -0,0 +1,127 @@
+"""Tests for HLS/DASH packaging and manifest exposure."""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.videos.packaging import (
+    build_dash_command,
+    build_hls_variant_command,
+    build_master_playlist,
+    codecs_from_probe,
+    dimensions_from_probe,
+    package_renditions,
+    prefix_manifest,
+    rendition_bandwidth,
+)
+from apps.videos.transcoding import Rendition, transcode_renditions
+
+HD = Rendition('720p', 1280, 720, '2500k')
+SD = Rendition('360p', 640, 360, '1000k', audio_bitrate='96k')
+
+
+class PlaylistTests(SimpleTestCase):
+    """Master playlists advertise every rendition, highest bandwidth first."""
+
+    def test_bandwidth_includes_audio(self):
+        self.assertEqual(rendition_bandwidth(HD), 2628000)
+        self.assertEqual(rendition_bandwidth(SD), 1096000)
+
+    def test_master_playlist_lists_variants(self):
+        playlist = build_master_playlist([
+            {'name': '360p', 'width': 640, 'height': 360, 'bandwidth': 1096000, 'playlist': '360p/index.m3u8'},
+            {'name': '720p', 'width': 1280, 'height': 720, 'bandwidth': 2628000, 'playlist': '720p/index.m3u8'},
+        ])
+        lines = playlist.splitlines()
+
+        self.assertEqual(lines[0], '#EXTM3U')
+        self.assertIn('BANDWIDTH=2628000,RESOLUTION=1280x720', lines[3])
+        self.assertEqual(lines[4], '720p/index.m3u8')
+        self.assertEqual(lines[6], '360p/index.m3u8')
+
+    def test_codecs_and_dimensions_come_from_the_probe(self):
+        probe = {'streams': [
+            {'codec_type': 'video', 'codec_name': 'h264', 'profile': 'Main', 'level': 31, 'width': 640, 'height': 360},
+            {'codec_type': 'audio', 'codec_name': 'aac', 'profile': 'HE-AAC'},
+        ]}
+        self.assertEqual(codecs_from_probe(probe), 'avc1.4d001f,mp4a.40.5')
+        self.assertEqual(dimensions_from_probe(probe), (640, 360))
+        # Not something the playlist can describe; the caller falls back
+        self.assertIsNone(codecs_from_probe({'streams': [{'codec_type': 'video', 'codec_name': 'hevc'}]}))
+
+        playlist = build_master_playlist([
+            {'name': '360p', 'width': 480, 'height': 360, 'bandwidth': 1096000,
+             'codecs': 'avc1.4d001f,mp4a.40.5', 'playlist': '360p/index.m3u8'},
+        ])
+        self.assertIn('RESOLUTION=480x360,CODECS="avc1.4d001f,mp4a.40.5"', playlist)
+
+    def test_packaging_commands_remux_without_reencoding(self):
+        hls = build_hls_variant_command('720p.mp4', '/out/720p')
+        self.assertEqual(hls[hls.index('-c') + 1], 'copy')
+        self.assertEqual(hls[-1], '/out/720p/index.m3u8')
+
+        dash = build_dash_command(['720p.mp4', '360p.mp4'], '/out/dash/manifest.mpd')
+        self.assertEqual(dash.count('-i'), 2)
+        self.assertEqual(dash.count('0:a:0?'), 1)
+
+    def test_prefix_manifest_produces_storage_names(self):
+        manifest = prefix_manifest(
+            {'hls': 'master.m3u8', 'dash': None, 'renditions': [{'name': '720p', 'playlist': '720p/index.m3u8'}]},
+            'streams/abc',
+        )
+        self.assertEqual(manifest['hls'], 'streams/abc/master.m3u8')
+        self.assertIsNone(manifest['dash'])
+        self.assertEqual(manifest['renditions'][0]['playlist'], 'streams/abc/720p/index.m3u8')
+
+
+class QualityVariantsViewTests(TestCase):
+    """Packaged videos expose their manifests to players."""
+
+    def test_returns_manifest_urls(self):
+        from apps.videos.views import VideoQualityVariantsView
+        from tests.factories import UserFactory, VideoFactory
+
+        user = UserFactory()
+        video = VideoFactory(uploader=user, streaming_manifest=prefix_manifest(
+            {
+                'hls': 'master.m3u8',
+                'dash': None,
+                'renditions': [{'name': '720p', 'width': 1280, 'height': 720,
+                                'bandwidth': 2628000, 'playlist': '720p/index.m3u8'}],
+            },
+            'streams/packaged',
+        ))
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=user)
+
+        response = VideoQualityVariantsView.as_view()(request, video_id=video.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['manifests']['hls'].endswith('/master.m3u8'))
+        self.assertEqual(response.data['quality_variants'][0]['bandwidth'], 2628000)
+
+
+@unittest.skipUnless(shutil.which('ffmpeg'), 'ffmpeg is not installed')
+class PackageClipTests(SimpleTestCase):
+    """End-to-end packaging of a small generated clip."""
+
+    def test_writes_master_and_variant_playlists(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir, True)
+        source = os.path.join(workdir, 'source.mp4')
+        subprocess.run(
+            ['ffmpeg', '-hide_banner', '-nostdin', '-y', '-f', 'lavfi',
+             '-i', 'testsrc=duration=6:size=640x360:rate=25', '-c:v', 'libx264', source],
+            check=True, capture_output=True,
+        )
+        outputs = transcode_renditions(source, os.path.join(workdir, 'out'), [SD])
+
+        manifest = package_renditions(outputs, [SD], os.path.join(workdir, 'stream'))
+
+        self.assertTrue(os.path.exists(os.path.join(workdir, 'stream', manifest['hls'])))
+        self.assertTrue(os.path.exists(os.path.join(workdir, 'stream', '360p', 'index.m3u8')))
@@ -0,0 +1,86 @@
+"""Tests for the persisted ffprobe result cache."""
+
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from apps.videos import probe_cache
+from apps.videos.enhanced_processing import VideoProcessor
+from apps.videos.models import VideoProbe
+
+PROBE = {
+    'format': {'duration': '90.0', 'size': '2048'},
+    'streams': [{'codec_type': 'video', 'codec_name': 'h264', 'width': 1280, 'height': 720, 'r_frame_rate': '24/1'}],
+}
+
+
+class ProbeCacheTests(TestCase):
+    """ffprobe runs at most once per source version."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import VideoFactory
+
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.tmp)
+        media.enable()
+        self.addCleanup(media.disable)
+        cache.clear()
+
+        self.video = VideoFactory(status='processing')
+        self.video.file.name = default_storage.save('videos/movie.mp4', ContentFile(b'x' * 2048))
+        self.video.save()
+
+        patcher = mock.patch.object(probe_cache, 'run_ffprobe', return_value=PROBE)
+        self.ffprobe = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pipeline_stages_share_one_probe(self):
+        processor = VideoProcessor(self.video.id)
+        self.assertTrue(processor.validate_video())
+        processor.extract_metadata()
+        # A later stage on another worker
+        VideoProcessor(self.video.id).get_video_info()
+
+        self.assertEqual(self.ffprobe.call_count, 1)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.resolution, '1280x720')
+
+    def test_hit_from_database_needs_no_source(self):
+        local_path = mock.Mock(return_value=self.video.file.path)
+        probe_cache.probe_field_file(self.video.file, local_path)
+        cache.clear()
+
+        second_path = mock.Mock()
+        self.assertEqual(probe_cache.probe_field_file(self.video.file, second_path), PROBE)
+        second_path.assert_not_called()
+        self.assertEqual(VideoProbe.objects.count(), 1)
+
+    def test_new_version_is_probed_again(self):
+        probe_cache.probe_field_file(self.video.file, lambda: self.video.file.path)
+        with open(self.video.file.path, 'ab') as source:
+            source.write(b'more')
+
+        probe_cache.probe_field_file(self.video.file, lambda: self.video.file.path)
+        self.assertEqual(self.ffprobe.call_count, 2)
+
+    def test_failed_probe_is_not_cached(self):
+        self.ffprobe.return_value = None
+        self.assertIsNone(probe_cache.probe_path(self.video.file.path))
+        self.ffprobe.return_value = PROBE
+        self.assertEqual(probe_cache.probe_path(self.video.file.path), PROBE)
+
+    def test_waiter_that_gives_up_leaves_the_holders_lock(self):
+        identity = probe_cache.identity_for_path(self.video.file.path)
+        lock_key = f"{probe_cache._cache_key(identity)}:lock"
+        cache.add(lock_key, 'holder', 60)
+
+        with mock.patch.object(probe_cache, 'PROBE_LOCK_TIMEOUT', 0):
+            self.assertEqual(probe_cache.probe_path(self.video.file.path), PROBE)
+        self.assertEqual(cache.get(lock_key), 'holder')
@@ -0,0 +1,140 @@
+"""Tests for the staged, resumable video processing DAG."""
+
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from celery import current_app
+from django.test import TestCase, override_settings
+
+from apps.videos.enhanced_processing import VideoProcessor
+from apps.videos.models import Video, VideoProcessing
+from apps.videos.tasks import start_video_processing
+from apps.videos.transcoding import TranscodingError, rendition_output_path
+from apps.videos.workspace import MediaWorkspace
+
+
+class ProcessingPipelineTests(TestCase):
+    """Stages checkpoint into VideoProcessing and reruns resume from them."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import VideoFactory
+
+        eager = {'task_always_eager': True, 'task_eager_propagates': True}
+        previous = {name: current_app.conf[name] for name in eager}
+        current_app.conf.update(eager)
+        self.addCleanup(current_app.conf.update, previous)
+
+        self.video = VideoFactory(status='uploading', resolution='854x480')
+        self.transcoded = []
+        self.fail_renditions = set()
+        patches = [
+            mock.patch.object(VideoProcessor, 'validate_video', return_value=True),
+            mock.patch.object(VideoProcessor, 'extract_metadata', return_value={}),
+            mock.patch.object(VideoProcessor, 'generate_thumbnails', return_value=True),
+            mock.patch.object(VideoProcessor, 'transcode', autospec=True, side_effect=self._transcode),
+            mock.patch.object(VideoProcessor, 'package', autospec=True, side_effect=self._package),
+            mock.patch('apps.videos.tasks._fail_stage', side_effect=self._fail_without_retry),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _transcode(self, processor, renditions):
+        names = [rendition.name for rendition in renditions]
+        if self.fail_renditions & set(names):
+            raise TranscodingError('boom')
+        self.transcoded.extend(names)
+        return {name: f'/tmp/{name}.mp4' for name in names}
+
+    def _package(self, processor, outputs, renditions):
+        processor.video.streaming_manifest = {'hls': 'master.m3u8', 'renditions': sorted(outputs)}
+        Video.objects.filter(id=processor.video.id).update(streaming_manifest=processor.video.streaming_manifest)
+
+    def _fail_without_retry(self, task, video_id, stage, exc):
+        VideoProcessing.objects.filter(video_id=video_id).update(status='failed', error_message=stage)
+        raise exc
+
+    def test_runs_every_stage_and_records_checkpoints(self):
+        start_video_processing.delay(self.video.id)
+
+        record = VideoProcessing.objects.get(video=self.video)
+        self.assertEqual(record.status, 'completed')
+        self.assertTrue(record.metadata_extracted)
+        self.assertTrue(record.thumbnail_generated)
+        self.assertEqual(sorted(record.resolutions_generated), ['144p', '240p', '360p', '480p'])
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.status, 'ready')
+        # 480p source: nothing above it is encoded
+        self.assertNotIn('720p', self.transcoded)
+
+    def test_rerun_resumes_from_failed_rendition(self):
+        # Eager groups run in order, so fail the last branch
+        self.fail_renditions = {'144p'}
+        with self.assertRaises(TranscodingError):
+            start_video_processing.delay(self.video.id)
+
+        record = VideoProcessing.objects.get(video=self.video)
+        self.assertEqual(record.status, 'failed')
+        self.assertEqual(sorted(record.resolutions_generated), ['240p', '360p', '480p'])
+
+        self.fail_renditions = set()
+        self.transcoded = []
+        with mock.patch.object(VideoProcessor, 'generate_thumbnails') as thumbnails:
+            start_video_processing.delay(self.video.id)
+            thumbnails.assert_not_called()
+
+        self.assertEqual(self.transcoded, ['144p'])
+        self.assertEqual(VideoProcessing.objects.get(video=self.video).status, 'completed')
+
+
+class ProcessedOutputTests(TestCase):
+    """Renditions handed between stages never collide across videos."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import VideoFactory
+
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=os.path.join(self.tmp, 'media'))
+        media.enable()
+        self.addCleanup(media.disable)
+
+        # Same client filename, uploaded on different days
+        self.videos = [
+            VideoFactory(file=f'videos/2026/01/0{day}/movie.mp4', resolution='256x144') for day in (1, 2)
+        ]
+
+    def _fake_transcode(self, video):
+        def transcode(input_path, output_dir, renditions, filename_base='output', timings=None):
+            outputs = {}
+            for rendition in renditions:
+                path = rendition_output_path(output_dir, filename_base, rendition)
+                with open(path, 'wb') as output:
+                    output.write(str(video.id).encode())
+                outputs[rendition.name] = path
+            return outputs
+        return transcode
+
+    def _processor(self, video, host):
+        processor = VideoProcessor(video.id)
+        processor.workspace = MediaWorkspace.for_video(video.id, root=os.path.join(self.tmp, host))
+        return processor
+
+    def test_videos_sharing_a_basename_keep_their_own_renditions(self):
+        for video in self.videos:
+            processor = self._processor(video, 'transcode-host')
+            with mock.patch.object(VideoProcessor, 'input_path', return_value='source.mp4'), \
+                    mock.patch('apps.videos.enhanced_processing.transcode_renditions',
+                               side_effect=self._fake_transcode(video)):
+                processor.transcode(processor.select_renditions())
+
+        for video in self.videos:
+            # The packaging stage runs on a host with an empty workspace
+            processor = self._processor(video, 'package-host')
+            outputs = processor.processed_outputs(['144p'])
+            with open(processor.workspace.fetch_stored(outputs['144p']), 'rb') as rendition:
+                self.assertEqual(rendition.read(), str(video.id).encode())
@@ -0,0 +1,94 @@
+"""Tests for Range-aware local file streaming."""
+
+import os
+import tempfile
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+
+from apps.videos import range_streaming
+from apps.videos.range_streaming import RangeNotSatisfiable, parse_range_header, serve_file
+
+
+class ParseRangeHeaderTests(SimpleTestCase):
+    """Byte ranges are validated, clamped and coalesced."""
+
+    def test_forms(self):
+        self.assertEqual(parse_range_header('bytes=0-99', 1000), [(0, 99)])
+        self.assertEqual(parse_range_header('bytes=900-', 1000), [(900, 999)])
+        self.assertEqual(parse_range_header('bytes=-100', 1000), [(900, 999)])
+        self.assertEqual(parse_range_header('bytes=990-5000', 1000), [(990, 999)])
+
+    def test_overlapping_ranges_are_merged(self):
+        self.assertEqual(
+            parse_range_header('bytes=500-599, 0-99, 50-149, 600-700', 1000),
+            [(0, 149), (500, 700)],
+        )
+
+    def test_malformed_or_absent_serves_full_file(self):
+        self.assertIsNone(parse_range_header(None, 1000))
+        self.assertIsNone(parse_range_header('items=0-1', 1000))
+        self.assertIsNone(parse_range_header('bytes=5-1', 1000))
+        self.assertIsNone(parse_range_header('bytes=' + ','.join(['0-1'] * 17), 1000))
+
+    def test_unsatisfiable(self):
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range_header('bytes=1000-', 1000)
+
+
+class ServeFileTests(SimpleTestCase):
+    """Responses carry the right status, headers and bytes."""
+
+    def setUp(self):
+        super().setUp()
+        handle, self.path = tempfile.mkstemp(suffix='.mp4')
+        self.data = bytes(range(256)) * 40
+        with os.fdopen(handle, 'wb') as file:
+            file.write(self.data)
+        self.addCleanup(os.unlink, self.path)
+        self.factory = RequestFactory()
+
+    def _get(self, **headers):
+        response = serve_file(self.factory.get('/', **headers), self.path)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        # Not response.close(): that fires request_finished and touches the DB
+        if getattr(response, 'file_to_stream', None) is not None:
+            response.file_to_stream.close()
+        return response, body
+
+    def test_full_file(self):
+        response, body = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(body, self.data)
+
+    def test_single_range(self):
+        response, body = self._get(HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(body, self.data[100:200])
+
+    def test_multiple_ranges(self):
+        response, body = self._get(HTTP_RANGE='bytes=0-9,5000-5009')
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response['Content-Type'].startswith('multipart/byteranges'))
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertIn(self.data[:10], body)
+        self.assertIn(self.data[5000:5010], body)
+
+    def test_unsatisfiable_range(self):
+        response, _body = self._get(HTTP_RANGE='bytes=999999-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_stale_if_range_gets_full_file(self):
+        response, body = self._get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.data)
+
+    def test_x_accel_redirect_hands_off_to_nginx(self):
+        with mock.patch.object(range_streaming, 'X_ACCEL_REDIRECT_PREFIX', '/protected-media/'):
+            response = serve_file(self.factory.get('/'), self.path, accel_name='videos/2024/a.mp4')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/videos/2024/a.mp4')
+        self.assertEqual(response.content, b'')
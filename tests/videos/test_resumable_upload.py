@@ -0,0 +1,156 @@
+"""Tests for resumable chunked video uploads."""
+
+import hashlib
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.exceptions import SuspiciousOperation
+from django.core.files.storage import default_storage
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.videos import resumable_upload
+from apps.videos.models import VideoUpload
+from apps.videos.resumable_upload import (
+    UploadOffsetConflict, UploadTooLarge, append_chunk, begin_upload, check_declared_size,
+)
+from apps.videos.views import VideoUploadChunkView
+from shared.middleware.security_middleware import FileUploadSecurityMiddleware
+
+
+class FakeS3:
+    """Records multipart calls, keeping each part's bytes."""
+
+    def __init__(self):
+        self.parts = {}
+        self.completed = None
+
+    def create_multipart_upload(self, key, content_type=None):
+        return 'mpu-1'
+
+    def upload_part(self, key, upload_id, part_number, body):
+        self.parts[part_number] = body.read()
+        return f'"etag-{part_number}"'
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        self.completed = (key, parts)
+        return {'file_key': key}
+
+    def abort_multipart_upload(self, key, upload_id):
+        return True
+
+
+class ResumableUploadTests(TestCase):
+    """Chunks are appended at the right offset and assembled into storage."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import UserFactory, VideoFactory
+
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=f'{self.tmp}/media')
+        media.enable()
+        self.addCleanup(media.disable)
+        patcher = mock.patch.object(resumable_upload, 'UPLOAD_STAGING_DIR', f'{self.tmp}/staging')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = UserFactory()
+        self.video = VideoFactory(uploader=self.user, status='uploading')
+        self.data = bytes(range(256)) * 4
+        self.upload = VideoUpload.objects.create(
+            user=self.user, video=self.video, filename='movie.mp4', file_size=len(self.data),
+        )
+
+    def _send(self, offset, size):
+        return append_chunk(self.upload, offset, io.BytesIO(self.data[offset:offset + size]), size)
+
+    def test_local_chunks_track_progress_and_assemble(self):
+        begin_upload(self.upload)
+        self._send(0, 300)
+        self.assertEqual(self.upload.bytes_received, 300)
+        self.assertAlmostEqual(self.upload.progress_percentage, 29.3, places=1)
+
+        self._send(300, 724)
+
+        self.upload.refresh_from_db()
+        self.video.refresh_from_db()
+        self.assertEqual(self.upload.status, 'completed')
+        self.assertEqual(self.upload.progress_percentage, 100.0)
+        self.assertEqual(self.video.status, 'processing')
+        self.assertEqual(self.video.content_hash, hashlib.sha256(self.data).hexdigest())
+        with default_storage.open(self.video.file.name, 'rb') as stored:
+            self.assertEqual(stored.read(), self.data)
+
+    def test_wrong_offset_conflicts(self):
+        begin_upload(self.upload)
+        self._send(0, 100)
+        with self.assertRaises(UploadOffsetConflict):
+            self._send(50, 100)
+
+    def test_interrupted_chunk_resumes_from_received_bytes(self):
+        begin_upload(self.upload)
+        # Client declared 500 bytes but the connection dropped after 200
+        append_chunk(self.upload, 0, io.BytesIO(self.data[:200]), 500)
+        self.assertEqual(self.upload.bytes_received, 200)
+
+        self._send(200, 824)
+        self.video.refresh_from_db()
+        with default_storage.open(self.video.file.name, 'rb') as stored:
+            self.assertEqual(stored.read(), self.data)
+
+    def test_s3_ships_parts_as_they_fill(self):
+        fake = FakeS3()
+        with mock.patch.object(resumable_upload, '_s3_service', return_value=fake), \
+                mock.patch.object(resumable_upload, 'use_s3', return_value=True), \
+                mock.patch.object(resumable_upload, 'S3_PART_SIZE', 400):
+            begin_upload(self.upload)
+            self._send(0, 300)
+            self.assertEqual(fake.parts, {})
+            self._send(300, 300)
+            self._send(600, 424)
+
+        self.assertEqual(b''.join(fake.parts[number] for number in sorted(fake.parts)), self.data)
+        key, parts = fake.completed
+        self.assertEqual([part['PartNumber'] for part in parts], [1, 2])
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.file.name, key)
+
+    def test_patch_view_reports_offset(self):
+        begin_upload(self.upload)
+        factory = APIRequestFactory()
+        request = factory.patch(
+            f'/api/videos/upload/{self.upload.id}/chunks/', self.data[:100],
+            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET='0',
+        )
+        force_authenticate(request, user=self.user)
+
+        response = VideoUploadChunkView.as_view()(request, upload_id=self.upload.id)
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Upload-Offset'], '100')
+        self.assertEqual(response['Upload-Length'], str(len(self.data)))
+
+
+class DeclaredSizeTests(SimpleTestCase):
+    """Oversized uploads are refused from their declared length alone."""
+
+    def test_declared_file_size(self):
+        with self.assertRaises(UploadTooLarge):
+            check_declared_size(resumable_upload.MAX_VIDEO_FILE_SIZE + 1)
+
+    @override_settings(MAX_UPLOAD_SIZE=1000)
+    def test_middleware_uses_content_length(self):
+        middleware = FileUploadSecurityMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().post(
+            '/upload/', data=b'x' * 10, content_type='multipart/form-data; boundary=x',
+        )
+        request.META['CONTENT_LENGTH'] = '5000'
+        with mock.patch.object(type(request), 'FILES', new_callable=mock.PropertyMock) as files:
+            with self.assertRaises(SuspiciousOperation):
+                middleware(request)
+            files.assert_not_called()
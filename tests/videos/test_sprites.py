@@ -0,0 +1,67 @@
+"""Tests for sprite sheet and WebVTT thumbnail track generation."""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from django.test import SimpleTestCase
+
+from apps.videos.sprites import (
+    SpriteSpec,
+    build_sprite_command,
+    build_thumbnails_vtt,
+    effective_interval,
+    generate_sprites,
+)
+
+SPEC = SpriteSpec(interval=10, columns=2, rows=2, width=160, height=90)
+
+
+class ThumbnailsVttTests(SimpleTestCase):
+    """Cues map each interval to its cell across sprite sheets."""
+
+    def test_cues_walk_cells_then_sheets(self):
+        vtt = build_thumbnails_vtt(45, 10, SPEC, ['sprite_001.jpg', 'sprite_002.jpg'])
+        lines = vtt.splitlines()
+
+        self.assertEqual(lines[0], 'WEBVTT')
+        self.assertEqual(lines[2], '00:00:00.000 --> 00:00:10.000')
+        self.assertEqual(lines[3], 'sprite_001.jpg#xywh=0,0,160,90')
+        self.assertEqual(lines[6], 'sprite_001.jpg#xywh=160,0,160,90')
+        self.assertEqual(lines[12], 'sprite_001.jpg#xywh=160,90,160,90')
+        # Fifth thumbnail starts the second sheet; the last cue is clipped to the duration
+        self.assertEqual(lines[14], '00:00:40.000 --> 00:00:45.000')
+        self.assertEqual(lines[15], 'sprite_002.jpg#xywh=0,0,160,90')
+
+    def test_long_videos_widen_the_interval(self):
+        self.assertEqual(effective_interval(600, SpriteSpec()), 10)
+        self.assertEqual(effective_interval(20000, SpriteSpec(max_thumbnails=500)), 40)
+
+    def test_single_ffmpeg_pass_tiles_frames(self):
+        cmd = build_sprite_command('source.mp4', '/out', 10, SPEC)
+
+        self.assertEqual(cmd.count('-i'), 1)
+        self.assertIn('fps=1/10,scale=160:90,tile=2x2', cmd)
+        self.assertEqual(cmd[-1], '/out/sprite_%03d.jpg')
+
+
+@unittest.skipUnless(shutil.which('ffmpeg'), 'ffmpeg is not installed')
+class SpriteClipTests(SimpleTestCase):
+    """End-to-end sprite generation for a small generated clip."""
+
+    def test_writes_sheets_and_track(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir, True)
+        source = os.path.join(workdir, 'source.mp4')
+        subprocess.run(
+            ['ffmpeg', '-hide_banner', '-nostdin', '-y', '-f', 'lavfi',
+             '-i', 'testsrc=duration=10:size=320x180:rate=25', '-c:v', 'libx264', source],
+            check=True, capture_output=True,
+        )
+
+        result = generate_sprites(source, os.path.join(workdir, 'sprites'), 10, SpriteSpec(interval=1, columns=3, rows=2))
+
+        self.assertEqual(len(result['sprites']), 2)
+        self.assertTrue(os.path.exists(os.path.join(workdir, 'sprites', result['vtt'])))
@@ -0,0 +1,87 @@
+"""Tests for single-pass multi-rendition transcoding."""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from django.test import SimpleTestCase
+
+from apps.videos.transcoding import (
+    Rendition,
+    StageTimings,
+    build_filter_graph,
+    build_transcode_command,
+    select_renditions,
+    transcode_renditions,
+)
+
+LADDER = [
+    Rendition('360p', 640, 360, '1000k'),
+    Rendition('1080p', 1920, 1080, '4000k'),
+    Rendition('720p', 1280, 720, '2500k'),
+    Rendition('144p', 256, 144, '400k'),
+]
+
+
+class RenditionSelectionTests(SimpleTestCase):
+    """Renditions never upscale the source and come out highest first."""
+
+    def test_skips_renditions_above_source(self):
+        selected = select_renditions(LADDER, source_height=720)
+        self.assertEqual([rendition.name for rendition in selected], ['720p', '360p', '144p'])
+
+    def test_unknown_source_height_keeps_everything(self):
+        self.assertEqual(len(select_renditions(LADDER, source_height=None)), len(LADDER))
+
+
+class TranscodeCommandTests(SimpleTestCase):
+    """All renditions come from one ffmpeg invocation with one decode."""
+
+    def test_filter_graph_splits_once(self):
+        graph = build_filter_graph(LADDER[:2])
+        self.assertEqual(graph, '[0:v]split=2[s0][s1];[s0]scale=-2:360[v0];[s1]scale=-2:1080[v1]')
+
+    def test_command_has_single_input_and_one_output_per_rendition(self):
+        outputs = [(rendition, f'/tmp/{rendition.name}.mp4') for rendition in LADDER[:3]]
+        cmd = build_transcode_command('source.mp4', outputs)
+
+        self.assertEqual(cmd.count('-i'), 1)
+        self.assertEqual(cmd.count('-filter_complex'), 1)
+        for index, (rendition, path) in enumerate(outputs):
+            self.assertIn(path, cmd)
+            self.assertIn(f'[v{index}]', cmd)
+        bufsize = cmd[cmd.index('-bufsize') + 1]
+        self.assertEqual(bufsize, '2000k')
+
+
+@unittest.skipUnless(shutil.which('ffmpeg'), 'ffmpeg is not installed')
+class TranscodeClipTests(SimpleTestCase):
+    """End-to-end run against a small generated clip."""
+
+    def setUp(self):
+        super().setUp()
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir, True)
+        self.source = os.path.join(self.workdir, 'source.mp4')
+        subprocess.run(
+            [
+                'ffmpeg', '-hide_banner', '-nostdin', '-y',
+                '-f', 'lavfi', '-i', 'testsrc=duration=2:size=426x240:rate=25',
+                '-f', 'lavfi', '-i', 'sine=duration=2',
+                '-c:v', 'libx264', '-c:a', 'aac', '-shortest', self.source,
+            ],
+            check=True, capture_output=True,
+        )
+
+    def test_emits_each_rendition_and_records_timing(self):
+        timings = StageTimings()
+        renditions = select_renditions(LADDER, source_height=240)
+        outputs = transcode_renditions(
+            self.source, os.path.join(self.workdir, 'out'), renditions, timings=timings,
+        )
+
+        self.assertEqual(set(outputs), {'144p'})
+        self.assertTrue(os.path.getsize(outputs['144p']) > 0)
+        self.assertIn('transcode', timings.stages)
@@ -0,0 +1,95 @@
+"""Tests for buffered video view counting."""
+
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.videos import view_counter as view_counter_module
+from apps.videos.models import Video, VideoView
+from apps.videos.view_counter import MemoryViewCounterStore, ViewCounter, bloom_positions
+from apps.videos.views import VideoViewSet
+
+
+class ViewCounterTests(TestCase):
+    """Views are deduplicated per window and written in bulk."""
+
+    def setUp(self):
+        super().setUp()
+        from tests.factories import UserFactory, VideoFactory
+
+        self.counter = ViewCounter(store=MemoryViewCounterStore())
+        self.user = UserFactory()
+        self.video = VideoFactory()
+
+    def test_repeat_view_in_window_counts_once(self):
+        self.assertTrue(self.counter.record_view(self.video, self.user, '10.0.0.1'))
+        self.assertFalse(self.counter.record_view(self.video, self.user, '10.0.0.1'))
+        self.assertEqual(self.counter.pending_views(self.video.id), 1)
+
+    def test_next_window_counts_again(self):
+        with mock.patch.object(view_counter_module, 'current_window', return_value=1):
+            self.counter.record_view(self.video, self.user, '10.0.0.1')
+        with mock.patch.object(view_counter_module, 'current_window', return_value=2):
+            self.assertTrue(self.counter.record_view(self.video, self.user, '10.0.0.1'))
+
+    def test_flush_bulk_writes_rows_and_counts(self):
+        from tests.factories import UserFactory, VideoFactory
+
+        other = VideoFactory()
+        for _ in range(3):
+            self.counter.record_view(self.video, UserFactory(), '10.0.0.2', 'agent')
+        self.counter.record_view(other, self.user, '10.0.0.3')
+
+        # Savepoint, existence check, one insert, one update, release
+        with self.assertNumQueries(5):
+            self.assertEqual(self.counter.flush(), 4)
+
+        self.video.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.video.view_count, 3)
+        self.assertEqual(other.view_count, 1)
+        self.assertEqual(VideoView.objects.filter(video=self.video).count(), 3)
+        self.assertEqual(self.counter.pending_views(self.video.id), 0)
+
+    def test_views_of_deleted_video_are_dropped(self):
+        self.counter.record_view(self.video, self.user, '10.0.0.1')
+        Video.objects.filter(id=self.video.id).delete()
+
+        self.assertEqual(self.counter.flush(), 1)
+        self.assertFalse(VideoView.objects.exists())
+
+    def test_failed_flush_keeps_views_buffered(self):
+        self.counter.record_view(self.video, self.user, '10.0.0.1')
+        with mock.patch.object(VideoView.objects, 'bulk_create', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                self.counter.flush()
+
+        self.assertEqual(self.counter.flush(), 1)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.view_count, 1)
+
+    def test_retrieve_defers_write_until_flush(self):
+        counter = ViewCounter(store=MemoryViewCounterStore())
+        request = APIRequestFactory().get(f'/api/videos/{self.video.id}/')
+        force_authenticate(request, user=self.user)
+        with mock.patch('apps.videos.views.view_counter', counter), \
+                mock.patch('apps.videos.views.friend_graph.get_friend_ids', return_value=set()):
+            response = VideoViewSet.as_view({'get': 'retrieve'})(request, pk=str(self.video.id))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['view_count'], 1)
+        self.assertFalse(VideoView.objects.exists())
+        counter.flush()
+        self.assertEqual(VideoView.objects.get().user, self.user)
+
+
+class BloomPositionTests(SimpleTestCase):
+    """Each viewer maps to a stable set of k bits."""
+
+    def test_positions_are_stable_and_bounded(self):
+        positions = bloom_positions('video:u:1', bits=1024, hashes=7)
+        self.assertEqual(positions, bloom_positions('video:u:1', bits=1024, hashes=7))
+        self.assertEqual(len(positions), 7)
+        self.assertTrue(all(0 <= position < 1024 for position in positions))
+        self.assertNotEqual(positions, bloom_positions('video:u:2', bits=1024, hashes=7))
@@ -0,0 +1,123 @@
+"""Tests for per-job media workspaces."""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, override_settings
+
+from apps.videos import workspace as workspace_module
+from apps.videos.workspace import MediaWorkspace, WorkspaceError, download_url, sweep_stale_workspaces
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b'', headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def iter_content(self, block_size):
+        for start in range(0, len(self.body), block_size):
+            yield self.body[start:start + block_size]
+
+
+class FakeSession:
+    """Serves ``body`` with byte-range support, recording every GET range."""
+
+    def __init__(self, body):
+        self.body = body
+        self.ranges = []
+
+    def head(self, url, **kwargs):
+        return FakeResponse(200, headers={'Content-Length': str(len(self.body)), 'Accept-Ranges': 'bytes'})
+
+    def get(self, url, headers=None, **kwargs):
+        byte_range = (headers or {}).get('Range')
+        if not byte_range:
+            return FakeResponse(200, self.body)
+        start, end = (int(value) for value in byte_range[len('bytes='):].split('-'))
+        self.ranges.append((start, end))
+        return FakeResponse(206, self.body[start:end + 1])
+
+
+class MediaWorkspaceTests(SimpleTestCase):
+    """Sources are fetched once, verified, and removed with the workspace."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=os.path.join(self.tmp, 'media'))
+        media.enable()
+        self.addCleanup(media.disable)
+        self.root = os.path.join(self.tmp, 'work')
+        self.data = os.urandom(4096)
+        self.name = default_storage.save('videos/source.mp4', ContentFile(self.data))
+
+    def test_storage_source_fetched_once_and_reused(self):
+        workspace = MediaWorkspace.for_video('abc', root=self.root)
+        path = workspace.fetch_source(storage_name=self.name)
+        with open(path, 'rb') as fetched:
+            self.assertEqual(fetched.read(), self.data)
+        self.assertEqual(workspace.checksum(), {
+            'sha256': hashlib.sha256(self.data).hexdigest(), 'size': len(self.data),
+        })
+
+        with mock.patch.object(default_storage, 'open') as storage_open:
+            self.assertEqual(workspace.fetch_source(storage_name=self.name), path)
+        storage_open.assert_not_called()
+
+    def test_checksum_mismatch_leaves_nothing_behind(self):
+        workspace = MediaWorkspace('job', root=self.root)
+        with self.assertRaises(WorkspaceError):
+            workspace.fetch_source(storage_name=self.name, expected_checksum=('md5', '0' * 32))
+        self.assertEqual(sorted(os.listdir(workspace.directory)), ['.lock'])
+        self.assertIsNone(workspace.checksum())
+
+    def test_context_manager_removes_workspace(self):
+        with MediaWorkspace('job', root=self.root) as workspace:
+            scratch = workspace.scratch_dir('variants')
+            self.assertTrue(os.path.isdir(scratch))
+        self.assertFalse(os.path.exists(workspace.directory))
+
+    def test_stage_outputs_are_handed_over_through_storage(self):
+        writer = MediaWorkspace('job', root=os.path.join(self.tmp, 'host-a'))
+        output = os.path.join(writer.scratch_dir('processed'), 'movie_480p.mp4')
+        with open(output, 'wb') as rendition:
+            rendition.write(b'rendition')
+        stored = writer.store(output, 'processed/movie_480p.mp4')
+        self.assertEqual(writer.store(output, stored), stored)  # a retried stage overwrites its output
+
+        # Another host has an empty workspace for the same job
+        reader = MediaWorkspace('job', root=os.path.join(self.tmp, 'host-b'))
+        with open(reader.fetch_stored(stored), 'rb') as fetched:
+            self.assertEqual(fetched.read(), b'rendition')
+        with mock.patch.object(default_storage, 'open') as storage_open:
+            self.assertEqual(writer.fetch_stored(stored), output)
+        storage_open.assert_not_called()
+
+    def test_parallel_ranged_download(self):
+        session = FakeSession(self.data)
+        path = os.path.join(self.tmp, 'download')
+        with mock.patch.object(workspace_module, '_http_session', return_value=session):
+            size = download_url('https://cdn.example.com/movie.mp4', path, chunk_size=1000, workers=3)
+
+        self.assertEqual(size, len(self.data))
+        self.assertEqual(sorted(session.ranges), [(0, 999), (1000, 1999), (2000, 2999), (3000, 3999), (4000, 4095)])
+        with open(path, 'rb') as downloaded:
+            self.assertEqual(downloaded.read(), self.data)
+
+    def test_sweep_removes_only_stale_workspaces(self):
+        stale = MediaWorkspace('stale', root=self.root).scratch_dir('x')
+        fresh = MediaWorkspace('fresh', root=self.root).scratch_dir('x')
+        old = time.time() - 2 * 3600
+        os.utime(os.path.dirname(stale), (old, old))
+
+        self.assertEqual(sweep_stale_workspaces(max_age_seconds=3600, root=self.root), 1)
+        self.assertFalse(os.path.exists(os.path.dirname(stale)))
+        self.assertTrue(os.path.exists(fresh))